@@ -0,0 +1,304 @@
+"""
+静的ファイルのビルド（圧縮・結合・内容ハッシュ付きファイル名）と配信
+
+flask build-assets が static/css・static/js の各ファイルを圧縮し、BUNDLES の定義に従って結合したうえで、
+内容のハッシュを含む名前で static/dist/ に書き出し、論理名 → 出力先の対応を static/dist/manifest.json に保存する。
+VENDOR の外部 CDN のファイル（Bootstrap・Font Awesome・Chart.js）もダウンロードして同様に書き出す
+（CSS が参照するフォントも取得し、url() を書き換える）。
+
+アプリ側では url_for('static', filename=...) をマニフェストで解決し（url_defaults）、
+static/dist/ 以下は内容が変われば URL も変わるため 1 年の immutable キャッシュで配信する。
+マニフェストが無い（ビルドしていない）場合は従来どおり元のファイルと CDN を参照する。
+
+圧縮には rjsmin / rcssmin があれば使い、無ければ空白・コメント行を除く簡易な圧縮を行う。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+import urllib.request
+from urllib.parse import urljoin, urlsplit
+
+from flask import request, url_for
+
+try:
+    import rjsmin
+except ImportError:  # 任意依存
+    rjsmin = None
+try:
+    import rcssmin
+except ImportError:  # 任意依存
+    rcssmin = None
+
+logger = logging.getLogger(__name__)
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+DOWNLOAD_TIMEOUT = 30
+
+# 複数のファイルを1つにまとめるもの（論理名: 構成ファイル）。全ページで読み込む共通スクリプト
+BUNDLES = {
+    'js/app.js': ['js/main.js', 'js/offline.js'],
+}
+
+# 取り込む外部ファイル（論理名: CDN の URL）。ビルドしていない場合はこの URL をそのまま使う
+# CSS が相対パスで参照するファイルは論理名からの相対位置に置く（Font Awesome の ../webfonts/ 等）
+VENDOR = {
+    'vendor/bootstrap/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js',
+    'vendor/fontawesome/css/all.min.css': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
+    'vendor/chart.js/chart.js': 'https://cdn.jsdelivr.net/npm/chart.js',
+}
+
+# 個別に圧縮する対象（sw.js は /sw.js の固定 URL で配信するため除く）
+SOURCE_DIRS = ('css', 'js', 'js/pages')
+EXCLUDE = {'js/sw.js'}
+
+_CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_SOURCE_MAP_RE = re.compile(r'\n?/[/*]# sourceMappingURL=[^\n]*')
+
+
+# --- 圧縮 ---
+
+def minify_js(source):
+    if rjsmin is not None:
+        return rjsmin.jsmin(source)
+    # 簡易版: 行頭の字下げ・空行・コメントだけの行を除く（テンプレートリテラル内の行はそのまま残す）
+    lines = []
+    in_template = False
+    in_comment = False
+    for line in source.splitlines():
+        stripped = line.strip()
+        if in_template:
+            lines.append(line)
+        elif in_comment:
+            in_comment = '*/' not in stripped
+            continue
+        elif not stripped or stripped.startswith('//'):
+            continue
+        elif stripped.startswith('/*') and ('*/' not in stripped or stripped.endswith('*/')):
+            in_comment = '*/' not in stripped
+            continue
+        else:
+            lines.append(stripped)
+        if _count_backticks(line) % 2:
+            in_template = not in_template
+    return '\n'.join(lines) + '\n'
+
+
+def _count_backticks(line):
+    return len(re.findall(r'(?<!\\)`', line))
+
+
+def minify_css(source):
+    if rcssmin is not None:
+        return rcssmin.cssmin(source)
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    # セレクタの空白（a :hover 等）は意味を持つため、{ } ; , の前後だけを詰める
+    return re.sub(r'\s*([{};,])\s*', r'\1', source).strip() + '\n'
+
+
+def minify(name, source):
+    if name.endswith('.js'):
+        return minify_js(source)
+    if name.endswith('.css'):
+        return minify_css(source)
+    return source
+
+
+def hashed_name(name, content):
+    """js/app.js → dist/js/app.<hash>.js"""
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    root, ext = posixpath.splitext(name)
+    return f'{DIST_DIR}/{root}.{digest}{ext}'
+
+
+# --- ビルド ---
+
+def _read(static_folder, name):
+    with open(os.path.join(static_folder, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def _write(static_folder, name, content):
+    path = os.path.join(static_folder, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 同じ内容なら同じ名前になるため、既にあれば書き込まない
+    if not os.path.exists(path):
+        tmp = f'{path}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+
+def _emit(static_folder, manifest, name, text):
+    content = text.encode('utf-8') if isinstance(text, str) else text
+    output = hashed_name(name, content)
+    _write(static_folder, output, content)
+    manifest[name] = output
+    return output
+
+
+def source_files(static_folder):
+    names = []
+    for directory in SOURCE_DIRS:
+        path = os.path.join(static_folder, directory)
+        if not os.path.isdir(path):
+            continue
+        for filename in sorted(os.listdir(path)):
+            name = f'{directory}/{filename}'
+            if filename.endswith(('.js', '.css')) and name not in EXCLUDE:
+                names.append(name)
+    return names
+
+
+def _download(url):
+    req = urllib.request.Request(url, headers={'User-Agent': 'listening-app-build-assets'})
+    with urllib.request.urlopen(req, timeout=DOWNLOAD_TIMEOUT) as response:
+        return response.read()
+
+
+def _vendor_css(static_folder, manifest, name, url, css, fetch):
+    """CSS が相対パスで参照するファイル（フォント等）を取得して書き出し、url() を出力先への相対パスに書き換える"""
+    output = {}
+
+    def resolve(reference):
+        if reference.startswith(('data:', '#')) or urlsplit(reference).scheme:
+            return None
+        path, _, suffix = reference.partition('?')
+        path, _, fragment = path.partition('#')
+        asset_name = posixpath.normpath(posixpath.join(posixpath.dirname(name), path))
+        if asset_name not in output:
+            output[asset_name] = _emit(static_folder, manifest, asset_name, fetch(urljoin(url, path)))
+        return output[asset_name], (f'?{suffix}' if suffix else '') + (f'#{fragment}' if fragment else '')
+
+    def replace(match):
+        resolved = resolve(match.group(2))
+        if resolved is None:
+            return match.group(0)
+        target, suffix = resolved
+        # CSS 自身の出力先（dist/<name> と同じディレクトリ）からの相対パス
+        relative = posixpath.relpath(target, posixpath.dirname(f'{DIST_DIR}/{name}'))
+        return f'url({match.group(1)}{relative}{suffix}{match.group(1)})'
+
+    return _CSS_URL_RE.sub(replace, css)
+
+
+def build(static_folder, vendor=True, fetch=None, previous=None):
+    """
+    static/dist/ に書き出してマニフェスト（論理名 → dist 内のパス）を返す。
+    外部ファイルの取得に失敗したものは CDN のままにする。vendor=False では前回のマニフェスト（previous）の分を引き継ぐ。
+    """
+    fetch = fetch or _download
+    previous = previous or {}
+    manifest = {}
+
+    for name in source_files(static_folder):
+        _emit(static_folder, manifest, name, minify(name, _read(static_folder, name)))
+
+    for name, members in BUNDLES.items():
+        # 結合時に前のファイルの末尾の式と繋がらないよう ; で区切る
+        separator = ';\n' if name.endswith('.js') else '\n'
+        text = separator.join(minify(member, _read(static_folder, member)) for member in members)
+        _emit(static_folder, manifest, name, text)
+
+    if vendor:
+        for name, url in VENDOR.items():
+            try:
+                content = fetch(url)
+                if name.endswith('.css'):
+                    text = _vendor_css(static_folder, manifest, name, url, content.decode('utf-8'), fetch)
+                    content = _SOURCE_MAP_RE.sub('', text).encode('utf-8')
+                elif name.endswith('.js'):
+                    content = _SOURCE_MAP_RE.sub('', content.decode('utf-8')).encode('utf-8')
+                _emit(static_folder, manifest, name, content)
+            except Exception as e:
+                logger.warning(f'[assets] {url} を取得できませんでした（CDN を参照します）: {e}')
+    else:
+        # 取得しない場合は前回取り込んだものを引き継ぐ
+        manifest.update({k: v for k, v in previous.items()
+                         if k.startswith('vendor/') and os.path.exists(os.path.join(static_folder, v))})
+
+    _write_manifest(static_folder, manifest)
+    return manifest
+
+
+def manifest_path(static_folder):
+    return os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+
+
+def _write_manifest(static_folder, manifest):
+    path = manifest_path(static_folder)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def load_manifest(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def clean(static_folder, manifest):
+    """マニフェストから参照されていない dist 内のファイルを削除し、削除数を返す"""
+    keep = {os.path.normpath(os.path.join(static_folder, p)) for p in manifest.values()}
+    keep.add(os.path.normpath(manifest_path(static_folder)))
+    removed = 0
+    for root, _, files in os.walk(os.path.join(static_folder, DIST_DIR)):
+        for filename in files:
+            path = os.path.normpath(os.path.join(root, filename))
+            if path not in keep:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+# --- 配信 ---
+
+class Assets:
+    def __init__(self):
+        self.manifest = {}
+
+    def init_app(self, app):
+        app.config.setdefault('ASSET_MANIFEST', os.getenv('ASSET_MANIFEST', manifest_path(app.static_folder)))
+        self.manifest = load_manifest(app.config['ASSET_MANIFEST'])
+        if self.manifest:
+            logger.info(f'[assets] マニフェストを読み込みました: {len(self.manifest)} 件')
+
+        @app.url_defaults
+        def _resolve_static(endpoint, values):
+            # url_for('static', filename='js/pages/learn.js') → /static/dist/js/pages/learn.<hash>.js
+            if endpoint == 'static' and values.get('filename') in self.manifest:
+                values['filename'] = self.manifest[values['filename']]
+
+        @app.after_request
+        def _immutable_cache(response):
+            filename = (request.view_args or {}).get('filename', '') if request.endpoint == 'static' else ''
+            if filename.startswith(f'{DIST_DIR}/') and response.status_code in (200, 206, 304):
+                response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+            return response
+
+        app.jinja_env.globals['asset_urls'] = self.urls
+
+    def urls(self, name):
+        """テンプレートで読み込む URL の一覧（ビルド済みなら1つ、未ビルドのバンドルは構成ファイルごと、外部ファイルは CDN）"""
+        if name in self.manifest:
+            return [url_for('static', filename=name)]
+        if name in BUNDLES:
+            return [url for member in BUNDLES[name] for url in self.urls(member)]
+        if name in VENDOR:
+            return [VENDOR[name]]
+        return [url_for('static', filename=name)]
+
+
+assets = Assets()
@@ -0,0 +1,245 @@
+"""
+アップロード音声の変換パイプライン
+
+アップロード時に一度だけデコードし、以下の2ファイルを書き出す。
+- 音声認識用: 16kHz モノラル FLAC（ffmpeg が無い場合は 16kHz モノラル LINEAR16 WAV）
+- 再生用: ビットレート上限付きの Opus / MP3
+
+ffmpeg は別プロセスのため、呼び出し元のスレッドから subprocess で直接実行する。
+ffmpeg が無い環境の WAV のリサンプリング（Python の1サンプルごとの処理）は GIL を握り続けるため、
+初回に作るプロセスプール（gunicorn の fork 後のプロセスごと）で実行し、リクエストのスレッドは結果を待つだけにする。
+同時に実行する変換の数は AUDIO_TRANSCODE_WORKERS で制限し、空きを待てなければ変換せずに元ファイルを使う。
+再生用のビットレートは元の音声のビットレートと AUDIO_PLAYBACK_BITRATE の小さい方にする（不要に上げない）。
+"""
+
+import array
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import wave
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# 認識用の出力形式（Speech-to-Text 推奨値）
+RECOGNITION_SAMPLE_RATE = 16000
+RECOGNITION_CHANNELS = 1
+
+# 再生用の出力形式・ビットレート上限、変換のタイムアウト（秒）と同時実行数の既定値（init_app で設定から読む）
+DEFAULT_PLAYBACK_FORMAT = 'mp3'  # 'mp3' or 'opus'
+DEFAULT_PLAYBACK_BITRATE = '64k'
+DEFAULT_TRANSCODE_TIMEOUT = 120
+DEFAULT_TRANSCODE_WORKERS = 2
+
+SUPPORTED_EXTENSIONS = {'.mp3', '.wav', '.flac', '.ogg', '.opus', '.m4a', '.aac', '.webm', '.mp4'}
+
+_PLAYBACK_CODECS = {
+    'mp3': ('.mp3', ['-codec:a', 'libmp3lame']),
+    'opus': ('.ogg', ['-codec:a', 'libopus']),
+}
+
+# recognition_encoding は transcribe_audio の設定選択に使う（'FLAC' / 'LINEAR16'）
+TranscodeResult = namedtuple(
+    'TranscodeResult',
+    ['recognition_path', 'recognition_encoding', 'sample_rate_hertz', 'playback_path'],
+)
+
+_playback_format = DEFAULT_PLAYBACK_FORMAT
+_playback_bitrate = DEFAULT_PLAYBACK_BITRATE
+_timeout = DEFAULT_TRANSCODE_TIMEOUT
+_workers = DEFAULT_TRANSCODE_WORKERS
+_slots = threading.BoundedSemaphore(DEFAULT_TRANSCODE_WORKERS)
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def init_app(app):
+    """設定から再生用の形式・ビットレート上限、タイムアウト、同時実行数を読む（全ロールで呼ばれる）"""
+    global _playback_format, _playback_bitrate, _timeout, _workers, _slots
+    config = app.config
+    _playback_format = config.setdefault(
+        'AUDIO_PLAYBACK_FORMAT', os.getenv('AUDIO_PLAYBACK_FORMAT', DEFAULT_PLAYBACK_FORMAT))
+    _playback_bitrate = config.setdefault(
+        'AUDIO_PLAYBACK_BITRATE', os.getenv('AUDIO_PLAYBACK_BITRATE', DEFAULT_PLAYBACK_BITRATE))
+    _timeout = config.setdefault(
+        'AUDIO_TRANSCODE_TIMEOUT', int(os.getenv('AUDIO_TRANSCODE_TIMEOUT', DEFAULT_TRANSCODE_TIMEOUT)))
+    _workers = max(1, config.setdefault(
+        'AUDIO_TRANSCODE_WORKERS', int(os.getenv('AUDIO_TRANSCODE_WORKERS', DEFAULT_TRANSCODE_WORKERS))))
+    _slots = threading.BoundedSemaphore(_workers)
+
+
+def _get_executor():
+    """WAV のリサンプリング用のプロセスプール（初回に作る。fork 後の子プロセスでは作り直す）"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=_workers)
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def ffmpeg_available():
+    return shutil.which('ffmpeg') is not None
+
+
+def parse_bitrate(value):
+    """'64k' / '1.5M' / '64000' を bps に変換する"""
+    value = str(value).strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(value[-1:], 1)
+    if scale != 1:
+        value = value[:-1]
+    return int(float(value) * scale)
+
+
+def _source_bitrate(src_path):
+    """ffprobe で調べた元の音声のビットレート（bps）。分からなければ None"""
+    if shutil.which('ffprobe') is None:
+        return None
+    # ストリームのビットレートが無い形式（Ogg など）はコンテナ全体の値を使う
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'a:0',
+           '-show_entries', 'stream=bit_rate:format=bit_rate', '-of', 'default=noprint_wrappers=1:nokey=1', src_path]
+    try:
+        output = subprocess.run(cmd, check=True, timeout=_timeout, capture_output=True, text=True).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    for line in output.split():
+        if line.isdigit() and int(line) > 0:
+            return int(line)
+    return None
+
+
+def playback_bitrate(source_bitrate):
+    """再生用のビットレート（元のビットレートと上限の小さい方。ffmpeg の -b:a の形式）"""
+    cap = parse_bitrate(_playback_bitrate)
+    bitrate = min(source_bitrate, cap) if source_bitrate else cap
+    return f'{max(bitrate // 1000, 8)}k'
+
+
+def _run_ffmpeg(args):
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y'] + args
+    subprocess.run(cmd, check=True, timeout=_timeout,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def _transcode_with_ffmpeg(src_path, stem):
+    """ffmpeg で一度デコードし、認識用 FLAC と再生用ファイルを同時に出力する"""
+    playback_ext, playback_codec = _PLAYBACK_CODECS.get(_playback_format, _PLAYBACK_CODECS['mp3'])
+    bitrate = playback_bitrate(_source_bitrate(src_path))
+    recognition_path = stem + '.rec.flac'
+    playback_path = stem + '.play' + playback_ext
+    _run_ffmpeg([
+        '-i', src_path,
+        # 認識用: 16kHz モノラル FLAC
+        '-map', '0:a:0', '-vn', '-ac', str(RECOGNITION_CHANNELS), '-ar', str(RECOGNITION_SAMPLE_RATE),
+        '-codec:a', 'flac', recognition_path,
+        # 再生用: ビットレート上限付き
+        '-map', '0:a:0', '-vn', *playback_codec, '-b:a', bitrate, playback_path,
+    ])
+    return TranscodeResult(recognition_path, 'FLAC', RECOGNITION_SAMPLE_RATE, playback_path)
+
+
+def _resample_wav(src_path, dst_path):
+    """
+    ffmpeg が無い環境向けのフォールバック。
+    PCM WAV を標準ライブラリのみでモノラル化・16kHz へ線形補間リサンプリングする。
+    """
+    with wave.open(src_path, 'rb') as src:
+        channels = src.getnchannels()
+        sample_width = src.getsampwidth()
+        rate = src.getframerate()
+        frames = src.readframes(src.getnframes())
+
+    if sample_width != 2:
+        raise ValueError(f'Unsupported WAV sample width: {sample_width * 8}bit')
+
+    samples = array.array('h')
+    samples.frombytes(frames)
+    if channels > 1:
+        # チャンネル平均でモノラル化
+        mono = array.array('h', (
+            sum(samples[i:i + channels]) // channels
+            for i in range(0, len(samples) - channels + 1, channels)
+        ))
+    else:
+        mono = samples
+
+    if rate != RECOGNITION_SAMPLE_RATE and len(mono) > 1:
+        ratio = rate / RECOGNITION_SAMPLE_RATE
+        out_len = int(len(mono) / ratio)
+        last = len(mono) - 1
+        resampled = array.array('h', bytes(2 * out_len))
+        for i in range(out_len):
+            pos = i * ratio
+            j = int(pos)
+            frac = pos - j
+            nxt = mono[j + 1] if j < last else mono[last]
+            resampled[i] = int(mono[j] + (nxt - mono[j]) * frac)
+        mono = resampled
+
+    with wave.open(dst_path, 'wb') as dst:
+        dst.setnchannels(RECOGNITION_CHANNELS)
+        dst.setsampwidth(2)
+        dst.setframerate(RECOGNITION_SAMPLE_RATE)
+        dst.writeframes(mono.tobytes())
+
+
+def transcode_audio(src_path):
+    """
+    音声ファイルを認識用・再生用に変換する
+
+    Returns: TranscodeResult。変換できない形式の場合は None
+    """
+    stem, ext = os.path.splitext(src_path)
+    ext = ext.lower()
+    if ffmpeg_available():
+        return _transcode_with_ffmpeg(src_path, stem)
+    if ext == '.wav':
+        recognition_path = stem + '.rec.wav'
+        _get_executor().submit(_resample_wav, src_path, recognition_path).result(timeout=_timeout)
+        # 再生用は元ファイルをそのまま使う
+        return TranscodeResult(recognition_path, 'LINEAR16', RECOGNITION_SAMPLE_RATE, src_path)
+    return None
+
+
+def existing_result(src_path, exists=os.path.exists):
+    """
+    同じ音声の変換結果が既にあれば返す（コンテンツアドレス型ストアへの再アップロード時に変換を省略する）
+
+    exists はファイルの有無を調べる関数（リモートの保存先からローカルに取得する関数も渡せる）。
+    Returns: TranscodeResult。無ければ None
+    """
+    stem = os.path.splitext(src_path)[0]
+    playback_ext = _PLAYBACK_CODECS.get(_playback_format, _PLAYBACK_CODECS['mp3'])[0]
+    recognition_path = stem + '.rec.flac'
+    playback_path = stem + '.play' + playback_ext
+    if exists(recognition_path) and exists(playback_path):
+        return TranscodeResult(recognition_path, 'FLAC', RECOGNITION_SAMPLE_RATE, playback_path)
+    if exists(stem + '.rec.wav'):
+        return TranscodeResult(stem + '.rec.wav', 'LINEAR16', RECOGNITION_SAMPLE_RATE, src_path)
+    return None
+
+
+def process_upload(src_path, timeout=None):
+    """
+    アップロード済みファイルを変換して返す。同時実行数（プロセスプールで実行する分を含む）の上限に
+    達している場合は timeout 秒（既定は AUDIO_TRANSCODE_TIMEOUT）まで空きを待つ。
+    変換できなかった場合は None を返し、呼び出し側は元ファイルで処理を続ける。
+    """
+    ext = os.path.splitext(src_path)[1].lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        return None
+    slots = _slots
+    if not slots.acquire(timeout=timeout or _timeout):
+        logger.warning('[audio_pipeline] 同時に実行できる変換の数が上限のため元ファイルを使用します')
+        return None
+    try:
+        return transcode_audio(src_path)
+    except Exception as e:
+        logger.warning(f'[audio_pipeline] 変換に失敗したため元ファイルを使用します: {e}')
+        return None
+    finally:
+        slots.release()
@@ -0,0 +1,329 @@
+"""
+音声ファイルのコンテンツアドレス型ストア
+
+アップロードされた音声は受信しながら SHA-256 を計算し、内容ごとに1回だけ保存する。
+    <保存先>/ab/cd/<sha256><拡張子>   （local では UPLOAD_FOLDER/blobs 以下）
+変換結果（.rec.flac / .play.mp3）や文字起こし（.txt）・単語タイミング（.words）も同じディレクトリに <sha256>.* で置くため、
+同じ音声が再アップロードされた場合は変換・音声認識も省略できる。
+
+Question.audio_hash で参照し、audio_blob.ref_count で参照数を数える
+（Question の追加・削除・audio_hash の変更時にマッパーイベントで増減）。
+参照の無くなった blob は flask gc-audio で、猶予期間を過ぎたものだけ削除する。
+
+保存先は storage のバックエンド（local / s3）。ファイルは local_root 以下で作成・変換してから publish() で保存先に反映し、
+読み込み時は localize() で保存先からローカルに取得する。
+"""
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import dialect_insert
+from models import AudioBlob, Question
+from storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+URL_PREFIX = '/audio/'
+CHUNK_SIZE = 1024 * 1024
+# 配信時のキャッシュ期間（内容が変わらないため1年・immutable）
+CACHE_MAX_AGE = 365 * 24 * 3600
+DEFAULT_GC_GRACE_HOURS = 24
+
+_NAME_RE = re.compile(r'^([0-9a-f]{64})((?:\.[a-z0-9]+)*)$')
+
+# path は保存先、created は今回新たに保存したか（False なら既存の blob と重複）
+StoredBlob = namedtuple('StoredBlob', ['digest', 'path', 'size', 'created'])
+
+
+def store_root():
+    """作業用（local では保存先そのもの、s3 ではディスクキャッシュ）のディレクトリ"""
+    return get_storage().local_root
+
+
+def blob_dir(root, digest):
+    """2階層のファンアウト（ab/cd/）で1ディレクトリあたりのファイル数を抑える"""
+    return os.path.join(root, digest[:2], digest[2:4])
+
+
+def key_for(name):
+    """ストレージ上のキー（ab/cd/<name>）"""
+    return f'{name[:2]}/{name[2:4]}/{name}'
+
+
+def parse_name(name):
+    """'<sha256>.play.mp3' → ('<sha256>', '.play.mp3')。ストアのファイル名でなければ None"""
+    m = _NAME_RE.match(name or '')
+    return (m.group(1), m.group(2)) if m else None
+
+
+def path_for(name, root=None):
+    digest, _ = parse_name(name)
+    return os.path.join(blob_dir(root or store_root(), digest), name)
+
+
+def localize(path):
+    """ストア内のファイルをローカルに用意してパスを返す（s3 ではキャッシュに無ければダウンロード。無ければ None）"""
+    if path and os.path.exists(path):
+        return path
+    name = os.path.basename(path or '')
+    if not parse_name(name):
+        return None
+    return get_storage().fetch(key_for(name))
+
+
+def publish(stored, paths=()):
+    """
+    作業ディレクトリの blob と派生ファイル（変換結果・文字起こし）を保存先に反映する。
+    内容から決まるキーなので既に存在するものは送らない（重複した blob は GC の猶予期間のために更新時刻だけ進める）。
+    """
+    backend = get_storage()
+    key = key_for(os.path.basename(stored.path))
+    if backend.exists(key):
+        backend.touch(key)
+    else:
+        backend.put_file(key, stored.path)
+    for path in paths:
+        key = key_for(os.path.basename(path))
+        if not backend.exists(key):
+            backend.put_file(key, path)
+
+
+def url_for_path(path):
+    """ストア内のファイルパスを配信 URL（/audio/<name>）に変換する"""
+    return URL_PREFIX + os.path.basename(path)
+
+
+def hash_for_url(audio_url):
+    """配信 URL（/audio/<sha256>.*）の内容ハッシュ。旧形式の URL は None"""
+    if audio_url and audio_url.startswith(URL_PREFIX):
+        parsed = parse_name(audio_url[len(URL_PREFIX):])
+        if parsed:
+            return parsed[0]
+    return None
+
+
+def resolve_path(audio_url, root=None):
+    """Question.audio_url をローカルのファイルパスに変換する（旧形式のパスはそのまま返す）"""
+    if audio_url and audio_url.startswith(URL_PREFIX):
+        name = audio_url[len(URL_PREFIX):]
+        if parse_name(name):
+            return path_for(name, root)
+    return audio_url
+
+
+def transcript_path(blob_path):
+    """blob と同じディレクトリの文字起こしファイル（<sha256>.txt）"""
+    return os.path.join(os.path.dirname(blob_path), os.path.basename(blob_path).split('.', 1)[0] + '.txt')
+
+
+def write_text(path, content):
+    """一時ファイルに書いてから置き換える（同じ blob を同時に処理しても壊れたファイルを読ませない）"""
+    write_bytes(path, content.encode('utf-8'))
+
+
+def write_bytes(path, content):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def _commit_blob(tmp_path, root, digest, ext, size):
+    final_dir = blob_dir(root, digest)
+    os.makedirs(final_dir, exist_ok=True)
+    final_path = os.path.join(final_dir, digest + ext)
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+        # 猶予期間の判定に使うため、重複アップロードでも更新時刻を進める
+        os.utime(final_path)
+        return StoredBlob(digest, final_path, size, False)
+    os.replace(tmp_path, final_path)
+    return StoredBlob(digest, final_path, size, True)
+
+
+def save_stream(stream, ext, root):
+    """
+    ストリームを読みながらハッシュを計算して保存する（ファイル全体をメモリに載せない）。
+
+    Returns: StoredBlob
+    """
+    tmp_dir = os.path.join(root, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    h = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                h.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return _commit_blob(tmp_path, root, h.hexdigest(), ext.lower(), size)
+
+
+def import_file(path, root, digest=None):
+    """既存ファイルをストアに取り込む（digest が計算済みなら再計算しない）"""
+    ext = os.path.splitext(path)[1].lower()
+    if digest is None:
+        with open(path, 'rb') as f:
+            return save_stream(f, ext, root)
+    final_path = os.path.join(blob_dir(root, digest), digest + ext)
+    size = os.path.getsize(path)
+    if os.path.exists(final_path):
+        os.utime(final_path)
+        return StoredBlob(digest, final_path, size, False)
+    tmp_dir = os.path.join(root, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    os.close(fd)
+    shutil.copyfile(path, tmp_path)
+    return _commit_blob(tmp_path, root, digest, ext, size)
+
+
+# ---- 参照カウント ----
+
+def ensure_blob(connection, digest, size=None):
+    """audio_blob の行が無ければ作成する"""
+    values = {'hash': digest, 'size': size, 'ref_count': 0, 'created_at': datetime.utcnow()}
+    upsert = dialect_insert(connection)
+    if upsert is not None:
+        connection.execute(
+            upsert(AudioBlob.__table__).values(**values).on_conflict_do_nothing(index_elements=['hash']))
+        return
+    # ON CONFLICT の無い DB（MySQL 等）は行が無い場合だけ INSERT する。
+    # 同時に同じ blob が作られた場合の一意制約違反はセーブポイントを戻して無視する
+    if connection.execute(select(AudioBlob.hash).where(AudioBlob.hash == digest)).first() is not None:
+        return
+    try:
+        with connection.begin_nested():
+            connection.execute(insert(AudioBlob.__table__).values(**values))
+    except IntegrityError:
+        pass
+
+
+def _add_reference(connection, digest, delta):
+    if delta > 0:
+        ensure_blob(connection, digest)
+    connection.execute(
+        update(AudioBlob).where(AudioBlob.hash == digest).values(ref_count=AudioBlob.ref_count + delta)
+    )
+
+
+def add_references(connection, digests):
+    """digests の各 blob の参照数を1ずつ加算する（bulk_insert_mappings のようにマッパーイベントを通らない INSERT 用）"""
+    for digest in digests:
+        if digest:
+            _add_reference(connection, digest, 1)
+
+
+@event.listens_for(Question, 'after_insert')
+def _question_inserted(mapper, connection, target):
+    if target.audio_hash:
+        _add_reference(connection, target.audio_hash, 1)
+
+
+@event.listens_for(Question, 'after_delete')
+def _question_deleted(mapper, connection, target):
+    if target.audio_hash:
+        _add_reference(connection, target.audio_hash, -1)
+
+
+@event.listens_for(Question, 'after_update')
+def _question_updated(mapper, connection, target):
+    history = inspect(target).attrs.audio_hash.history
+    if not history.has_changes():
+        return
+    for old in history.deleted:
+        if old:
+            _add_reference(connection, old, -1)
+    for new in history.added:
+        if new:
+            _add_reference(connection, new, 1)
+
+
+def sync_references(session):
+    """
+    Question.audio_hash から参照数を数え直す
+    （bulk_insert_mappings のようにマッパーイベントを通らない書き込みの後や GC の前に実行する）
+    """
+    connection = session.connection()
+    referenced = select(Question.audio_hash).where(Question.audio_hash.isnot(None)).distinct()
+    existing = set(connection.execute(select(AudioBlob.hash)).scalars())
+    for digest in connection.execute(referenced).scalars():
+        if digest not in existing:
+            ensure_blob(connection, digest)
+    count = (
+        select(func.count(Question.id)).where(Question.audio_hash == AudioBlob.hash).scalar_subquery()
+    )
+    connection.execute(update(AudioBlob).values(ref_count=count))
+
+
+def collect_garbage(session, grace_hours=DEFAULT_GC_GRACE_HOURS, dry_run=False):
+    """
+    参照されていない blob とその派生ファイルを保存先から削除する。
+
+    アップロード中（問題の登録前）の blob を消さないよう、作成・更新から grace_hours 以内のものは残す。
+    audio_blob に行が無いファイル（登録に失敗したアップロード）も同じ条件で削除する。
+    Returns: {'blobs', 'files', 'bytes'}
+    """
+    backend = get_storage()
+    sync_references(session)
+    session.commit()
+    cutoff = time.time() - grace_hours * 3600
+    created_cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+    stats = {'blobs': 0, 'files': 0, 'bytes': 0}
+
+    objects = defaultdict(list)
+    for obj in backend.list():
+        parsed = parse_name(obj.key.rsplit('/', 1)[-1])
+        if parsed:
+            objects[parsed[0]].append(obj)
+
+    connection = session.connection()
+    known = set(connection.execute(select(AudioBlob.hash)).scalars())
+    orphans = set(connection.execute(
+        select(AudioBlob.hash).where(AudioBlob.ref_count <= 0, AudioBlob.created_at < created_cutoff)
+    ).scalars())
+    # DB に行の無いファイルも対象
+    orphans |= set(objects) - known
+
+    for digest in sorted(orphans):
+        stored = objects.get(digest, [])
+        if any(obj.mtime >= cutoff for obj in stored):
+            continue
+        if digest in known and not dry_run:
+            # 削除直前に参照されていないことを条件付き DELETE で再確認する
+            deleted = session.execute(
+                AudioBlob.__table__.delete().where(AudioBlob.hash == digest, AudioBlob.ref_count <= 0)
+            ).rowcount
+            session.commit()
+            if not deleted:
+                continue
+        stats['blobs'] += 1
+        for obj in stored:
+            stats['files'] += 1
+            stats['bytes'] += obj.size
+            if not dry_run:
+                backend.delete(obj.key)
+
+    # 中断したアップロードの一時ファイル
+    tmp_dir = os.path.join(store_root(), 'tmp')
+    if os.path.isdir(tmp_dir) and not dry_run:
+        for name in os.listdir(tmp_dir):
+            path = os.path.join(tmp_dir, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+    return stats
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+起動時間（import 時間）のベンチマーク
+
+python -X importtime で対象モジュールを別プロセスで繰り返し import し、
+累積 import 時間の中央値と時間のかかっているモジュール上位を表示する。
+--budget-ms を指定すると中央値が予算を超えた場合に終了コード 1 を返す（CI の起動時間チェック用）。
+
+使い方:
+    python benchmarks/import_time.py                      # app の import 時間
+    python benchmarks/import_time.py --module create_db   # スクリプトの import 時間
+    python benchmarks/import_time.py --budget-ms 800
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 起動時に読み込まれてはいけない重いモジュール
+DEFERRED_MODULES = ('google.cloud.speech', 'alembic', 'boto3')
+
+_LINE_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def run_once(module):
+    """1回分の importtime を計測し、(トップレベルの累積µs, {モジュール: (self, cumulative)}, 読み込まれた重いモジュール) を返す"""
+    # app はモジュール属性 app の参照時に create_app() が走るため、それも含めて計測する
+    build = f'{module}.app; ' if module == 'app' else ''
+    code = (
+        f'import sys; import {module}; {build}'
+        f'print(",".join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))'
+    )
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+
+    modules = {}
+    total = 0
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, indent, name = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        modules[name] = (self_us, cumulative_us)
+        # インデントが最小（トップレベル）の import の累積時間を合計する
+        if len(indent) <= 1:
+            total += cumulative_us
+    loaded = [m for m in proc.stdout.strip().split(',') if m]
+    return total, modules, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, default=None)
+    args = parser.parse_args(argv)
+
+    totals = []
+    last_modules = {}
+    loaded = []
+    for _ in range(args.runs):
+        total, last_modules, loaded = run_once(args.module)
+        totals.append(total)
+
+    median_ms = statistics.median(totals) / 1000
+    print(f'{args.module}: import 時間 中央値 {median_ms:.1f} ms '
+          f'(min {min(totals) / 1000:.1f} / max {max(totals) / 1000:.1f}, {args.runs} 回)')
+    print(f'\n累積時間の上位 {args.top} モジュール:')
+    ranked = sorted(last_modules.items(), key=lambda kv: kv[1][1], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in ranked:
+        print(f'  {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f} ms)  {name}')
+
+    ok = True
+    if loaded:
+        print(f'\nNG: 起動時に遅延対象のモジュールが読み込まれています: {", ".join(loaded)}')
+        ok = False
+    if args.budget_ms is not None:
+        if median_ms > args.budget_ms:
+            print(f'\nNG: 予算 {args.budget_ms:.0f} ms を超過しました')
+            ok = False
+        else:
+            print(f'\nOK: 予算 {args.budget_ms:.0f} ms 以内です')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
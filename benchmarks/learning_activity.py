@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+連続学習日数・週の集計のベンチマーク
+
+一時 SQLite に1ユーザー分の学習ログ（1日あたり --per-day 件、直近は毎日学習）を件数を変えて作成し、
+- 従来の実装（全学習ログを読み込み Python でソート・集計）
+- SQL（gaps-and-islands のウィンドウ関数と集計。learning_stats.activity_metrics_sql）
+- 日別ビットマップ（UserActivity。learning_stats.learning_activity）
+の1回あたりの時間を表示する。ビットマップは学習履歴の長さによらず一定になる。
+
+使い方:
+    python benchmarks/learning_activity.py
+    python benchmarks/learning_activity.py --logs 1000 10000 100000 --per-day 20
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def _legacy(LearningLog, calculate_learning_streak, user_id):
+    """変更前のダッシュボードの集計"""
+    logs = LearningLog.query.filter_by(user_id=user_id).all()
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    logs_this_week = [log for log in logs if log.created_at and log.created_at >= week_ago]
+    days = len(set(log.created_at.date() for log in logs_this_week))
+    minutes = int(round(sum(log.time_spent or 0 for log in logs_this_week)))
+    return calculate_learning_streak(logs), days, minutes
+
+
+def _time(db, fn, repeat):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+        db.session.expunge_all()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logs', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--per-day', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmpdir, "bench.db")}'
+
+    import learning_stats
+    from app import create_app
+    from extensions import db
+    from models import LearningLog, User
+
+    app = create_app('cli')
+    with app.app_context():
+        db.create_all()
+        now = datetime.utcnow()
+        today = learning_stats.to_day(now)
+        print(f'1日 {args.per_day} 件, {args.repeat} 回の平均')
+        for n_logs in args.logs:
+            user = User(username=f'bench{n_logs}', email=f'bench{n_logs}@example.com', password='x')
+            db.session.add(user)
+            db.session.commit()
+            # 一括 INSERT は after_flush を通らないため、最後にビットマップを作り直す
+            db.session.bulk_insert_mappings(LearningLog, [
+                {
+                    'user_id': user.id,
+                    'content_id': 1,
+                    'time_spent': 1.5,
+                    'created_at': now - timedelta(days=i // args.per_day, minutes=i % args.per_day),
+                }
+                for i in range(n_logs)
+            ])
+            learning_stats.rebuild_activity(db.session.connection(), [user.id])
+            db.session.commit()
+
+            expected = _legacy(LearningLog, learning_stats.calculate_learning_streak, user.id)
+            results = [
+                ('Python（全件読み込み）', lambda: _legacy(LearningLog, learning_stats.calculate_learning_streak, user.id)),
+                ('SQL（ウィンドウ関数）', lambda: tuple(learning_stats.activity_metrics_sql(user.id, today))),
+                ('日別ビットマップ', lambda: tuple(learning_stats.learning_activity(user.id))),
+            ]
+            print(f'学習ログ {n_logs:,} 件（連続 {expected[0]} 日, 今週 {expected[1]} 日 {expected[2]} 分）:')
+            for name, fn in results:
+                print(f'  {name:<16} {_time(db, fn, args.repeat) * 1000:9.2f} ms/回  {fn()}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+問題カタログキャッシュのベンチマーク
+
+一時 SQLite に N 件の問題を作成し、
+- 全件をキャッシュしたときのメモリ使用量（tracemalloc）
+- 主キー参照の速度（Question.query.get とキャッシュ参照の比較。毎回セッションを破棄してリクエスト単位の参照を再現）
+を表示する。
+
+使い方:
+    python benchmarks/question_catalog.py                 # 100,000 件
+    python benchmarks/question_catalog.py --questions 10000 --lookups 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def _populate(db, Question, User, n):
+    user = User(username='bench', email='bench@example.com', password='x')
+    db.session.add(user)
+    db.session.commit()
+    rows = [
+        {
+            'audio_url': f'./static/audio/bench_{i}.mp3',
+            'question_text': f'This is question number {i} with a ____ in the middle.',
+            'correct_answer': 'blank',
+            'option_a': 'blank', 'option_b': 'plank', 'option_c': 'black', 'option_d': 'bank',
+            'uploaded_by': user.id,
+            'is_public': True,
+            'difficulty_level': i % 5 + 1,
+        }
+        for i in range(n)
+    ]
+    db.session.bulk_insert_mappings(Question, rows)
+    db.session.commit()
+
+
+def _lookup_loop(app, db, fetch, ids):
+    t0 = time.perf_counter()
+    for question_id in ids:
+        with app.test_request_context():
+            fetch(question_id)
+            db.session.remove()
+    return time.perf_counter() - t0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=100_000)
+    parser.add_argument('--lookups', type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmpdir, "bench.db")}'
+
+    from app import create_app
+    from extensions import db
+    from models import Question, User
+    from question_catalog import catalog
+
+    app = create_app('cli')
+    with app.app_context():
+        db.create_all()
+        t0 = time.perf_counter()
+        _populate(db, Question, User, args.questions)
+        print(f'{args.questions:,} 件の問題を作成 ({time.perf_counter() - t0:.1f}s)')
+
+        # 全件をキャッシュに載せたときのメモリ
+        all_ids = list(range(1, args.questions + 1))
+        catalog.clear()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        for i in range(0, len(all_ids), 900):
+            catalog.get_many(all_ids[i:i + 900])
+        load_s = time.perf_counter() - t0
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        db.session.remove()
+        total_mb = (after - before) / 1024 / 1024
+        print(f'キャッシュ全件ロード: {load_s:.2f}s, {total_mb:.1f} MB '
+              f'({(after - before) / args.questions:.0f} B/問)')
+
+    rng = random.Random(0)
+    ids = [rng.randint(1, args.questions) for _ in range(args.lookups)]
+    orm_s = _lookup_loop(app, db, lambda qid: Question.query.get(qid), ids)
+    cached_s = _lookup_loop(app, db, catalog.get, ids)
+    print(f'主キー参照 {args.lookups:,} 回:')
+    print(f'  Question.query.get: {orm_s * 1e6 / args.lookups:8.1f} µs/回')
+    print(f'  catalog.get:        {cached_s * 1e6 / args.lookups:8.1f} µs/回 (x{orm_s / cached_s:.1f})')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+問題ごとの統計（QuestionStats）のベンチマーク
+
+一時 SQLite に学習ログを件数を変えて作成し、
+- 公開問題一覧の再生回数・平均スコア・正答率を学習ログの GROUP BY で毎回集計する場合
+- QuestionStats を結合する場合（read_queries.public_questions_select）
+の1回あたりの時間と、学習ログを --new 件追加したあとの増分の反映（question_stats.refresh）の時間を表示する。
+一覧の時間は学習ログの件数によらず、増分の反映は追加した件数だけに比例する。
+
+使い方:
+    python benchmarks/question_stats.py
+    python benchmarks/question_stats.py --logs 10000 100000 1000000 --questions 500
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def _add_logs(db, LearningLog, n_questions, start_id, count):
+    start = datetime(2024, 1, 1)
+    batch = 50_000
+    for offset in range(start_id, start_id + count, batch):
+        db.session.bulk_insert_mappings(LearningLog, [
+            {
+                'id': i,
+                'user_id': i % 50 + 1,
+                'content_id': i % n_questions + 1,
+                'question_id': i % n_questions + 1,
+                'score': i % 2,
+                'completion_status': True,
+                'time_spent': random.uniform(0.2, 6.0),
+                'created_at': start + timedelta(seconds=i),
+            }
+            for i in range(offset, min(offset + batch, start_id + count))
+        ])
+    db.session.commit()
+
+
+def _time(fn, repeat):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logs', type=int, nargs='+', default=[10_000, 100_000, 500_000])
+    parser.add_argument('--questions', type=int, default=200)
+    parser.add_argument('--new', type=int, default=1_000, help='増分の反映で追加する学習ログの件数')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmpdir, "bench.db")}'
+    os.environ['QUESTION_STATS_REFRESH_INTERVAL'] = '0'
+    random.seed(0)
+
+    import question_stats
+    import read_queries
+    from app import create_app
+    from extensions import db
+    from models import LearningLog, Question, User
+    from sqlalchemy import case, func, select
+
+    def live_select():
+        """変更前の方法: 学習ログから問題ごとに集計して結合する"""
+        stats = select(
+            LearningLog.question_id,
+            func.count().label('play_count'),
+            func.round(func.avg(func.coalesce(LearningLog.score, 0)), 1).label('avg_score'),
+            func.avg(case((LearningLog.score == 1, 1.0), else_=0.0)).label('accuracy'),
+        ).group_by(LearningLog.question_id).subquery()
+        return select(Question.id, Question.question_text, func.coalesce(stats.c.play_count, 0),
+                      func.coalesce(stats.c.avg_score, 0), stats.c.accuracy) \
+            .outerjoin(stats, stats.c.question_id == Question.id) \
+            .where(Question.is_public.is_(True)).order_by(Question.id)
+
+    app = create_app('cli')
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', email='bench@example.com', password='x'))
+        db.session.commit()
+        db.session.bulk_insert_mappings(Question, [
+            {'audio_url': f'/audio/{i}.mp3', 'question_text': f'q{i} ____', 'correct_answer': 'x',
+             'uploaded_by': 1, 'is_public': True, 'difficulty_level': i % 5 + 1}
+            for i in range(args.questions)
+        ])
+        db.session.commit()
+
+        print(f'問題 {args.questions:,} 問, {args.repeat} 回の平均')
+        total = 0
+        for n_logs in args.logs:
+            _add_logs(db, LearningLog, args.questions, total + 1, n_logs - total)
+            total = n_logs
+            question_stats.run(batch_size=50_000)
+
+            live = _time(lambda: db.session.execute(live_select()).all(), args.repeat)
+            stored = _time(lambda: db.session.execute(read_queries.public_questions_select()).all(), args.repeat)
+
+            _add_logs(db, LearningLog, args.questions, total + 1, args.new)
+            total += args.new
+            t0 = time.perf_counter()
+            result = question_stats.run(batch_size=args.new)
+            refresh = time.perf_counter() - t0
+            mismatches = question_stats.check(db.session.connection())
+            db.session.rollback()
+
+            print(f'学習ログ {n_logs:,} 件:')
+            print(f'  一覧（学習ログを集計）   {live * 1000:9.2f} ms/回')
+            print(f'  一覧（QuestionStats）    {stored * 1000:9.2f} ms/回')
+            print(f'  増分の反映（{result.logs:,} 件）  {refresh * 1000:9.2f} ms  '
+                  f'整合性: {"OK" if not mismatches else f"{len(mismatches)} 件のずれ"}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+読み取りクエリ層（read_queries）のベンチマーク
+
+一時 SQLite に1ユーザー分の学習ログを作成し、読み取り処理ごとに
+- 従来の実装（LearningLog の ORM エンティティを .all() で取得）
+- read_queries（列を指定した Core の SELECT → namedtuple の行、または SQL の集計）
+の1回あたりの CPU 時間と、tracemalloc で測ったメモリのピーク（結果を保持した状態）を表示する。
+
+使い方:
+    python benchmarks/read_queries.py                    # 学習ログ 100,000 件
+    python benchmarks/read_queries.py --logs 300000 --repeat 5
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def _populate(db, Question, LearningLog, User, n_questions, n_logs):
+    user = User(username='bench', email='bench@example.com', password='x')
+    db.session.add(user)
+    db.session.commit()
+    db.session.bulk_insert_mappings(Question, [
+        {
+            'audio_url': f'/audio/{i:064x}.mp3',
+            'question_text': f'This is question number {i} with a ____ in the middle.',
+            'correct_answer': 'blank',
+            'uploaded_by': user.id,
+            'is_public': True,
+            'difficulty_level': i % 5 + 1,
+        }
+        for i in range(n_questions)
+    ])
+    start = datetime(2024, 1, 1)
+    batch = 50_000
+    for offset in range(0, n_logs, batch):
+        db.session.bulk_insert_mappings(LearningLog, [
+            {
+                'user_id': user.id,
+                'content_id': i % n_questions + 1,
+                'question_id': i % n_questions + 1,
+                'user_answer': 'blank' if i % 3 else 'plank',
+                'score': 100 if i % 3 else 0,
+                'completion_status': True,
+                'time_spent': 1.5,
+                'is_review': i % 7 == 0,
+                'created_at': start + timedelta(minutes=i),
+            }
+            for i in range(offset, min(offset + batch, n_logs))
+        ])
+    db.session.commit()
+    return user.id
+
+
+def _measure(db, fn, repeat):
+    """(1回あたりの CPU 秒, 結果を保持した状態でのメモリのピーク バイト)"""
+    db.session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    t0 = time.process_time()
+    for _ in range(repeat):
+        fn()
+        # ORM はアイデンティティマップに残るため、毎回リクエスト終了時と同じ状態に戻す
+        db.session.expunge_all()
+    return (time.process_time() - t0) / repeat, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logs', type=int, default=100_000)
+    parser.add_argument('--questions', type=int, default=1_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmpdir, "bench.db")}'
+
+    import read_queries
+    from app import create_app
+    from extensions import db
+    from learning_stats import calculate_learning_streak
+    from models import LearningLog, Question, User
+
+    app = create_app('web')
+    with app.app_context():
+        db.create_all()
+        user_id = _populate(db, Question, LearningLog, User, args.questions, args.logs)
+
+        def orm_wrong():
+            return LearningLog.query.filter_by(user_id=user_id, completion_status=True).filter(
+                LearningLog.score < 100).order_by(LearningLog.id.desc()).all()
+
+        def orm_counts():
+            logs = LearningLog.query.filter_by(user_id=user_id).all()
+            return len(logs), sum(1 for log in logs if log.score == 1), sum(log.score or 0 for log in logs)
+
+        cases = [
+            ('全学習ログ（dashboard・stats・推薦）',
+             lambda: LearningLog.query.filter_by(user_id=user_id).all(),
+             lambda: read_queries.log_stats(user_id)),
+            ('全学習ログ + 連続学習日数',
+             lambda: calculate_learning_streak(LearningLog.query.filter_by(user_id=user_id).all()),
+             lambda: calculate_learning_streak(read_queries.log_stats(user_id))),
+            ('件数・正答数・合計（profile）', orm_counts, lambda: read_queries.log_summary(user_id)),
+            ('間違えた問題（review）', orm_wrong, lambda: read_queries.wrong_logs(user_id)),
+        ]
+
+        print(f'学習ログ {args.logs:,} 件, CPU 時間は {args.repeat} 回の平均')
+        for name, legacy, current in cases:
+            legacy_s, legacy_peak = _measure(db, legacy, args.repeat)
+            current_s, current_peak = _measure(db, current, args.repeat)
+            print(f'{name}:')
+            print(f'  ORM エンティティ: {legacy_s * 1000:9.1f} ms/回  ピーク {legacy_peak / 2**20:8.1f} MiB')
+            print(f'  read_queries:     {current_s * 1000:9.1f} ms/回  ピーク {current_peak / 2**20:8.1f} MiB '
+                  f'(CPU x{legacy_s / current_s:.1f}, メモリ x{legacy_peak / max(current_peak, 1):.1f})')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+API レスポンスの JSON 化・圧縮のベンチマーク
+
+一時 SQLite に問題と学習ログを作成し、エンドポイントごとに
+- 従来の実装（ORM オブジェクト → dict → 標準 json。ベンチマーク用のルートで再現）
+- 現在の実装（Core の行 → FastJSONProvider。orjson があれば使用）
+の 1 リクエストあたりの CPU 時間と、応答サイズ（無圧縮・gzip・brotli）を表示する。
+
+使い方:
+    python benchmarks/response_serialization.py                       # 問題 5,000 件・学習ログ 20,000 件
+    python benchmarks/response_serialization.py --questions 20000 --logs 100000 --repeat 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def _populate(db, Question, LearningLog, User, n_questions, n_logs):
+    user = User(username='bench', email='bench@example.com', password='x')
+    db.session.add(user)
+    db.session.commit()
+    db.session.bulk_insert_mappings(Question, [
+        {
+            'audio_url': f'/audio/{i:064x}.mp3',
+            'question_text': f'This is question number {i} with a ____ in the middle. 問題 {i}',
+            'correct_answer': 'blank',
+            'option_a': 'blank', 'option_b': 'plank', 'option_c': 'black', 'option_d': 'bank',
+            'uploaded_by': user.id,
+            'is_public': True,
+            'difficulty_level': i % 5 + 1,
+        }
+        for i in range(n_questions)
+    ])
+    start = datetime(2024, 1, 1)
+    db.session.bulk_insert_mappings(LearningLog, [
+        {
+            'user_id': user.id,
+            'content_id': i % n_questions + 1,
+            'question_id': i % n_questions + 1,
+            'user_answer': 'blank' if i % 3 else 'plank',
+            'score': 1 if i % 3 else 0,
+            'created_at': start + timedelta(minutes=i),
+        }
+        for i in range(n_logs)
+    ])
+    db.session.commit()
+    return user.id
+
+
+def _register_legacy_routes(app, db, Question, LearningLog, User):
+    """変更前の実装（ORM・dict の組み立て・Flask 既定の JSON プロバイダー）"""
+    from flask import Blueprint, request
+    from flask.json.provider import DefaultJSONProvider
+    from question_stats import summary
+
+    legacy_json = DefaultJSONProvider(app)
+    bp = Blueprint('legacy', __name__)
+
+    def respond(obj):
+        return app.response_class(legacy_json.dumps(obj), mimetype='application/json')
+
+    @bp.route('/legacy/questions/public')
+    def public_questions():
+        result = []
+        for q in Question.query.filter_by(is_public=True).all():
+            uploader = db.session.get(User, q.uploaded_by) if q.uploaded_by else None
+            stats = summary(q.id)
+            result.append({
+                'id': q.id,
+                'question_text': q.question_text,
+                'difficulty': q.difficulty,
+                'category': q.category,
+                'created_at': q.created_at.isoformat() if q.created_at else None,
+                'play_count': stats.play_count,
+                'avg_score': stats.avg_score,
+                'uploader': {'username': uploader.username} if uploader else None,
+            })
+        return respond(result)
+
+    @bp.route('/legacy/learning-history')
+    def learning_history():
+        rows = db.session.query(LearningLog, Question).join(
+            Question, LearningLog.question_id == Question.id
+        ).filter(LearningLog.user_id == int(request.args['user_id'])).order_by(
+            LearningLog.id.desc()).limit(int(request.args['limit']) + 1).all()
+        return respond([{
+            'id': log.id,
+            'question_id': log.question_id,
+            'user_answer': log.user_answer,
+            'score': log.score,
+            'created_at': log.created_at.isoformat() if log.created_at else None,
+            'category': question.category,
+            'difficulty': question.difficulty,
+        } for log, question in rows[:int(request.args['limit'])]])
+
+    @bp.route('/legacy/user_progress')
+    def user_progress():
+        logs = LearningLog.query.filter_by(user_id=int(request.args['user_id'])).order_by(
+            LearningLog.id.desc()).limit(int(request.args['limit']) + 1).all()
+        return respond({'logs': [{
+            'id': log.id,
+            'user_id': log.user_id,
+            'question_id': log.question_id,
+            'content_id': log.content_id,
+            'user_answer': log.user_answer,
+            'score': log.score,
+        } for log in logs[:int(request.args['limit'])]], 'next_before_id': None})
+
+    app.register_blueprint(bp)
+
+
+def _measure(client, url, repeat, encoding=None):
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200, (url, response.status_code)
+    t0 = time.process_time()
+    for _ in range(repeat):
+        client.get(url, headers=headers)
+    return (time.process_time() - t0) / repeat, len(response.get_data())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=5_000)
+    parser.add_argument('--logs', type=int, default=20_000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmpdir, "bench.db")}'
+    # キャッシュ・レート制限を外して毎回 JSON 化させる
+    os.environ['RESPONSE_CACHE_ENABLED'] = 'false'
+    os.environ['RATELIMIT_ENABLED'] = 'false'
+
+    import compression
+    import serialization
+    from app import create_app
+    from extensions import db
+    from models import LearningLog, Question, User
+
+    app = create_app('web')
+    with app.app_context():
+        db.create_all()
+        user_id = _populate(db, Question, LearningLog, User, args.questions, args.logs)
+    _register_legacy_routes(app, db, Question, LearningLog, User)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    print(f'問題 {args.questions:,} 件・学習ログ {args.logs:,} 件, 各 {args.repeat} 回の平均 '
+          f'(orjson: {"あり" if serialization.orjson else "なし"}, brotli: {"あり" if compression.brotli else "なし"})')
+    endpoints = [
+        ('get_public_questions', '/legacy/questions/public', '/api/questions/public'),
+        ('get_learning_history', f'/legacy/learning-history?user_id={user_id}&limit=1000',
+         '/api/user/learning-history?limit=1000'),
+        ('user_progress', f'/legacy/user_progress?user_id={user_id}&limit=1000',
+         f'/user_progress?user_id={user_id}&limit=1000'),
+    ]
+    encodings = ['gzip'] + (['br'] if compression.brotli else [])
+    for name, legacy_url, url in endpoints:
+        legacy_s, legacy_bytes = _measure(client, legacy_url, args.repeat)
+        current_s, current_bytes = _measure(client, url, args.repeat)
+        print(f'{name}:')
+        print(f'  従来（ORM + dict + json）: {legacy_s * 1000:8.2f} ms/回 {legacy_bytes:>10,} B')
+        print(f'  Core 行 + FastJSON:        {current_s * 1000:8.2f} ms/回 {current_bytes:>10,} B '
+              f'(x{legacy_s / current_s:.1f})')
+        for encoding in encodings:
+            encoded_s, encoded_bytes = _measure(client, url, args.repeat, encoding)
+            print(f'  {encoding:<6} 圧縮:               {encoded_s * 1000:8.2f} ms/回 {encoded_bytes:>10,} B '
+                  f'({encoded_bytes / current_bytes:.1%})')
+
+    # 参考: 同じデータの JSON 化だけの比較（標準 json と FastJSONProvider）
+    with app.app_context():
+        data = serialization.rows(db.session.execute(
+            db.select(*[c for c in Question.__table__.c if c.name != 'word_timings'])))
+    t0 = time.process_time()
+    json.dumps(data, default=str, ensure_ascii=True, sort_keys=True)
+    std_s = time.process_time() - t0
+    t0 = time.process_time()
+    app.json.dumps_bytes(data)
+    fast_s = time.process_time() - t0
+    print(f'JSON 化のみ（問題 {len(data):,} 行）: 標準 json {std_s * 1000:.1f} ms, FastJSONProvider {fast_s * 1000:.1f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+役割（APP_ROLE）ごとの起動時間とメモリ使用量の計測
+
+役割ごとに別プロセスで create_app(role) を実行し、import + アプリ生成にかかった時間と
+プロセスの RSS（/proc/self/status の VmRSS、取得できない環境では ru_maxrss）を表示する。
+
+使い方:
+    python benchmarks/role_footprint.py
+    python benchmarks/role_footprint.py --roles web cli --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = r'''
+import json, resource, sys, time
+t0 = time.perf_counter()
+import app
+app.create_app(sys.argv[1])
+elapsed = time.perf_counter() - t0
+rss_kb = None
+try:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss_kb = int(line.split()[1])
+except OSError:
+    pass
+if rss_kb is None:
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss_kb //= 1024
+print(json.dumps({'elapsed_ms': elapsed * 1000, 'rss_kb': rss_kb, 'modules': len(sys.modules)}))
+'''
+
+
+def measure(role):
+    proc = subprocess.run([sys.executable, '-c', _PROBE, role], cwd=PROJECT_ROOT,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    sys.path.insert(0, PROJECT_ROOT)
+    from app import ROLES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--roles', nargs='*', default=list(ROLES))
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f'{"role":<8} {"起動時間(ms)":>12} {"RSS(MB)":>9} {"modules":>8}')
+    for role in args.roles:
+        results = [measure(role) for _ in range(args.runs)]
+        elapsed = statistics.median(r['elapsed_ms'] for r in results)
+        rss = statistics.median(r['rss_kb'] for r in results) / 1024
+        modules = results[-1]['modules']
+        print(f'{role:<8} {elapsed:>12.1f} {rss:>9.1f} {modules:>8}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""
+機能ごとの Blueprint
+
+create_app() がワーカーの役割（APP_ROLE）に応じて必要なものだけを import・登録する。
+"""
@@ -0,0 +1,127 @@
+"""
+認証・プロフィール関連のルート
+"""
+
+import logging
+
+from flask import Blueprint, request, jsonify, redirect, url_for, render_template, flash
+from flask_login import current_user, login_required, login_user, logout_user
+from werkzeug.security import generate_password_hash, check_password_hash
+
+import read_queries
+from extensions import db
+from models import User
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('auth', __name__)
+
+
+# 認証関連のルート
+@bp.route('/')
+def index():
+    if current_user.is_authenticated:
+        return redirect(url_for('learning.dashboard'))
+    return redirect(url_for('auth.login'))
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('learning.dashboard'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        
+        user = User.query.filter_by(username=username).first()
+        
+        if user and check_password_hash(user.password, password):
+            login_user(user)
+            flash('ログインしました！', 'success')
+            return redirect(url_for('learning.dashboard'))
+        else:
+            flash('ユーザー名またはパスワードが正しくありません。', 'error')
+    
+    return render_template('login.html')
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for('learning.dashboard'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        confirm_password = request.form.get('confirm_password')
+        
+        # バリデーション
+        if not username or not email or not password:
+            flash('すべてのフィールドを入力してください。', 'error')
+        elif password != confirm_password:
+            flash('パスワードが一致しません。', 'error')
+        elif User.query.filter_by(username=username).first():
+            flash('このユーザー名は既に使用されています。', 'error')
+        elif User.query.filter_by(email=email).first():
+            flash('このメールアドレスは既に登録されています。', 'error')
+        else:
+            # 新規ユーザー作成
+            hashed_password = generate_password_hash(password)
+            new_user = User(username=username, email=email, password=hashed_password)
+            db.session.add(new_user)
+            db.session.commit()
+            
+            flash('アカウントが作成されました。ログインしてください。', 'success')
+            return redirect(url_for('auth.login'))
+    
+    return render_template('register.html')
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash('ログアウトしました。', 'info')
+    return redirect(url_for('auth.login'))
+
+@bp.route('/profile')
+@login_required
+def profile():
+    # ユーザーの学習統計を取得（ログを読み込まず SQL で集計）
+    summary = read_queries.log_summary(current_user.id)
+    total_questions = summary.total
+    correct_answers = summary.correct
+    accuracy = (correct_answers / total_questions * 100) if total_questions > 0 else 0
+    
+    # 最近の学習履歴
+    recent_logs = read_queries.recent_logs(current_user.id, 5)
+
+    # 登録日（User.created_at が無い既存ユーザーは '—'）
+    registered_at = '—'
+    if getattr(current_user, 'created_at', None):
+        try:
+            registered_at = current_user.created_at.strftime('%Y年%m月%d日')
+        except Exception:
+            pass
+
+    return render_template('profile.html',
+                        user=current_user,
+                        registered_at=registered_at,
+                        total_questions=total_questions,
+                        correct_answers=correct_answers,
+                        accuracy=accuracy,
+                        recent_logs=recent_logs)
+
+# ユーザープロフィール取得（復習機能用）
+@bp.route('/api/user/profile')
+@login_required
+def get_user_profile():
+    """ユーザープロフィールを取得"""
+    try:
+        return jsonify({
+            'id': current_user.id,
+            'username': current_user.username,
+            'email': current_user.email
+        })
+    except Exception as e:
+        logger.error(f"ユーザープロフィール取得エラー: {e}")
+        return jsonify({'error': 'ユーザープロフィールの取得に失敗しました'}), 500
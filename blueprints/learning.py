@@ -0,0 +1,414 @@
+"""
+学習（ダッシュボード・問題一覧・回答・学習ログ・統計）関連のルート
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from flask import Blueprint, request, jsonify, url_for, render_template
+from flask_login import current_user, login_required
+from sqlalchemy import select
+
+import audio_store
+import question_queue
+import question_search
+import question_stats
+import read_queries
+import serialization
+import word_timing
+from extensions import db
+from models import Question, LearningLog
+from learning_stats import learning_activity
+from pagination import keyset_args, wants_ndjson, apply_keyset, split_page, ndjson_response
+from question_catalog import catalog
+from question_generator import check_answer
+from rate_limit import limiter
+from response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('learning', __name__)
+
+PREFETCH_DEFAULT = 5
+PREFETCH_MAX = 20
+# オフライン中の回答（answered_at 付きで後から同期）を受け付ける期間
+OFFLINE_ANSWER_MAX_AGE = timedelta(days=7)
+
+
+def _answered_at(data):
+    """
+    オフラインで回答した時刻（answered_at: UNIX ミリ秒）。未来・古すぎる値や未指定は None（サーバーの現在時刻を使う）
+    """
+    value = data.get('answered_at')
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return None
+    try:
+        answered_at = datetime.utcfromtimestamp(value / 1000)
+    except (OverflowError, OSError, ValueError):
+        return None
+    now = datetime.utcnow()
+    if answered_at > now or answered_at < now - OFFLINE_ANSWER_MAX_AGE:
+        return None
+    return answered_at
+
+
+@bp.route('/dashboard')
+@login_required
+def dashboard():
+    # 最近の問題を取得
+    recent_questions = read_queries.questions_in_order(read_queries.recent_public_question_ids(3))
+
+    # 進捗サマリー（合計スコアは SQL で集計）
+    total_score = read_queries.log_summary(current_user.id).score_sum
+
+    # 直近7日間の学習日数・学習時間と連続学習日数（日別ビットマップから）
+    activity = learning_activity(current_user.id)
+
+    return render_template('dashboard.html',
+                        user=current_user,
+                        recent_questions=recent_questions,
+                        total_score=total_score,
+                        days_this_week=activity.days_this_week,
+                        minutes_this_week=activity.minutes_this_week,
+                        learning_streak=activity.streak)
+
+# メイン学習系のルート
+@bp.route('/questions')
+@login_required
+def questions():
+    """問題一覧ページ"""
+    return render_template('questions.html')
+
+def _audio_src(raw):
+    """音声URL: DBには ./static/audio/ や フルパス が入る場合があるため、配信用URLに正規化"""
+    raw = raw or ''
+    if raw.startswith('/') or raw.startswith('http'):
+        return raw
+    return url_for('static', filename='audio/' + raw.replace('\\', '/').split('/')[-1])
+
+
+@bp.route('/learn/<int:question_id>')
+@login_required
+def learn(question_id):
+    """問題学習ページ"""
+    question = catalog.get_or_404(question_id)
+    # 再生回数・平均スコア（統計は学習のたびに変わるためカタログにはキャッシュしない）
+    stats = question_stats.summary(question.id)
+    return render_template('learn.html', question=question, stats=stats, audio_src=_audio_src(question.audio_url))
+
+
+def _session_item(q):
+    """先読み・次の問題の API で返す1問分"""
+    return {
+        'id': q.id,
+        'question_text': q.question_text,
+        'options': [o for o in (q.option_a, q.option_b, q.option_c, q.option_d) if o],
+        'difficulty': q.difficulty,
+        'audio_url': _audio_src(q.audio_url),
+        'audio_hash': audio_store.hash_for_url(q.audio_url),
+        'learn_url': url_for('learning.learn', question_id=q.id),
+    }
+
+
+# 学習セッションの先読み（Service Worker が音声と学習ページをキャッシュする）
+@bp.route('/api/session/prefetch')
+@login_required
+def session_prefetch():
+    """
+    after の次に学習する問題を最大 n 問返す（?after=<問題ID>&n=5）。
+    次の問題のキュー（question_queue）の先頭から順に返し（取り出さない）、足りない分は
+    キューと同じ対象（公開問題と自分の問題のうち近似重複でない未正解のもの）を ID 順に、末尾に達したら先頭から選ぶ。
+    """
+    n = max(1, min(request.args.get('n', PREFETCH_DEFAULT, type=int), PREFETCH_MAX))
+    after = request.args.get('after', 0, type=int)
+    queued = question_queue.peek(current_user.id, n + 1)
+    if not queued and question_queue.refill(current_user.id):
+        # 初回はキューを作ってから（次の /api/next_question と同じ順で先読みする）
+        queued = question_queue.peek(current_user.id, n + 1)
+    ids = [question_id for question_id in queued if question_id != after][:n]
+    candidates = select(Question.id).where(
+        *question_queue.eligible(current_user.id),
+        Question.id.not_in([after] + ids),
+    )
+    if len(ids) < n:
+        ids += db.session.execute(
+            candidates.where(Question.id > after).order_by(Question.id).limit(n - len(ids))
+        ).scalars()
+    if len(ids) < n:
+        ids += db.session.execute(
+            candidates.where(Question.id < after).order_by(Question.id).limit(n - len(ids))
+        ).scalars()
+
+    records = catalog.get_many(ids)
+    return jsonify({'questions': [_session_item(records[question_id]) for question_id in ids if question_id in records]})
+
+
+# 次の問題（ユーザーごとのキューの先頭を取り出す）
+@bp.route('/api/next_question')
+@login_required
+def next_question():
+    """
+    推奨難易度に合わせて並べたキューから次の問題を1問取り出して返す（?after=<表示中の問題ID>）。
+    残りが少なくなったらバックグラウンドで補充する。出題できる問題が無ければ 404
+    """
+    after = request.args.get('after', type=int)
+    result = question_queue.next_question(current_user.id, after=after)
+    if result.question is None:
+        return jsonify({'error': 'No questions available'}), 404
+    response = jsonify({'question': _session_item(result.question), 'remaining': result.remaining})
+    # 取り出すたびに結果が変わるため、ブラウザ・プロキシにキャッシュさせない
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+# リスニング問題を取得 (ランダム + 公開限定)
+@bp.route('/get_question', methods=['GET'])
+def get_question():
+    question = catalog.get(read_queries.random_public_question_id())
+    if question:
+        return jsonify({
+            'id': question.id,
+            'audio_url': question.audio_url,
+            'question_text': question.question_text
+        })
+    else:
+        logger.warning('No questions available')
+        return jsonify({'error': 'No questions available'}), 404
+
+
+
+# 公開問題一覧を取得
+@bp.route('/api/questions/public')
+@login_required
+def get_public_questions():
+    """公開されている問題一覧を取得"""
+    try:
+        # アップローダー名も結合して1回の SELECT で取得し、行をそのまま出力する（'uploader.username' は入れ子になる）
+        return jsonify(serialization.rows(db.session.execute(read_queries.public_questions_select()))), 200
+        
+    except Exception as e:
+        logger.error(f'Failed to get public questions: {str(e)}')
+        return jsonify({'error': 'Failed to get questions'}), 500
+
+# 問題の全文検索
+@bp.route('/api/questions/search')
+@login_required
+def search_questions():
+    """問題文・正解・文字起こしを全文検索する（?q=...&page=1&per_page=20、関連度順）"""
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', question_search.DEFAULT_PER_PAGE, type=int)
+
+    try:
+        hits, has_more = question_search.search(query, current_user.id, page=page, per_page=per_page)
+    except Exception as e:
+        logger.error(f'Failed to search questions: {str(e)}')
+        return jsonify({'error': 'Failed to search questions'}), 500
+
+    records = catalog.get_many(question_id for question_id, _, _ in hits)
+    results = []
+    for question_id, score, snippet in hits:
+        q = records.get(question_id)
+        if q is None:
+            continue
+        results.append({
+            'id': q.id,
+            'question_text': q.question_text,
+            'difficulty': q.difficulty,
+            'category': q.category,
+            'created_at': q.created_at.isoformat() if q.created_at else None,
+            'uploader': {'username': q.uploader_name} if q.uploader_name else None,
+            'score': round(score, 4),
+            'snippet': snippet,
+        })
+    return jsonify({
+        'query': query,
+        'page': max(1, page),
+        'results': results,
+        'next_page': max(1, page) + 1 if has_more else None,
+    })
+
+# 空欄を含む文の再生範囲
+@bp.route('/api/questions/<int:question_id>/segments')
+@login_required
+def question_segments(question_id):
+    """空欄を含む文ごとの再生範囲（秒）を返す。単語タイミングが無い問題は segments が空"""
+    question = catalog.get(question_id)
+    if question is None:
+        return jsonify({'error': 'Question not found'}), 404
+    timings = db.session.execute(
+        select(Question.word_timings).where(Question.id == question_id)
+    ).scalar()
+    return jsonify({
+        'question_id': question_id,
+        'segments': word_timing.segments(question.question_text, word_timing.decode(timings)),
+    })
+
+# 回答の提出と採点
+@bp.route('/api/submit_answer', methods=['POST'])
+@login_required
+def submit_answer():
+    """回答を提出して採点する"""
+    data = request.json
+    if not data or 'question_id' not in data or 'user_answer' not in data:
+        return jsonify({'error': 'Invalid input data'}), 400
+
+    question_id = data.get('question_id')
+    user_answer = data.get('user_answer')
+
+    question = catalog.get(question_id)
+    if not question:
+        return jsonify({'error': 'Question not found'}), 404
+
+    # 採点処理（複数空欄の場合はスペース区切りで全ての語が一致すれば正解）
+    is_correct = check_answer(user_answer, question.correct_answer)
+    score = 1 if is_correct else 0
+
+    # 学習ログに記録
+    try:
+        log = LearningLog(
+            user_id=current_user.id,
+            content_id=question_id,
+            question_id=question_id,
+            user_answer=user_answer,
+            score=score
+        )
+        # オフライン中の回答は回答した時刻で記録する（連続学習日数などの集計のため）
+        answered_at = _answered_at(data)
+        if answered_at:
+            log.created_at = answered_at
+        db.session.add(log)
+        db.session.commit()
+        # 再生回数・平均スコアはコミット後に question_stats が QuestionStats に反映する
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'Failed to log learning progress: {str(e)}')
+        return jsonify({'error': 'Failed to log progress'}), 500
+
+    return jsonify({
+        'is_correct': is_correct,
+        'score': score,
+        'user_answer': user_answer,
+        'correct_answer': question.correct_answer,
+        'explanation': f'正解は「{question.correct_answer}」です。'
+    })
+
+# 学習ログの記録
+@bp.route('/api/log_learning', methods=['POST'])
+@login_required
+def log_learning():
+    """学習結果を記録する"""
+    data = request.json
+    if not data or 'question_id' not in data:
+        return jsonify({'error': 'Invalid input data'}), 400
+
+    try:
+        log = LearningLog(
+            user_id=current_user.id,
+            content_id=data.get('question_id'),
+            question_id=data.get('question_id'),
+            user_answer=data.get('user_answer', ''),
+            score=data.get('score', 0)
+        )
+        answered_at = _answered_at(data)
+        if answered_at:
+            log.created_at = answered_at
+        db.session.add(log)
+        db.session.commit()
+        
+        return jsonify({'success': True}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'Failed to log learning: {str(e)}')
+        return jsonify({'error': 'Failed to log learning'}), 500
+
+# ユーザー統計の取得
+@bp.route('/api/user/stats')
+@login_required
+@response_cache.cached('user_stats')
+def get_user_stats():
+    """ユーザーの学習統計を取得"""
+    try:
+        # 学習ログを SQL で集計
+        summary = read_queries.log_summary(current_user.id)
+        
+        if not summary.total:
+            return jsonify({
+                'total_questions': 0,
+                'correct_rate': 0,
+                'avg_score': 0,
+                'learning_streak': 0
+            })
+        
+        # 統計を計算
+        total_questions = summary.total
+        correct_answers = summary.correct
+        correct_rate = (correct_answers / total_questions * 100) if total_questions > 0 else 0
+        avg_score = summary.score_sum / total_questions if total_questions > 0 else 0
+        
+        # 連続学習日数（日別ビットマップから）
+        learning_streak = learning_activity(current_user.id).streak
+        
+        return jsonify({
+            'total_questions': total_questions,
+            'correct_rate': round(correct_rate, 1),
+            'avg_score': round(avg_score, 1),
+            'learning_streak': learning_streak
+        })
+        
+    except Exception as e:
+        logger.error(f'Failed to get user stats: {str(e)}')
+        return jsonify({'error': 'Failed to get stats'}), 500
+
+# 学習履歴の取得
+@bp.route('/api/user/learning-history')
+@login_required
+@response_cache.cached('learning_history')
+def get_learning_history():
+    """
+    ユーザーの学習履歴を取得（ID の降順 = 記録した順の新しい順。オフラインの回答は created_at が
+    記録時刻より前になるため、created_at の順とは一致しないことがある）
+
+    before_id/limit でキーセットページネーション（既定 100 件。次ページの before_id は X-Next-Before-Id ヘッダー）。
+    format=ndjson の場合は全履歴を1行1件でストリーミングする。
+    """
+    try:
+        before_id, limit = keyset_args()
+        # 学習ログと問題情報を結合して取得
+        query = read_queries.learning_history_select(current_user.id)
+
+        if wants_ndjson():
+            return ndjson_response(apply_keyset(query, LearningLog.id, before_id))
+
+        result = db.session.execute(apply_keyset(query, LearningLog.id, before_id, limit))
+        rows, next_before_id = split_page(result.all(), limit, lambda row: row.id)
+        response = jsonify(list(map(serialization.row_mapper(result.keys()), rows)))
+        if next_before_id is not None:
+            response.headers['X-Next-Before-Id'] = str(next_before_id)
+        return response
+        
+    except Exception as e:
+        logger.error(f'Failed to get learning history: {str(e)}')
+        return jsonify({'error': 'Failed to get history'}), 500
+
+# ユーザーの進捗・スコア履歴を取得
+@bp.route('/user_progress', methods=['GET'])
+@limiter.limit('user_progress', per_minute=20, burst=5, concurrency=2)
+def user_progress():
+    """before_id/limit でページネーション、format=ndjson でストリーミング"""
+    user_id = request.args.get('user_id', type=int)
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+
+    before_id, limit = keyset_args()
+    query = read_queries.user_progress_select(user_id)
+    if wants_ndjson():
+        return ndjson_response(apply_keyset(query, LearningLog.id, before_id))
+
+    result = db.session.execute(apply_keyset(query, LearningLog.id, before_id, limit))
+    logs, next_before_id = split_page(result.all(), limit, lambda row: row.id)
+    results = list(map(serialization.row_mapper(result.keys()), logs))
+    return jsonify({'logs': results, 'next_before_id': next_before_id}), 200
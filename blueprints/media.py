@@ -0,0 +1,54 @@
+"""
+音声ファイル・Service Worker の配信ルート
+"""
+
+import os
+
+from flask import Blueprint, abort, current_app, redirect, send_file, send_from_directory
+
+import audio_store
+from storage import get_storage
+
+bp = Blueprint('media', __name__)
+
+REDIRECT_MAX_AGE = 300
+
+
+@bp.route('/audio/<name>')
+def audio(name):
+    """
+    コンテンツアドレス型ストアの音声を配信する。
+    s3 バックエンドでは署名付き URL（または公開 URL）へリダイレクトし、転送をストレージ側に任せる。
+    """
+    parsed = audio_store.parse_name(name)
+    if not parsed or parsed[1].endswith(('.txt', '.words')):
+        abort(404)
+    backend = get_storage()
+    key = audio_store.key_for(name)
+
+    url = backend.url(key)
+    if url:
+        response = redirect(url, 302)
+        # 署名付き URL の期限より短い間だけリダイレクトをキャッシュさせる
+        response.headers['Cache-Control'] = f'private, max-age={REDIRECT_MAX_AGE}'
+        return response
+
+    path = backend.fetch(key)
+    if path is None:
+        abort(404)
+    # conditional=True で Range リクエスト（シーク）と ETag に対応
+    response = send_file(os.path.abspath(path), conditional=True, max_age=audio_store.CACHE_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={audio_store.CACHE_MAX_AGE}, immutable'
+    return response
+
+
+@bp.route('/sw.js')
+def service_worker():
+    """
+    Service Worker（static/js/sw.js）をサイト全体をスコープにできるルートで配信する。
+    更新をすぐ検出できるよう、ブラウザには毎回再検証させる。
+    """
+    response = send_from_directory(os.path.join(current_app.static_folder, 'js'), 'sw.js', max_age=0)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Service-Worker-Allowed'] = '/'
+    return response
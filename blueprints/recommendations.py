@@ -0,0 +1,210 @@
+"""
+推奨コンテンツ関連のルートと推奨ロジック
+"""
+
+import logging
+
+from flask import Blueprint, request, jsonify, render_template
+from flask_login import current_user, login_required
+
+import question_stats
+import read_queries
+from ml_recommendations import recommend_content  # 推薦機能をインポート
+from question_catalog import catalog
+from rate_limit import limiter
+from recommendation_profile import STATS_MIN_ATTEMPTS, TARGET_ACCURACY, analyze_user_profile, get_next_difficulty
+from response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('recommendations', __name__)
+
+# 適切な難易度の問題で補う場合に読む候補の数（不足数の倍数）
+GENERAL_CANDIDATE_FACTOR = 3
+
+
+# 推奨コンテンツページ
+@bp.route('/recommendations')
+@login_required
+def recommendations():
+    """推奨コンテンツページ"""
+    return render_template('recommendations.html')
+
+# 推奨コンテンツの取得
+@bp.route('/api/recommendations')
+@login_required
+@response_cache.cached('recommendations', vary=catalog.version)  # 問題の追加・公開設定の変更でも作り直す
+@limiter.limit('recommendations', per_minute=30, burst=10, concurrency=4)
+def get_recommendations():
+    """ユーザーに推奨するコンテンツを取得"""
+    try:
+        # ユーザーの学習履歴を分析
+        user_profile = analyze_user_profile(current_user.id)
+        
+        # 推奨問題を取得
+        recommended_questions = get_recommended_questions(user_profile)
+        
+        return jsonify(recommended_questions)
+        
+    except Exception as e:
+        logger.error(f'Failed to get recommendations: {str(e)}')
+        return jsonify({'error': 'Failed to get recommendations'}), 500
+
+# 推奨問題の取得
+def get_recommended_questions(user_profile):
+    """ユーザープロファイルに基づいて推奨問題を取得"""
+    try:
+        recommendations = []
+        
+        # 改善が必要な分野の問題を優先的に推奨
+        if user_profile['weaknesses']:
+            for category in user_profile['weaknesses']:
+                questions = read_queries.questions_in_order(read_queries.public_question_ids(
+                    user_profile['preferred_difficulty'], 2, category=category))
+                
+                question_stats.summaries(question.id for question in questions)
+                for question in questions:
+                    recommendation = create_recommendation(question, user_profile, 'weakness_improvement')
+                    recommendations.append(recommendation)
+        
+        # 得意分野の次のレベルを推奨
+        if user_profile['strengths']:
+            for category in user_profile['strengths']:
+                # 得意分野では少し難しい問題を推奨
+                next_difficulty = get_next_difficulty(user_profile['preferred_difficulty'])
+                questions = read_queries.questions_in_order(read_queries.public_question_ids(
+                    next_difficulty, 1, category=category))
+                
+                question_stats.summaries(question.id for question in questions)
+                for question in questions:
+                    recommendation = create_recommendation(question, user_profile, 'skill_advancement')
+                    recommendations.append(recommendation)
+        
+        # 新しい分野を探索
+        all_categories = ['conversation', 'news', 'story', 'academic']
+        unexplored_categories = [cat for cat in all_categories if cat not in user_profile['preferred_categories']]
+        
+        if unexplored_categories:
+            for category in unexplored_categories[:2]:
+                # 新しい分野は初級から
+                questions = read_queries.questions_in_order(read_queries.public_question_ids(
+                    'easy', 1, category=category))
+                
+                question_stats.summaries(question.id for question in questions)
+                for question in questions:
+                    recommendation = create_recommendation(question, user_profile, 'exploration')
+                    recommendations.append(recommendation)
+        
+        # 推奨数が足りない場合は、適切な難易度の問題を候補の多めの中から推奨度の高い順に追加
+        if len(recommendations) < 6:
+            needed = 6 - len(recommendations)
+            remaining_questions = read_queries.questions_in_order(read_queries.public_question_ids(
+                user_profile['preferred_difficulty'], needed * GENERAL_CANDIDATE_FACTOR))
+            question_stats.summaries(question.id for question in remaining_questions)
+            
+            candidates = [
+                create_recommendation(question, user_profile, 'general')
+                for question in remaining_questions
+                if not any(r['id'] == question.id for r in recommendations)
+            ]
+            candidates.sort(key=lambda r: r['recommendation_score'], reverse=True)
+            recommendations.extend(candidates[:needed])
+        
+        return recommendations[:6]  # 最大6問まで
+        
+    except Exception as e:
+        logger.error(f'Failed to get recommended questions: {str(e)}')
+        return []
+
+# 推奨情報の作成
+def create_recommendation(question, user_profile, reason_type):
+    """推奨問題の情報を作成（統計は呼び出し側で question_stats.summaries にまとめて読んでおく）"""
+    # 推奨度スコアを計算
+    recommendation_score = calculate_recommendation_score(question, user_profile, reason_type)
+    
+    # 推奨理由を生成
+    reason_messages = {
+        'weakness_improvement': f'{get_category_text(question.category)}分野の強化',
+        'skill_advancement': f'{get_category_text(question.category)}分野のレベルアップ',
+        'exploration': f'{get_category_text(question.category)}分野の新規挑戦',
+        'general': '学習進捗に最適'
+    }
+    
+    recommendation_reason = reason_messages.get(reason_type, '学習進捗に最適')
+    stats = question_stats.summary(question.id)
+    
+    return {
+        'id': question.id,
+        'question_text': question.question_text,
+        'difficulty': question.difficulty,
+        'category': question.category,
+        'play_count': stats.play_count,
+        'avg_score': stats.avg_score,
+        'recommendation_score': recommendation_score,
+        'recommendation_reason': recommendation_reason,
+        'confidence': min(0.9, 0.5 + (recommendation_score / 100) * 0.4)
+    }
+
+# 推奨度スコアの計算
+def calculate_recommendation_score(question, user_profile, reason_type):
+    """推奨度スコアを計算（0-100）"""
+    base_score = 50
+    
+    # 理由に基づくボーナス
+    reason_bonus = {
+        'weakness_improvement': 30,
+        'skill_advancement': 25,
+        'exploration': 20,
+        'general': 10
+    }
+    base_score += reason_bonus.get(reason_type, 0)
+    
+    # 難易度の適合性
+    if question.difficulty == user_profile['preferred_difficulty']:
+        base_score += 15
+    elif question.difficulty == get_next_difficulty(user_profile['preferred_difficulty']):
+        base_score += 10
+    
+    # 分野の適合性
+    if question.category in user_profile['weaknesses']:
+        base_score += 20
+    elif question.category in user_profile['strengths']:
+        base_score += 15
+    elif question.category not in user_profile['preferred_categories']:
+        base_score += 10
+    
+    # 全ユーザーの正答率が推奨難易度の目安に近いほど加点（最大 10）
+    stats = question_stats.summary(question.id)
+    if stats.play_count >= STATS_MIN_ATTEMPTS:
+        target = TARGET_ACCURACY.get(user_profile['preferred_difficulty'], TARGET_ACCURACY['medium'])
+        base_score += round(10 * max(0.0, 1 - abs(stats.accuracy - target) * 2))
+    
+    return min(100, max(0, base_score))
+
+# カテゴリテキストの取得
+def get_category_text(category):
+    """カテゴリの日本語テキストを取得"""
+    category_texts = {
+        'conversation': '会話',
+        'news': 'ニュース',
+        'story': '物語',
+        'academic': '学術'
+    }
+    return category_texts.get(category, category)
+
+# コンテンツの推薦（既存のAPI、互換性のため残す）
+@bp.route('/recommend', methods=['POST'])
+@limiter.limit('recommend', per_minute=20, burst=5, concurrency=2)
+def recommend():
+    data = request.json
+    user_id = data.get('user_id')
+    if not user_id:
+        return jsonify({"error": "User ID is required"}), 400
+
+    # 圧縮済みの分は 0 点のあった問題ごとに1件として扱う
+    learning_data = [{'question_id': total.question_id, 'score': 0}
+                     for total in read_queries.compacted_question_totals(user_id) if total.failed]
+    logs = read_queries.log_stats(user_id)
+    learning_data += [{'question_id': log.question_id, 'score': (log.score or 0)} for log in logs]
+    recommendations = recommend_content(learning_data)
+    return jsonify({'recommendations': recommendations}), 200
@@ -0,0 +1,219 @@
+"""
+復習機能のルート
+"""
+
+import logging
+
+from flask import Blueprint, request, jsonify, redirect, url_for, render_template, flash
+from flask_login import current_user, login_required
+
+import read_queries
+from extensions import db
+from models import LearningLog
+from question_catalog import catalog
+from response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('review', __name__)
+
+
+# 復習機能のルート
+@bp.route('/review')
+@login_required
+def review():
+    """復習ページを表示"""
+    return render_template('review.html')
+
+# 間違えた問題の取得
+@bp.route('/api/review/wrong-questions')
+@login_required
+@response_cache.cached('review_wrong_questions')
+def get_wrong_questions():
+    """ユーザーが間違えた問題のリストを取得"""
+    try:
+        # 間違えた問題ごとに回数・最後に間違えた日時とスコアを集計（100点未満を間違いとみなす。圧縮済みの分を含む）
+        wrong = read_queries.wrong_questions(current_user.id)
+        questions = catalog.get_many(w.question_id for w in wrong)
+        wrong_questions = []
+        for w in wrong:
+            question = questions.get(w.question_id)
+            if question:
+                wrong_questions.append({
+                    'id': question.id,
+                    'question_text': question.question_text,
+                    'correct_answer': question.correct_answer,
+                    'audio_url': question.audio_url,
+                    'wrong_count': w.wrong_count,
+                    'wrong_date': w.last_wrong_at.isoformat() if w.last_wrong_at else None,
+                    'last_score': w.last_score
+                })
+        
+        return jsonify(wrong_questions)
+    except Exception as e:
+        logger.error(f"間違えた問題の取得エラー: {e}")
+        return jsonify({'error': '間違えた問題の取得に失敗しました'}), 500
+
+# 学習履歴の取得（復習用）
+@bp.route('/api/review/learning-history')
+@login_required
+@response_cache.cached('review_learning_history')
+def get_review_learning_history():
+    """ユーザーの学習履歴を取得（復習用）"""
+    try:
+        logs = read_queries.recent_logs(current_user.id, 20)
+        
+        questions = catalog.get_many(log.question_id for log in logs if log.question_id)
+        history = []
+        for log in logs:
+            if log.question_id:
+                question = questions.get(log.question_id)
+                history.append({
+                    'id': log.id,
+                    'content_title': question.question_text if question else '問題',
+                    'study_date': log.created_at.isoformat() if log.created_at else None,
+                    'score': log.score,
+                    'time_spent': log.time_spent,
+                    'completion_status': log.completion_status
+                })
+        
+        return jsonify(history)
+    except Exception as e:
+        logger.error(f"学習履歴の取得エラー: {e}")
+        return jsonify({'error': '学習履歴の取得に失敗しました'}), 500
+
+# 回答履歴の取得
+@bp.route('/api/review/answer-history')
+@login_required
+@response_cache.cached('review_answer_history')
+def get_answer_history():
+    """ユーザーの回答履歴を取得"""
+    try:
+        logs = read_queries.recent_logs(current_user.id, 20, answered_only=True)
+        
+        questions = catalog.get_many(log.question_id for log in logs if log.question_id)
+        history = []
+        for log in logs:
+            if log.question_id:
+                question = questions.get(log.question_id)
+                if question:
+                    history.append({
+                        'id': log.id,
+                        'question_text': question.question_text,
+                        'user_answer': log.user_answer,
+                        'correct_answer': question.correct_answer,
+                        'is_correct': log.user_answer == question.correct_answer,
+                        'answer_date': log.created_at.isoformat() if log.created_at else None,
+                        'score': log.score
+                    })
+        
+        return jsonify(history)
+    except Exception as e:
+        logger.error(f"回答履歴の取得エラー: {e}")
+        return jsonify({'error': '回答履歴の取得に失敗しました'}), 500
+
+# 特定の問題の詳細取得
+@bp.route('/api/review/question/<int:question_id>')
+@login_required
+def get_question_for_review(question_id):
+    """復習用の問題詳細を取得"""
+    try:
+        question = catalog.get_or_404(question_id)
+        return jsonify({
+            'id': question.id,
+            'question_text': question.question_text,
+            'correct_answer': question.correct_answer,
+            'audio_url': question.audio_url,
+            'option_a': question.option_a or '選択肢A',
+            'option_b': question.option_b or '選択肢B',
+            'option_c': question.option_c or '選択肢C',
+            'option_d': question.option_d or '選択肢D'
+        })
+    except Exception as e:
+        logger.error(f"問題詳細の取得エラー: {e}")
+        return jsonify({'error': '問題詳細の取得に失敗しました'}), 500
+
+# 復習開始
+@bp.route('/api/review/start', methods=['POST'])
+@login_required
+def start_review():
+    """復習を開始"""
+    try:
+        data = request.json
+        question_id = data.get('question_id')
+        
+        if not question_id:
+            return jsonify({'error': '問題IDが必要です'}), 400
+        
+        # 復習ログを作成
+        review_log = LearningLog(
+            user_id=current_user.id,
+            content_id=question_id,
+            question_id=question_id,
+            completion_status=False,
+            time_spent=0.0
+        )
+        db.session.add(review_log)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'review_id': review_log.id})
+    except Exception as e:
+        logger.error(f"復習開始エラー: {e}")
+        return jsonify({'error': '復習開始に失敗しました'}), 500
+
+# 復習結果の保存
+@bp.route('/api/review/save-result', methods=['POST'])
+@login_required
+def save_review_result():
+    """復習結果を保存"""
+    try:
+        data = request.json
+        question_id = data.get('question_id')
+        user_answer = data.get('user_answer')
+        is_correct = data.get('is_correct')
+        time_spent = data.get('time_spent', 0)
+        
+        if not question_id or user_answer is None:
+            return jsonify({'error': '必要なデータが不足しています'}), 400
+        
+        # 復習ログを作成または更新
+        review_log = LearningLog(
+            user_id=current_user.id,
+            content_id=question_id,
+            question_id=question_id,
+            user_answer=user_answer,
+            score=100 if is_correct else 0,
+            completion_status=True,
+            time_spent=time_spent,
+            is_review=True,
+            review_count=1
+        )
+        
+        db.session.add(review_log)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'review_id': review_log.id})
+    except Exception as e:
+        logger.error(f"復習結果保存エラー: {e}")
+        return jsonify({'error': '復習結果の保存に失敗しました'}), 500
+
+# 復習詳細ページの表示
+@bp.route('/review/<int:question_id>')
+@login_required
+def review_detail(question_id):
+    """復習詳細ページを表示"""
+    try:
+        question = catalog.get_or_404(question_id)
+        
+        # 間違えた回数・前回のスコア・復習回数を取得
+        counts = read_queries.review_counts(current_user.id, question_id)
+        
+        return render_template('review_detail.html', 
+                            question=question,
+                            wrong_count=counts.wrong_count,
+                            last_score=counts.last_score,
+                            review_count=counts.review_count)
+    except Exception as e:
+        logger.error(f"復習詳細ページ表示エラー: {e}")
+        flash('復習ページの表示に失敗しました', 'error')
+        return redirect(url_for('review.review'))
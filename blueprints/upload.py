@@ -0,0 +1,219 @@
+"""
+音声アップロード・文字起こし・問題生成のルート
+"""
+
+import json
+import logging
+import os
+import re
+import time
+
+from flask import Blueprint, Response, request, jsonify, render_template, url_for
+from flask_login import current_user, login_required
+from werkzeug.utils import secure_filename
+
+import audio_pipeline
+import audio_store
+import question_dedupe
+import word_timing
+from extensions import db
+from models import Question
+from question_generator import generate_cloze, option_fields
+from rate_limit import limiter
+from transcription import transcribe_stored
+from upload_progress import TERMINAL_EVENTS, channel_for, upload_progress
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('upload', __name__)
+
+# クライアントが発行するアップロード ID（crypto.randomUUID() など）
+_UPLOAD_ID_RE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+# 1接続あたりの最大配信時間（超えたら切断し、EventSource の再接続で Last-Event-ID から続きを配信する）
+STREAM_MAX_SECONDS = 25
+KEEPALIVE_SECONDS = 10
+RECONNECT_MS = 1000
+
+
+@bp.route('/upload')
+@login_required
+def upload():
+    """音声アップロードページ"""
+    return render_template('upload.html')
+
+
+# 音声アップロード用エンドポイント（/upload_audio と /api/upload_audio の両方に対応）
+@bp.route('/upload_audio', methods=['POST'])
+@bp.route('/api/upload_audio', methods=['POST'])
+@login_required
+@limiter.limit('upload_audio', per_minute=10, burst=3, concurrency=2)
+def upload_audio():
+    # フォームの name="audio_file" と name="file" の両方を受け付ける
+    file = request.files.get('audio_file') or request.files.get('file')
+    if not file:
+        logger.error('No file part in the request')
+        return jsonify({'error': 'No file part in the request'}), 400
+    if file.filename == '':
+        logger.warning('No file selected for uploading')
+        return jsonify({'error': 'No file selected for uploading'}), 400
+
+    # upload_id があれば段階ごとの進捗を /api/upload_progress/<upload_id> に配信する
+    upload_id = request.form.get('upload_id') or request.headers.get('X-Upload-Id')
+    if upload_id and not _UPLOAD_ID_RE.match(upload_id):
+        return jsonify({'error': 'Invalid upload_id'}), 400
+    tracker = upload_progress.tracker(current_user.id, upload_id)
+    if not tracker.claim():
+        # タイムアウト後の再送: 完了済みなら前回の結果、処理中なら進捗の URL を返す（音声認識を二重に実行しない）
+        _, last_event, last_data = tracker.previous()[-1]
+        if last_event == 'stored':
+            return jsonify(last_data['result']), 200
+        return jsonify({
+            'upload_id': upload_id,
+            'status': 'in_progress',
+            'progress_url': url_for('upload.upload_progress_stream', upload_id=upload_id),
+        }), 202
+
+    try:
+        t0 = time.perf_counter()
+        # 受信しながらハッシュを計算し、内容ごとに1回だけ保存する（同名ファイルの上書きも起きない）
+        ext = os.path.splitext(secure_filename(file.filename))[1].lower()
+        stored = audio_store.save_stream(file.stream, ext, audio_store.store_root())
+        filepath = stored.path
+        t_save = time.perf_counter() - t0
+        logger.info(f'[upload] ファイル保存: {t_save:.2f}s ({"新規" if stored.created else "既存と重複"})')
+        tracker.stage('saved', size=stored.size, duplicate=not stored.created)
+
+        # 認識用 FLAC と再生用ファイルに変換（同時実行数の上限あり。同じ音声の変換結果があれば再利用）
+        t_conv0 = time.perf_counter()
+        converted = (audio_pipeline.existing_result(filepath, exists=audio_store.localize)
+                     or audio_pipeline.process_upload(filepath))
+        t_convert = time.perf_counter() - t_conv0
+        logger.info(f'[upload] 音声変換: {t_convert:.2f}s')
+        audio_path = filepath
+        if converted:
+            audio_path = converted.playback_path
+
+        tracker.stage('transcribing')
+
+        t1 = time.perf_counter()
+        # 同じ音声の文字起こし・単語タイミングがあれば音声認識を省略
+        transcript, word_times, written = transcribe_stored(filepath, converted)
+        t_transcribe = time.perf_counter() - t1
+        logger.info(f'[upload] 音声認識(Speech-to-Text): {t_transcribe:.2f}s')
+        tracker.stage('transcribed')
+
+        # 保存先（local / s3）に blob・変換結果・文字起こしを反映
+        derived = written + ([converted.recognition_path, converted.playback_path] if converted else [])
+        audio_store.publish(stored, [p for p in derived if p != filepath])
+
+        t2 = time.perf_counter()
+        cloze = generate_cloze(transcript, word_times=word_times)
+        t_generate = time.perf_counter() - t2
+        logger.info(f'[upload] 穴埋め問題生成: {t_generate:.2f}s')
+        tracker.stage('generated')
+
+        is_public = request.form.get('is_public', 'true').lower() == 'true'
+
+        t3 = time.perf_counter()
+        audio_url = audio_store.url_for_path(audio_path)
+        audio_store.ensure_blob(db.session.connection(), stored.digest, stored.size)
+        question = Question(
+            audio_url=audio_url,
+            audio_hash=stored.digest,
+            word_timings=word_timing.encode(word_times) if word_times else None,
+            question_text=cloze.question_text,
+            correct_answer=cloze.correct_answer,
+            uploaded_by=current_user.id,
+            is_public=is_public,
+            **option_fields(cloze.options)
+        )
+        db.session.add(question)
+        db.session.flush()
+        # 近似重複の索引も同じトランザクションで更新（近似重複があれば duplicate_of に重複元を設定。
+        # 検索索引は flush 時にマッパーイベントで更新される）
+        matches = question_dedupe.index_question(db.session, question, transcript)
+        db.session.commit()
+        t_db = time.perf_counter() - t3
+        logger.info(f'[upload] DB保存: {t_db:.2f}s')
+
+        total = time.perf_counter() - t0
+        logger.info(f'[upload] 合計: {total:.2f}s (保存={t_save:.2f}, 変換={t_convert:.2f}, 音声認識={t_transcribe:.2f}, 問題生成={t_generate:.2f}, DB={t_db:.2f})')
+        result = {
+            'message': 'File uploaded successfully',
+            'file_path': audio_url,
+            'transcript_path': written[0],
+            'question_id': question.id,
+            'duplicate_of': question.duplicate_of,
+            'similar_questions': [{'question_id': m.question_id, 'similarity': m.similarity} for m in matches],
+        }
+        tracker.stage('stored', seconds=round(t_db, 3), question_id=question.id, result=result)
+        return jsonify(result), 200
+    except Exception as e:
+        db.session.rollback()
+        err_msg = str(e)
+        logger.error(f'Failed to save file: {err_msg}')
+        if "credentials" in err_msg.lower() or "GOOGLE_APPLICATION_CREDENTIALS" in err_msg:
+            error_user = (
+                "音声認識の認証が設定されていません。"
+                "Render の Environment で GOOGLE_CREDENTIALS_JSON にサービスアカウントの JSON を設定してください。"
+            )
+        else:
+            error_user = f'Failed to upload file: {err_msg}'
+        tracker.stage('error', message=error_user)
+        return jsonify({'error': error_user}), 500
+
+
+def _sse(seq, event, data):
+    return f'id: {seq}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+@bp.route('/api/upload_progress/<upload_id>')
+@login_required
+def upload_progress_stream(upload_id):
+    """
+    アップロードの進捗を Server-Sent Events で配信する（Last-Event-ID・?after= で続きから）。
+    Accept に text/event-stream を含まない場合は現在までのイベントを JSON で返す（ポーリング用）。
+    """
+    if not _UPLOAD_ID_RE.match(upload_id):
+        return jsonify({'error': 'Invalid upload_id'}), 400
+    channel = channel_for(current_user.id, upload_id)
+    broker = upload_progress.broker
+    after = request.headers.get('Last-Event-ID', type=int) or request.args.get('after', 0, type=int)
+
+    if 'text/event-stream' not in request.headers.get('Accept', ''):
+        events = broker.events(channel, after)
+        return jsonify({
+            'events': [{'id': seq, 'event': event, 'data': data} for seq, event, data in events],
+            'done': any(event in TERMINAL_EVENTS for _, event, _ in broker.events(channel)),
+        })
+
+    # 終了済みのチャンネルへの再接続は 204 で打ち切る（EventSource は 204 で再接続をやめる）
+    if after and any(event in TERMINAL_EVENTS for seq, event, _ in broker.events(channel) if seq <= after):
+        return Response(status=204)
+    if not upload_progress.acquire_listener():
+        response = jsonify({'error': 'Too many progress listeners'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '2'
+        return response
+
+    def stream():
+        # リクエストコンテキスト・DB セッションには触れず、ブローカーの待機だけを行う
+        last = after
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        yield f'retry: {RECONNECT_MS}\n\n'
+        while time.monotonic() < deadline:
+            events = broker.wait(channel, last, min(KEEPALIVE_SECONDS, max(0.0, deadline - time.monotonic())))
+            if not events:
+                yield ': keepalive\n\n'
+            for seq, event, data in events:
+                last = seq
+                yield _sse(seq, event, data)
+                if event in TERMINAL_EVENTS:
+                    return
+
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # nginx 等のプロキシでバッファリングさせない
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(upload_progress.release_listener)
+    return response
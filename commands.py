@@ -0,0 +1,350 @@
+"""
+flask コマンド（全ロールで登録される）
+
+コマンドの処理に使うモジュールは実行時に import する（Web ワーカーの起動時に CLI 用の依存を読み込まない）。
+オプションの既定値もモジュールの定数を実行時に読む（--help では (dynamic) と表示される）。
+"""
+
+import importlib
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from extensions import db
+from models import User, Question
+
+
+def _default(module, name):
+    """オプションの既定値（module の定数 name。コマンドの実行時まで import しない）"""
+    return lambda: getattr(importlib.import_module(module), name)
+
+
+# 既存問題の一括再生成（flask regenerate-questions）
+@click.command('regenerate-questions')
+@with_appcontext
+def regenerate_questions_command():
+    """音声ファイル横の文字起こし(.txt)と単語タイミングから全問題の穴埋め・選択肢を再生成する"""
+    import question_search
+    import word_timing
+    from question_generator import build_index, generate_cloze, option_fields
+    t0 = time.perf_counter()
+    questions = Question.query.order_by(Question.id).all()
+    transcripts = {}
+    for q in questions:
+        transcript = question_search.read_transcript(q.audio_url)
+        if transcript:
+            transcripts[q.id] = transcript
+
+    # 語彙インデックスはカタログ全体から一度だけ構築する
+    index = build_index(transcripts.values())
+    updated = 0
+    for q in questions:
+        transcript = transcripts.get(q.id)
+        if not transcript:
+            continue
+        # 単語タイミングが未保存の問題はストアの <sha256>.words から補う
+        if q.word_timings is None:
+            q.word_timings = word_timing.load(q.audio_url)
+        cloze = generate_cloze(transcript, index=index, word_times=word_timing.decode(q.word_timings))
+        q.question_text = cloze.question_text
+        q.correct_answer = cloze.correct_answer
+        for field, value in option_fields(cloze.options).items():
+            setattr(q, field, value)
+        # 検索索引は flush 時にマッパーイベントで更新される
+        updated += 1
+    db.session.commit()
+    print(f"{updated}/{len(questions)} 問を再生成しました ({time.perf_counter() - t0:.2f}s)")
+
+
+# フォルダからの一括取り込み（flask ingest-audio <DIR>）
+@click.command('ingest-audio')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--uploader', default='admin', help='問題の登録者とするユーザー名')
+@click.option('--workers', default=_default('ingest', 'DEFAULT_WORKERS'), type=int, show_default=True, help='文字起こしの並列数')
+@click.option('--batch-size', default=_default('ingest', 'DEFAULT_BATCH_SIZE'), type=int, show_default=True, help='一括 INSERT の件数')
+@click.option('--manifest', default=None, help='処理済みハッシュの記録先（既定: <DIR>/.ingest_manifest）')
+@click.option('--private', is_flag=True, help='非公開の問題として登録する')
+@with_appcontext
+def ingest_audio_command(directory, uploader, workers, batch_size, manifest, private):
+    """ディレクトリ内の音声ファイルを文字起こしして問題を一括登録する"""
+    import ingest
+    from transcription import transcribe_audio_words
+    user = User.query.filter_by(username=uploader).first()
+    if not user:
+        raise click.ClickException(f'ユーザー {uploader} が見つかりません')
+    result = ingest.ingest_directory(
+        directory, db, Question, transcribe_audio_words,
+        uploaded_by=user.id,
+        is_public=not private,
+        workers=workers,
+        batch_size=batch_size,
+        manifest_path=manifest,
+        echo=click.echo,
+    )
+    # カタログバージョン・音声の参照数・検索索引・近似重複の索引は ingest_directory がバッチごとに更新する
+    click.echo(
+        f"完了: {result['processed']} 件登録, {result['skipped']} 件スキップ, {result['failed']} 件失敗 "
+        f"({result['elapsed']:.1f}s, {result['files_per_minute']:.1f} files/min)"
+    )
+
+
+# 検索索引の一括再構築（flask reindex-questions）
+@click.command('reindex-questions')
+@click.option('--missing-only', is_flag=True, help='未索引の問題のみ追加する')
+@click.option('--batch-size', default=_default('question_search', 'REINDEX_BATCH_SIZE'), type=int, show_default=True, help='コミット単位の件数')
+@with_appcontext
+def reindex_questions_command(missing_only, batch_size):
+    """全文検索の索引（SQLite FTS5 / PostgreSQL tsvector）を作成・再構築する"""
+    import question_search
+    t0 = time.perf_counter()
+    count = question_search.reindex(missing_only=missing_only, batch_size=batch_size, echo=click.echo)
+    click.echo(f"{count} 問を索引しました ({time.perf_counter() - t0:.2f}s)")
+
+
+# 既存の問題の近似重複の検出（flask dedupe-questions）
+@click.command('dedupe-questions')
+@click.option('--rebuild', is_flag=True, help='全問題の MinHash と重複の関連付けを作り直す（既定は MinHash の無い問題のみ）')
+@click.option('--threshold', default=_default('question_dedupe', 'DUPLICATE_THRESHOLD'), show_default=True,
+              type=click.FloatRange(0.0, 1.0), help='近似重複とみなす MinHash の一致率')
+@click.option('--batch-size', default=_default('question_dedupe', 'DEFAULT_BATCH_SIZE'), type=int, show_default=True, help='コミット単位の件数')
+@with_appcontext
+def dedupe_questions_command(rebuild, threshold, batch_size):
+    """問題の MinHash・LSH のバンドを作り、それより前の問題とほぼ同じ内容の問題を重複元に関連付ける"""
+    import question_dedupe
+    t0 = time.perf_counter()
+    result = question_dedupe.dedupe(rebuild=rebuild, threshold=threshold, batch_size=batch_size, echo=click.echo)
+    click.echo(f"{result.signed} 問を処理し、{result.linked} 問を近似重複として関連付けました "
+               f"({time.perf_counter() - t0:.2f}s)")
+
+
+# 既存音声のコンテンツアドレス型ストアへの移行（flask migrate-audio-store）
+@click.command('migrate-audio-store')
+@click.option('--dry-run', is_flag=True, help='移行せず件数と削減量だけを表示する')
+@click.option('--keep-originals', is_flag=True, help='移行元のファイルを削除しない')
+@with_appcontext
+def migrate_audio_store_command(dry_run, keep_originals):
+    """audio_hash の無い問題の音声を再ハッシュしてストアに取り込み、重複を1つにまとめる"""
+    import audio_store
+    import ingest
+    import question_search
+    t0 = time.perf_counter()
+    root = audio_store.store_root()
+    questions = Question.query.filter(Question.audio_hash.is_(None)).order_by(Question.id).all()
+    stored_by_path = {}
+    seen = set()
+    missing = 0
+    for q in questions:
+        path = audio_store.resolve_path(q.audio_url)
+        if not path or not os.path.exists(path):
+            missing += 1
+            continue
+        stored = stored_by_path.get(path)
+        if stored is None:
+            digest = ingest.file_sha256(path)
+            if dry_run:
+                blob_path = os.path.join(audio_store.blob_dir(root, digest), digest + os.path.splitext(path)[1].lower())
+                created = digest not in seen and not os.path.exists(blob_path)
+                stored = audio_store.StoredBlob(digest, path, os.path.getsize(path), created)
+            else:
+                transcript = question_search.read_transcript(q.audio_url)
+                stored = audio_store.import_file(path, root, digest)
+                transcript_path = audio_store.transcript_path(stored.path)
+                if transcript and not audio_store.localize(transcript_path):
+                    audio_store.write_text(transcript_path, transcript)
+                audio_store.publish(stored, [transcript_path] if transcript else [])
+                audio_store.ensure_blob(db.session.connection(), digest, stored.size)
+            stored_by_path[path] = stored
+            seen.add(digest)
+        if not dry_run:
+            # audio_hash の変更でマッパーイベントが参照数を加算する
+            q.audio_url = audio_store.url_for_path(stored.path)
+            q.audio_hash = stored.digest
+    db.session.commit()
+
+    # 既存の blob や他のファイルと内容が同じだった分が削減量
+    saved_mb = sum(stored.size for stored in stored_by_path.values() if not stored.created) / 1024 / 1024
+    prefix = '[dry-run] ' if dry_run else ''
+    if not dry_run and not keep_originals:
+        for path in stored_by_path:
+            for candidate in (path, os.path.splitext(path)[0] + '.txt'):
+                if os.path.exists(candidate):
+                    os.remove(candidate)
+    click.echo(f"{prefix}{len(questions) - missing} 問: {len(stored_by_path)} ファイル → {len(seen)} blob "
+               f"（重複の削減 {saved_mb:.1f} MB）, ファイル無し {missing} 件 ({time.perf_counter() - t0:.2f}s)")
+
+
+# 参照されなくなった音声の削除（flask gc-audio）
+@click.command('gc-audio')
+@click.option('--grace-hours', default=_default('audio_store', 'DEFAULT_GC_GRACE_HOURS'), type=int, show_default=True,
+              help='作成・更新からこの時間以内の blob は削除しない（アップロード中の保護）')
+@click.option('--dry-run', is_flag=True, help='削除せず対象だけを表示する')
+@with_appcontext
+def gc_audio_command(grace_hours, dry_run):
+    """参照数を数え直し、どの問題からも参照されていない音声 blob を削除する"""
+    import audio_store
+    stats = audio_store.collect_garbage(db.session, grace_hours=grace_hours, dry_run=dry_run)
+    db.session.commit()
+    prefix = '[dry-run] ' if dry_run else ''
+    click.echo(f"{prefix}{stats['blobs']} blob / {stats['files']} ファイルを削除 "
+               f"({stats['bytes'] / 1024 / 1024:.1f} MB)")
+
+
+# 静的ファイルのビルド（flask build-assets）
+@click.command('build-assets')
+@click.option('--vendor/--no-vendor', default=True, show_default=True,
+              help='外部 CDN のファイルをダウンロードして取り込む（--no-vendor では前回の分を引き継ぐ）')
+@click.option('--clean', is_flag=True, help='マニフェストから参照されなくなった古いファイルを削除する')
+@with_appcontext
+def build_assets_command(vendor, clean):
+    """static の JS・CSS を圧縮・結合し、内容ハッシュ付きの名前で static/dist/ に書き出す"""
+    import assets
+    t0 = time.perf_counter()
+    static_folder = current_app.static_folder
+    previous = assets.load_manifest(assets.manifest_path(static_folder))
+    manifest = assets.build(static_folder, vendor=vendor, previous=previous)
+    missing = [name for name in assets.VENDOR if name not in manifest]
+    removed = assets.clean(static_folder, manifest) if clean else 0
+    click.echo(f"{len(manifest)} ファイルを書き出しました（CDN のまま {len(missing)} 件, 削除 {removed} 件）"
+               f" ({time.perf_counter() - t0:.2f}s)")
+
+
+# 日別の学習ビットマップの再構築（flask rebuild-activity）
+@click.command('rebuild-activity')
+@click.option('--user-id', type=int, multiple=True, help='対象のユーザーID（複数指定可。省略時は全ユーザー）')
+@with_appcontext
+def rebuild_activity_command(user_id):
+    """連続学習日数・週の集計に使う UserActivity を学習ログから作り直す（一括 INSERT した学習ログの反映用）"""
+    import learning_stats
+    t0 = time.perf_counter()
+    count = learning_stats.rebuild_activity(db.session.connection(), user_id or None)
+    db.session.commit()
+    click.echo(f"{count} ユーザーの学習ビットマップを作り直しました ({time.perf_counter() - t0:.2f}s)")
+
+
+# 保持期間を過ぎた学習ログの圧縮（flask compact-learning-logs）
+@click.command('compact-learning-logs')
+@click.option('--retention-days', type=int, default=None,
+              help='この日数より前の学習ログを圧縮する（既定: LEARNING_LOG_RETENTION_DAYS または retention.DEFAULT_RETENTION_DAYS）')
+@click.option('--batch-size', default=_default('retention', 'DEFAULT_BATCH_SIZE'), type=int, show_default=True, help='1トランザクションで処理する件数')
+@click.option('--max-batches', type=int, default=None, help='1回の実行で処理するバッチ数の上限（省略時は全件）')
+@click.option('--pause', default=0.0, show_default=True, help='バッチ間の待ち時間（秒）')
+@click.option('--dry-run', is_flag=True, help='圧縮せず対象の件数だけを表示する')
+@with_appcontext
+def compact_learning_logs_command(retention_days, batch_size, max_batches, pause, dry_run):
+    """保持期間を過ぎた学習ログを (ユーザー, 問題, 日) ごとの集計にまとめて削除する（中断しても次回は続きから）"""
+    import retention
+    t0 = time.perf_counter()
+    days = retention.retention_days() if retention_days is None else retention_days
+    if dry_run:
+        count = retention.pending_count(retention.cutoff_for(days))
+        click.echo(f"[dry-run] {days} 日より前の学習ログ {count} 件が対象です")
+        return
+    result = retention.compact(days, batch_size=batch_size, max_batches=max_batches, pause=pause, echo=click.echo)
+    click.echo(f"学習ログ {result.logs} 件を集計 {result.rollups} 行にまとめました"
+               f"（{result.batches} バッチ, {time.perf_counter() - t0:.2f}s）")
+
+
+# learning_log の月別パーティションの作成（flask ensure-partitions, PostgreSQL のみ）
+@click.command('ensure-partitions')
+@click.option('--months-ahead', default=_default('partitions', 'DEFAULT_MONTHS_AHEAD'), type=int, show_default=True,
+              help='今月から何か月先までのパーティションを作るか')
+@with_appcontext
+def ensure_partitions_command(months_ahead):
+    """今月以降の learning_log のパーティションを作る（既定パーティションに入った行は移す）"""
+    import partitions
+    connection = db.session.connection()
+    if not partitions.is_partitioned(connection):
+        click.echo('learning_log はパーティション化されていません（PostgreSQL でマイグレーション適用後に使用）')
+        return
+    created = partitions.ensure_partitions(connection, months_ahead=months_ahead)
+    db.session.commit()
+    click.echo(f"{len(created)} 個のパーティションを作成しました{': ' + ', '.join(created) if created else ''}")
+
+
+# 古いパーティションの切り離し（flask archive-partitions, PostgreSQL のみ）
+@click.command('archive-partitions')
+@click.option('--older-than-days', type=int, default=None,
+              help='この日数より前の月のパーティションを対象にする（既定: 学習ログの保持期間）')
+@click.option('--drop', is_flag=True, help='archive スキーマに移さず削除する（空のもののみ）')
+@click.option('--include-nonempty', is_flag=True, help='圧縮されていない行が残っていても archive スキーマへ移す')
+@with_appcontext
+def archive_partitions_command(older_than_days, drop, include_nonempty):
+    """保持期間を過ぎた learning_log のパーティションを切り離す（先に flask compact-learning-logs を実行する）"""
+    import partitions
+    import retention
+    connection = db.session.connection()
+    if not partitions.is_partitioned(connection):
+        click.echo('learning_log はパーティション化されていません（PostgreSQL でマイグレーション適用後に使用）')
+        return
+    days = retention.retention_days() if older_than_days is None else older_than_days
+    archived, skipped = partitions.archive_partitions(
+        connection, retention.cutoff_for(days), drop=drop, include_nonempty=include_nonempty)
+    db.session.commit()
+    click.echo(f"{len(archived)} 個のパーティションを{'削除' if drop else '切り離'}しました"
+               f"（行が残っているため対象外: {', '.join(skipped) or 'なし'}）")
+
+
+# 問題ごとの統計の更新（flask refresh-question-stats）
+@click.command('refresh-question-stats')
+@click.option('--batch-size', default=_default('question_stats', 'DEFAULT_BATCH_SIZE'), type=int, show_default=True,
+              help='1トランザクションで反映する学習ログの件数')
+@click.option('--max-batches', type=int, default=None, help='1回の実行で処理するバッチ数の上限（省略時は追いつくまで）')
+@click.option('--pause', default=0.0, show_default=True, help='バッチ間の待ち時間（秒）')
+@click.option('--rebuild', is_flag=True, help='統計を圧縮済みの分から作り直し、全学習ログを反映し直す')
+@with_appcontext
+def refresh_question_stats_command(batch_size, max_batches, pause, rebuild):
+    """前回反映した学習ログより後の分を QuestionStats に加算する（cron 等で定期実行）"""
+    import question_stats
+    t0 = time.perf_counter()
+    if rebuild:
+        question_stats.rebuild(db.session.connection())
+        db.session.commit()
+    result = question_stats.run(batch_size, max_batches=max_batches, pause=pause, echo=click.echo)
+    click.echo(f"学習ログ {result.logs} 件を反映しました（{result.batches} バッチ, 反映済みの ID: "
+               f"{result.watermark if result.watermark is not None else '他の更新が実行中'}, "
+               f"{time.perf_counter() - t0:.2f}s）")
+
+
+# 問題ごとの統計の整合性の確認（flask check-question-stats）
+@click.command('check-question-stats')
+@click.option('--repair', is_flag=True, help='ずれがあれば作り直す')
+@with_appcontext
+def check_question_stats_command(repair):
+    """QuestionStats を学習ログと圧縮済みの集計からの再計算と比べる（ずれがあれば終了コード 1）"""
+    import question_stats
+    t0 = time.perf_counter()
+    mismatches = question_stats.check(db.session.connection())
+    db.session.rollback()
+    for mismatch in mismatches[:50]:
+        click.echo(f"  問題 {mismatch.question_id} {mismatch.field}: 再計算 {mismatch.expected} / 統計 {mismatch.actual}")
+    if len(mismatches) > 50:
+        click.echo(f"  ...ほか {len(mismatches) - 50} 件")
+    if not mismatches:
+        click.echo(f"ずれはありません ({time.perf_counter() - t0:.2f}s)")
+        return
+    click.echo(f"{len({m.question_id for m in mismatches})} 問でずれがありました ({time.perf_counter() - t0:.2f}s)")
+    if not repair:
+        raise SystemExit(1)
+    question_stats.rebuild(db.session.connection())
+    db.session.commit()
+    result = question_stats.run(echo=click.echo)
+    click.echo(f"作り直しました（学習ログ {result.logs} 件）")
+
+
+def register_commands(app):
+    app.cli.add_command(regenerate_questions_command)
+    app.cli.add_command(ingest_audio_command)
+    app.cli.add_command(reindex_questions_command)
+    app.cli.add_command(dedupe_questions_command)
+    app.cli.add_command(migrate_audio_store_command)
+    app.cli.add_command(gc_audio_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(rebuild_activity_command)
+    app.cli.add_command(compact_learning_logs_command)
+    app.cli.add_command(ensure_partitions_command)
+    app.cli.add_command(archive_partitions_command)
+    app.cli.add_command(refresh_question_stats_command)
+    app.cli.add_command(check_question_stats_command)
@@ -0,0 +1,177 @@
+"""
+レスポンスの圧縮（gzip / brotli）
+
+Accept-Encoding に応じて、COMPRESS_MIN_SIZE バイト以上の圧縮可能なレスポンス（JSON・NDJSON・HTML・テキスト等）を
+after_request で圧縮する。brotli（brotli または brotlicffi パッケージ）があれば br を優先し、無ければ gzip。
+- ストリーミング（NDJSON 等）は COMPRESS_STREAM_FLUSH バイトごとに圧縮して送る（全体をメモリに載せない）
+- text/event-stream は逐次配信が目的のため圧縮しない（圧縮器のバッファで進捗の配信が遅れる）
+- send_file の応答（音声・静的ファイル）、Range 応答、Content-Encoding 済みのものは対象外
+"""
+
+import gzip
+import os
+import zlib
+
+from flask import request
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # 任意依存
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+metrics.describe('response_compression_bytes_total',
+                 'Response body bytes before (stage=in) and after (stage=out) compression by endpoint and encoding')
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+# 動的なレスポンス向けの品質（11 は静的ファイル向けで遅い）
+DEFAULT_BROTLI_QUALITY = 4
+DEFAULT_STREAM_FLUSH = 64 * 1024
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml',
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'text/csv', 'image/svg+xml',
+)
+_SKIP_STATUS = (204, 206, 304)
+
+
+def negotiate(accept_encodings, br_available=None):
+    """使う Content-Encoding（'br' / 'gzip'）を返す。どちらも受け付けなければ None"""
+    br_available = brotli is not None if br_available is None else br_available
+    br = accept_encodings.quality('br') if br_available else 0
+    gz = accept_encodings.quality('gzip')
+    if br > 0 and br >= gz:
+        return 'br'
+    if gz > 0:
+        return 'gzip'
+    return None
+
+
+class _GzipStream:
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def process(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._obj = brotli.Compressor(quality=quality)
+        # brotli は process、brotlicffi は compress
+        self._process = getattr(self._obj, 'process', None) or self._obj.compress
+
+    def process(self, data):
+        return self._process(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+class Compression:
+    def __init__(self):
+        self.enabled = True
+        self.min_size = DEFAULT_MIN_SIZE
+        self.gzip_level = DEFAULT_GZIP_LEVEL
+        self.brotli_quality = DEFAULT_BROTLI_QUALITY
+        self.stream_flush = DEFAULT_STREAM_FLUSH
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true')
+        app.config.setdefault('COMPRESS_MIN_SIZE', int(os.getenv('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE)))
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', int(os.getenv('COMPRESS_GZIP_LEVEL', DEFAULT_GZIP_LEVEL)))
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY',
+                              int(os.getenv('COMPRESS_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY)))
+        app.config.setdefault('COMPRESS_STREAM_FLUSH', int(os.getenv('COMPRESS_STREAM_FLUSH', DEFAULT_STREAM_FLUSH)))
+        self.enabled = app.config['COMPRESS_ENABLED']
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.gzip_level = app.config['COMPRESS_GZIP_LEVEL']
+        self.brotli_quality = app.config['COMPRESS_BROTLI_QUALITY']
+        self.stream_flush = app.config['COMPRESS_STREAM_FLUSH']
+        if self.enabled:
+            app.after_request(self.compress_response)
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def _stream(self, encoding):
+        return _BrotliStream(self.brotli_quality) if encoding == 'br' else _GzipStream(self.gzip_level)
+
+    def compress_response(self, response):
+        if (response.status_code < 200 or response.status_code in _SKIP_STATUS
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        # キャッシュが Accept-Encoding ごとに別の応答を保持するよう、圧縮しない場合も Vary を付ける
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        endpoint = request.endpoint or ''
+        if response.is_streamed:
+            response.response = self._compress_iter(response.response, encoding, endpoint)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            compressed = self.compress(data, encoding)
+            metrics.inc('response_compression_bytes_total', len(data), endpoint=endpoint, encoding=encoding, stage='in')
+            metrics.inc('response_compression_bytes_total', len(compressed), endpoint=endpoint, encoding=encoding,
+                        stage='out')
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # 圧縮後のバイト列は元と異なるため、強い ETag は弱い ETag にする
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _compress_iter(self, chunks, encoding, endpoint):
+        stream = self._stream(encoding)
+        pending = 0
+        total_in = total_out = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                total_in += len(chunk)
+                out = stream.process(chunk)
+                pending += len(chunk)
+                # 一定量ごとに区切って送る（1行ごとに flush すると圧縮率と CPU が悪化する）
+                if pending >= self.stream_flush:
+                    out += stream.flush()
+                    pending = 0
+                if out:
+                    total_out += len(out)
+                    yield out
+            out = stream.finish()
+            total_out += len(out)
+            yield out
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            metrics.inc('response_compression_bytes_total', total_in, endpoint=endpoint, encoding=encoding, stage='in')
+            metrics.inc('response_compression_bytes_total', total_out, endpoint=endpoint, encoding=encoding,
+                        stage='out')
+
+
+compression = Compression()
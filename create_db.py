@@ -15,8 +15,13 @@ load_dotenv()
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-from app import app, db
+from app import create_app
+from extensions import db
 from models import User, Question, LearningLog, TestResult
+import question_search
+
+# マイグレーション・スクリプト用の役割（Web の Blueprint は読み込まない）
+app = create_app('cli')
 
 def create_database():
     """データベースとテーブルを作成する"""
@@ -31,6 +36,8 @@ def create_database():
             
             # データベースとテーブルを作成
             db.create_all()
+            question_search.ensure_schema(db.session.connection())
+            db.session.commit()
             print("データベースとテーブルを作成しました")
             
             # サンプルユーザーを作成
@@ -13,8 +13,12 @@ import random
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-from app import app, db
+from app import create_app
+from extensions import db
 from models import User, Question, LearningLog, TestResult
+
+# マイグレーション・スクリプト用の役割（Web の Blueprint は読み込まない）
+app = create_app('cli')
 from werkzeug.security import generate_password_hash
 
 def create_sample_data():
@@ -1,3 +1,44 @@
+import click
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+
+class _LazyMigrateGroup(click.Group):
+    """flask db のサブコマンドが参照されたときに初めて Flask-Migrate（alembic）を読み込むコマンドグループ"""
+
+    def __init__(self, app, db, **kwargs):
+        super().__init__(name='db', help='Perform database migrations.', **kwargs)
+        self._app = app
+        self._db = db
+
+    def _group(self):
+        if 'migrate' not in self._app.extensions:
+            from flask_migrate import Migrate
+            Migrate(self._app, self._db)
+        return self._app.cli.commands['db']
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        # 本来の db グループ（オプション処理を含む）にそのまま委譲する
+        return self._group().make_context(info_name, args, parent=parent, **extra)
+
+    def list_commands(self, ctx):
+        return self._group().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._group().get_command(ctx, name)
+
+
+def init_lazy_migrate(app, db):
+    app.cli.add_command(_LazyMigrateGroup(app, db))
+
+
+def dialect_insert(connection):
+    """ON CONFLICT 句を使える insert（PostgreSQL・SQLite）。それ以外の DB では None"""
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if connection.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
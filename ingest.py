@@ -0,0 +1,167 @@
+"""
+フォルダ単位の音声一括取り込み
+
+ディレクトリ内の音声ファイルをスレッドプールで並列に文字起こしし、
+穴埋め問題を生成してバッチごとに1回の一括 INSERT で登録する。
+カタログバージョン・音声の参照数は INSERT と同じトランザクションで、検索索引・近似重複の索引はコミットの直後に
+バッチごとに更新する（途中で止めても登録済みの問題はすぐに一覧・検索・重複判定の対象になる）。
+処理済みファイルは内容ハッシュをマニフェストに追記するため、中断後に再実行すると続きから処理される。
+"""
+
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import audio_pipeline
+import audio_store
+import question_dedupe
+import question_search
+import word_timing
+from question_catalog import bump_version
+from question_generator import generate_cloze, option_fields
+from transcription import transcribe_stored
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_BATCH_SIZE = 50
+MANIFEST_NAME = '.ingest_manifest'
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(manifest_path):
+    """処理済みハッシュの集合を読み込む"""
+    if not os.path.exists(manifest_path):
+        return set()
+    with open(manifest_path, encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def append_manifest(manifest_path, hashes):
+    with open(manifest_path, 'a', encoding='utf-8') as f:
+        for h in hashes:
+            f.write(h + '\n')
+
+
+def find_audio_files(directory):
+    """対応拡張子の音声ファイルを再帰的に列挙する（パス順）"""
+    paths = []
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in audio_pipeline.SUPPORTED_EXTENSIONS:
+                paths.append(os.path.join(root, name))
+    paths.sort()
+    return paths
+
+
+def _process_file(path, digest, store_root, transcribe):
+    """1ファイル分: ストアへ保存 → 変換 → 文字起こし → 問題生成（DB 書き込みは呼び出し側でまとめて行う）"""
+    stored = audio_store.import_file(path, store_root, digest)
+
+    converted = (audio_pipeline.existing_result(stored.path, exists=audio_store.localize)
+                 or audio_pipeline.process_upload(stored.path))
+    audio_path = converted.playback_path if converted else stored.path
+
+    transcript, word_times, written = transcribe_stored(stored.path, converted, transcribe)
+
+    derived = written + ([converted.recognition_path, converted.playback_path] if converted else [])
+    audio_store.publish(stored, [p for p in derived if p != stored.path])
+
+    cloze = generate_cloze(transcript, word_times=word_times)
+    return {
+        'audio_url': audio_store.url_for_path(audio_path),
+        'audio_hash': digest,
+        'word_timings': word_timing.encode(word_times) if word_times else None,
+        'question_text': cloze.question_text,
+        'correct_answer': cloze.correct_answer,
+        **option_fields(cloze.options),
+    }
+
+
+def ingest_directory(directory, db, question_model, transcribe, uploaded_by,
+                     is_public=True, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE,
+                     manifest_path=None, echo=print):
+    """
+    ディレクトリ内の音声を取り込む。
+
+    transcribe は transcribe_audio_words 互換の関数（テストや検証時は Speech クライアントを差し替えたものを渡せる）。
+    Returns: {'processed', 'skipped', 'failed', 'elapsed', 'files_per_minute'}
+    """
+    manifest_path = manifest_path or os.path.join(directory, MANIFEST_NAME)
+    done = load_manifest(manifest_path)
+    root = audio_store.store_root()
+
+    pending = []
+    skipped = 0
+    seen = set()
+    for path in find_audio_files(directory):
+        digest = file_sha256(path)
+        if digest in done or digest in seen:
+            skipped += 1
+            continue
+        seen.add(digest)
+        pending.append((path, digest))
+
+    echo(f'対象 {len(pending)} 件（処理済みスキップ {skipped} 件）')
+    processed = 0
+    failed = 0
+    t0 = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            futures = [
+                (path, digest, executor.submit(_process_file, path, digest, root, transcribe))
+                for path, digest in batch
+            ]
+            rows = []
+            hashes = []
+            for path, digest, future in futures:
+                try:
+                    row = future.result()
+                except Exception as e:
+                    failed += 1
+                    logger.error(f'[ingest] {path} の処理に失敗しました: {e}')
+                    continue
+                row['uploaded_by'] = uploaded_by
+                row['is_public'] = is_public
+                rows.append(row)
+                hashes.append(digest)
+
+            if rows:
+                # バッチ単位で1回の一括 INSERT（索引の更新用に ID を受け取る）
+                db.session.bulk_insert_mappings(question_model, rows, return_defaults=True)
+                # bulk_insert_mappings はフラッシュ・マッパーのイベントを通らないため、
+                # カタログバージョンと音声の参照数を明示的に更新する
+                connection = db.session.connection()
+                bump_version(connection)
+                audio_store.add_references(connection, hashes)
+                db.session.commit()
+                append_manifest(manifest_path, hashes)
+                processed += len(rows)
+                # 登録したバッチを検索索引・近似重複の索引に追加
+                question_search.reindex(question_ids=[row['id'] for row in rows])
+                question_dedupe.dedupe(echo=echo)
+
+            elapsed = time.perf_counter() - t0
+            rate = processed / elapsed * 60 if elapsed > 0 else 0.0
+            echo(f'{processed}/{len(pending)} 件完了 ({rate:.1f} files/min)')
+
+    elapsed = time.perf_counter() - t0
+    files_per_minute = processed / elapsed * 60 if elapsed > 0 else 0.0
+    return {
+        'processed': processed,
+        'skipped': skipped,
+        'failed': failed,
+        'elapsed': elapsed,
+        'files_per_minute': files_per_minute,
+    }
@@ -0,0 +1,275 @@
+"""
+学習統計の計算
+
+連続学習日数・今週（今日を含む直近 7 日, UTC）の学習日数と学習時間は、ユーザーごとの
+日別ビットマップ（UserActivity）から O(1) で求める。UserActivity は学習ログの INSERT と同じ
+トランザクションで更新し（after_flush）、行が無いユーザーは学習ログから SQL で作る。
+
+SQL での集計（activity_metrics_sql・行の再構築）は日付の重複を除いたうえで
+「日数 - ROW_NUMBER()」が等しい日を1つの連続区間とする gaps-and-islands で求める。
+保持期間を過ぎて圧縮された学習ログは LearningRollup の日別の集計として含める。
+"""
+
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Integer, event, func, insert, select, union, union_all, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.functions import FunctionElement
+
+from extensions import db, dialect_insert
+from models import LearningLog, LearningRollup, UserActivity
+
+EPOCH = date(1970, 1, 1)
+# ビットマップで保持する日数（BigInteger の符号ビットを使わない 63 日）
+WINDOW_DAYS = 63
+WINDOW_MASK = (1 << WINDOW_DAYS) - 1
+WEEK_DAYS = 7
+
+ActivityMetrics = namedtuple('ActivityMetrics', 'streak days_this_week minutes_this_week')
+ActivityState = namedtuple('ActivityState', 'last_day run_start day_bits recent_minutes')
+
+
+class day_number(FunctionElement):
+    """日時の列 → 1970-01-01 からの日数（整数）の SQL 式"""
+    type = Integer()
+    name = 'day_number'
+    inherit_cache = True
+
+
+@compiles(day_number)
+def _day_number_default(element, compiler, **kw):
+    # PostgreSQL: date - date は日数（integer）
+    return f"(CAST({compiler.process(element.clauses, **kw)} AS DATE) - DATE '1970-01-01')"
+
+
+@compiles(day_number, 'sqlite')
+def _day_number_sqlite(element, compiler, **kw):
+    return f"CAST(julianday(date({compiler.process(element.clauses, **kw)})) - 2440587.5 AS INTEGER)"
+
+
+def to_day(value):
+    """date / datetime → 1970-01-01 からの日数"""
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def day_start(day):
+    """日数 → その日の 0 時（created_at と比較する naive UTC の datetime）"""
+    return datetime.combine(EPOCH + timedelta(days=day), time())
+
+
+# 連続学習日数の計算
+def calculate_learning_streak(logs):
+    """連続学習日数を計算（created_at を持つ学習ログの列から。画面・API は learning_activity を使う）"""
+    if not logs:
+        return 0
+
+    # 日付順にソート
+    sorted_logs = sorted(logs, key=lambda x: x.created_at)
+
+    streak = 1
+    current_date = sorted_logs[-1].created_at.date()
+
+    for i in range(len(sorted_logs) - 2, -1, -1):
+        log_date = sorted_logs[i].created_at.date()
+        days_diff = (current_date - log_date).days
+
+        if days_diff == 1:
+            streak += 1
+            current_date = log_date
+        elif days_diff > 1:
+            break
+
+    return streak
+
+
+# --- ビットマップ ---
+
+def apply_day(state, day, minutes):
+    """
+    学習した日を1件反映した ActivityState を返す。
+    過去の日（オフライン回答）で前の連続と繋がり、その連続がビットマップの範囲外まで続く場合は None（再構築が必要）
+    """
+    if state is None:
+        return ActivityState(day, day, 1, [minutes] + [0.0] * (WEEK_DAYS - 1))
+    last_day, run_start, bits, recent = state
+    recent = list(recent)
+    if day > last_day:
+        shift = day - last_day
+        bits = ((bits << shift) | 1) & WINDOW_MASK if shift < WINDOW_DAYS else 1
+        recent = ([0.0] * min(shift, WEEK_DAYS) + recent)[:WEEK_DAYS]
+        recent[0] += minutes
+        return ActivityState(day, run_start if shift == 1 else day, bits, recent)
+
+    offset = last_day - day
+    if offset < WINDOW_DAYS:
+        bits |= 1 << offset
+    if offset < WEEK_DAYS:
+        recent[offset] += minutes
+    if day == run_start - 1:
+        # 前の連続と繋がった場合はビットマップを遡って開始日を求める
+        run_start = day
+        while bits >> (last_day - run_start + 1) & 1:
+            run_start -= 1
+        if last_day - run_start + 1 >= WINDOW_DAYS:
+            return None
+    return ActivityState(last_day, run_start, bits, recent)
+
+
+def metrics_from_state(state, today):
+    """ActivityState と今日の日数から ActivityMetrics を求める"""
+    shift = today - state.last_day
+    bits = state.day_bits << shift if shift >= 0 else state.day_bits >> -shift
+    minutes = sum(m for k, m in enumerate(state.recent_minutes) if 0 <= k + shift < WEEK_DAYS)
+    return ActivityMetrics(
+        streak=state.last_day - state.run_start + 1,
+        days_this_week=bin(bits & ((1 << WEEK_DAYS) - 1)).count('1'),
+        minutes_this_week=int(round(minutes)),
+    )
+
+
+# --- SQL での集計 ---
+
+def _daily_minutes(user_id, since_day=None):
+    """学習ログと圧縮済みの集計を合わせた (day, minutes) の行"""
+    raw = select(day_number(LearningLog.created_at).label('day'), LearningLog.time_spent.label('minutes')).where(
+        LearningLog.user_id == user_id)
+    rolled = select(LearningRollup.day, LearningRollup.total_time).where(LearningRollup.user_id == user_id)
+    if since_day is not None:
+        raw = raw.where(LearningLog.created_at >= day_start(since_day))
+        rolled = rolled.where(LearningRollup.day >= since_day)
+    return union_all(raw, rolled).subquery()
+
+
+def _latest_run(connection, user_id):
+    """最後に学習した日で終わる連続区間の (開始日, 終了日)。学習ログが無ければ None"""
+    daily = _daily_minutes(user_id)
+    days = select(daily.c.day).distinct().subquery()
+    islands = select(
+        days.c.day,
+        (days.c.day - func.row_number().over(order_by=days.c.day)).label('island'),
+    ).subquery()
+    row = connection.execute(
+        select(func.min(islands.c.day), func.max(islands.c.day).label('last_day'))
+        .group_by(islands.c.island).order_by(func.max(islands.c.day).desc()).limit(1)
+    ).first()
+    return tuple(row) if row else None
+
+
+def activity_metrics_sql(user_id, today, connection=None):
+    """ビットマップを使わず学習ログから SQL で ActivityMetrics を求める"""
+    connection = connection or db.session
+    run = _latest_run(connection, user_id)
+    if run is None:
+        return ActivityMetrics(0, 0, 0)
+    daily = _daily_minutes(user_id, since_day=today - WEEK_DAYS + 1)
+    days, minutes = connection.execute(
+        select(func.count(daily.c.day.distinct()), func.sum(daily.c.minutes)).where(daily.c.day <= today)
+    ).one()
+    return ActivityMetrics(run[1] - run[0] + 1, days or 0, int(round(minutes or 0)))
+
+
+def state_from_logs(connection, user_id):
+    """学習ログから ActivityState を作る（学習ログが無ければ None）"""
+    run = _latest_run(connection, user_id)
+    if run is None:
+        return None
+    run_start, last_day = run
+    daily = _daily_minutes(user_id, since_day=last_day - WINDOW_DAYS + 1)
+    rows = connection.execute(select(daily.c.day, func.sum(daily.c.minutes)).group_by(daily.c.day)).all()
+    bits = 0
+    recent = [0.0] * WEEK_DAYS
+    for row_day, minutes in rows:
+        offset = last_day - row_day
+        if 0 <= offset < WINDOW_DAYS:
+            bits |= 1 << offset
+        if 0 <= offset < WEEK_DAYS:
+            recent[offset] = float(minutes or 0)
+    return ActivityState(last_day, run_start, bits, recent)
+
+
+# --- UserActivity の読み書き ---
+
+def _load_state(connection, user_id, for_update=False):
+    stmt = select(UserActivity.last_day, UserActivity.run_start, UserActivity.day_bits,
+                  UserActivity.recent_minutes).where(UserActivity.user_id == user_id)
+    if for_update:
+        stmt = stmt.with_for_update()
+    row = connection.execute(stmt).first()
+    return ActivityState(*row) if row else None
+
+
+def _insert_state(connection, user_id, state):
+    """行を作る。同時に他のトランザクションが作っていた場合は False"""
+    values = dict(user_id=user_id, **state._asdict())
+    upsert = dialect_insert(connection)
+    if upsert is None:
+        connection.execute(insert(UserActivity).values(**values))
+        return True
+    result = connection.execute(upsert(UserActivity).values(**values).on_conflict_do_nothing())
+    return result.rowcount == 1
+
+
+def _save_state(connection, user_id, state):
+    connection.execute(update(UserActivity).where(UserActivity.user_id == user_id).values(**state._asdict()))
+
+
+def record_activity(connection, log_ids):
+    """INSERT された学習ログ（flush 済み）の日付・学習時間を UserActivity に反映する"""
+    rows = connection.execute(
+        select(LearningLog.user_id, day_number(LearningLog.created_at), LearningLog.time_spent)
+        .where(LearningLog.id.in_(log_ids))
+    ).all()
+    entries = {}
+    for user_id, day, minutes in rows:
+        entries.setdefault(user_id, []).append((day, float(minutes or 0)))
+
+    for user_id, days in entries.items():
+        state = _load_state(connection, user_id, for_update=True)
+        if state is None:
+            # 初回は学習ログ（今回の分を含む）から作る
+            if _insert_state(connection, user_id, state_from_logs(connection, user_id)):
+                continue
+            state = _load_state(connection, user_id, for_update=True)
+        for day, minutes in sorted(days):
+            state = apply_day(state, day, minutes)
+            if state is None:
+                state = state_from_logs(connection, user_id)
+                break
+        _save_state(connection, user_id, state)
+
+
+def rebuild_activity(connection, user_ids=None):
+    """UserActivity を学習ログから作り直し、件数を返す（user_ids 省略時は全ユーザー）"""
+    if user_ids is None:
+        user_ids = connection.execute(
+            union(select(LearningLog.user_id), select(LearningRollup.user_id))
+        ).scalars().all()
+    count = 0
+    for user_id in user_ids:
+        state = state_from_logs(connection, user_id)
+        connection.execute(UserActivity.__table__.delete().where(UserActivity.user_id == user_id))
+        if state is not None:
+            _insert_state(connection, user_id, state)
+            count += 1
+    return count
+
+
+def learning_activity(user_id, today=None):
+    """連続学習日数・今週の学習日数・学習時間（分）"""
+    today = to_day(today or datetime.utcnow())
+    state = _load_state(db.session, user_id)
+    if state is None:
+        return activity_metrics_sql(user_id, today)
+    return metrics_from_state(state, today)
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_on_flush(session, flush_context):
+    # 学習ログと同じトランザクションで更新する（ロールバックされれば一緒に戻る）
+    log_ids = [obj.id for obj in session.new if isinstance(obj, LearningLog)]
+    if log_ids:
+        record_activity(session.connection(), log_ids)
@@ -0,0 +1,73 @@
+"""
+プロセス内メトリクス（カウンター・ゲージ）
+
+Prometheus のテキスト形式で /metrics から出力する。
+マルチワーカー構成ではワーカーごとの値になる点に注意。
+"""
+
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+_help = {}
+
+
+def describe(name, text):
+    _help[name] = text
+
+
+def inc(name, value=1, **labels):
+    """カウンターを加算する（labels はメトリクスのラベル）"""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] += value
+
+
+def gauge(name, fn):
+    """出力時に fn() を呼んで値を得るゲージを登録する（fn は {ラベルのタプル: 値} を返す）"""
+    _gauges[name] = fn
+
+
+def get(name, **labels):
+    return _counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+
+def collect(name):
+    """指定カウンターの {ラベルのタプル: 値} を返す"""
+    with _lock:
+        return {labels: value for (n, labels), value in _counters.items() if n == name}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels)
+    return '{' + body + '}'
+
+
+def render_prometheus():
+    with _lock:
+        items = sorted(_counters.items())
+    lines = []
+    current = None
+    for (name, labels), value in items:
+        if name != current:
+            current = name
+            if name in _help:
+                lines.append(f'# HELP {name} {_help[name]}')
+            lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name}{_format_labels(labels)} {value:g}')
+    for name, fn in sorted(_gauges.items()):
+        if name in _help:
+            lines.append(f'# HELP {name} {_help[name]}')
+        lines.append(f'# TYPE {name} gauge')
+        for labels, value in sorted(fn().items()):
+            lines.append(f'{name}{_format_labels(labels)} {value:g}')
+    return '\n'.join(lines) + '\n'
@@ -5,6 +5,9 @@ from flask import current_app
 
 from alembic import context
 
+import partitions
+import question_search
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -51,6 +54,14 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # モデルに無いがアプリが作るもの（検索用のテーブル・索引、learning_log の月別パーティション）は
+    # autogenerate で削除の差分にしない
+    if type_ in ('table', 'index') and (question_search.is_search_object(name) or partitions.is_partition(name)):
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +76,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -97,6 +109,9 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # online_migration のバッチ更新は途中でコミットするため、マイグレーションごとにトランザクションを分ける
+        conf_args.setdefault("transaction_per_migration", True)
+        conf_args.setdefault("include_object", include_object)
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
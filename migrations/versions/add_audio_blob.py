@@ -0,0 +1,35 @@
+"""Add content-addressed audio storage
+
+Revision ID: add_audio_blob
+Revises: add_question_search
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_audio_blob'
+down_revision = 'add_question_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 既存の音声は flask migrate-audio-store でストアに移行する
+    op.add_column('question', sa.Column('audio_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_question_audio_hash', 'question', ['audio_hash'])
+    op.create_table(
+        'audio_blob',
+        sa.Column('hash', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.current_timestamp()),
+        sa.PrimaryKeyConstraint('hash'),
+    )
+
+
+def downgrade():
+    op.drop_table('audio_blob')
+    op.drop_index('ix_question_audio_hash', table_name='question')
+    with op.batch_alter_table('question') as batch_op:
+        batch_op.drop_column('audio_hash')
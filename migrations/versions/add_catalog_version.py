@@ -0,0 +1,29 @@
+"""Add catalog_version table
+
+Revision ID: add_catalog_version
+Revises: add_user_created_at
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_catalog_version'
+down_revision = 'add_user_created_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 問題カタログのキャッシュ無効化用バージョン（1行のみ）
+    op.create_table(
+        'catalog_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.execute(sa.text('INSERT INTO catalog_version (id, version) VALUES (1, 0)'))
+
+
+def downgrade():
+    op.drop_table('catalog_version')
@@ -0,0 +1,30 @@
+"""Add inserted_at to learning_log
+
+Revision ID: add_learning_log_inserted_at
+Revises: add_rollup_review_counts
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import online_migration
+
+revision = 'add_learning_log_inserted_at'
+down_revision = 'add_rollup_review_counts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 既存の行は NULL（question_stats は欠番の判定で古い行とみなす）。
+    # 既定値は列の追加後に設定する（追加と同時に揮発性の既定値を付けると全行が書き換えられる）
+    online_migration.add_column('learning_log', sa.Column('inserted_at', sa.DateTime(), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('learning_log', 'inserted_at', server_default=sa.text('clock_timestamp()'))
+    # SQLite は ALTER TABLE で既定値を変更できない。書き込みは1つずつのため欠番がコミット前の INSERT になることもない
+
+
+def downgrade():
+    with op.batch_alter_table('learning_log') as batch_op:
+        batch_op.drop_column('inserted_at')
@@ -0,0 +1,34 @@
+"""Add learning_rollup table
+
+Revision ID: add_learning_rollup
+Revises: add_user_activity
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_learning_rollup'
+down_revision = 'add_user_activity'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 中身は flask compact-learning-logs が保持期間を過ぎた学習ログから作る
+    op.create_table(
+        'learning_rollup',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('correct', sa.Integer(), nullable=False),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('score_sum', sa.BigInteger(), nullable=False),
+        sa.Column('total_time', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id', 'question_id', 'day'),
+    )
+
+
+def downgrade():
+    op.drop_table('learning_rollup')
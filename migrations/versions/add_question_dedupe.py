@@ -0,0 +1,51 @@
+"""Add near-duplicate detection for questions
+
+Revision ID: add_question_dedupe
+Revises: add_question_stats
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import online_migration
+
+revision = 'add_question_dedupe'
+down_revision = 'add_question_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 既存の問題の MinHash・重複の関連付けは flask dedupe-questions で作る
+    online_migration.add_column('question', sa.Column('duplicate_of', sa.Integer(), nullable=True))
+    with op.batch_alter_table('question') as batch_op:
+        batch_op.create_foreign_key('fk_question_duplicate_of', 'question', ['duplicate_of'], ['id'], ondelete='SET NULL')
+        batch_op.create_index('ix_question_duplicate_of', ['duplicate_of'])
+    op.create_table(
+        'question_signature',
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('signature', sa.LargeBinary(), nullable=False),
+        sa.Column('shingle_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['question_id'], ['question.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('question_id'),
+    )
+    op.create_table(
+        'question_lsh_band',
+        sa.Column('band', sa.SmallInteger(), nullable=False),
+        sa.Column('key', sa.BigInteger(), nullable=False),
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['question_id'], ['question.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('band', 'key', 'question_id'),
+    )
+    op.create_index('ix_question_lsh_band_question_id', 'question_lsh_band', ['question_id'])
+
+
+def downgrade():
+    op.drop_index('ix_question_lsh_band_question_id', table_name='question_lsh_band')
+    op.drop_table('question_lsh_band')
+    op.drop_table('question_signature')
+    with op.batch_alter_table('question') as batch_op:
+        batch_op.drop_index('ix_question_duplicate_of')
+        batch_op.drop_constraint('fk_question_duplicate_of', type_='foreignkey')
+        batch_op.drop_column('duplicate_of')
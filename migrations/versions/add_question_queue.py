@@ -0,0 +1,31 @@
+"""Add per-user next question queue
+
+Revision ID: add_question_queue
+Revises: add_question_dedupe
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_question_queue'
+down_revision = 'add_question_dedupe'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # キューは /api/next_question の初回に作られる
+    op.create_table(
+        'question_queue',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.current_timestamp()),
+        sa.ForeignKeyConstraint(['question_id'], ['question.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'position'),
+    )
+
+
+def downgrade():
+    op.drop_table('question_queue')
@@ -0,0 +1,39 @@
+"""Add full-text search index for questions
+
+Revision ID: add_question_search
+Revises: add_catalog_version
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+from sqlalchemy import text
+
+revision = 'add_question_search'
+down_revision = 'add_catalog_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 索引の中身は flask reindex-questions で作成する
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(text(
+            'CREATE TABLE IF NOT EXISTS question_search ('
+            'question_id INTEGER PRIMARY KEY REFERENCES question (id) ON DELETE CASCADE, '
+            'transcript TEXT, document TSVECTOR NOT NULL)'
+        ))
+        op.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_question_search_document ON question_search USING GIN (document)'
+        ))
+    else:
+        op.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS question_fts USING fts5("
+            "question_text, correct_answer, transcript, tokenize='porter unicode61')"
+        ))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(text('DROP TABLE IF EXISTS question_search'))
+    else:
+        op.execute(text('DROP TABLE IF EXISTS question_fts'))
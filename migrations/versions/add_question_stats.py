@@ -0,0 +1,43 @@
+"""Add question_stats tables
+
+Revision ID: add_question_stats
+Revises: partition_learning_log
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_question_stats'
+down_revision = 'partition_learning_log'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 中身は flask refresh-question-stats（または学習ログの記録後の更新）が学習ログと LearningRollup から作る
+    op.create_table(
+        'question_stats',
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('correct', sa.Integer(), nullable=False),
+        sa.Column('score_sum', sa.BigInteger(), nullable=False),
+        sa.Column('total_time', sa.Float(), nullable=False),
+        sa.Column('time_histogram', sa.JSON(), nullable=False),
+        sa.Column('avg_score', sa.Float(), nullable=False),
+        sa.Column('accuracy', sa.Float(), nullable=False),
+        sa.Column('median_time', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('question_id'),
+    )
+    op.create_table(
+        'question_stats_watermark',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('last_log_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('question_stats_watermark')
+    op.drop_table('question_stats')
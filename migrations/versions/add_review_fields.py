@@ -8,6 +8,8 @@ Create Date: 2024-01-01 00:00:00.000000
 from alembic import op
 import sqlalchemy as sa
 
+import online_migration
+
 # revision identifiers, used by Alembic.
 revision = 'add_review_fields_fixed'
 down_revision = 'c10d2c06536c'
@@ -15,27 +17,31 @@ branch_labels = None
 depends_on = None
 
 def upgrade():
-    # LearningLogテーブルに新しいフィールドを追加
-    op.add_column('learning_log', sa.Column('created_at', sa.DateTime(), nullable=True))
-    op.add_column('learning_log', sa.Column('updated_at', sa.DateTime(), nullable=True))
-    op.add_column('learning_log', sa.Column('review_count', sa.Integer(), nullable=True))
-    op.add_column('learning_log', sa.Column('is_review', sa.Boolean(), nullable=True))
+    # LearningLogテーブルに新しいフィールドを追加（追加済みの列は飛ばすため、途中で止まっても再実行できる）
+    online_migration.add_column('learning_log', sa.Column('created_at', sa.DateTime(), nullable=True))
+    online_migration.add_column('learning_log', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    online_migration.add_column('learning_log', sa.Column('review_count', sa.Integer(), nullable=True))
+    online_migration.add_column('learning_log', sa.Column('is_review', sa.Boolean(), nullable=True))
     
     # Questionテーブルに新しいフィールドを追加
-    op.add_column('question', sa.Column('option_a', sa.String(length=255), nullable=True))
-    op.add_column('question', sa.Column('option_b', sa.String(length=255), nullable=True))
-    op.add_column('question', sa.Column('option_c', sa.String(length=255), nullable=True))
-    op.add_column('question', sa.Column('option_d', sa.String(length=255), nullable=True))
-    op.add_column('question', sa.Column('created_at', sa.DateTime(), nullable=True))
-    op.add_column('question', sa.Column('difficulty_level', sa.Integer(), nullable=True))
+    online_migration.add_column('question', sa.Column('option_a', sa.String(length=255), nullable=True))
+    online_migration.add_column('question', sa.Column('option_b', sa.String(length=255), nullable=True))
+    online_migration.add_column('question', sa.Column('option_c', sa.String(length=255), nullable=True))
+    online_migration.add_column('question', sa.Column('option_d', sa.String(length=255), nullable=True))
+    online_migration.add_column('question', sa.Column('created_at', sa.DateTime(), nullable=True))
+    online_migration.add_column('question', sa.Column('difficulty_level', sa.Integer(), nullable=True))
     
-    # デフォルト値を設定
-    op.execute("UPDATE learning_log SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
-    op.execute("UPDATE learning_log SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
-    op.execute("UPDATE learning_log SET review_count = 0 WHERE review_count IS NULL")
-    op.execute("UPDATE learning_log SET is_review = 0 WHERE is_review IS NULL")
-    op.execute("UPDATE question SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
-    op.execute("UPDATE question SET difficulty_level = 1 WHERE difficulty_level IS NULL")
+    # デフォルト値を設定（主キーの範囲ごとに分けて更新し、テーブル全体をロックしない）
+    online_migration.backfill('learning_log', {
+        'created_at': sa.func.current_timestamp(),
+        'updated_at': sa.func.current_timestamp(),
+        'review_count': 0,
+        'is_review': sa.false(),
+    })
+    online_migration.backfill('question', {
+        'created_at': sa.func.current_timestamp(),
+        'difficulty_level': 1,
+    })
 
 def downgrade():
     # LearningLogテーブルからフィールドを削除
@@ -0,0 +1,30 @@
+"""Add wrong/review counts to learning_rollup
+
+Revision ID: add_rollup_review_counts
+Revises: add_question_queue
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import online_migration
+
+revision = 'add_rollup_review_counts'
+down_revision = 'add_question_queue'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 既に圧縮済みの行は元の学習ログが無いため 0（間違い・復習の回数は以降の圧縮分から含まれる）
+    online_migration.add_column('learning_rollup', sa.Column('wrong', sa.Integer(), nullable=False, server_default='0'))
+    online_migration.add_column('learning_rollup', sa.Column('reviews', sa.Integer(), nullable=False, server_default='0'))
+    online_migration.add_column('learning_rollup', sa.Column('last_wrong_score', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('learning_rollup') as batch_op:
+        batch_op.drop_column('last_wrong_score')
+        batch_op.drop_column('reviews')
+        batch_op.drop_column('wrong')
@@ -0,0 +1,32 @@
+"""Add user_activity table
+
+Revision ID: add_user_activity
+Revises: add_word_timings
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_user_activity'
+down_revision = 'add_word_timings'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 既存ユーザーの行は次の学習ログの記録時に学習履歴から作られる（flask rebuild-activity で一括作成も可）。
+    # 行が無い間は learning_stats が SQL で直接集計する
+    op.create_table(
+        'user_activity',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('last_day', sa.Integer(), nullable=False),
+        sa.Column('run_start', sa.Integer(), nullable=False),
+        sa.Column('day_bits', sa.BigInteger(), nullable=False),
+        sa.Column('recent_minutes', sa.JSON(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('user_activity')
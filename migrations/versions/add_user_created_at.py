@@ -8,6 +8,8 @@ Create Date: 2025-02-19
 from alembic import op
 from sqlalchemy import text
 
+import online_migration
+
 revision = 'add_user_created_at'
 down_revision = 'add_review_fields_fixed'
 branch_labels = None
@@ -20,13 +22,10 @@ def upgrade():
     # PostgreSQL では "user" が予約語のため引用符で囲む
     if dialect_name == 'postgresql':
         op.execute(text('ALTER TABLE "user" ADD COLUMN IF NOT EXISTS created_at TIMESTAMP'))
-        op.execute(text('UPDATE "user" SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL'))
     else:
-        op.add_column('user', sa.Column('created_at', sa.DateTime(), nullable=True))
-        try:
-            op.execute(text("UPDATE user SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL"))
-        except Exception:
-            pass
+        online_migration.add_column('user', sa.Column('created_at', sa.DateTime(), nullable=True))
+    # 既存の行は主キーの範囲ごとに埋める（"user" の引用符は SQLAlchemy が付ける）
+    online_migration.backfill('user', {'created_at': sa.func.current_timestamp()})
 
 def downgrade():
     conn = op.get_bind()
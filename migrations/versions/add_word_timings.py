@@ -0,0 +1,24 @@
+"""Add word timings to questions
+
+Revision ID: add_word_timings
+Revises: add_audio_blob
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_word_timings'
+down_revision = 'add_audio_blob'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 既存の問題は flask regenerate-questions でストアの <sha256>.words から補う
+    op.add_column('question', sa.Column('word_timings', sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('question') as batch_op:
+        batch_op.drop_column('word_timings')
@@ -0,0 +1,158 @@
+"""Partition learning_log by created_at month (PostgreSQL)
+
+Revision ID: partition_learning_log
+Revises: add_learning_rollup
+Create Date: 2026-10-19
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+import online_migration
+
+revision = 'partition_learning_log'
+down_revision = 'add_learning_rollup'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_learning_log_user_created'
+MONTHS_AHEAD = 3
+# 作り直している間の新しいテーブルと、コピー中の旧テーブルの変更（id）の記録
+NEW_TABLE = 'learning_log_new'
+CHANGES_TABLE = 'learning_log_changes'
+CAPTURE_FUNCTION = 'learning_log_capture_change'
+COLUMNS = ('id, user_id, content_id, time_spent, completion_status, question_id, user_answer, score, '
+           'created_at, updated_at, review_count, is_review')
+# created_at はパーティションキーのため NULL にできない。他の列はモデルどおり NOT NULL・既定値を保つ
+UPGRADE_SELECT = ('id, user_id, content_id, time_spent, completion_status, question_id, user_answer, score, '
+                  'COALESCE(created_at, updated_at, CURRENT_TIMESTAMP), '
+                  'COALESCE(updated_at, created_at, CURRENT_TIMESTAMP), '
+                  'COALESCE(review_count, 0), COALESCE(is_review, false)')
+
+
+def _add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_table(sequence, partitioned):
+    if partitioned:
+        # パーティションキーは主キーに含める必要がある（id は従来どおりシーケンスで一意）
+        review_columns = """
+            created_at timestamp without time zone NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at timestamp without time zone NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            review_count integer NOT NULL DEFAULT 0,
+            is_review boolean NOT NULL DEFAULT false,
+            CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)"""
+    else:
+        review_columns = """
+            created_at timestamp without time zone,
+            updated_at timestamp without time zone,
+            review_count integer,
+            is_review boolean,
+            CONSTRAINT {table}_pkey PRIMARY KEY (id)
+        )"""
+    op.execute(f"""
+        CREATE TABLE IF NOT EXISTS {NEW_TABLE} (
+            id integer NOT NULL DEFAULT nextval('{sequence}'),
+            user_id integer NOT NULL,
+            content_id integer NOT NULL,
+            time_spent double precision NOT NULL,
+            completion_status boolean NOT NULL,
+            question_id integer REFERENCES question (id),
+            user_answer varchar(255),
+            score integer,
+    """ + review_columns.format(table=NEW_TABLE))
+
+
+def _create_partitions(first_month, last_month):
+    # 最終的な名前で作る（親の名前を変えてもパーティションの名前はそのまま）
+    month = first_month
+    while month <= last_month:
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS learning_log_p{month:%Y%m} PARTITION OF {NEW_TABLE} "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        )
+        month = upper
+    # 範囲外（パーティション作成前の月など）の行の受け皿。flask ensure-partitions が月別に移す
+    op.execute(f'CREATE TABLE IF NOT EXISTS learning_log_default PARTITION OF {NEW_TABLE} DEFAULT')
+
+
+def _capture_changes():
+    """コピー中の learning_log の追加・更新・削除の id を記録するトリガー"""
+    op.execute(f'CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (id integer NOT NULL)')
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION {CAPTURE_FUNCTION}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO {CHANGES_TABLE} (id) VALUES (OLD.id);
+            ELSE
+                INSERT INTO {CHANGES_TABLE} (id) VALUES (NEW.id);
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(f'DROP TRIGGER IF EXISTS {CAPTURE_FUNCTION} ON learning_log')
+    op.execute(f'CREATE TRIGGER {CAPTURE_FUNCTION} AFTER INSERT OR UPDATE OR DELETE ON learning_log '
+               f'FOR EACH ROW EXECUTE FUNCTION {CAPTURE_FUNCTION}()')
+
+
+def _rebuild(partitioned, select, first_month=None, last_month=None):
+    """
+    learning_log を NEW_TABLE に作り直して置き換える。
+    行は主キーの範囲ごとにコピーし（各バッチはすぐにコミット）、コピー中の変更はトリガーで記録する。
+    テーブルをロックするのは、記録した変更の反映と名前の付け替えの間だけ
+    """
+    bind = op.get_bind()
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('learning_log', 'id')")).scalar()
+    _create_table(sequence, partitioned)
+    if partitioned:
+        _create_partitions(first_month, last_month)
+        op.execute(f'CREATE INDEX IF NOT EXISTS ix_{NEW_TABLE}_user_created ON {NEW_TABLE} (user_id, created_at)')
+    # トリガーを付けてからコピーを始める（コピー済みの範囲の変更も漏らさない）
+    _capture_changes()
+
+    online_migration.copy_rows('learning_log', NEW_TABLE, COLUMNS, select)
+
+    # 以降は1つのトランザクション。読み書きを止めるのは記録した変更の反映の間だけ
+    op.execute('LOCK TABLE learning_log IN ACCESS EXCLUSIVE MODE')
+    op.execute(f'DELETE FROM {NEW_TABLE} WHERE id IN (SELECT id FROM {CHANGES_TABLE})')
+    op.execute(f'INSERT INTO {NEW_TABLE} ({COLUMNS}) SELECT {select} FROM learning_log '
+               f'WHERE id IN (SELECT id FROM {CHANGES_TABLE})')
+    # シーケンスを新しいテーブルの所有にしてから旧テーブルを削除する（所有のままだと一緒に削除される）
+    op.execute(f'ALTER SEQUENCE {sequence} OWNED BY {NEW_TABLE}.id')
+    # 旧テーブルのトリガーも一緒に削除される（月別パーティションも。切り離して保管したものは残る）
+    op.execute('DROP TABLE learning_log')
+    op.execute(f'DROP FUNCTION {CAPTURE_FUNCTION}()')
+    op.execute(f'DROP TABLE {CHANGES_TABLE}')
+    op.execute(f'ALTER TABLE {NEW_TABLE} RENAME TO learning_log')
+    op.execute(f'ALTER TABLE learning_log RENAME CONSTRAINT {NEW_TABLE}_pkey TO learning_log_pkey')
+    if partitioned:
+        op.execute(f'ALTER INDEX ix_{NEW_TABLE}_user_created RENAME TO {INDEX_NAME}')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # パーティションは PostgreSQL のみ。他の DB では索引だけ追加する
+        op.create_index(INDEX_NAME, 'learning_log', ['user_id', 'created_at'])
+        return
+
+    oldest = bind.execute(sa.text(
+        "SELECT min(COALESCE(created_at, updated_at)) FROM learning_log")).scalar()
+    this_month = date.today().replace(day=1)
+    first_month = oldest.date().replace(day=1) if oldest else this_month
+    _rebuild(True, UPGRADE_SELECT, first_month, _add_months(this_month, MONTHS_AHEAD))
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        op.drop_index(INDEX_NAME, table_name='learning_log')
+        return
+    _rebuild(False, COLUMNS)
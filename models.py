@@ -1,5 +1,35 @@
 from extensions import db
 from flask_login import UserMixin
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+def difficulty_label(level):
+    """難易度レベル(1-5)を easy/medium/hard に変換"""
+    level = level or 1
+    if level <= 2:
+        return 'easy'
+    if level <= 3:
+        return 'medium'
+    return 'hard'
+
+def difficulty_label_sql(level):
+    """difficulty_label の SQL 式版（Core の SELECT で難易度名を直接取得する）"""
+    level = db.func.coalesce(level, 1)
+    return db.case((level <= 2, 'easy'), (level <= 3, 'medium'), else_='hard')
+
+class insert_time(FunctionElement):
+    """行を INSERT した時刻（PostgreSQL の CURRENT_TIMESTAMP はトランザクション開始時刻のため clock_timestamp()）"""
+    type = db.DateTime()
+    name = 'insert_time'
+    inherit_cache = True
+
+@compiles(insert_time)
+def _insert_time_default(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+@compiles(insert_time, 'postgresql')
+def _insert_time_postgresql(element, compiler, **kw):
+    return 'clock_timestamp()'
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -22,32 +52,20 @@ class Question(db.Model):
     is_public = db.Column(db.Boolean, default=True) #デフォルトで公開
     created_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())  # 作成日時
     difficulty_level = db.Column(db.Integer, nullable=True, default=1)  # 難易度レベル（1-5）
+    audio_hash = db.Column(db.String(64), nullable=True, index=True)  # 音声の SHA-256（audio_store のコンテンツアドレス。旧データは None）
+    word_timings = db.Column(db.LargeBinary, nullable=True)  # 単語ごとの開始・終了時刻（word_timing.encode の形式。旧データは None）
+    duplicate_of = db.Column(db.Integer, db.ForeignKey('question.id', ondelete='SET NULL'), nullable=True, index=True)  # 内容がほぼ同じ先の問題（question_dedupe が設定。推薦・ランダム出題の対象外）
 
     @property
     def difficulty(self):
         """難易度レベル(1-5)を easy/medium/hard に変換（API・テンプレート互換）"""
-        level = self.difficulty_level or 1
-        if level <= 2:
-            return 'easy'
-        if level <= 3:
-            return 'medium'
-        return 'hard'
+        return difficulty_label(self.difficulty_level)
 
     @property
     def category(self):
         """カテゴリ（未実装の場合は None。API・テンプレート互換）"""
         return None
 
-    @property
-    def play_count(self):
-        """再生回数（未実装の場合は 0）"""
-        return 0
-
-    @property
-    def avg_score(self):
-        """平均スコア（未実装の場合は 0）"""
-        return 0
-
     def __repr__(self):
         return f'<Question {self.id}: {self.question_text}>'
 
@@ -64,6 +82,12 @@ class LearningLog(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())  # 更新日時
     review_count = db.Column(db.Integer, nullable=False, default=0)  # 復習回数
     is_review = db.Column(db.Boolean, nullable=False, default=False)  # 復習かどうか
+    inserted_at = db.Column(db.DateTime, nullable=True, server_default=insert_time())  # 実際に INSERT した時刻（question_stats の欠番の判定用。created_at は指定できるため使わない）
+
+    # PostgreSQL では created_at の月ごとの範囲パーティション（主キーは (id, created_at)。partitions を参照）
+    __table_args__ = (
+        db.Index('ix_learning_log_user_created', 'user_id', 'created_at'),
+    )
 
     def __repr__(self):
         return f'<LearningLog User {self.user_id}, Content {self.content_id}, Status {self.completion_status}>'
@@ -77,3 +101,74 @@ class TestResult(db.Model):
 
     def __repr__(self):
         return f'<TestResult User: {self.user_id}, Score: {self.score}>'
+
+class CatalogVersion(db.Model):
+    """問題カタログのバージョン（Question の追加・更新・削除で加算。question_catalog のキャッシュ無効化用）"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class AudioBlob(db.Model):
+    """コンテンツアドレス型ストアの音声（参照している Question の数を ref_count で管理）"""
+    hash = db.Column(db.String(64), primary_key=True)  # SHA-256
+    size = db.Column(db.BigInteger, nullable=True)  # バイト数
+    ref_count = db.Column(db.Integer, nullable=False, default=0)  # 参照している問題数
+    created_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())  # 作成日時
+
+class UserActivity(db.Model):
+    """ユーザーごとの日別の学習有無のビットマップ（学習ログの記録時に更新。learning_stats の連続学習日数・週の集計用）"""
+    user_id = db.Column(db.Integer, primary_key=True)  # ユーザーID
+    last_day = db.Column(db.Integer, nullable=False)  # 最後に学習した日（1970-01-01 からの日数, UTC）
+    run_start = db.Column(db.Integer, nullable=False)  # last_day で終わる連続学習の開始日
+    day_bits = db.Column(db.BigInteger, nullable=False, default=0)  # bit k = last_day の k 日前に学習したか（63 日分）
+    recent_minutes = db.Column(db.JSON, nullable=False)  # last_day から k 日前の学習時間（分、7 日分）
+
+class LearningRollup(db.Model):
+    """保持期間を過ぎた学習ログの (ユーザー, 問題, 日) ごとの集計（retention の圧縮で作成し、元の学習ログは削除）"""
+    user_id = db.Column(db.Integer, primary_key=True)  # ユーザーID
+    question_id = db.Column(db.Integer, primary_key=True)  # 問題ID（問題の無い学習ログは 0）
+    day = db.Column(db.Integer, primary_key=True)  # 日（1970-01-01 からの日数, UTC）
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # 学習ログの件数
+    correct = db.Column(db.Integer, nullable=False, default=0)  # 正解（score == 1）の件数
+    failed = db.Column(db.Integer, nullable=False, default=0)  # 0 点（score が 0 または未設定）の件数
+    score_sum = db.Column(db.BigInteger, nullable=False, default=0)  # スコアの合計
+    total_time = db.Column(db.Float, nullable=False, default=0.0)  # 学習時間の合計（分）
+    wrong = db.Column(db.Integer, nullable=False, default=0)  # 間違い（完了済みで 100 点未満）の件数
+    reviews = db.Column(db.Integer, nullable=False, default=0)  # 復習（is_review）の件数
+    last_wrong_score = db.Column(db.Integer, nullable=True)  # その日の最後の間違いのスコア（間違いが無ければ None）
+
+class QuestionStats(db.Model):
+    """問題ごとの学習ログの集計（question_stats が反映済みの ID より後の学習ログを加算して更新）"""
+    question_id = db.Column(db.Integer, primary_key=True)  # 問題ID
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # 学習ログの件数（再生回数）
+    correct = db.Column(db.Integer, nullable=False, default=0)  # 正解（score == 1）の件数
+    score_sum = db.Column(db.BigInteger, nullable=False, default=0)  # スコアの合計
+    total_time = db.Column(db.Float, nullable=False, default=0.0)  # 学習時間の合計（分）
+    time_histogram = db.Column(db.JSON, nullable=False)  # 学習時間の対数ヒストグラム {段階: 件数}（question_stats.time_bucket）
+    avg_score = db.Column(db.Float, nullable=False, default=0.0)  # 平均スコア（小数 1 桁）
+    accuracy = db.Column(db.Float, nullable=False, default=0.0)  # 正答率（0-1）
+    median_time = db.Column(db.Float, nullable=False, default=0.0)  # 学習時間の中央値（分、ヒストグラムからの近似）
+    updated_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())  # 更新日時
+
+class QuestionStatsWatermark(db.Model):
+    """QuestionStats に反映済みの学習ログの最大 ID（id = 1 の1行）"""
+    id = db.Column(db.Integer, primary_key=True)
+    last_log_id = db.Column(db.Integer, nullable=False, default=0)
+
+class QuestionSignature(db.Model):
+    """問題の文字起こし・質問文の MinHash（question_dedupe が作成。近似重複の検出用）"""
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id', ondelete='CASCADE'), primary_key=True)  # 問題ID
+    signature = db.Column(db.LargeBinary, nullable=False)  # MinHash（question_dedupe.NUM_PERM 個の uint32）
+    shingle_count = db.Column(db.Integer, nullable=False, default=0)  # 単語 3-gram の数（少ない問題はバンドを作らない）
+
+class QuestionLshBand(db.Model):
+    """MinHash の LSH のバンドごとのキー（(band, key) が一致する問題が近似重複の候補）"""
+    band = db.Column(db.SmallInteger, primary_key=True)  # バンドの番号
+    key = db.Column(db.BigInteger, primary_key=True)  # バンド内の MinHash のハッシュ
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id', ondelete='CASCADE'), primary_key=True, index=True)  # 問題ID
+
+class QuestionQueue(db.Model):
+    """ユーザーごとの次に出題する問題のキュー（question_queue が末尾に補充し、/api/next_question が先頭から取り出す）"""
+    user_id = db.Column(db.Integer, primary_key=True)  # ユーザーID
+    position = db.Column(db.Integer, primary_key=True)  # 並び順（補充のたびに末尾に加算）
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id', ondelete='CASCADE'), nullable=False)  # 問題ID
+    created_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())  # 補充した日時
@@ -0,0 +1,173 @@
+"""
+大きなテーブルのオンラインでのデータ移行（alembic のマイグレーションから使う）
+
+1つの UPDATE でテーブル全体を書き換えると、その間は対象の行のロックが保持され書き込みが止まる。
+ここでは主キーの範囲ごとに batch_size 件ずつ更新し、バッチごとにコミットする。
+- add_column: 列を追加する（既にあれば何もしない。途中で止まったマイグレーションをそのまま再実行できる）
+- backfill: NULL の列を値で埋める。値の入った行は更新しないため、中断しても次回は残りから続く
+- set_not_null: NOT NULL 制約を付ける。PostgreSQL では NOT VALID の CHECK 制約を検証してから付け、
+  テーブル全体を走査する間の排他ロックを避ける
+- copy_rows: テーブルの行を別のテーブルへ主キーの範囲ごとにコピーする（テーブルの作り直し用）。
+  コピー先の最大の主キーの次から続けるため、中断しても次回は残りから続く
+
+NOT NULL の列の追加は expand（add_column で NULL 可の列を追加し backfill）と contract（アプリが
+値を書き込むようになった後の別のマイグレーションで set_not_null）の2段階に分ける。
+
+バッチの件数・間隔は環境変数 MIGRATION_BATCH_SIZE・MIGRATION_BATCH_PAUSE（秒）で変えられる。
+--sql（オフライン）では1つの UPDATE（copy_rows は INSERT ... SELECT）を出力する。
+"""
+
+import logging
+import os
+import time
+
+import sqlalchemy as sa
+from alembic import op
+
+# alembic.ini で INFO が出力される alembic ロガーの子にする（flask db upgrade に進捗を表示する）
+logger = logging.getLogger(f'alembic.{__name__}')
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_PAUSE = 0.05
+
+
+def batch_size():
+    return int(os.getenv('MIGRATION_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+
+
+def batch_pause():
+    return float(os.getenv('MIGRATION_BATCH_PAUSE', DEFAULT_PAUSE))
+
+
+def _offline():
+    return op.get_context().as_sql
+
+
+def has_column(table, column):
+    return any(c['name'] == column for c in sa.inspect(op.get_bind()).get_columns(table))
+
+
+def add_column(table, column):
+    """列を追加する（expand）。既にある場合は何もしない"""
+    if not _offline() and has_column(table, column.name):
+        logger.info(f'[migration] {table}.{column.name} は追加済みです')
+        return
+    op.add_column(table, column)
+
+
+def backfill(table, values, pk='id', size=None, pause=None):
+    """
+    values（列名 → 値・SQL 式）のうち NULL の列を主キーの範囲ごとに埋め、更新した行数を返す。
+    各バッチは自動コミットで実行する（それまでのマイグレーションの変更もここでコミットされる）
+    """
+    size = size or batch_size()
+    pause = batch_pause() if pause is None else pause
+    target = sa.table(table, sa.column(pk), *(sa.column(name) for name in values))
+    key = target.c[pk]
+    pending = sa.or_(*(target.c[name].is_(None) for name in values))
+    assignments = {name: sa.func.coalesce(target.c[name], value) for name, value in values.items()}
+
+    if _offline():
+        op.execute(sa.update(target).where(pending).values(assignments))
+        return 0
+
+    connection = op.get_bind()
+    updated = batches = 0
+    t0 = time.perf_counter()
+    with op.get_context().autocommit_block():
+        lower, upper = connection.execute(sa.select(sa.func.min(key), sa.func.max(key)).where(pending)).one()
+        if lower is None:
+            logger.info(f'[migration] {table}: 埋める行はありません')
+            return 0
+        first = lower
+        while lower is not None:
+            result = connection.execute(
+                sa.update(target).where(key >= lower, key < lower + size, pending).values(assignments))
+            updated += result.rowcount
+            batches += 1
+            lower += size
+            total = upper - first + 1
+            done = min(lower - first, total)
+            logger.info(f'[migration] {table}: {done}/{total} ({done * 100 // total}%, '
+                        f'ID ~{min(lower - 1, upper)}) {updated} 行更新 {time.perf_counter() - t0:.1f}s')
+            if lower > upper:
+                # 実行中に追加された行（値の入っていないもの）があれば続ける
+                lower, new_upper = connection.execute(
+                    sa.select(sa.func.min(key), sa.func.max(key)).where(key >= lower, pending)).one()
+                if lower is None:
+                    break
+                upper = new_upper
+            if pause:
+                time.sleep(pause)
+    logger.info(f'[migration] {table}: {batches} バッチで {updated} 行を更新しました')
+    return updated
+
+
+def copy_rows(source, target, columns, select=None, pk='id', size=None, pause=None):
+    """
+    source の行を主キーの範囲ごとに INSERT ... SELECT で target へコピーし、コピーした行数を返す。
+    columns は列名のカンマ区切り、select は対応する SELECT の式（省略時は columns と同じ）。
+    各バッチは自動コミットで実行する。コピー中に source で更新・削除された行は反映しないため、
+    呼び出し側でトリガー等で変更を記録し、最後に反映すること
+    """
+    size = size or batch_size()
+    pause = batch_pause() if pause is None else pause
+    insert = f'INSERT INTO {target} ({columns}) SELECT {select or columns} FROM {source}'
+
+    if _offline():
+        op.execute(insert)
+        return 0
+
+    connection = op.get_bind()
+    copied = batches = 0
+    t0 = time.perf_counter()
+    with op.get_context().autocommit_block():
+        done = connection.execute(sa.text(f'SELECT max({pk}) FROM {target}')).scalar()
+        lower, upper = connection.execute(sa.text(
+            f'SELECT min({pk}), max({pk}) FROM {source}' + ('' if done is None else f' WHERE {pk} > :done')
+        ), {'done': done}).one()
+        if lower is None:
+            logger.info(f'[migration] {source} → {target}: コピーする行はありません')
+            return 0
+        first = lower
+        while lower is not None:
+            result = connection.execute(sa.text(f'{insert} WHERE {pk} >= :lower AND {pk} < :upper'),
+                                        {'lower': lower, 'upper': lower + size})
+            copied += result.rowcount
+            batches += 1
+            lower += size
+            total = upper - first + 1
+            progress = min(lower - first, total)
+            logger.info(f'[migration] {source} → {target}: {progress}/{total} ({progress * 100 // total}%, '
+                        f'ID ~{min(lower - 1, upper)}) {copied} 行コピー {time.perf_counter() - t0:.1f}s')
+            if lower > upper:
+                # 実行中に追加された行があれば続ける
+                lower, new_upper = connection.execute(sa.text(
+                    f'SELECT min({pk}), max({pk}) FROM {source} WHERE {pk} >= :lower'), {'lower': lower}).one()
+                if lower is None:
+                    break
+                upper = new_upper
+            if pause:
+                time.sleep(pause)
+    logger.info(f'[migration] {source} → {target}: {batches} バッチで {copied} 行をコピーしました')
+    return copied
+
+
+def set_not_null(table, column, existing_type):
+    """NOT NULL 制約を付ける（contract）。NULL の行が残っている場合は失敗する"""
+    dialect = op.get_context().dialect
+    if _offline() or dialect.name != 'postgresql':
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, existing_type=existing_type, nullable=False)
+        return
+    # CHECK 制約の追加（NOT VALID）は走査しない。VALIDATE は書き込みを止めずに走査し、
+    # 検証済みの制約があれば SET NOT NULL（PostgreSQL 12+）は走査しない。各手順はすぐにコミットする
+    quoted = dialect.identifier_preparer.quote
+    name = f'{table}_{column}_not_null'
+    with op.get_context().autocommit_block():
+        # 前回の実行が VALIDATE で失敗していた場合の制約を消してからやり直す
+        op.execute(f'ALTER TABLE {quoted(table)} DROP CONSTRAINT IF EXISTS {name}')
+        op.execute(f'ALTER TABLE {quoted(table)} ADD CONSTRAINT {name} CHECK ({quoted(column)} IS NOT NULL) NOT VALID')
+        op.execute(f'ALTER TABLE {quoted(table)} VALIDATE CONSTRAINT {name}')
+        op.execute(f'ALTER TABLE {quoted(table)} ALTER COLUMN {quoted(column)} SET NOT NULL')
+        op.execute(f'ALTER TABLE {quoted(table)} DROP CONSTRAINT {name}')
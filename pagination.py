@@ -0,0 +1,69 @@
+"""
+キーセットページネーションと NDJSON ストリーミングの共通処理
+"""
+
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import Select
+
+from extensions import db
+from serialization import row_mapper
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+
+def keyset_args():
+    """
+    クエリパラメータ before_id / limit を取得する。
+
+    Returns: (before_id or None, limit)
+    """
+    before_id = request.args.get('before_id', type=int)
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return before_id, limit
+
+
+def wants_ndjson():
+    """?format=ndjson または Accept: application/x-ndjson の場合にストリーミングする"""
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best == 'application/x-ndjson'
+
+
+def apply_keyset(query, id_column, before_id, limit=None):
+    """id 降順のキーセット条件を付ける（limit は次ページ判定用に +1 件取得）"""
+    if before_id is not None:
+        query = query.filter(id_column < before_id)
+    query = query.order_by(id_column.desc())
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+
+def split_page(rows, limit, id_of):
+    """limit+1 件取得した結果を (ページ, 次の before_id) に分ける"""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, id_of(rows[-1])
+    return rows, None
+
+
+def ndjson_response(query, serialize=None, batch_size=STREAM_BATCH_SIZE):
+    """
+    クエリ結果を1行1 JSON で逐次返す。
+    yield_per によりサーバーサイドカーソルから batch_size 件ずつ読み込むため、履歴の長さによらずメモリは一定。
+    query が Core の SELECT の場合、serialize を省略すると列のラベルをキーにして出力する（serialization.row_mapper）。
+    """
+    def generate():
+        if isinstance(query, Select):
+            result = db.session.execute(query.execution_options(yield_per=batch_size))
+            rows, mapper = result, serialize or row_mapper(result.keys())
+        else:
+            rows, mapper = query.yield_per(batch_size), serialize
+        dumps = current_app.json.dumps
+        for row in rows:
+            yield dumps(mapper(row)) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
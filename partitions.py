@@ -0,0 +1,132 @@
+"""
+learning_log の月別パーティション（PostgreSQL）
+
+マイグレーション partition_learning_log で learning_log を created_at の月ごとの範囲パーティション
+（learning_log_pYYYYMM）に分け、範囲外の行は learning_log_default に入る。
+- ensure_partitions: 今月から months_ahead か月先までのパーティションを作る。既定パーティションに
+  その月の行があれば新しいパーティションへ移してから ATTACH する（作成漏れがあっても書き込みは失敗しない）
+- archive_partitions: 期間の終わりが before より前のパーティションを DETACH し、archive スキーマへ移す
+  （または削除する）。retention で圧縮済み（空）のものだけを対象にし、行が残っているものは既定では残す
+
+SQLite など PostgreSQL 以外、またはマイグレーション前の単一テーブルの場合は何もしない。
+日時で絞り込むクエリ（learning_stats の週・ビットマップの再構築、read_queries の新しい順の取得）は
+created_at の条件でパーティションが枝刈りされる。
+"""
+
+import logging
+import re
+from collections import namedtuple
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+PARENT = 'learning_log'
+DEFAULT_PARTITION = 'learning_log_default'
+ARCHIVE_SCHEMA = 'archive'
+DEFAULT_MONTHS_AHEAD = 3
+_NAME_RE = re.compile(r'^learning_log_p(\d{4})(\d{2})$')
+
+Partition = namedtuple('Partition', 'name month')
+
+
+def month_start(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.replace(day=1)
+
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARENT}_p{month:%Y%m}'
+
+
+def is_partition(name):
+    """月別・既定パーティションのテーブル名か（alembic の autogenerate の対象外）"""
+    return bool(name) and (name == DEFAULT_PARTITION or _NAME_RE.match(name) is not None)
+
+
+def is_partitioned(connection):
+    if connection.dialect.name != 'postgresql':
+        return False
+    return bool(connection.execute(text(
+        'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name)'
+    ), {'name': PARENT}).scalar())
+
+
+def list_partitions(connection):
+    """月別パーティションの一覧（古い順。既定パーティションは含まない）"""
+    names = connection.execute(text(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = to_regclass(:name)'
+    ), {'name': PARENT}).scalars()
+    partitions = []
+    for name in names:
+        match = _NAME_RE.match(name)
+        if match:
+            partitions.append(Partition(name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda p: p.month)
+
+
+def _create_partition(connection, month):
+    name = partition_name(month)
+    lower, upper = f'{month:%Y-%m-%d}', f'{add_months(month, 1):%Y-%m-%d}'
+    # CREATE ... PARTITION OF は既定パーティションにその範囲の行があると失敗するため、
+    # 独立したテーブルとして作り、行を移してから ATTACH する
+    connection.execute(text(f'CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    moved = connection.execute(text(
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :lower AND created_at < :upper '
+        f'RETURNING *) INSERT INTO {name} SELECT * FROM moved'
+    ), {'lower': lower, 'upper': upper}).rowcount
+    connection.execute(text(
+        f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    ))
+    logger.info(f'[partitions] {name} を作成しました（既定パーティションから {moved} 件移動）')
+    return name
+
+
+def ensure_partitions(connection, months_ahead=DEFAULT_MONTHS_AHEAD, now=None):
+    """今月から months_ahead か月先までの無いパーティションを作り、作成した名前の一覧を返す"""
+    if not is_partitioned(connection):
+        return []
+    existing = {p.month for p in list_partitions(connection)}
+    this_month = month_start(now or datetime.utcnow())
+    created = []
+    for n in range(months_ahead + 1):
+        month = add_months(this_month, n)
+        if month not in existing:
+            created.append(_create_partition(connection, month))
+    return created
+
+
+def archive_partitions(connection, before, drop=False, include_nonempty=False):
+    """
+    期間の終わりが before 以前のパーティションを切り離す。
+    drop=False なら archive スキーマへ移して残し、drop=True なら削除する（行の残っているものは削除しない）。
+    Returns: (処理したパーティション名の一覧, 行が残っているため残したパーティション名の一覧)
+    """
+    if not is_partitioned(connection):
+        return [], []
+    before = month_start(before)
+    archived, skipped = [], []
+    for partition in list_partitions(connection):
+        if add_months(partition.month, 1) > before:
+            break
+        has_rows = connection.execute(text(f'SELECT EXISTS (SELECT 1 FROM {partition.name})')).scalar()
+        if has_rows and (drop or not include_nonempty):
+            skipped.append(partition.name)
+            continue
+        connection.execute(text(f'ALTER TABLE {PARENT} DETACH PARTITION {partition.name}'))
+        if drop:
+            connection.execute(text(f'DROP TABLE {partition.name}'))
+        else:
+            connection.execute(text(f'CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}'))
+            connection.execute(text(f'ALTER TABLE {partition.name} SET SCHEMA {ARCHIVE_SCHEMA}'))
+        archived.append(partition.name)
+        logger.info(f'[partitions] {partition.name} を{"削除" if drop else f"{ARCHIVE_SCHEMA} に移動"}しました')
+    return archived, skipped
@@ -0,0 +1,216 @@
+"""
+問題カタログの読み取りキャッシュ
+
+問題は主キーで何度も参照されるがアップロード時にしか変わらないため、
+__slots__ の軽量レコード（QuestionRecord）としてプロセス内に保持する。
+
+整合性は catalog_version テーブルのバージョンで保つ:
+- Question を追加・更新・削除するフラッシュで同じトランザクション内にバージョンを加算する
+- 参照時にバージョンを読み（リクエスト中は1回、さらに QUESTION_CATALOG_CHECK_INTERVAL 秒に1回まで）、
+  変わっていればキャッシュを破棄する
+そのため複数ワーカー構成でも他ワーカーの更新は最大でチェック間隔の遅れで反映される。
+自ワーカーでのコミットは即座に反映される。
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+from flask import abort, g, has_app_context, has_request_context
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+import metrics
+from extensions import db
+from models import CatalogVersion, Question, User, difficulty_label
+
+logger = logging.getLogger(__name__)
+
+metrics.describe('question_catalog_lookups_total', 'Question catalog cache lookups by result')
+
+CATALOG_VERSION_ID = 1
+DEFAULT_CHECK_INTERVAL = 1.0
+_BUMPED_KEY = 'question_catalog_bumped'
+_G_VERSION = '_question_catalog_version'
+
+Uploader = namedtuple('Uploader', 'username')
+
+
+class QuestionRecord:
+    """テンプレート・API から Question と同じように参照できる読み取り専用レコード"""
+
+    __slots__ = (
+        'id', 'audio_url', 'question_text', 'correct_answer',
+        'option_a', 'option_b', 'option_c', 'option_d',
+        'uploaded_by', 'uploader_name', 'is_public', 'created_at', 'difficulty_level',
+    )
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @property
+    def difficulty(self):
+        return difficulty_label(self.difficulty_level)
+
+    @property
+    def category(self):
+        return None
+
+    @property
+    def uploader(self):
+        return Uploader(self.uploader_name) if self.uploader_name is not None else None
+
+    def __repr__(self):
+        return f'<QuestionRecord {self.id}: {self.question_text}>'
+
+
+# QuestionRecord.__slots__ の順に取得する列（ORM オブジェクトを作らない列指定の SELECT）
+_COLUMNS = (
+    Question.id, Question.audio_url, Question.question_text, Question.correct_answer,
+    Question.option_a, Question.option_b, Question.option_c, Question.option_d,
+    Question.uploaded_by, User.username, Question.is_public, Question.created_at, Question.difficulty_level,
+)
+
+
+def _to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class QuestionCatalog:
+    def __init__(self, check_interval=None):
+        if check_interval is None:
+            check_interval = float(os.getenv('QUESTION_CATALOG_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL))
+        self.check_interval = check_interval
+        self._records = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        """DB のカタログバージョン（リクエスト中は g に記録して1回だけ、かつチェック間隔内は読まない）"""
+        if has_request_context() and _G_VERSION in g:
+            return g.get(_G_VERSION)
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.check_interval:
+            return self._version
+        version = db.session.execute(
+            select(CatalogVersion.version).where(CatalogVersion.id == CATALOG_VERSION_ID)
+        ).scalar() or 0
+        self._checked_at = now
+        if has_request_context():
+            setattr(g, _G_VERSION, version)
+        return version
+
+    def _sync(self):
+        version = self._current_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    if self._version is not None:
+                        logger.info(f'問題カタログのバージョンが {self._version} -> {version} に変わったためキャッシュを破棄します')
+                    self._records = {}
+                    self._version = version
+        return self._records
+
+    def _load(self, ids):
+        stmt = (
+            select(*_COLUMNS)
+            .outerjoin(User, User.id == Question.uploaded_by)
+            .where(Question.id.in_(ids))
+        )
+        return {row[0]: QuestionRecord(*row) for row in db.session.execute(stmt)}
+
+    def get(self, question_id):
+        """問題レコードを返す（無ければ None）"""
+        return self.get_many([question_id]).get(_to_id(question_id))
+
+    def get_or_404(self, question_id):
+        record = self.get(question_id)
+        if record is None:
+            abort(404)
+        return record
+
+    def get_many(self, question_ids):
+        """{id: QuestionRecord} を返す。キャッシュに無い分は1回の SELECT でまとめて読み込む"""
+        records = self._sync()
+        found = {}
+        missing = []
+        for question_id in question_ids:
+            question_id = _to_id(question_id)
+            if question_id is None or question_id in found:
+                continue
+            record = records.get(question_id)
+            if record is None:
+                missing.append(question_id)
+            else:
+                found[question_id] = record
+        if found:
+            metrics.inc('question_catalog_lookups_total', len(found), result='hit')
+        if missing:
+            metrics.inc('question_catalog_lookups_total', len(missing), result='miss')
+            loaded = self._load(missing)
+            records.update(loaded)
+            found.update(loaded)
+        return found
+
+    def version(self):
+        """現在のカタログバージョン（レスポンスキャッシュのキー用。読み直しの頻度は参照時と同じ）"""
+        return self._current_version()
+
+    def expire_version(self):
+        """次の参照で必ずバージョンを読み直す"""
+        self._checked_at = 0.0
+        # g はアプリケーションコンテキストごと（同じコンテキストで続くリクエストにも残る）
+        if has_app_context():
+            g.pop(_G_VERSION, None)
+
+    def clear(self):
+        with self._lock:
+            self._records = {}
+            self._version = None
+
+
+def bump_version(connection):
+    """カタログバージョンを加算する（bulk_insert_mappings など ORM のフラッシュを通らない書き込み用）"""
+    result = connection.execute(
+        update(CatalogVersion).where(CatalogVersion.id == CATALOG_VERSION_ID)
+        .values(version=CatalogVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(CatalogVersion).values(id=CATALOG_VERSION_ID, version=1))
+
+
+def _touches_questions(session):
+    if any(isinstance(obj, Question) for obj in session.new) or \
+            any(isinstance(obj, Question) for obj in session.deleted):
+        return True
+    return any(isinstance(obj, Question) and session.is_modified(obj) for obj in session.dirty)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_on_flush(session, flush_context):
+    # 問題の変更と同じトランザクションで加算する（ロールバックされればバージョンも戻る）
+    if _touches_questions(session):
+        bump_version(session.connection())
+        session.info[_BUMPED_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _expire_after_commit(session):
+    # 自ワーカーでの更新はチェック間隔を待たずに反映する
+    if session.info.pop(_BUMPED_KEY, False):
+        catalog.expire_version()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop(_BUMPED_KEY, None)
+
+
+catalog = QuestionCatalog()
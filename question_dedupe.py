@@ -0,0 +1,262 @@
+"""
+問題の近似重複の検出（MinHash + LSH）
+
+文字起こしと question_text の単語 3-gram の集合から NUM_PERM 個の MinHash を作り（question_signature）、
+BANDS 個のバンド（ROWS 個ずつ）のハッシュを question_lsh_band に保存する。
+いずれかのバンドのキーが一致した問題だけを候補として読み、MinHash の一致率（Jaccard 係数の推定値）が
+DUPLICATE_THRESHOLD 以上のものを近似重複とする。候補は (band, key) の索引から引くため、全問題とは比べない。
+Jaccard 係数 s の2問が候補になる確率は 1 - (1 - s^ROWS)^BANDS（s=0.8 で 99.8%、s=0.5 で 27%）。
+
+- index_question: アップロード時に1問分の MinHash・バンドを保存し、近似重複があれば Question.duplicate_of に
+  重複元（duplicate_of を持たない最初の問題）を設定する
+- dedupe: 既存の問題を ID 順にまとめて処理する（flask dedupe-questions）
+
+duplicate_of のある問題は推薦・ランダム出題の対象から外す（公開問題一覧・検索・直接のリンクには残る）。
+候補は公開問題と同じアップローダーの問題に限る（他のユーザーの非公開の問題とは関連付けない）。
+関連付けるのは重複元が公開されている場合と、重複元が同じアップローダーの問題で重複側が非公開の場合だけ
+（公開の問題を非公開の問題の重複にすると、他のユーザーにはどちらも出題されなくなる）。
+"""
+
+import hashlib
+import logging
+import random
+import re
+import struct
+import time
+from collections import namedtuple
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.exc import DBAPIError
+
+import question_search
+from extensions import db
+from models import Question, QuestionLshBand, QuestionSignature
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 120
+BANDS = 20
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+# これより 3-gram の少ない問題はバンドを作らない（短い定型文どうしの誤検出を避ける）
+MIN_SHINGLES = 5
+DUPLICATE_THRESHOLD = 0.8
+DEFAULT_BATCH_SIZE = 500
+# 結果に含める近似重複の最大数
+MAX_MATCHES = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+_SIGNATURE_FORMAT = f'<{NUM_PERM}I'
+_BAND_FORMAT = f'<{ROWS}I'
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# original_is_public・original_uploaded_by: 重複元（duplicate_of が無ければ question_id の問題）の公開設定とアップローダー
+Match = namedtuple('Match', 'question_id similarity duplicate_of original_is_public original_uploaded_by')
+DedupeResult = namedtuple('DedupeResult', 'signed linked')
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def shingles(*texts):
+    """
+    小文字化した単語の SHINGLE_SIZE-gram のハッシュの集合（3-gram が作れなければ単語そのもの）。
+    穴埋めの空欄（____）とテキストの境目では区切り、空欄をまたぐ 3-gram は作らない
+    （問題文の 3-gram が文字起こしの 3-gram に含まれ、空欄の位置の違いで一致率が下がらない）
+    """
+    segments = []
+    for text in texts:
+        segment = []
+        for word in _WORD_RE.findall((text or '').lower()):
+            if '_' in word:
+                segments.append(segment)
+                segment = []
+            else:
+                segment.append(word)
+        segments.append(segment)
+    hashes = {
+        _hash64(' '.join(segment[i:i + SHINGLE_SIZE]))
+        for segment in segments for i in range(len(segment) - SHINGLE_SIZE + 1)
+    }
+    return hashes or {_hash64(word) for segment in segments for word in segment}
+
+
+def minhash(hashes):
+    """ハッシュの集合の MinHash（空なら全て _MAX_HASH）"""
+    if not hashes:
+        return (_MAX_HASH,) * NUM_PERM
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH for a, b in _PERMUTATIONS)
+
+
+def band_keys(signature):
+    """[(バンドの番号, キー)]（キーは BigInteger に入る符号付き 64 bit）"""
+    return [
+        (band, int.from_bytes(hashlib.blake2b(
+            struct.pack(_BAND_FORMAT, *signature[band * ROWS:(band + 1) * ROWS]), digest_size=8
+        ).digest(), 'little', signed=True))
+        for band in range(BANDS)
+    ]
+
+
+def similarity(a, b):
+    """MinHash の一致率（Jaccard 係数の推定値）"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def _unpack(data):
+    return struct.unpack(_SIGNATURE_FORMAT, data)
+
+
+def _store(connection, question_id, signature, shingle_count):
+    """1問分の MinHash とバンドを置き換え、バンドのキーを返す（3-gram が少なければ空）"""
+    connection.execute(delete(QuestionLshBand).where(QuestionLshBand.question_id == question_id))
+    connection.execute(delete(QuestionSignature).where(QuestionSignature.question_id == question_id))
+    connection.execute(insert(QuestionSignature).values(
+        question_id=question_id, signature=struct.pack(_SIGNATURE_FORMAT, *signature), shingle_count=shingle_count,
+    ))
+    if shingle_count < MIN_SHINGLES:
+        return []
+    keys = band_keys(signature)
+    connection.execute(insert(QuestionLshBand), [
+        {'band': band, 'key': key, 'question_id': question_id} for band, key in keys
+    ])
+    return keys
+
+
+def find_similar(connection, signature, keys, question_id, uploaded_by, threshold=DUPLICATE_THRESHOLD, before=None):
+    """
+    バンドのキーが一致する問題のうち一致率が threshold 以上のものを一致率の高い順に返す。
+    before を指定した場合はそれより小さい ID の問題だけを対象にする
+    """
+    if not keys:
+        return []
+    # (band, key) ごとの等値条件の OR（行値の IN は SQLite で索引を使わない）
+    candidates = select(QuestionLshBand.question_id).where(or_(*(
+        and_(QuestionLshBand.band == band, QuestionLshBand.key == key) for band, key in keys
+    )))
+    original = aliased(Question)
+    stmt = select(
+        Question.id, Question.duplicate_of, Question.is_public, Question.uploaded_by, QuestionSignature.signature,
+        original.is_public.label('original_is_public'), original.uploaded_by.label('original_uploaded_by'),
+    ).join(
+        QuestionSignature, QuestionSignature.question_id == Question.id
+    ).outerjoin(original, original.id == Question.duplicate_of).where(
+        Question.id.in_(candidates),
+        Question.id != question_id,
+        or_(Question.is_public.is_(True), Question.uploaded_by == uploaded_by),
+    )
+    if before is not None:
+        stmt = stmt.where(Question.id < before)
+    matches = []
+    for row in connection.execute(stmt):
+        score = similarity(signature, _unpack(row.signature))
+        if score >= threshold:
+            if row.duplicate_of is None:
+                matches.append(Match(row.id, round(score, 3), None, row.is_public, row.uploaded_by))
+            else:
+                matches.append(Match(row.id, round(score, 3), row.duplicate_of,
+                                     row.original_is_public, row.original_uploaded_by))
+    matches.sort(key=lambda m: (-m.similarity, m.question_id))
+    return matches[:MAX_MATCHES]
+
+
+def can_link(original_is_public, original_uploaded_by, uploaded_by, is_public):
+    """重複元が公開されているか、同じアップローダーの問題で重複側が非公開なら関連付けてよい"""
+    if original_is_public:
+        return True
+    return uploaded_by is not None and original_uploaded_by == uploaded_by and not is_public
+
+
+def original_of(matches, uploaded_by, is_public):
+    """関連付けてよい近似重複のうち最も一致率の高いものの重複元の ID（無ければ None）"""
+    for match in matches:
+        if can_link(match.original_is_public, match.original_uploaded_by, uploaded_by, is_public):
+            return match.duplicate_of or match.question_id
+    return None
+
+
+def _link(connection, question_id, original_id):
+    # question_id を重複元としていた問題も新しい重複元に付け替える（重複元は常に duplicate_of を持たない）。
+    # 付け替えられない問題（重複元が非公開で、他のユーザーの問題か公開の問題）は関連付けを外す
+    original = connection.execute(
+        select(Question.is_public, Question.uploaded_by).where(Question.id == original_id)).one()
+    children = update(Question).where(Question.duplicate_of == question_id)
+    if original.is_public:
+        connection.execute(children.values(duplicate_of=original_id))
+    else:
+        connection.execute(children.where(
+            Question.uploaded_by == original.uploaded_by, Question.is_public.isnot(True)
+        ).values(duplicate_of=original_id))
+        connection.execute(children.values(duplicate_of=None))
+    connection.execute(update(Question).where(Question.id == question_id).values(duplicate_of=original_id))
+
+
+def index_question(session, question, transcript=None, threshold=DUPLICATE_THRESHOLD):
+    """
+    1問分の MinHash・バンドを保存し、近似重複の一覧を返す（question は flush 済みで id を持つこと）。
+    関連付けてよい近似重複があれば question.duplicate_of に重複元を設定する。
+    失敗しても問題の保存自体は失敗させず、ログに残して空の一覧を返す。
+    """
+    if transcript is None:
+        transcript = question_search.read_transcript(question.audio_url)
+    hashes = shingles(transcript, question.question_text)
+    signature = minhash(hashes)
+    try:
+        with session.begin_nested():
+            connection = session.connection()
+            keys = _store(connection, question.id, signature, len(hashes))
+            matches = find_similar(connection, signature, keys, question.id, question.uploaded_by, threshold)
+    except DBAPIError as e:
+        logger.warning(f'近似重複の索引の更新に失敗しました (question_id={question.id}): {e}  '
+                       f'flask dedupe-questions を実行してください')
+        return []
+    original_id = original_of(matches, question.uploaded_by, question.is_public)
+    if original_id:
+        question.duplicate_of = original_id
+        logger.info(f'[dedupe] 問題 {question.id} は問題 {question.duplicate_of} の近似重複です '
+                    f'(一致率 {matches[0].similarity:.2f})')
+    return matches
+
+
+def dedupe(rebuild=False, threshold=DUPLICATE_THRESHOLD, batch_size=DEFAULT_BATCH_SIZE, echo=None):
+    """
+    MinHash の無い問題（rebuild の場合は全問題）を ID 順に処理し、それより前の問題に近似重複があれば関連付ける。
+    rebuild では既存の関連付けを外してから作り直す。
+
+    Returns: DedupeResult(MinHash を作った件数, 関連付けた件数)
+    """
+    t0 = time.perf_counter()
+    if rebuild:
+        db.session.execute(update(Question).where(Question.duplicate_of.isnot(None)).values(duplicate_of=None))
+        db.session.commit()
+    stmt = select(
+        Question.id, Question.audio_url, Question.question_text, Question.uploaded_by, Question.is_public,
+    ).order_by(Question.id)
+    if not rebuild:
+        stmt = stmt.where(~Question.id.in_(select(QuestionSignature.question_id)))
+    rows = db.session.execute(stmt).all()
+
+    linked = 0
+    for start in range(0, len(rows), batch_size):
+        connection = db.session.connection()
+        for row in rows[start:start + batch_size]:
+            hashes = shingles(question_search.read_transcript(row.audio_url), row.question_text)
+            signature = minhash(hashes)
+            keys = _store(connection, row.id, signature, len(hashes))
+            matches = find_similar(connection, signature, keys, row.id, row.uploaded_by, threshold, before=row.id)
+            original_id = original_of(matches, row.uploaded_by, row.is_public)
+            if original_id:
+                _link(connection, row.id, original_id)
+                linked += 1
+                if echo:
+                    echo(f'  問題 {row.id} → {original_id} (一致率 {matches[0].similarity:.2f})')
+        db.session.commit()
+        if echo:
+            echo(f'  {min(start + batch_size, len(rows))}/{len(rows)} 件')
+    logger.info(f'近似重複の索引を更新しました: {len(rows)} 件, 関連付け {linked} 件 ({time.perf_counter() - t0:.2f}s)')
+    return DedupeResult(len(rows), linked)
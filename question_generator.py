@@ -0,0 +1,263 @@
+"""
+穴埋め問題の生成モジュール
+
+正規表現・ストップワード・頻度リストはモジュール読み込み時（または初回利用時）に
+一度だけ準備し、問題生成は文字起こしを1回走査するだけで完結させる。
+誤答選択肢は語彙インデックス（品詞 × 文字数のバケット）から引く。
+"""
+
+import os
+import random
+import re
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+
+# 単語を抽出（英単語 + 日本語の連続文字列）
+_TOKEN_RE = re.compile(r"[A-Za-z']+|[一-龥ぁ-んァ-ン]+")
+_ASCII_WORD_RE = re.compile(r"[A-Za-z']+")
+_ANSWER_SPLIT_RE = re.compile(r"[\s,/、]+")
+_WORD_RE = re.compile(r"\S+")
+
+BLANK = "____"
+MIN_WORD_LENGTH = 4
+DEFAULT_MAX_BLANKS = 3
+OPTION_COUNT = 4
+# 発話がこれより短い語（早口・弱く発音された語）は空欄にしない（単語タイミングがある場合）
+MIN_BLANK_DURATION_MS = 150
+
+_FREQUENCY_LIST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'common_words.txt')
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before
+being below between both but by can could did do does doing down during each either even
+ever every few for from further had has have having he her here hers herself him himself
+his how however i if in into is it its itself just let me might more most much must my
+myself neither no nor not now of off on once only or other ought our ours ourselves out
+over own same shall she should so some such than that the their theirs them themselves
+then there these they this those through to too under until up upon us very was we were
+what when where which while who whom whose why will with within without would yet you
+your yours yourself yourselves don't didn't doesn't isn't aren't wasn't weren't can't
+couldn't won't wouldn't shouldn't i'm you're we're they're it's that's there's i've
+you've we've they've i'll you'll we'll they'll i'd you'd he's she's let's
+""".split())
+
+# 品詞推定用の接尾辞（先頭から順に評価）
+_POS_SUFFIXES = (
+    ('ing', 'VBG'),
+    ('ed', 'VBD'),
+    ('ly', 'RB'),
+    ('tion', 'NN'), ('sion', 'NN'), ('ment', 'NN'), ('ness', 'NN'), ('ity', 'NN'),
+    ('ship', 'NN'), ('ence', 'NN'), ('ance', 'NN'), ('er', 'NN'), ('or', 'NN'),
+    ('ous', 'JJ'), ('ful', 'JJ'), ('able', 'JJ'), ('ible', 'JJ'), ('ive', 'JJ'),
+    ('ical', 'JJ'), ('al', 'JJ'), ('less', 'JJ'), ('ic', 'JJ'),
+    ('ize', 'VB'), ('ise', 'VB'), ('ate', 'VB'), ('ify', 'VB'),
+)
+
+ClozeQuestion = namedtuple('ClozeQuestion', ['question_text', 'correct_answer', 'answers', 'options'])
+
+
+@lru_cache(maxsize=1)
+def frequency_ranks():
+    """頻度リストを読み込み {単語: 順位} を返す（初回のみファイルを読む）"""
+    ranks = {}
+    try:
+        with open(_FREQUENCY_LIST_PATH, encoding='utf-8') as f:
+            for line in f:
+                word = line.strip().lower()
+                if word and not word.startswith('#') and word not in ranks:
+                    ranks[word] = len(ranks)
+    except OSError:
+        pass
+    return ranks
+
+
+def guess_pos(word):
+    """接尾辞による簡易品詞推定（英語以外は 'JA'）"""
+    if not _ASCII_WORD_RE.fullmatch(word):
+        return 'JA'
+    w = word.lower()
+    for suffix, pos in _POS_SUFFIXES:
+        if len(w) > len(suffix) + 2 and w.endswith(suffix):
+            return pos
+    if len(w) > 4 and w.endswith('s') and not w.endswith('ss'):
+        return 'NNS'
+    return 'NN'
+
+
+class VocabularyIndex:
+    """品詞 × 文字数でバケット化した誤答候補の語彙インデックス"""
+
+    def __init__(self, words=()):
+        self._buckets = defaultdict(list)
+        self._seen = set()
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return len(self._seen)
+
+    def add(self, word):
+        w = word.lower()
+        if len(w) < MIN_WORD_LENGTH or w in STOPWORDS or w in self._seen:
+            return
+        self._seen.add(w)
+        self._buckets[(guess_pos(w), len(w))].append(w)
+
+    def add_text(self, text):
+        for token in _TOKEN_RE.findall(text or ''):
+            self.add(token)
+
+    def distractors(self, word, k=OPTION_COUNT - 1, rng=None, exclude=()):
+        """同じ品詞・近い文字数の語を最大 k 個返す（近い長さから順に探索）"""
+        rng = rng or random
+        w = word.lower()
+        pos = guess_pos(w)
+        picked = []
+        for delta in (0, 1, -1, 2, -2, 3, -3):
+            bucket = [c for c in self._buckets.get((pos, len(w) + delta), ())
+                      if c != w and c not in picked and c not in exclude]
+            if bucket:
+                need = k - len(picked)
+                picked.extend(rng.sample(bucket, min(need, len(bucket))))
+            if len(picked) >= k:
+                break
+        return [_match_case(word, c) for c in picked]
+
+
+def _match_case(template, word):
+    if template[:1].isupper():
+        return word.capitalize()
+    return word
+
+
+@lru_cache(maxsize=1)
+def default_index():
+    """頻度リストから作る既定の語彙インデックス"""
+    return VocabularyIndex(frequency_ranks())
+
+
+def build_index(texts):
+    """既定の語彙に文字起こし・正解などのテキストを加えたインデックスを作る（一括再生成用）"""
+    index = VocabularyIndex(frequency_ranks())
+    for text in texts:
+        index.add_text(text)
+    return index
+
+
+def _spoken_durations(transcript, word_times):
+    """_TOKEN_RE のトークンごとの発話時間(ms)。タイミングが空白区切りの語と対応しなければ None"""
+    spans = [m.span() for m in _WORD_RE.finditer(transcript)]
+    if not word_times or len(spans) != len(word_times):
+        return None
+    durations = []
+    w = 0
+    for m in _TOKEN_RE.finditer(transcript):
+        while spans[w][1] <= m.start():
+            w += 1
+        start_ms, end_ms = word_times[w]
+        durations.append(end_ms - start_ms)
+    return durations
+
+
+def generate_cloze(transcript, max_blanks=DEFAULT_MAX_BLANKS, index=None, rng=None, word_times=None):
+    """
+    文字起こしテキストから複数空欄の穴埋め問題と4択の選択肢を生成する。
+
+    - 4文字以上・ストップワード以外の語を候補とし、頻度リストで低頻度の語を優先する
+    - word_times（単語ごとの (開始ms, 終了ms)）があれば、発話が短く聞き取れない語は候補から外す
+    - 空欄同士は隣接させない
+    - 選択肢は空欄ごとの誤答を組み合わせた文字列（正解は空欄の語をスペース区切りで連結）
+    """
+    rng = rng or random
+    if not transcript:
+        return ClozeQuestion("Listen to the audio and answer the question.", "", [], [])
+
+    index = index or default_index()
+    ranks = frequency_ranks()
+    unknown_rank = len(ranks)
+
+    durations = _spoken_durations(transcript, word_times)
+    tokens = []
+    candidates = []
+    unclear = []
+    for i, m in enumerate(_TOKEN_RE.finditer(transcript)):
+        word = m.group()
+        tokens.append(m)
+        lower = word.lower()
+        if len(word) >= MIN_WORD_LENGTH and lower not in STOPWORDS:
+            # 低頻度ほど高スコア。同点はランダムに崩す
+            candidate = (ranks.get(lower, unknown_rank), rng.random(), i)
+            if durations is not None and durations[i] < MIN_BLANK_DURATION_MS:
+                unclear.append(candidate)
+            else:
+                candidates.append(candidate)
+
+    # 聞き取りやすい候補が無ければ短い語も使い、それも無ければ末尾の単語を使用
+    if not candidates:
+        candidates = unclear
+    if not candidates and tokens:
+        candidates = [(0, 0.0, len(tokens) - 1)]
+    if not candidates:
+        return ClozeQuestion(transcript, "", [], [])
+
+    candidates.sort(reverse=True)
+    chosen = []
+    for _, _, i in candidates:
+        if all(abs(i - j) > 1 for j in chosen):
+            chosen.append(i)
+            if len(chosen) >= max_blanks:
+                break
+    chosen.sort()
+
+    parts = []
+    pos = 0
+    answers = []
+    for i in chosen:
+        m = tokens[i]
+        parts.append(transcript[pos:m.start()])
+        parts.append(BLANK)
+        answers.append(m.group())
+        pos = m.end()
+    parts.append(transcript[pos:])
+    question_text = "".join(parts)
+    correct_answer = " ".join(answers)
+
+    # 空欄ごとの誤答を組み合わせて選択肢を作る
+    exclude = {a.lower() for a in answers}
+    per_blank = []
+    for answer in answers:
+        distractors = index.distractors(answer, OPTION_COUNT - 1, rng, exclude)
+        exclude.update(d.lower() for d in distractors)
+        per_blank.append(distractors)
+    options = [correct_answer]
+    for k in range(OPTION_COUNT - 1):
+        if not all(len(d) > k for d in per_blank):
+            break
+        options.append(" ".join(d[k] for d in per_blank))
+    rng.shuffle(options)
+    return ClozeQuestion(question_text, correct_answer, answers, options)
+
+
+def generate_question(transcript: str, word_times=None):
+    """
+    文字起こしテキストから穴埋め問題を自動生成する（後方互換用）。
+
+    Returns: (question_text, correct_answer)
+    """
+    cloze = generate_cloze(transcript, word_times=word_times)
+    return cloze.question_text, cloze.correct_answer
+
+
+def option_fields(options):
+    """選択肢リストを Question の option_a〜option_d に対応する dict に変換する"""
+    padded = list(options[:OPTION_COUNT]) + [None] * (OPTION_COUNT - len(options))
+    return dict(zip(('option_a', 'option_b', 'option_c', 'option_d'), padded))
+
+
+def normalize_answer(text):
+    """採点用に回答を正規化する（大文字小文字・区切り文字の差を無視）"""
+    return " ".join(t for t in _ANSWER_SPLIT_RE.split((text or '').strip().lower()) if t)
+
+
+def check_answer(user_answer, correct_answer):
+    return normalize_answer(user_answer) == normalize_answer(correct_answer)
@@ -0,0 +1,193 @@
+"""
+ユーザーごとの次の問題のキュー（/api/next_question）
+
+analyze_user_profile の推奨難易度から、未正解・近似重複でない公開問題（と自分の問題）を
+推奨難易度 → 次の難易度 → その他の順、同じ難易度では全ユーザーの正答率が推奨難易度の目安に近い順に並べ、
+NEXT_QUESTION_QUEUE_SIZE（既定 10）問まで question_queue に入れておく。
+- pop: 先頭の1問を DELETE ... RETURNING で取り出す（(user_id, position) の主キーの索引で1行）
+- 取り出した後の残りが REFILL_AT 問以下ならバックグラウンドのスレッドで補充する（応答は待たない）
+- キューが空のとき（初回・補充が追いつかない場合）はその場で補充する
+
+補充は末尾に追加するだけのため、プロフィールが変わってもキューに残っている分（最大でキューの長さ）は
+そのまま出題される。直近に回答した問題（RECENT_EXCLUDE 件）とキューにある問題は補充の対象にしない。
+"""
+
+import logging
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import case, delete, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+
+import read_queries
+from extensions import db
+from models import Question, QuestionQueue, QuestionStats, difficulty_label_sql
+from question_catalog import catalog
+from recommendation_profile import STATS_MIN_ATTEMPTS, TARGET_ACCURACY, analyze_user_profile, get_next_difficulty
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 10
+REFILL_AT = 3
+RECENT_EXCLUDE = 20
+# 回答数が STATS_MIN_ATTEMPTS に満たない問題の、正答率の目安からの距離の扱い
+UNRATED_DISTANCE = 0.15
+
+NextQuestion = namedtuple('NextQuestion', 'question remaining')
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def queue_size():
+    return int(os.getenv('NEXT_QUESTION_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+
+
+def _visible(user_id):
+    return or_(Question.is_public.is_(True), Question.uploaded_by == user_id)
+
+
+def _solved(user_id):
+    """正解したことのある問題（保持期間を過ぎて圧縮された分を含む）"""
+    return read_queries.solved_select(user_id)
+
+
+def eligible(user_id):
+    """出題の対象にする問題の条件（公開か自分の問題・近似重複でない・未正解）"""
+    return (_visible(user_id), Question.duplicate_of.is_(None), Question.id.not_in(_solved(user_id)))
+
+
+def _queued(user_id):
+    return select(QuestionQueue.question_id).where(QuestionQueue.user_id == user_id)
+
+
+def candidates(user_id, profile, limit, exclude=()):
+    """プロフィールに合う順の出題候補の ID"""
+    preferred = profile['preferred_difficulty']
+    label = difficulty_label_sql(Question.difficulty_level)
+    tier = case((label == preferred, 0), (label == get_next_difficulty(preferred), 1), else_=2)
+    target = TARGET_ACCURACY.get(preferred, TARGET_ACCURACY['medium'])
+    distance = case(
+        (QuestionStats.attempts >= STATS_MIN_ATTEMPTS, func.abs(QuestionStats.accuracy - target)),
+        else_=UNRATED_DISTANCE,
+    )
+    stmt = select(Question.id).outerjoin(QuestionStats, QuestionStats.question_id == Question.id).where(
+        *eligible(user_id),
+        Question.id.not_in(_queued(user_id)),
+    )
+    if exclude:
+        stmt = stmt.where(Question.id.not_in(list(exclude)))
+    return list(db.session.execute(stmt.order_by(tier, distance, Question.id).limit(limit)).scalars())
+
+
+def remaining(user_id):
+    return db.session.execute(
+        select(func.count()).select_from(QuestionQueue).where(QuestionQueue.user_id == user_id)
+    ).scalar()
+
+
+def peek(user_id, n):
+    """キューの先頭から n 問の ID（取り出さない）"""
+    return list(db.session.execute(
+        select(QuestionQueue.question_id).where(QuestionQueue.user_id == user_id)
+        .order_by(QuestionQueue.position).limit(n)
+    ).scalars())
+
+
+def refill(user_id, size=None, exclude=()):
+    """キューが size 問になるまで末尾に補充してコミットし、追加した数を返す（exclude の問題は入れない）"""
+    size = size or queue_size()
+    have = remaining(user_id)
+    if have >= size:
+        return 0
+    profile = analyze_user_profile(user_id)
+    exclude = {question_id for question_id in exclude if question_id}
+    recent = {log.question_id for log in read_queries.recent_logs(user_id, RECENT_EXCLUDE) if log.question_id}
+    ids = candidates(user_id, profile, size - have, exclude=recent | exclude)
+    if not ids and recent - exclude:
+        # 直近に回答した問題しか残っていない場合はそれも候補にする
+        ids = candidates(user_id, profile, size - have, exclude=exclude)
+    if not ids:
+        return 0
+    start = (db.session.execute(
+        select(func.max(QuestionQueue.position)).where(QuestionQueue.user_id == user_id)
+    ).scalar() or 0) + 1
+    try:
+        db.session.execute(insert(QuestionQueue), [
+            {'user_id': user_id, 'position': start + i, 'question_id': question_id}
+            for i, question_id in enumerate(ids)
+        ])
+        db.session.commit()
+    except IntegrityError:
+        # 他のプロセスが同時に補充した
+        db.session.rollback()
+        return 0
+    return len(ids)
+
+
+def _refill_in_background(app, user_id, exclude):
+    try:
+        with app.app_context():
+            added = refill(user_id, exclude=exclude)
+        logger.info(f'[question_queue] ユーザー {user_id} のキューに {added} 問を補充しました')
+    except Exception as e:
+        logger.warning(f'[question_queue] ユーザー {user_id} のキューを補充できませんでした: {e}')
+    finally:
+        with _executor_lock:
+            _pending.discard(user_id)
+
+
+def schedule_refill(user_id, exclude=()):
+    """バックグラウンドのスレッドで補充する（同じユーザーの補充が実行待ち・実行中なら何もしない）"""
+    global _executor
+    app = current_app._get_current_object()
+    with _executor_lock:
+        if user_id in _pending:
+            return
+        _pending.add(user_id)
+        if _executor is None:
+            # gunicorn の fork 後に最初に使ったプロセスで作る
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='question-queue')
+    _executor.submit(_refill_in_background, app, user_id, tuple(exclude))
+
+
+def pop(user_id):
+    """先頭の1問を取り出す（空なら None）"""
+    head = select(QuestionQueue.position).where(QuestionQueue.user_id == user_id) \
+        .order_by(QuestionQueue.position).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+    return db.session.execute(
+        delete(QuestionQueue).where(QuestionQueue.user_id == user_id, QuestionQueue.position == head)
+        .returning(QuestionQueue.question_id)
+    ).scalar()
+
+
+def next_question(user_id, after=None):
+    """
+    次に出題する問題（QuestionRecord）と残りの数を返す（出題できる問題が無ければ question は None）。
+    after（表示中の問題）と、キューに入れた後に削除・非公開になった問題は飛ばす
+    """
+    question = None
+    refilled = False
+    for _ in range(queue_size() * 2):
+        question_id = pop(user_id)
+        if question_id is None:
+            if refilled:
+                break
+            db.session.commit()
+            refill(user_id, exclude=(after,))
+            refilled = True
+            continue
+        record = catalog.get(question_id)
+        if question_id != after and record and (record.is_public or record.uploaded_by == user_id):
+            question = record
+            break
+    left = remaining(user_id)
+    db.session.commit()
+    if left <= REFILL_AT and not refilled:
+        # 取り出した問題はまだ回答されていない（学習ログに無い）ため、補充の対象から外す
+        schedule_refill(user_id, exclude=(after, question.id if question else None))
+    return NextQuestion(question, left)
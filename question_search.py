@@ -0,0 +1,229 @@
+"""
+問題の全文検索
+
+対象は question_text・correct_answer・文字起こし（音声ファイル横の .txt）。
+- SQLite:     FTS5 仮想テーブル question_fts（rowid = question.id、bm25 でランキング）
+- PostgreSQL: question_search テーブルの tsvector 列 + GIN インデックス（ts_rank_cd でランキング）
+
+Question の追加・question_text / correct_answer / audio_url の変更時にマッパーイベントで1件ずつ
+（アップロード・再生成・サンプルデータなど経路を問わない）、flask reindex-questions で一括して索引を更新する。
+bulk_insert_mappings のようにマッパーイベントを通らない書き込みの後は reindex(question_ids=...) を呼ぶこと。
+"""
+
+import logging
+import os
+import re
+import time
+
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.exc import DBAPIError
+
+import audio_store
+from extensions import db
+from models import Question
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+REINDEX_BATCH_SIZE = 500
+# 列ごとの重み（question_text > correct_answer > transcript）
+_FTS_WEIGHTS = (10.0, 5.0, 1.0)
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_SCHEMA = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS question_fts USING fts5("
+        "question_text, correct_answer, transcript, tokenize='porter unicode61')",
+    ],
+    'postgresql': [
+        'CREATE TABLE IF NOT EXISTS question_search ('
+        'question_id INTEGER PRIMARY KEY REFERENCES question (id) ON DELETE CASCADE, '
+        'transcript TEXT, document TSVECTOR NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_question_search_document ON question_search USING GIN (document)',
+    ],
+}
+
+
+def is_search_object(name):
+    """ensure_schema が作るテーブル・索引（FTS5 の内部テーブル question_fts_* を含む。alembic の autogenerate の対象外）"""
+    return bool(name) and (name.startswith('question_fts') or name in ('question_search', 'ix_question_search_document'))
+
+
+def _dialect(connection):
+    return 'postgresql' if connection.dialect.name == 'postgresql' else 'sqlite'
+
+
+def ensure_schema(connection):
+    """検索用のテーブル・インデックスが無ければ作成する"""
+    for statement in _SCHEMA[_dialect(connection)]:
+        connection.execute(text(statement))
+
+
+def read_transcript(audio_url):
+    """音声ファイル横の文字起こし(.txt)を読む（再生用 .play.* からは元ファイル名の .txt を探す）"""
+    path = audio_store.resolve_path(audio_url)
+    if path != audio_url:
+        # コンテンツアドレス型ストアは <sha256>.txt
+        candidates = [audio_store.localize(audio_store.transcript_path(path))]
+    else:
+        stem = os.path.splitext(audio_url or '')[0]
+        candidates = [stem + '.txt']
+        if stem.endswith('.play'):
+            candidates.append(stem[:-len('.play')] + '.txt')
+    for path in candidates:
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+    return ''
+
+
+def _upsert(connection, question_id, question_text, correct_answer, transcript):
+    params = {
+        'id': question_id,
+        'question_text': question_text or '',
+        'correct_answer': correct_answer or '',
+        'transcript': transcript or '',
+    }
+    if _dialect(connection) == 'postgresql':
+        connection.execute(text(
+            "INSERT INTO question_search (question_id, transcript, document) VALUES (:id, :transcript, "
+            "setweight(to_tsvector('english', :question_text), 'A') || "
+            "setweight(to_tsvector('english', :correct_answer), 'B') || "
+            "setweight(to_tsvector('english', :transcript), 'C')) "
+            "ON CONFLICT (question_id) DO UPDATE SET transcript = EXCLUDED.transcript, document = EXCLUDED.document"
+        ), params)
+    else:
+        # FTS5 は UPSERT 非対応のため削除してから挿入する
+        connection.execute(text('DELETE FROM question_fts WHERE rowid = :id'), params)
+        connection.execute(text(
+            'INSERT INTO question_fts (rowid, question_text, correct_answer, transcript) '
+            'VALUES (:id, :question_text, :correct_answer, :transcript)'
+        ), params)
+
+
+# 変わったら索引を作り直す列
+_INDEXED_ATTRS = ('question_text', 'correct_answer', 'audio_url')
+
+
+def _index(connection, question):
+    """
+    1問分の索引を更新する（flush 中の接続で実行）。
+    索引の失敗で問題の保存自体を失敗させないよう、セーブポイント内で実行してエラーはログに残す。
+    """
+    try:
+        with connection.begin_nested():
+            _upsert(connection, question.id, question.question_text, question.correct_answer,
+                    read_transcript(question.audio_url))
+    except DBAPIError as e:
+        logger.warning(f'検索索引の更新に失敗しました (question_id={question.id}): {e}  '
+                       f'flask reindex-questions --missing-only を実行してください')
+
+
+@event.listens_for(Question, 'after_insert')
+def _question_inserted(mapper, connection, target):
+    _index(connection, target)
+
+
+@event.listens_for(Question, 'after_update')
+def _question_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in _INDEXED_ATTRS):
+        _index(connection, target)
+
+
+@event.listens_for(Question, 'after_delete')
+def _question_deleted(mapper, connection, target):
+    # PostgreSQL の question_search は外部キーの ON DELETE CASCADE で消える
+    if _dialect(connection) == 'sqlite':
+        try:
+            with connection.begin_nested():
+                connection.execute(text('DELETE FROM question_fts WHERE rowid = :id'), {'id': target.id})
+        except DBAPIError as e:
+            logger.warning(f'検索索引から削除できませんでした (question_id={target.id}): {e}')
+
+
+def _indexed_ids(connection):
+    if _dialect(connection) == 'postgresql':
+        rows = connection.execute(text('SELECT question_id FROM question_search'))
+    else:
+        rows = connection.execute(text('SELECT rowid FROM question_fts'))
+    return {row[0] for row in rows}
+
+
+def reindex(missing_only=False, batch_size=REINDEX_BATCH_SIZE, echo=None, question_ids=None):
+    """
+    全問題（missing_only の場合は未索引の問題のみ、question_ids を指定した場合はその問題のみ）の索引を作り直す。
+
+    Returns: 索引した件数
+    """
+    t0 = time.perf_counter()
+    connection = db.session.connection()
+    ensure_schema(connection)
+    skip = _indexed_ids(connection) if missing_only and question_ids is None else set()
+    if not missing_only and question_ids is None:
+        connection.execute(text(
+            'DELETE FROM question_search' if _dialect(connection) == 'postgresql' else 'DELETE FROM question_fts'
+        ))
+    db.session.commit()
+
+    stmt = select(Question.id, Question.audio_url, Question.question_text, Question.correct_answer).order_by(Question.id)
+    if question_ids is not None:
+        stmt = stmt.where(Question.id.in_(list(question_ids)))
+    rows = [row for row in db.session.execute(stmt) if row.id not in skip]
+    for start in range(0, len(rows), batch_size):
+        connection = db.session.connection()
+        for row in rows[start:start + batch_size]:
+            _upsert(connection, row.id, row.question_text, row.correct_answer, read_transcript(row.audio_url))
+        db.session.commit()
+        if echo:
+            echo(f'  {min(start + batch_size, len(rows))}/{len(rows)} 件')
+    logger.info(f'検索索引を更新しました: {len(rows)} 件 ({time.perf_counter() - t0:.2f}s)')
+    return len(rows)
+
+
+def _fts_match(query):
+    """入力語を FTS5 の構文として解釈させないよう引用し、最後の語は前方一致にする"""
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return None
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search(query, user_id, page=1, per_page=DEFAULT_PER_PAGE):
+    """
+    公開問題と user_id がアップロードした問題から検索する。
+
+    Returns: ([(question_id, score, snippet), ...], 次ページがあるか)
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    page = max(1, page)
+    params = {'user_id': user_id, 'limit': per_page + 1, 'offset': (page - 1) * per_page}
+    connection = db.session.connection()
+    if _dialect(connection) == 'postgresql':
+        params['query'] = query
+        sql = text(
+            "SELECT q.id, ts_rank_cd(s.document, tsq) AS score, "
+            "ts_headline('english', s.transcript, tsq, 'MaxWords=20, MinWords=5') AS snippet "
+            "FROM question_search s JOIN question q ON q.id = s.question_id, "
+            "websearch_to_tsquery('english', :query) tsq "
+            "WHERE s.document @@ tsq AND (q.is_public OR q.uploaded_by = :user_id) "
+            "ORDER BY score DESC, q.id DESC LIMIT :limit OFFSET :offset"
+        )
+    else:
+        match = _fts_match(query)
+        if match is None:
+            return [], False
+        params['match'] = match
+        weights = ', '.join(str(w) for w in _FTS_WEIGHTS)
+        sql = text(
+            f"SELECT q.id, -bm25(question_fts, {weights}) AS score, "
+            f"snippet(question_fts, 2, '[', ']', '…', 12) AS snippet "
+            f"FROM question_fts JOIN question q ON q.id = question_fts.rowid "
+            f"WHERE question_fts MATCH :match AND (q.is_public = 1 OR q.uploaded_by = :user_id) "
+            f"ORDER BY score DESC, q.id DESC LIMIT :limit OFFSET :offset"
+        )
+    rows = [tuple(row) for row in connection.execute(sql, params)]
+    return rows[:per_page], len(rows) > per_page
@@ -0,0 +1,409 @@
+"""
+問題ごとの統計（回答数・正答率・平均スコア・学習時間の中央値）
+
+QuestionStats は反映済みの学習ログの最大 ID（最高水位, QuestionStatsWatermark）より後の学習ログだけを
+ID 順に batch_size 件ずつ読んで加算する（学習ログは追記のみ）。
+- 定期実行: flask refresh-question-stats（cron 等）
+- 書き込み時: 学習ログを INSERT したトランザクションのコミット後、QUESTION_STATS_REFRESH_INTERVAL 秒
+  （既定 60、0 で無効）に1回まで1バッチ分をバックグラウンドのスレッドで更新する（応答は待たない）
+- 水位の行をロックして更新するため、同時には1つだけが進む（書き込み時の更新は他が実行中なら待たない）
+- PostgreSQL ではコミット前の INSERT の ID が後から見えることがあるため、ID の欠番の直後の学習ログが
+  GAP_GRACE 秒以内に INSERT されたもの（inserted_at。created_at は過去の日時を指定できるため使わない）なら
+  そこで止めて次回に読む（それより古い欠番・inserted_at の無い行はロールバック・削除とみなす）
+
+保持期間を過ぎて LearningRollup に圧縮された分は、初回と作り直しのときに LearningRollup から加算する。
+retention の圧縮は水位までの学習ログだけを対象にするため、圧縮される前に必ず統計に反映される。
+
+学習時間の中央値は 2^(1/4) 倍ごとの対数ヒストグラムから求める（誤差は ±9% 程度）。
+LearningRollup から加算した分は (ユーザー, 問題, 日) ごとの平均時間の段階に入れる。
+
+check は学習ログ（水位まで）と LearningRollup からの再計算と比べ、ずれの一覧を返す（flask check-question-stats）。
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app, g, has_app_context, has_request_context
+from sqlalchemy import bindparam, delete, event, insert, select, update
+from sqlalchemy.orm import Session
+
+from extensions import db, dialect_insert
+from models import LearningLog, LearningRollup, QuestionStats, QuestionStatsWatermark
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_ID = 1
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_REFRESH_INTERVAL = 60
+# 欠番をコミット前の INSERT とみなす秒数
+GAP_GRACE = 30
+BUCKETS_PER_DOUBLING = 4
+MAX_BUCKET = 64
+_PENDING_KEY = 'question_stats_pending'
+_G_SUMMARIES = '_question_stats'
+
+StatsSummary = namedtuple('StatsSummary', 'play_count avg_score accuracy median_time')
+EMPTY = StatsSummary(0, 0.0, 0.0, 0.0)
+RefreshResult = namedtuple('RefreshResult', 'logs questions watermark caught_up')
+RunResult = namedtuple('RunResult', 'batches logs watermark')
+Mismatch = namedtuple('Mismatch', 'question_id field expected actual')
+
+_refresh_lock = threading.Lock()
+_last_refresh = 0.0
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def refresh_interval():
+    return float(os.getenv('QUESTION_STATS_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL))
+
+
+# --- 学習時間のヒストグラム ---
+
+def time_bucket(minutes):
+    """学習時間（分）→ ヒストグラムの段階（0: 1 秒未満、k: 2^((k-1)/4) 秒以上 2^(k/4) 秒未満）"""
+    seconds = (minutes or 0) * 60
+    if seconds < 1:
+        return 0
+    return min(MAX_BUCKET, int(math.log2(seconds) * BUCKETS_PER_DOUBLING) + 1)
+
+
+def bucket_minutes(bucket):
+    """段階の代表値（分。段階の上端と下端の幾何平均）"""
+    if bucket <= 0:
+        return 0.0
+    return 2 ** ((bucket - 0.5) / BUCKETS_PER_DOUBLING) / 60
+
+
+def histogram_median(histogram):
+    """ヒストグラム {段階: 件数} の中央値（分）"""
+    total = sum(histogram.values())
+    if not total:
+        return 0.0
+    seen = 0
+    for bucket in sorted(histogram, key=int):
+        seen += histogram[bucket]
+        if seen * 2 >= total:
+            return round(bucket_minutes(int(bucket)), 3)
+    return 0.0
+
+
+class _Totals:
+    """1問分の加算値"""
+
+    __slots__ = ('attempts', 'correct', 'score_sum', 'total_time', 'histogram')
+
+    def __init__(self, attempts=0, correct=0, score_sum=0, total_time=0.0, histogram=None):
+        self.attempts = attempts
+        self.correct = correct
+        self.score_sum = score_sum
+        self.total_time = total_time
+        self.histogram = {str(k): v for k, v in (histogram or {}).items()}
+
+    def add(self, attempts, correct, score_sum, total_time, bucket):
+        self.attempts += attempts
+        self.correct += correct
+        self.score_sum += score_sum
+        self.total_time += total_time
+        key = str(bucket)
+        self.histogram[key] = self.histogram.get(key, 0) + attempts
+
+    def merge(self, other):
+        self.attempts += other.attempts
+        self.correct += other.correct
+        self.score_sum += other.score_sum
+        self.total_time += other.total_time
+        for key, count in other.histogram.items():
+            self.histogram[key] = self.histogram.get(key, 0) + count
+
+    def values(self):
+        """QuestionStats の列の値（平均・正答率・中央値を含む）"""
+        attempts = self.attempts
+        return {
+            'attempts': attempts,
+            'correct': self.correct,
+            'score_sum': self.score_sum,
+            'total_time': self.total_time,
+            'time_histogram': self.histogram,
+            'avg_score': round(self.score_sum / attempts, 1) if attempts else 0.0,
+            'accuracy': round(self.correct / attempts, 4) if attempts else 0.0,
+            'median_time': histogram_median(self.histogram),
+        }
+
+
+def _add_logs(totals, rows):
+    """(question_id, score, time_spent) の行を問題ごとに加算する（問題の無い学習ログは除く）"""
+    for question_id, score, minutes in rows:
+        if question_id is None:
+            continue
+        totals.setdefault(question_id, _Totals()).add(
+            1, 1 if score == 1 else 0, score or 0, minutes or 0.0, time_bucket(minutes))
+    return totals
+
+
+def _rollup_totals(connection):
+    """圧縮済みの分の問題ごとの加算値（学習時間は (ユーザー, 問題, 日) ごとの平均の段階に入れる）"""
+    totals = {}
+    rows = connection.execute(select(
+        LearningRollup.question_id, LearningRollup.attempts, LearningRollup.correct,
+        LearningRollup.score_sum, LearningRollup.total_time,
+    ).where(LearningRollup.question_id != 0))
+    for question_id, attempts, correct, score_sum, total_time in rows:
+        totals.setdefault(question_id, _Totals()).add(
+            attempts, correct, score_sum, total_time, time_bucket(total_time / attempts if attempts else 0))
+    return totals
+
+
+def _apply(connection, totals):
+    """問題ごとの加算値を QuestionStats に加える"""
+    if not totals:
+        return
+    table = QuestionStats.__table__
+    stored = connection.execute(
+        select(table.c.question_id, table.c.attempts, table.c.correct, table.c.score_sum,
+               table.c.total_time, table.c.time_histogram).where(table.c.question_id.in_(list(totals)))
+    ).all()
+    stored = {row[0]: _Totals(*row[1:]) for row in stored}
+    now = datetime.utcnow()
+    inserts, updates = [], []
+    for question_id, added in totals.items():
+        current = stored.get(question_id)
+        if current is None:
+            inserts.append(dict(added.values(), question_id=question_id, updated_at=now))
+        else:
+            current.merge(added)
+            updates.append(dict(current.values(), b_question_id=question_id, updated_at=now))
+    if inserts:
+        connection.execute(insert(table), inserts)
+    if updates:
+        connection.execute(update(table).where(table.c.question_id == bindparam('b_question_id')), updates)
+
+
+# --- 水位 ---
+
+def watermark(connection):
+    """反映済みの学習ログの最大 ID（未作成なら 0）"""
+    return connection.execute(
+        select(QuestionStatsWatermark.last_log_id).where(QuestionStatsWatermark.id == WATERMARK_ID)
+    ).scalar() or 0
+
+
+def _lock(connection, wait=True):
+    """水位の行をロックして値を返す。行が無い、または wait=False で他が更新中なら None"""
+    stmt = select(QuestionStatsWatermark.last_log_id).where(QuestionStatsWatermark.id == WATERMARK_ID)
+    if connection.dialect.name == 'sqlite':
+        # SQLite には FOR UPDATE が無いため、先に書き込んでデータベースの書き込みロックを取る
+        connection.execute(update(QuestionStatsWatermark).where(QuestionStatsWatermark.id == WATERMARK_ID)
+                           .values(last_log_id=QuestionStatsWatermark.last_log_id))
+    else:
+        stmt = stmt.with_for_update(skip_locked=not wait)
+    return connection.execute(stmt).scalar()
+
+
+def _insert_watermark(connection):
+    """水位の行を作る。他のトランザクションが先に作っていた場合は False"""
+    values = dict(id=WATERMARK_ID, last_log_id=0)
+    upsert = dialect_insert(connection)
+    if upsert is None:
+        connection.execute(insert(QuestionStatsWatermark).values(**values))
+        return True
+    return connection.execute(upsert(QuestionStatsWatermark).values(**values).on_conflict_do_nothing()).rowcount == 1
+
+
+def _reset(connection):
+    """QuestionStats を圧縮済みの分だけにし、水位を 0 に戻す（続く refresh で全学習ログを加算する）"""
+    connection.execute(delete(QuestionStats))
+    _apply(connection, _rollup_totals(connection))
+    connection.execute(update(QuestionStatsWatermark).where(QuestionStatsWatermark.id == WATERMARK_ID)
+                       .values(last_log_id=0))
+
+
+def _committed_prefix(rows, last_id, recent):
+    """欠番の直後の学習ログが recent より新しければその手前まで（欠番はコミット前の INSERT の可能性がある）"""
+    expected = last_id + 1
+    for i, row in enumerate(rows):
+        if row.id != expected and row.inserted_at is not None and row.inserted_at > recent:
+            return rows[:i]
+        expected = row.id + 1
+    return rows
+
+
+# --- 更新 ---
+
+def refresh(connection, batch_size=DEFAULT_BATCH_SIZE, wait=True, now=None):
+    """
+    水位より後の学習ログを最大 batch_size 件反映して水位を進める（コミットは呼び出し側）。
+    wait=False で他が更新中なら None
+    """
+    last_id = _lock(connection, wait)
+    if last_id is None:
+        if not _insert_watermark(connection):
+            return None
+        # 初回は圧縮済みの分から作る
+        _reset(connection)
+        last_id = 0
+
+    rows = connection.execute(
+        select(LearningLog.id, LearningLog.question_id, LearningLog.score, LearningLog.time_spent,
+               LearningLog.inserted_at)
+        .where(LearningLog.id > last_id).order_by(LearningLog.id).limit(batch_size)
+    ).all()
+    fetched = len(rows)
+    rows = _committed_prefix(rows, last_id, (now or datetime.utcnow()) - timedelta(seconds=GAP_GRACE))
+    totals = _add_logs({}, ((row.question_id, row.score, row.time_spent) for row in rows))
+    if rows:
+        _apply(connection, totals)
+        last_id = rows[-1].id
+        connection.execute(update(QuestionStatsWatermark).where(QuestionStatsWatermark.id == WATERMARK_ID)
+                           .values(last_log_id=last_id))
+    return RefreshResult(len(rows), len(totals), last_id, caught_up=len(rows) < batch_size or len(rows) < fetched)
+
+
+def run(batch_size=DEFAULT_BATCH_SIZE, max_batches=None, pause=0.0, now=None, echo=None):
+    """水位が追いつくまで（または max_batches まで）1バッチずつコミットしながら反映する"""
+    batches = logs = 0
+    last_id = None
+    while max_batches is None or batches < max_batches:
+        t0 = time.perf_counter()
+        result = refresh(db.session.connection(), batch_size, now=now)
+        db.session.commit()
+        if result is None:
+            break
+        batches += 1
+        logs += result.logs
+        last_id = result.watermark
+        if echo and result.logs:
+            echo(f'  バッチ {batches}: 学習ログ {result.logs} 件 → {result.questions} 問 '
+                 f'(~ID {result.watermark}, {time.perf_counter() - t0:.2f}s)')
+        if result.caught_up:
+            break
+        if pause:
+            time.sleep(pause)
+    return RunResult(batches, logs, last_id)
+
+
+def rebuild(connection):
+    """QuestionStats を作り直す（圧縮済みの分から作り、水位を 0 に戻す。続けて run で学習ログを反映する）"""
+    if _lock(connection) is None:
+        _insert_watermark(connection)
+    _reset(connection)
+
+
+def _refresh_in_background(app):
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        with app.app_context():
+            with db.engine.begin() as connection:
+                result = refresh(connection, wait=False)
+        if result is not None and result.logs:
+            logger.info(f'[question_stats] 学習ログ {result.logs} 件を反映しました (~{result.watermark})')
+    except Exception as e:
+        # 次回・定期実行で反映される
+        logger.warning(f'[question_stats] 問題の統計を更新できませんでした: {e}')
+    finally:
+        _refresh_lock.release()
+
+
+def refresh_after_write():
+    """学習ログのコミット後の更新をバックグラウンドのスレッドに渡す（間隔内なら何もしない）"""
+    global _executor, _last_refresh
+    interval = refresh_interval()
+    if interval <= 0 or not has_app_context():
+        return
+    app = current_app._get_current_object()
+    with _executor_lock:
+        if time.monotonic() - _last_refresh < interval:
+            return
+        _last_refresh = time.monotonic()
+        if _executor is None:
+            # gunicorn の fork 後に最初に使ったプロセスで作る
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='question-stats')
+    _executor.submit(_refresh_in_background, app)
+
+
+@event.listens_for(Session, 'after_flush')
+def _remember_logs(session, flush_context):
+    if any(isinstance(obj, LearningLog) for obj in session.new):
+        session.info[_PENDING_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_on_commit(session):
+    if session.info.pop(_PENDING_KEY, False):
+        refresh_after_write()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# --- 参照 ---
+
+def summaries(question_ids):
+    """{question_id: StatsSummary}（リクエスト中は g に保持し、同じ問題は1回だけ読む）"""
+    cache = g.setdefault(_G_SUMMARIES, {}) if has_request_context() else {}
+    missing = {question_id for question_id in question_ids if question_id is not None} - cache.keys()
+    if missing:
+        rows = db.session.execute(
+            select(QuestionStats.question_id, QuestionStats.attempts, QuestionStats.avg_score,
+                   QuestionStats.accuracy, QuestionStats.median_time)
+            .where(QuestionStats.question_id.in_(missing))
+        )
+        for question_id, *values in rows:
+            cache[question_id] = StatsSummary(*values)
+        for question_id in missing:
+            cache.setdefault(question_id, EMPTY)
+    return cache
+
+
+def summary(question_id):
+    return summaries([question_id]).get(question_id, EMPTY)
+
+
+# --- 整合性の確認 ---
+
+def check(connection, tolerance=1e-6):
+    """
+    QuestionStats を学習ログ（水位まで）と LearningRollup から再計算した値と比べ、Mismatch の一覧を返す。
+    圧縮済みの分がある問題は1件ごとの学習時間が残っていないため、ヒストグラムは件数の合計だけを比べる
+    """
+    # 比べる間に水位が進まないようロックする（呼び出し側でロールバックする）
+    last_id = _lock(connection) or 0
+    expected = _rollup_totals(connection)
+    compacted = set(expected)
+    logs = connection.execute(
+        select(LearningLog.question_id, LearningLog.score, LearningLog.time_spent)
+        .where(LearningLog.id <= last_id, LearningLog.question_id.isnot(None))
+        .execution_options(yield_per=10_000)
+    )
+    _add_logs(expected, logs)
+
+    table = QuestionStats.__table__
+    stored = {row[0]: _Totals(*row[1:]) for row in connection.execute(
+        select(table.c.question_id, table.c.attempts, table.c.correct, table.c.score_sum,
+               table.c.total_time, table.c.time_histogram))}
+
+    mismatches = []
+    for question_id in sorted(expected.keys() | stored.keys()):
+        want = expected.get(question_id) or _Totals()
+        have = stored.get(question_id) or _Totals()
+        for field in ('attempts', 'correct', 'score_sum'):
+            if getattr(want, field) != getattr(have, field):
+                mismatches.append(Mismatch(question_id, field, getattr(want, field), getattr(have, field)))
+        if not math.isclose(want.total_time, have.total_time, rel_tol=tolerance, abs_tol=tolerance):
+            mismatches.append(Mismatch(question_id, 'total_time', want.total_time, have.total_time))
+        if question_id in compacted:
+            counted = sum(have.histogram.values())
+            if counted != have.attempts:
+                mismatches.append(Mismatch(question_id, 'time_histogram', have.attempts, counted))
+        elif want.histogram != have.histogram:
+            mismatches.append(Mismatch(question_id, 'time_histogram', want.histogram, have.histogram))
+    return mismatches
@@ -0,0 +1,215 @@
+"""
+レート制限と同時実行数制御
+
+- トークンバケット方式（ユーザーIDまたはIPアドレスごと）
+- ストア: プロセス内（既定）/ SQLite 共有ファイル（マルチワーカー用）
+- エンドポイントごとの同時実行数上限（超過時はキューイングせず 429 + Retry-After）。
+  ストリーミングのレスポンスはボディを返し終える（WSGI の close()）まで実行中として数える
+- 満タンまで補充されたバケットは保持しない（PRUNE_INTERVAL 秒ごとに削除。無いバケットは満タンとして扱う）
+- 判定結果は metrics に出力
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify, make_response, request
+from flask_login import current_user
+
+import metrics
+
+metrics.describe('ratelimit_decisions_total', 'Rate limiter decisions by endpoint and result')
+
+# 満タンになったバケットを削除する間隔（秒）
+PRUNE_INTERVAL = 60
+
+
+def _refill(tokens, updated, now, rate, burst):
+    """経過時間分のトークンを補充する（rate はトークン/秒）"""
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+def _retry_after(tokens, cost, rate):
+    return math.ceil((cost - tokens) / rate) if rate > 0 else 60
+
+
+def _full_at(tokens, now, rate, burst):
+    """バケットが満タンに戻る時刻（それ以降は削除してよい）"""
+    return now + (burst - tokens) / rate if rate > 0 else math.inf
+
+
+class MemoryStore:
+    """プロセス内のトークンバケット"""
+
+    def __init__(self):
+        # key → (トークン数, 更新時刻, 満タンに戻る時刻)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_prune = time.monotonic() + PRUNE_INTERVAL
+
+    def consume(self, key, rate, burst, cost=1):
+        """Returns: (許可されたか, Retry-After 秒)"""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_prune:
+                self._prune(now)
+            tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now, _full_at(tokens, now, rate, burst))
+            return allowed, (0 if allowed else _retry_after(tokens, cost, rate))
+
+    def _prune(self, now):
+        for key in [key for key, bucket in self._buckets.items() if bucket[2] <= now]:
+            del self._buckets[key]
+        self._next_prune = now + PRUNE_INTERVAL
+
+
+class SQLiteStore:
+    """複数ワーカーで共有する SQLite ファイル上のトークンバケット"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._next_prune = time.time() + PRUNE_INTERVAL
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_bucket ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL DEFAULT 0)'
+        )
+        if 'full_at' not in {row[1] for row in conn.execute('PRAGMA table_info(rate_limit_bucket)')}:
+            # 以前のファイル（既存のバケットは次の削除の対象になる）
+            conn.execute('ALTER TABLE rate_limit_bucket ADD COLUMN full_at REAL NOT NULL DEFAULT 0')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_rate_limit_bucket_full_at ON rate_limit_bucket (full_at)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, rate, burst, cost=1):
+        # プロセス間で共有するため monotonic ではなく壁時計を使う
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM rate_limit_bucket WHERE key = ?', (key,)).fetchone()
+            tokens = _refill(row[0], row[1], now, rate, burst) if row else burst
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute('INSERT OR REPLACE INTO rate_limit_bucket (key, tokens, updated, full_at) '
+                         'VALUES (?, ?, ?, ?)', (key, tokens, now, _full_at(tokens, now, rate, burst)))
+            if now >= self._next_prune:
+                # 各ワーカーが PRUNE_INTERVAL ごとに削除する
+                self._next_prune = now + PRUNE_INTERVAL
+                conn.execute('DELETE FROM rate_limit_bucket WHERE full_at <= ?', (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, (0 if allowed else _retry_after(tokens, cost, rate))
+
+
+def _make_store(url):
+    """RATELIMIT_STORAGE_URL: 'memory://'（既定）または 'sqlite:///path/to/file.db'"""
+    if url and url.startswith('sqlite:///'):
+        return SQLiteStore(url[len('sqlite:///'):])
+    return MemoryStore()
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        self.store = MemoryStore()
+        self.enabled = True
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true')
+        app.config.setdefault('RATELIMIT_STORAGE_URL', os.getenv('RATELIMIT_STORAGE_URL', 'memory://'))
+        self.enabled = app.config['RATELIMIT_ENABLED']
+        self.store = _make_store(app.config['RATELIMIT_STORAGE_URL'])
+
+    def _semaphore(self, name, limit):
+        with self._lock:
+            sem = self._semaphores.get(name)
+            if sem is None:
+                sem = self._semaphores[name] = threading.BoundedSemaphore(limit)
+            return sem
+
+    def limit(self, name, per_minute, burst=None, concurrency=None):
+        """
+        エンドポイント用デコレーター（@login_required より内側に付ける）
+
+        per_minute: 1分あたりの補充トークン数 / burst: バケット容量 / concurrency: 同時実行数の上限
+        """
+        rate = per_minute / 60.0
+        burst = burst or per_minute
+
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+
+                allowed, retry_after = self.store.consume(f'{name}:{client_key()}', rate, burst)
+                if not allowed:
+                    metrics.inc('ratelimit_decisions_total', endpoint=name, decision='rate_limited')
+                    return _too_many_requests(retry_after)
+
+                if concurrency is None:
+                    metrics.inc('ratelimit_decisions_total', endpoint=name, decision='allowed')
+                    return view(*args, **kwargs)
+
+                sem = self._semaphore(name, concurrency)
+                if not sem.acquire(blocking=False):
+                    metrics.inc('ratelimit_decisions_total', endpoint=name, decision='concurrency_limited')
+                    return _too_many_requests(1)
+                try:
+                    metrics.inc('ratelimit_decisions_total', endpoint=name, decision='allowed')
+                    response = make_response(view(*args, **kwargs))
+                except BaseException:
+                    sem.release()
+                    raise
+                if response.is_streamed:
+                    # NDJSON 等はボディを返し終えるまで枠を使う（WSGI サーバーが close() を呼んだときに解放）
+                    response.call_on_close(sem.release)
+                else:
+                    sem.release()
+                return response
+            return wrapped
+        return decorator
+
+
+def client_key():
+    """
+    ログイン中はユーザーID、未ログインはクライアントIP をキーにする。
+    リバースプロキシの背後では ProxyFix（PROXY_FIX_X_FOR）が信頼できる段数分だけ X-Forwarded-For を
+    remote_addr に反映する（クライアントが付けた X-Forwarded-For はそのまま信頼しない）
+    """
+    if current_user and current_user.is_authenticated:
+        return f'user:{current_user.id}'
+    return f'ip:{request.remote_addr}'
+
+
+def _too_many_requests(retry_after):
+    response = jsonify({'error': 'Too many requests', 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, int(retry_after)))
+    return response
+
+
+limiter = RateLimiter()
@@ -0,0 +1,284 @@
+"""
+読み取り専用のクエリ層
+
+画面・API の表示に使う学習ログ・問題の読み取りは、必要な列だけを指定した Core の SELECT で行い、
+namedtuple の行（または集計値）で返す。ORM のエンティティを作らないため、アイデンティティマップへの登録・
+属性の計装・セッションへの保持が発生せず、長い学習履歴でも CPU・メモリが小さい。
+問題本体は question_catalog のキャッシュ（QuestionRecord）から引く。
+件数・スコアの集計は保持期間内の学習ログと圧縮済みの LearningRollup（retention）を合わせて返す。
+
+回答の記録・復習の開始など書き込みを伴う処理は従来どおり ORM で行う。
+"""
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func, literal, null, select, union, union_all
+
+from extensions import db
+from learning_stats import day_start
+from models import LearningLog, LearningRollup, Question, QuestionStats, User, difficulty_label_sql
+from question_catalog import catalog
+
+# 統計（スコア・学習時間・連続学習日数・推薦）の計算用
+LogStat = namedtuple('LogStat', 'question_id score created_at time_spent')
+# 履歴の表示用
+LogEntry = namedtuple('LogEntry', 'id question_id user_answer score created_at time_spent completion_status')
+# 件数・正答数・合計スコア（SQL で集計）
+LogSummary = namedtuple('LogSummary', 'total correct score_sum')
+# 問題ごとの回答数・合計スコア・0 点の回数（推薦用）
+QuestionTotal = namedtuple('QuestionTotal', 'question_id attempts score_sum failed')
+# 復習詳細ページの集計
+ReviewCounts = namedtuple('ReviewCounts', 'wrong_count last_score review_count')
+# 間違えた問題ごとの回数・最後に間違えた日時とそのスコア（圧縮済みの分は日の 0 時）
+WrongQuestion = namedtuple('WrongQuestion', 'question_id wrong_count last_wrong_at last_score')
+
+# 新しい順の取得はまずこの日数に絞る（PostgreSQL の月別パーティションが枝刈りされる）。足りなければ全期間
+RECENT_WINDOW_DAYS = 31
+
+# 学習履歴 API の出力列（ラベルがそのまま JSON のキーになる）
+LEARNING_HISTORY_COLUMNS = (
+    LearningLog.id,
+    LearningLog.question_id,
+    LearningLog.user_answer,
+    LearningLog.score,
+    LearningLog.created_at,
+    null().label('category'),
+    difficulty_label_sql(Question.difficulty_level).label('difficulty'),
+)
+
+# 進捗 API の出力列
+USER_PROGRESS_COLUMNS = (
+    LearningLog.id,
+    LearningLog.user_id,
+    LearningLog.question_id,
+    LearningLog.content_id,
+    LearningLog.user_answer,
+    LearningLog.score,
+)
+
+
+def _select(row_type):
+    """namedtuple のフィールド名と同名の LearningLog の列を取得する SELECT"""
+    return select(*[getattr(LearningLog, field) for field in row_type._fields])
+
+
+def _fetch(row_type, stmt):
+    return list(map(row_type._make, db.session.execute(stmt).tuples()))
+
+
+# --- 学習ログ ---
+
+def log_summary(user_id):
+    """件数・正答数（score == 1）・合計スコアを集計する（圧縮済みの分を含む）"""
+    total, correct, score_sum = db.session.execute(
+        select(
+            func.count(LearningLog.id),
+            func.sum(case((LearningLog.score == 1, 1), else_=0)),
+            func.sum(func.coalesce(LearningLog.score, 0)),
+        ).where(LearningLog.user_id == user_id)
+    ).one()
+    rolled = db.session.execute(
+        select(
+            func.sum(LearningRollup.attempts),
+            func.sum(LearningRollup.correct),
+            func.sum(LearningRollup.score_sum),
+        ).where(LearningRollup.user_id == user_id)
+    ).one()
+    return LogSummary(total + (rolled[0] or 0), (correct or 0) + (rolled[1] or 0),
+                      (score_sum or 0) + (rolled[2] or 0))
+
+
+def question_totals(user_id):
+    """問題ごとの回答数・合計スコア・0 点の回数（圧縮済みの分を含む。問題の無い学習ログは question_id None）"""
+    score = func.coalesce(LearningLog.score, 0)
+    raw = select(
+        LearningLog.question_id.label('question_id'),
+        literal(1).label('attempts'),
+        score.label('score_sum'),
+        case((score == 0, 1), else_=0).label('failed'),
+    ).where(LearningLog.user_id == user_id)
+    rolled = select(
+        func.nullif(LearningRollup.question_id, 0),
+        LearningRollup.attempts,
+        LearningRollup.score_sum,
+        LearningRollup.failed,
+    ).where(LearningRollup.user_id == user_id)
+    rows = union_all(raw, rolled).subquery()
+    return _fetch(QuestionTotal, select(
+        rows.c.question_id, func.sum(rows.c.attempts), func.sum(rows.c.score_sum), func.sum(rows.c.failed),
+    ).group_by(rows.c.question_id).order_by(rows.c.question_id))
+
+
+def compacted_question_totals(user_id):
+    """圧縮済みの分だけの問題ごとの集計（古い順）"""
+    return _fetch(QuestionTotal, select(
+        func.nullif(LearningRollup.question_id, 0),
+        func.sum(LearningRollup.attempts),
+        func.sum(LearningRollup.score_sum),
+        func.sum(LearningRollup.failed),
+    ).where(LearningRollup.user_id == user_id).group_by(LearningRollup.question_id)
+        .order_by(func.min(LearningRollup.day), LearningRollup.question_id))
+
+
+def log_stats(user_id, since=None):
+    """ユーザーの保持期間内の学習ログ（記録順）。since を指定するとその日時以降のみ"""
+    stmt = _select(LogStat).where(LearningLog.user_id == user_id)
+    if since is not None:
+        stmt = stmt.where(LearningLog.created_at >= since)
+    return _fetch(LogStat, stmt.order_by(LearningLog.id))
+
+
+def recent_logs(user_id, limit, answered_only=False):
+    """新しい順（作成日時）の学習ログ。answered_only では回答済み（完了・回答あり）のみ"""
+    stmt = _select(LogEntry).where(LearningLog.user_id == user_id)
+    if answered_only:
+        stmt = stmt.where(LearningLog.completion_status.is_(True), LearningLog.user_answer.isnot(None))
+    stmt = stmt.order_by(LearningLog.created_at.desc(), LearningLog.id.desc()).limit(limit)
+    rows = _fetch(LogEntry, stmt.where(
+        LearningLog.created_at >= datetime.utcnow() - timedelta(days=RECENT_WINDOW_DAYS)))
+    if len(rows) < limit:
+        rows = _fetch(LogEntry, stmt)
+    return rows
+
+
+def solved_select(user_id):
+    """正解（score >= 1）したことのある問題の ID の SELECT（圧縮済みの分を含む。NOT IN に使えるよう NULL を除く）"""
+    return union(
+        select(LearningLog.question_id).where(
+            LearningLog.user_id == user_id, LearningLog.score >= 1, LearningLog.question_id.isnot(None)),
+        select(LearningRollup.question_id).where(LearningRollup.user_id == user_id, LearningRollup.correct > 0),
+    )
+
+
+def wrong_logs(user_id):
+    """完了済みで 100 点未満（間違い）の保持期間内の学習ログ（新しい順）"""
+    return _fetch(LogEntry, _select(LogEntry).where(
+        LearningLog.user_id == user_id,
+        LearningLog.completion_status.is_(True),
+        LearningLog.score < 100,
+    ).order_by(LearningLog.id.desc()))
+
+
+def _wrong_rollups(user_id, question_id=None):
+    """圧縮済みの間違いのある (問題, 日) の行（新しい日から）"""
+    stmt = select(
+        LearningRollup.question_id, LearningRollup.day, LearningRollup.wrong, LearningRollup.last_wrong_score,
+    ).where(LearningRollup.user_id == user_id, LearningRollup.question_id != 0, LearningRollup.wrong > 0)
+    if question_id is not None:
+        stmt = stmt.where(LearningRollup.question_id == question_id)
+    return db.session.execute(stmt.order_by(LearningRollup.day.desc())).all()
+
+
+def wrong_questions(user_id):
+    """間違えた問題ごとの回数・最後に間違えた日時とスコア（最後に間違えた順。圧縮済みの分を含む）"""
+    questions = {}
+    for log in wrong_logs(user_id):
+        if not log.question_id:
+            continue
+        entry = questions.get(log.question_id)
+        if entry is None:
+            questions[log.question_id] = [1, log.created_at, log.score]
+        else:
+            entry[0] += 1
+    for row in _wrong_rollups(user_id):
+        entry = questions.get(row.question_id)
+        if entry is None:
+            # 保持期間内に間違いが無い問題は、圧縮済みの最後の日の間違い
+            questions[row.question_id] = [row.wrong, day_start(row.day), row.last_wrong_score]
+        else:
+            entry[0] += row.wrong
+    result = [WrongQuestion(question_id, *entry) for question_id, entry in questions.items()]
+    result.sort(key=lambda q: q.last_wrong_at or datetime.min, reverse=True)
+    return result
+
+
+def review_counts(user_id, question_id):
+    """問題ごとの間違えた回数・直近の間違いのスコア・復習回数（圧縮済みの分を含む）"""
+    conditions = (LearningLog.user_id == user_id, LearningLog.question_id == question_id)
+    wrong = LearningLog.score < 100
+    wrong_count, review_count = db.session.execute(
+        select(
+            func.sum(case((wrong, 1), else_=0)),
+            func.sum(case((LearningLog.is_review.is_(True), 1), else_=0)),
+        ).where(*conditions)
+    ).one()
+    rolled_wrong, rolled_reviews = db.session.execute(
+        select(func.sum(LearningRollup.wrong), func.sum(LearningRollup.reviews)).where(
+            LearningRollup.user_id == user_id, LearningRollup.question_id == question_id)
+    ).one()
+    last_score = db.session.execute(
+        select(LearningLog.score).where(*conditions, wrong).order_by(LearningLog.id.desc()).limit(1)
+    ).scalar()
+    if last_score is None:
+        rolled = _wrong_rollups(user_id, question_id)
+        last_score = rolled[0].last_wrong_score if rolled else None
+    return ReviewCounts((wrong_count or 0) + (rolled_wrong or 0), last_score if last_score is not None else 0,
+                        (review_count or 0) + (rolled_reviews or 0))
+
+
+def learning_history_select(user_id):
+    """学習履歴 API の SELECT（ページネーション・ストリーミングは呼び出し側で付ける）"""
+    return select(*LEARNING_HISTORY_COLUMNS).join(
+        Question, LearningLog.question_id == Question.id
+    ).where(LearningLog.user_id == user_id)
+
+
+def user_progress_select(user_id):
+    return select(*USER_PROGRESS_COLUMNS).where(LearningLog.user_id == user_id)
+
+
+# --- 問題 ---
+
+def questions_in_order(question_ids):
+    """ID の順に QuestionRecord を返す（キャッシュに無い分は1回の SELECT）"""
+    question_ids = list(question_ids)
+    records = catalog.get_many(question_ids)
+    return [records[question_id] for question_id in question_ids if question_id in records]
+
+
+def recent_public_question_ids(limit):
+    return list(db.session.execute(
+        select(Question.id).where(Question.is_public.is_(True)).order_by(Question.id.desc()).limit(limit)
+    ).scalars())
+
+
+def public_question_ids(difficulty, limit, category=None):
+    """
+    難易度名（'easy' 等）で絞り込んだ公開問題の ID（ID 順。近似重複の問題は除く）。
+    カテゴリは未実装（Question.category は常に None）のため、指定した場合は該当なし
+    """
+    if category is not None:
+        return []
+    return list(db.session.execute(
+        select(Question.id).where(
+            Question.is_public.is_(True),
+            Question.duplicate_of.is_(None),
+            difficulty_label_sql(Question.difficulty_level) == difficulty,
+        ).order_by(Question.id).limit(limit)
+    ).scalars())
+
+
+def public_questions_select():
+    """
+    公開問題一覧 API の SELECT（アップローダー名と QuestionStats の再生回数・平均スコアを結合。
+    'uploader.username' は出力時に入れ子になる）
+    """
+    return select(
+        Question.id,
+        Question.question_text,
+        difficulty_label_sql(Question.difficulty_level).label('difficulty'),
+        null().label('category'),
+        Question.created_at,
+        func.coalesce(QuestionStats.attempts, 0).label('play_count'),
+        func.coalesce(QuestionStats.avg_score, 0).label('avg_score'),
+        User.username.label('uploader.username'),
+    ).outerjoin(User, User.id == Question.uploaded_by).outerjoin(
+        QuestionStats, QuestionStats.question_id == Question.id
+    ).where(Question.is_public.is_(True)).order_by(Question.id)
+
+
+def random_public_question_id():
+    return db.session.execute(
+        select(Question.id).where(Question.is_public.is_(True), Question.duplicate_of.is_(None)).order_by(func.random()).limit(1)
+    ).scalar()
@@ -0,0 +1,117 @@
+"""
+ユーザーの学習プロフィール（推奨難易度・得意／不得意分野）と難易度ごとの正答率の目安
+
+推奨コンテンツ（blueprints.recommendations）と次の問題のキュー（question_queue）が使う。
+"""
+
+import logging
+
+import read_queries
+from question_catalog import catalog
+
+logger = logging.getLogger(__name__)
+
+# 推奨難易度ごとの全ユーザーの正答率の目安（QuestionStats の回答数が STATS_MIN_ATTEMPTS 以上の問題に適用）
+TARGET_ACCURACY = {'easy': 0.8, 'medium': 0.65, 'hard': 0.5}
+STATS_MIN_ATTEMPTS = 5
+
+# ユーザープロファイルの分析
+def analyze_user_profile(user_id):
+    """ユーザーの学習プロファイルを分析"""
+    try:
+        # 問題ごとの回答数・合計スコア（保持期間を過ぎて圧縮された分を含む）
+        totals = read_queries.question_totals(user_id)
+        total_questions = sum(total.attempts for total in totals)
+        
+        if not total_questions:
+            return {
+                'level': 'beginner',
+                'strengths': [],
+                'weaknesses': [],
+                'preferred_categories': [],
+                'preferred_difficulty': 'easy'
+            }
+        
+        # 分野別の正答率を計算
+        category_stats = {}
+        difficulty_stats = {}
+        
+        questions = catalog.get_many(total.question_id for total in totals if total.question_id)
+        for total in totals:
+            question = questions.get(total.question_id)
+            if question:
+                # カテゴリ統計
+                if question.category:
+                    if question.category not in category_stats:
+                        category_stats[question.category] = {'total': 0, 'correct': 0}
+                    category_stats[question.category]['total'] += total.attempts
+                    category_stats[question.category]['correct'] += total.score_sum
+                
+                # 難易度統計
+                if question.difficulty:
+                    if question.difficulty not in difficulty_stats:
+                        difficulty_stats[question.difficulty] = {'total': 0, 'correct': 0}
+                    difficulty_stats[question.difficulty]['total'] += total.attempts
+                    difficulty_stats[question.difficulty]['correct'] += total.score_sum
+        
+        # 得意・不得意分野を特定
+        strengths = []
+        weaknesses = []
+        for category, stats in category_stats.items():
+            accuracy = stats['correct'] / stats['total']
+            if accuracy >= 0.7 and stats['total'] >= 3:
+                strengths.append(category)
+            elif accuracy < 0.5 and stats['total'] >= 3:
+                weaknesses.append(category)
+        
+        # 推奨難易度を決定
+        if total_questions < 5:
+            preferred_difficulty = 'easy'
+        elif total_questions < 15:
+            preferred_difficulty = 'medium'
+        else:
+            # 最近の正答率に基づいて難易度を調整
+            recent_logs = read_queries.recent_logs(user_id, 10)  # 最近10問
+            if recent_logs:
+                recent_accuracy = sum(log.score or 0 for log in recent_logs) / len(recent_logs)
+            else:
+                # 全て圧縮済みの場合は全体の平均
+                recent_accuracy = sum(total.score_sum for total in totals) / total_questions
+            
+            if recent_accuracy >= 0.8:
+                preferred_difficulty = 'hard'
+            elif recent_accuracy >= 0.6:
+                preferred_difficulty = 'medium'
+            else:
+                preferred_difficulty = 'easy'
+        
+        return {
+            'level': 'beginner' if total_questions < 10 else 'intermediate' if total_questions < 30 else 'advanced',
+            'strengths': strengths,
+            'weaknesses': weaknesses,
+            'preferred_categories': list(category_stats.keys()),
+            'preferred_difficulty': preferred_difficulty,
+            'total_questions': total_questions
+        }
+        
+    except Exception as e:
+        logger.error(f'Failed to analyze user profile: {str(e)}')
+        return {
+            'level': 'beginner',
+            'strengths': [],
+            'weaknesses': [],
+            'preferred_categories': [],
+            'preferred_difficulty': 'easy'
+        }
+
+# 次の難易度を取得
+def get_next_difficulty(current_difficulty):
+    """現在の難易度の次のレベルを取得"""
+    difficulty_order = ['easy', 'medium', 'hard']
+    try:
+        current_index = difficulty_order.index(current_difficulty)
+        if current_index < len(difficulty_order) - 1:
+            return difficulty_order[current_index + 1]
+        return current_difficulty
+    except ValueError:
+        return 'medium'
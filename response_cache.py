@@ -0,0 +1,247 @@
+"""
+ユーザー単位の JSON レスポンスキャッシュ
+
+キーは (エンドポイント, user_id, ユーザーのデータバージョン, [vary の値,] クエリ文字列)。
+LearningLog が INSERT されたトランザクションのコミット時にそのユーザーのバージョンを進めるため
+（submit_answer・log_learning・start_review・save_review_result など書き込み経路を問わない）、
+古いエントリは参照されなくなり LRU / TTL で自然に消える。
+ユーザー以外のデータ（問題カタログ等）にも依存するエンドポイントは cached(vary=...) でそのバージョンをキーに加える。
+
+バックエンド:
+- memory://（既定）: プロセス内 LRU。ワーカーごとに独立
+- sqlite:///path:    複数ワーカーで共有する SQLite ファイル（バージョンも共有）
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+import metrics
+
+metrics.describe('response_cache_requests_total', 'Per-user response cache lookups by endpoint and result')
+metrics.describe('response_cache_hit_ratio', 'Per-user response cache hit ratio by endpoint')
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL = 300
+_PENDING_KEY = 'response_cache_users'
+# キャッシュしたレスポンスで引き継ぐヘッダー
+_KEPT_HEADERS = ('Content-Type', 'X-Next-Before-Id')
+
+
+class MemoryBackend:
+    """プロセス内 LRU"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def version(self, user_id):
+        return self._versions.get(user_id, 0)
+
+    def bump(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+
+class SQLiteBackend:
+    """複数ワーカーで共有する SQLite ファイル"""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute('CREATE TABLE IF NOT EXISTS response_cache ('
+                     'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS response_cache_version ('
+                     'user_id INTEGER PRIMARY KEY, version INTEGER NOT NULL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute('SELECT value, expires FROM response_cache WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] < now:
+            return None
+        conn.execute('UPDATE response_cache SET accessed = ? WHERE key = ?', (now, key))
+        return row[0]
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO response_cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                     (key, value, now + ttl, now))
+        # 上限を超えた分は最終アクセスの古い順に削除
+        conn.execute('DELETE FROM response_cache WHERE key IN ('
+                     'SELECT key FROM response_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                     (self.max_entries,))
+
+    def version(self, user_id):
+        row = self._connect().execute(
+            'SELECT version FROM response_cache_version WHERE user_id = ?', (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, user_ids):
+        conn = self._connect()
+        for user_id in user_ids:
+            conn.execute('INSERT INTO response_cache_version (user_id, version) VALUES (?, 1) '
+                         'ON CONFLICT(user_id) DO UPDATE SET version = version + 1', (user_id,))
+
+
+def _make_backend(url, max_entries):
+    if url and url.startswith('sqlite:///'):
+        return SQLiteBackend(url[len('sqlite:///'):], max_entries)
+    return MemoryBackend(max_entries)
+
+
+class ResponseCache:
+    def __init__(self):
+        self.backend = MemoryBackend()
+        self.enabled = True
+        self.ttl = DEFAULT_TTL
+        self._listening = False
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_ENABLED', os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true')
+        app.config.setdefault('RESPONSE_CACHE_URL', os.getenv('RESPONSE_CACHE_URL', 'memory://'))
+        app.config.setdefault('RESPONSE_CACHE_TTL', int(os.getenv('RESPONSE_CACHE_TTL', DEFAULT_TTL)))
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES',
+                              int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)))
+        self.enabled = app.config['RESPONSE_CACHE_ENABLED']
+        self.ttl = app.config['RESPONSE_CACHE_TTL']
+        self.backend = _make_backend(app.config['RESPONSE_CACHE_URL'], app.config['RESPONSE_CACHE_MAX_ENTRIES'])
+        self._listen()
+        metrics.gauge('response_cache_hit_ratio', _hit_ratios)
+
+    def _listen(self):
+        """LearningLog の INSERT を記録し、コミット時にユーザーのバージョンを進める"""
+        if self._listening:
+            return
+        from models import LearningLog
+
+        @event.listens_for(LearningLog, 'after_insert')
+        def _remember_user(mapper, connection, target):
+            session = object_session(target)
+            if session is not None and target.user_id is not None:
+                session.info.setdefault(_PENDING_KEY, set()).add(target.user_id)
+
+        @event.listens_for(Session, 'after_commit')
+        def _bump_versions(session):
+            user_ids = session.info.pop(_PENDING_KEY, None)
+            if user_ids:
+                self.invalidate_users(user_ids)
+
+        @event.listens_for(Session, 'after_rollback')
+        def _discard(session):
+            session.info.pop(_PENDING_KEY, None)
+
+        self._listening = True
+
+    def invalidate_users(self, user_ids):
+        self.backend.bump(user_ids)
+
+    def cached(self, name, vary=None):
+        """
+        ログイン中ユーザーの JSON レスポンスをキャッシュするデコレーター（@login_required より内側に付ける）
+
+        vary: ユーザーのデータ以外にレスポンスが依存するバージョンを返す関数（値をキーに加える）
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if not self.enabled or not current_user.is_authenticated:
+                    return view(*args, **kwargs)
+
+                user_id = current_user.id
+                key = f'{name}:{user_id}:{self.backend.version(user_id)}:'
+                if vary is not None:
+                    key += f'{vary()}:'
+                key += request.query_string.decode()
+                hit = self.backend.get(key)
+                if hit is not None:
+                    metrics.inc('response_cache_requests_total', endpoint=name, result='hit')
+                    return _restore(hit)
+
+                metrics.inc('response_cache_requests_total', endpoint=name, result='miss')
+                response = _as_response(view(*args, **kwargs))
+                # 正常終了した通常の JSON レスポンスのみ保存（NDJSON ストリーミングやエラーは対象外）
+                if response.status_code == 200 and not response.is_streamed and response.is_json:
+                    self.backend.set(key, _dump(response), self.ttl)
+                return response
+            return wrapped
+        return decorator
+
+
+def _as_response(rv):
+    from flask import current_app
+    return current_app.make_response(rv)
+
+
+def _dump(response):
+    headers = {h: response.headers[h] for h in _KEPT_HEADERS if h in response.headers}
+    meta = json.dumps({'status': response.status_code, 'headers': headers}).encode()
+    return meta + b'\n' + response.get_data()
+
+
+def _restore(blob):
+    from flask import current_app
+    meta, body = blob.split(b'\n', 1)
+    meta = json.loads(meta)
+    response = current_app.response_class(body, status=meta['status'])
+    for header, value in meta['headers'].items():
+        response.headers[header] = value
+    response.headers['X-Cache'] = 'HIT'
+    return response
+
+
+def _hit_ratios():
+    totals = {}
+    for labels, value in metrics.collect('response_cache_requests_total').items():
+        labels = dict(labels)
+        hits, total = totals.get(labels['endpoint'], (0.0, 0.0))
+        if labels['result'] == 'hit':
+            hits += value
+        totals[labels['endpoint']] = (hits, total + value)
+    return {(('endpoint', endpoint),): hits / total for endpoint, (hits, total) in totals.items() if total}
+
+
+response_cache = ResponseCache()
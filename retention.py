@@ -0,0 +1,143 @@
+"""
+学習ログの保持期間と日別集計への圧縮
+
+保持期間（LEARNING_LOG_RETENTION_DAYS 日）より前の日の学習ログを (ユーザー, 問題, 日) ごとの
+LearningRollup に加算し、元の行を削除する。ID 順に batch_size 件ずつ、1 バッチを 1 トランザクションで
+処理する（集計への加算と削除が同時にコミットされるため、途中で止めても二重計上せず次回は続きから再開できる）。
+PostgreSQL では対象の行を FOR UPDATE SKIP LOCKED で取得し、同時に実行しても同じ行を処理しない。
+
+件数・正答数・合計スコア（read_queries）、推薦、連続学習日数（learning_stats）、間違えた問題・復習の回数、
+正解済みの問題は LearningRollup と保持期間内の学習ログを合わせて読む。1件ごとの回答が必要な学習履歴は
+保持期間内のみになる。
+問題ごとの統計（question_stats）に反映済みの学習ログだけを圧縮する（先に反映を追いつかせる）。
+"""
+
+import logging
+import os
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import and_, case, delete, func, insert, select, update
+
+import question_stats
+from extensions import db, dialect_insert
+from learning_stats import day_number, day_start, to_day
+from models import LearningLog, LearningRollup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 180
+DEFAULT_BATCH_SIZE = 5000
+_COUNTERS = ('attempts', 'correct', 'failed', 'score_sum', 'total_time', 'wrong', 'reviews')
+
+CompactResult = namedtuple('CompactResult', 'batches logs rollups')
+
+
+def retention_days():
+    return int(os.getenv('LEARNING_LOG_RETENTION_DAYS', DEFAULT_RETENTION_DAYS))
+
+
+def cutoff_for(days, now=None):
+    """この日時より前の学習ログが圧縮の対象（日の途中で区切らないよう 0 時）"""
+    return day_start(to_day(now or datetime.utcnow()) - days)
+
+
+def _aggregate(connection, log_ids):
+    question = func.coalesce(LearningLog.question_id, 0)
+    day = day_number(LearningLog.created_at)
+    score = func.coalesce(LearningLog.score, 0)
+    # read_queries.wrong_logs と同じ「間違い」
+    wrong = and_(LearningLog.completion_status.is_(True), LearningLog.score < 100)
+    rows = [dict(row) for row in connection.execute(
+        select(
+            LearningLog.user_id,
+            question.label('question_id'),
+            day.label('day'),
+            func.count().label('attempts'),
+            func.sum(case((LearningLog.score == 1, 1), else_=0)).label('correct'),
+            func.sum(case((score == 0, 1), else_=0)).label('failed'),
+            func.sum(score).label('score_sum'),
+            func.sum(LearningLog.time_spent).label('total_time'),
+            func.sum(case((wrong, 1), else_=0)).label('wrong'),
+            func.sum(case((LearningLog.is_review.is_(True), 1), else_=0)).label('reviews'),
+        ).where(LearningLog.id.in_(log_ids)).group_by(LearningLog.user_id, question, day)
+    ).mappings()]
+    # (ユーザー, 問題, 日) ごとの最後（ID が最大）の間違いのスコア
+    last_wrong = {}
+    for user_id, question_id, log_day, log_score in connection.execute(
+        select(LearningLog.user_id, question, day, LearningLog.score)
+        .where(LearningLog.id.in_(log_ids), wrong).order_by(LearningLog.id)
+    ):
+        last_wrong[user_id, question_id, log_day] = log_score
+    for row in rows:
+        row['last_wrong_score'] = last_wrong.get((row['user_id'], row['question_id'], row['day']))
+    return rows
+
+
+def _add_rollups(connection, rows):
+    """集計行を LearningRollup に加算する（無ければ作る）"""
+    table = LearningRollup.__table__
+    upsert = dialect_insert(connection)
+    if upsert is not None:
+        stmt = upsert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'question_id', 'day'],
+            set_={
+                **{name: table.c[name] + stmt.excluded[name] for name in _COUNTERS},
+                # バッチは ID 順のため、後のバッチの間違いが新しい
+                'last_wrong_score': func.coalesce(stmt.excluded.last_wrong_score, table.c.last_wrong_score),
+            },
+        )
+        connection.execute(stmt, rows)
+        return
+    for row in rows:
+        key = and_(table.c.user_id == row['user_id'], table.c.question_id == row['question_id'],
+                   table.c.day == row['day'])
+        values = {name: table.c[name] + row[name] for name in _COUNTERS}
+        values['last_wrong_score'] = func.coalesce(row['last_wrong_score'], table.c.last_wrong_score)
+        result = connection.execute(update(table).where(key).values(values))
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(**row))
+
+
+def pending_count(cutoff):
+    return db.session.execute(select(func.count(LearningLog.id)).where(LearningLog.created_at < cutoff)).scalar()
+
+
+def compact(days=None, batch_size=DEFAULT_BATCH_SIZE, max_batches=None, pause=0.0, now=None, echo=None):
+    """
+    保持期間を過ぎた学習ログを圧縮する。
+    max_batches で1回の実行のバッチ数を、pause でバッチ間の待ち時間（秒）を制限できる。
+    """
+    days = retention_days() if days is None else days
+    cutoff = cutoff_for(days, now)
+    # 問題ごとの統計は学習ログから加算するため、反映前の学習ログは圧縮しない
+    question_stats.run(batch_size)
+    batches = logs = rollups = 0
+    while max_batches is None or batches < max_batches:
+        t0 = time.perf_counter()
+        counted = question_stats.watermark(db.session)
+        log_ids = db.session.execute(
+            select(LearningLog.id).where(LearningLog.created_at < cutoff, LearningLog.id <= counted)
+            .order_by(LearningLog.id).limit(batch_size).with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not log_ids:
+            db.session.rollback()
+            break
+        connection = db.session.connection()
+        rows = _aggregate(connection, log_ids)
+        _add_rollups(connection, rows)
+        connection.execute(delete(LearningLog).where(LearningLog.id.in_(log_ids)))
+        db.session.commit()
+
+        batches += 1
+        logs += len(log_ids)
+        rollups += len(rows)
+        logger.info(f'[retention] {len(log_ids)} 件を {len(rows)} 行に集約しました (~{log_ids[-1]})')
+        if echo:
+            echo(f'  バッチ {batches}: 学習ログ {len(log_ids)} 件 → 集計 {len(rows)} 行 '
+                 f'(ID {log_ids[0]}〜{log_ids[-1]}, {time.perf_counter() - t0:.2f}s)')
+        if pause:
+            time.sleep(pause)
+    return CompactResult(batches, logs, rollups)
@@ -0,0 +1,82 @@
+"""
+JSON シリアライズ
+
+- FastJSONProvider: app.json に設定する JSON プロバイダー（jsonify・NDJSON が使う）。
+  orjson があれば使い、無ければ標準の json。datetime / date は ISO 8601 で出力する
+  （Flask 既定の HTTP 日付形式ではなく、各 API が .isoformat() で返していた形式）。
+- row_mapper / rows: Core の SELECT 結果（ラベル付きの列）をそのまま出力用の行にする。
+  ORM オブジェクトの生成や、エンドポイントごとの dict 組み立て・.isoformat() 呼び出しを経由しない。
+  ラベルに '.' を含む列（'uploader.username' 等）は入れ子のオブジェクトにまとめる（全て NULL なら null）。
+"""
+
+import json
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider, _default
+
+try:
+    import orjson
+except ImportError:  # 任意依存
+    orjson = None
+
+
+def _default_iso(o):
+    if isinstance(o, date):
+        return o.isoformat()
+    return _default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default_iso)
+    # orjson と同じ出力にする（日本語を \uXXXX にしない・キーを並べ替えない）
+    ensure_ascii = False
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            kwargs.setdefault('default', self.default)
+            kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def dumps_bytes(self, obj):
+        if orjson is None:
+            return self.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        # orjson は datetime・date・UUID・dataclass を自前で変換し、それ以外は default に渡す
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is None or self._app.debug:
+            return super().response(obj)
+        # 文字列を経由せずバイト列のままレスポンスにする
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def row_mapper(keys):
+    """列名（ラベル）の並びから、行（タプル）を出力用の dict に変換する関数を作る"""
+    keys = tuple(keys)
+    if not any('.' in key for key in keys):
+        return lambda row: dict(zip(keys, row))
+
+    flat = [(key, i) for i, key in enumerate(keys) if '.' not in key]
+    groups = {}
+    for i, key in enumerate(keys):
+        if '.' in key:
+            name, field = key.split('.', 1)
+            groups.setdefault(name, []).append((field, i))
+    groups = list(groups.items())
+
+    def mapper(row):
+        item = {key: row[i] for key, i in flat}
+        for name, fields in groups:
+            values = {field: row[i] for field, i in fields}
+            item[name] = values if any(v is not None for v in values.values()) else None
+        return item
+    return mapper
+
+
+def rows(result):
+    """Core の実行結果を出力用の行の list にする"""
+    return list(map(row_mapper(result.keys()), result))
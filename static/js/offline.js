@@ -0,0 +1,132 @@
+// オフライン回答キュー（IndexedDB）
+// ページと Service Worker（importScripts）の両方から使う。
+// 送信に失敗した POST を answered_at 付きで保存し、オンライン復帰時・Background Sync で順に再送する。
+
+const OfflineQueue = (function() {
+    const DB_NAME = 'listening-offline';
+    const STORE = 'requests';
+    const SYNC_TAG = 'answer-queue';
+    let flushing = null;
+
+    function open() {
+        return new Promise((resolve, reject) => {
+            const request = indexedDB.open(DB_NAME, 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(STORE, { keyPath: 'id', autoIncrement: true });
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    async function withStore(mode, fn) {
+        const db = await open();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(STORE, mode);
+            const result = fn(tx.objectStore(STORE));
+            tx.oncomplete = () => resolve(result && 'result' in result ? result.result : undefined);
+            tx.onerror = () => reject(tx.error);
+        });
+    }
+
+    function add(url, body) {
+        return withStore('readwrite', store => store.add({ url: url, body: body }));
+    }
+
+    function all() {
+        return withStore('readonly', store => store.getAll());
+    }
+
+    function remove(id) {
+        return withStore('readwrite', store => store.delete(id));
+    }
+
+    async function count() {
+        return (await all()).length;
+    }
+
+    // 保存順に再送する。サーバーエラー・通信エラー・ログイン切れ（リダイレクト）の場合は残して次回に回す
+    async function flushOnce() {
+        const entries = await all();
+        let sent = 0;
+        for (const entry of entries) {
+            let response;
+            try {
+                response = await fetch(entry.url, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(entry.body),
+                    credentials: 'same-origin'
+                });
+            } catch (error) {
+                break;
+            }
+            if (response.redirected || response.status >= 500 || response.status === 429) {
+                break;
+            }
+            // 4xx は再送しても成功しないため破棄する
+            await remove(entry.id);
+            sent++;
+        }
+        return sent;
+    }
+
+    function flush() {
+        if (!flushing) {
+            flushing = flushOnce().finally(() => { flushing = null; });
+        }
+        return flushing;
+    }
+
+    // JSON を POST する。通信できなければキューに入れて { queued: true } を返す
+    async function postJSON(url, body) {
+        try {
+            const response = await fetch(url, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(body)
+            });
+            return { queued: false, response: response };
+        } catch (error) {
+            await add(url, Object.assign({ answered_at: Date.now() }, body));
+            if (typeof navigator !== 'undefined' && navigator.serviceWorker) {
+                navigator.serviceWorker.ready
+                    .then(registration => registration.sync && registration.sync.register(SYNC_TAG))
+                    .catch(() => {});
+            }
+            return { queued: true, response: null };
+        }
+    }
+
+    return { SYNC_TAG, add, all, count, flush, postJSON };
+})();
+
+// ページではオンライン復帰時・読み込み時に再送する（Background Sync 非対応のブラウザ用）
+if (typeof window !== 'undefined') {
+    window.OfflineQueue = OfflineQueue;
+    window.addEventListener('online', () => OfflineQueue.flush().then(sent => {
+        if (sent && window.AppUtils) {
+            window.AppUtils.showMessage(`オフライン中の回答 ${sent} 件を送信しました`, 'success');
+        }
+    }));
+    window.addEventListener('load', () => {
+        if (navigator.onLine) {
+            OfflineQueue.flush().catch(() => {});
+        }
+    });
+
+    // Service Worker（音声・静的ファイルのキャッシュ、学習セッションの先読み、オフライン回答の同期）
+    if ('serviceWorker' in navigator) {
+        window.addEventListener('load', () => {
+            navigator.serviceWorker.register('/sw.js').catch(error => {
+                console.warn('Service Worker の登録に失敗しました:', error);
+            });
+            if (document.body.dataset.authenticated !== 'true') {
+                // 未ログインのページではユーザーごとの学習ページのキャッシュを破棄する
+                navigator.serviceWorker.ready.then(registration => {
+                    registration.active && registration.active.postMessage({ type: 'logout' });
+                });
+            }
+        });
+    }
+}
@@ -0,0 +1,39 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // 数値カウントアップアニメーション（学習進捗サマリーの4つの数値）
+    const counters = document.querySelectorAll('.dashboard-stat');
+    counters.forEach(counter => {
+        const target = parseInt(counter.getAttribute('data-value') || counter.textContent, 10);
+        if (!isNaN(target)) {
+            const increment = Math.max(1, target / 50);
+            let current = 0;
+            const updateCounter = () => {
+                if (current < target) {
+                    current = Math.min(current + increment, target);
+                    counter.textContent = Math.round(current);
+                    setTimeout(updateCounter, 20);
+                } else {
+                    counter.textContent = target;
+                }
+            };
+            updateCounter();
+        }
+    });
+
+    // 現在時刻に基づく挨拶の更新
+    const now = new Date();
+    const hour = now.getHours();
+    let greeting = '';
+
+    if (hour < 12) {
+        greeting = 'おはようございます';
+    } else if (hour < 18) {
+        greeting = 'こんにちは';
+    } else {
+        greeting = 'こんばんは';
+    }
+
+    const greetingElement = document.querySelector('.card h2');
+    if (greetingElement) {
+        greetingElement.innerHTML = `<i class="fas fa-sun me-2"></i>${greeting}、${greetingElement.textContent.split('、')[1]}`;
+    }
+});
@@ -0,0 +1,334 @@
+// グローバル変数
+// サーバー側の値は <script data-page> から受け取る（テンプレートに依存しない静的ファイルにするため）
+const PAGE = JSON.parse(document.currentScript.dataset.page);
+let startTime = Date.now();
+let playCount = 0;
+let isAnswered = false;
+let audioPlayer;
+// 空欄を含む文の再生範囲（/api/questions/<id>/segments）と繰り返し中の番号（-1 は停止）
+let segments = [];
+let loopIndex = -1;
+// 先読みした次の問題（/api/session/prefetch。次の問題のキューの先頭から）。オフライン時は localStorage に残した分を使う
+const SESSION_KEY = 'learningSession';
+let nextQuestions = [];
+
+// ページ読み込み時の初期化
+document.addEventListener('DOMContentLoaded', function() {
+    audioPlayer = document.getElementById('audioPlayer');
+    setupEventListeners();
+    startTimer();
+    loadSegments();
+    prefetchSession();
+});
+
+// イベントリスナーの設定
+function setupEventListeners() {
+    // 音声再生イベント
+    audioPlayer.addEventListener('play', function() {
+        playCount++;
+        updatePlayCount();
+    });
+
+    // 回答フォーム送信
+    document.getElementById('answerForm').addEventListener('submit', function(e) {
+        e.preventDefault();
+        submitAnswer();
+    });
+
+    // 繰り返し中は文の終わりで文の先頭に戻る
+    audioPlayer.addEventListener('timeupdate', function() {
+        if (loopIndex < 0) return;
+        const segment = segments[loopIndex];
+        if (audioPlayer.currentTime >= segment.end || audioPlayer.currentTime < segment.start - 0.5) {
+            audioPlayer.currentTime = segment.start;
+        }
+    });
+
+    // 音声終了時の処理
+    audioPlayer.addEventListener('ended', function() {
+        // 必要に応じて自動再生や次の処理
+    });
+}
+
+// 音声再生
+function playAudio() {
+    audioPlayer.play();
+}
+
+// 音声一時停止
+function pauseAudio() {
+    audioPlayer.pause();
+}
+
+// 音声を最初から再生
+function restartAudio() {
+    audioPlayer.currentTime = 0;
+    audioPlayer.play();
+}
+
+// ゆっくり再生
+function slowAudio() {
+    if (audioPlayer.playbackRate === 1.0) {
+        audioPlayer.playbackRate = 0.75;
+        showMessage('再生速度を0.75倍に設定しました', 'info');
+    } else {
+        audioPlayer.playbackRate = 1.0;
+        showMessage('再生速度を通常に戻しました', 'info');
+    }
+}
+
+// 空欄を含む文の再生範囲を取得（単語タイミングの無い問題ではボタンを表示しない）
+async function loadSegments() {
+    try {
+        const response = await fetch(`/api/questions/${PAGE.questionId}/segments`);
+        if (!response.ok) return;
+        const data = await response.json();
+        segments = data.segments || [];
+        if (segments.length > 0) {
+            document.getElementById('segmentButton').style.display = '';
+        }
+    } catch (error) {
+        console.error('Error:', error);
+    }
+}
+
+// 空欄の文を繰り返し再生（押すごとに次の空欄の文 → 全体再生に戻る）
+function loopSegment() {
+    loopIndex = loopIndex + 1 < segments.length ? loopIndex + 1 : -1;
+    const label = document.getElementById('segmentLabel');
+    if (loopIndex < 0) {
+        label.textContent = '空欄の文を繰り返す';
+        showMessage('全体の再生に戻しました', 'info');
+        return;
+    }
+    label.textContent = segments.length > 1
+        ? `繰り返し中 (${loopIndex + 1}/${segments.length})`
+        : '繰り返し中';
+    audioPlayer.currentTime = segments[loopIndex].start;
+    audioPlayer.play();
+}
+
+// ヒント表示
+function showHint() {
+    const hintSection = document.getElementById('hintSection');
+    hintSection.style.display = 'block';
+
+    // ヒントボタンを無効化
+    event.target.disabled = true;
+    event.target.innerHTML = '<i class="fas fa-lightbulb me-2"></i>ヒント表示済み';
+}
+
+// 文字起こし表示切り替え
+function toggleTranscript() {
+    const transcriptSection = document.getElementById('transcriptSection');
+    const button = event.target;
+
+    if (transcriptSection.style.display === 'none') {
+        transcriptSection.style.display = 'block';
+        button.innerHTML = '<i class="fas fa-eye-slash me-2"></i>文字起こし非表示';
+        button.classList.remove('btn-outline-primary');
+        button.classList.add('btn-primary');
+    } else {
+        transcriptSection.style.display = 'none';
+        button.innerHTML = '<i class="fas fa-eye me-2"></i>文字起こし';
+        button.classList.remove('btn-primary');
+        button.classList.add('btn-outline-primary');
+    }
+}
+
+// 回答送信
+async function submitAnswer() {
+    if (isAnswered) return;
+
+    const userAnswer = document.getElementById('userAnswer').value.trim();
+    if (!userAnswer) {
+        showMessage('回答を入力してください', 'warning');
+        return;
+    }
+
+    const submitBtn = document.getElementById('submitBtn');
+    submitBtn.disabled = true;
+    submitBtn.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>採点中...';
+
+    try {
+        const { queued, response } = await OfflineQueue.postJSON('/api/submit_answer', {
+            question_id: PAGE.questionId,
+            user_answer: userAnswer
+        });
+
+        if (queued) {
+            showQueuedResult(userAnswer);
+        } else if (response.ok) {
+            const result = await response.json();
+            showResult(result);
+        } else {
+            throw new Error('回答の送信に失敗しました');
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        showMessage('回答の送信に失敗しました', 'error');
+        submitBtn.disabled = false;
+        submitBtn.innerHTML = '<i class="fas fa-check me-2"></i>回答を送信';
+    }
+}
+
+// オフラインで回答を保存した場合の表示（採点はオンライン復帰後にサーバーで行う）
+function showQueuedResult(userAnswer) {
+    isAnswered = true;
+    document.getElementById('resultHeader').className = 'card-header bg-secondary text-white';
+    document.getElementById('resultTitle').innerHTML = '<i class="fas fa-wifi me-2"></i>オフライン';
+    const content = document.getElementById('resultContent');
+    content.innerHTML = '<p class="mb-1"><strong>あなたの回答:</strong> </p>' +
+        '<p class="text-muted small mb-0">オフラインのため回答を保存しました。オンラインに戻ると送信・採点されます。</p>';
+    content.querySelector('p').append(userAnswer);
+    document.getElementById('resultCard').style.display = 'block';
+    document.getElementById('userAnswer').disabled = true;
+    document.getElementById('submitBtn').disabled = true;
+}
+
+// 結果表示
+function showResult(result) {
+    isAnswered = true;
+
+    const resultCard = document.getElementById('resultCard');
+    const resultHeader = document.getElementById('resultHeader');
+    const resultTitle = document.getElementById('resultTitle');
+    const resultContent = document.getElementById('resultContent');
+
+    // 結果に応じてスタイルを変更
+    if (result.is_correct) {
+        resultHeader.className = 'card-header bg-success text-white';
+        resultTitle.innerHTML = '<i class="fas fa-check-circle me-2"></i>正解！';
+    } else {
+        resultHeader.className = 'card-header bg-danger text-white';
+        resultTitle.innerHTML = '<i class="fas fa-times-circle me-2"></i>不正解';
+    }
+
+    // 結果内容を表示
+    resultContent.innerHTML = `
+        <div class="result-summary mb-3">
+            <h4 class="mb-2">${result.is_correct ? '素晴らしい！' : '頑張りましょう！'}</h4>
+            <p class="mb-1"><strong>あなたの回答:</strong> ${result.user_answer}</p>
+            <p class="mb-1"><strong>正解:</strong> ${result.correct_answer}</p>
+            <p class="mb-0"><strong>スコア:</strong> ${result.score}点</p>
+        </div>
+
+        ${result.explanation ? `
+        <div class="explanation mb-3">
+            <h6>解説:</h6>
+            <p class="mb-0">${result.explanation}</p>
+        </div>
+        ` : ''}
+    `;
+
+    resultCard.style.display = 'block';
+
+    // 回答フォームを無効化
+    document.getElementById('userAnswer').disabled = true;
+    document.getElementById('submitBtn').disabled = true;
+
+    // 学習時間を記録
+    const timeSpent = Math.floor((Date.now() - startTime) / 1000);
+    updateTimeSpent(timeSpent);
+
+    // 結果をサーバーに送信（学習ログ）
+    logLearningResult(result);
+}
+
+// 学習結果の記録
+async function logLearningResult(result) {
+    try {
+        await fetch('/api/log_learning', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                question_id: PAGE.questionId,
+                user_answer: result.user_answer,
+                score: result.score,
+                time_spent: Math.floor((Date.now() - startTime) / 1000)
+            })
+        });
+    } catch (error) {
+        console.error('学習ログの記録に失敗:', error);
+    }
+}
+
+// 次の問題を先読みし、Service Worker に音声と学習ページをキャッシュさせる
+async function prefetchSession() {
+    try {
+        const response = await fetch(`/api/session/prefetch?after=${PAGE.questionId}`);
+        if (!response.ok) throw new Error(response.status);
+        nextQuestions = (await response.json()).questions;
+        localStorage.setItem(SESSION_KEY, JSON.stringify(nextQuestions.map(q => q.id)));
+    } catch (error) {
+        // オフライン: 前回先読みした問題のうち、この問題より後のものを使う
+        const ids = JSON.parse(localStorage.getItem(SESSION_KEY) || '[]');
+        const rest = ids.slice(ids.indexOf(PAGE.questionId) + 1);
+        nextQuestions = rest.map(id => ({ id: id, learn_url: `/learn/${id}` }));
+        return;
+    }
+    if (navigator.serviceWorker && navigator.serviceWorker.controller) {
+        navigator.serviceWorker.controller.postMessage({
+            type: 'prefetch',
+            audio: nextQuestions.map(q => q.audio_url),
+            pages: nextQuestions.map(q => q.learn_url)
+        });
+    }
+}
+
+// 次の問題（キューの先頭を取り出す。先読みと同じ順のため、通常はキャッシュ済みのページに移動する）
+async function nextQuestion() {
+    try {
+        const response = await fetch(`/api/next_question?after=${PAGE.questionId}`);
+        if (response.ok) {
+            window.location.href = (await response.json()).question.learn_url;
+            return;
+        }
+    } catch (error) {
+        // オフライン: 先読みした問題を使う
+    }
+    if (nextQuestions.length > 0) {
+        window.location.href = nextQuestions[0].learn_url;
+        return;
+    }
+    // 先読みした問題が無ければ推奨コンテンツページに移動
+    window.location.href = '/recommendations';
+}
+
+// 問題を再挑戦
+function retryQuestion() {
+    // ページをリロード
+    location.reload();
+}
+
+// タイマー開始
+function startTimer() {
+    setInterval(updateTimeSpent, 1000);
+}
+
+// 学習時間更新
+function updateTimeSpent(seconds) {
+    const timeSpentElement = document.getElementById('timeSpent');
+    if (timeSpentElement) {
+        timeSpentElement.textContent = seconds;
+    }
+}
+
+// 再生回数更新
+function updatePlayCount() {
+    const playCountElement = document.getElementById('playCount');
+    if (playCountElement) {
+        playCountElement.textContent = playCount;
+    }
+}
+
+// メッセージ表示
+function showMessage(message, type = 'info') {
+    if (window.AppUtils) {
+        window.AppUtils.showMessage(message, type);
+    } else {
+        alert(message);
+    }
+}
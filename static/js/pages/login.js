@@ -0,0 +1,34 @@
+// パスワード表示切り替え機能
+function togglePasswordVisibility(fieldId) {
+    const field = document.getElementById(fieldId);
+    const button = field.parentElement.querySelector('.password-toggle-btn i');
+
+    if (field.type === 'password') {
+        field.type = 'text';
+        button.className = 'fas fa-eye-slash';
+    } else {
+        field.type = 'password';
+        button.className = 'fas fa-eye';
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    // フォームのバリデーション
+    const form = document.querySelector('form');
+    const usernameInput = document.getElementById('username');
+    const passwordInput = document.getElementById('password');
+
+    form.addEventListener('submit', function(e) {
+        if (!usernameInput.value.trim()) {
+            e.preventDefault();
+            usernameInput.focus();
+            return false;
+        }
+
+        if (!passwordInput.value.trim()) {
+            e.preventDefault();
+            passwordInput.focus();
+            return false;
+        }
+    });
+});
@@ -0,0 +1,56 @@
+// パスワード表示切り替え機能
+function togglePasswordVisibility(fieldId) {
+    const field = document.getElementById(fieldId);
+    const button = field.parentElement.querySelector('.password-toggle-btn i');
+
+    if (field.type === 'password') {
+        field.type = 'text';
+        button.className = 'fas fa-eye-slash';
+    } else {
+        field.type = 'password';
+        button.className = 'fas fa-eye';
+    }
+}
+
+function saveProfile() {
+    const form = document.getElementById('editProfileForm');
+    const formData = new FormData(form);
+
+    // パスワード一致チェック
+    const newPassword = formData.get('new_password');
+    const confirmPassword = formData.get('confirm_password');
+
+    if (newPassword && newPassword !== confirmPassword) {
+        alert('パスワードが一致しません。');
+        return;
+    }
+
+    // ここでAPIを呼び出してプロフィールを更新
+    // 実際の実装では、fetch()を使用してサーバーにデータを送信
+
+    alert('プロフィールが更新されました。');
+    location.reload();
+}
+
+// 学習統計のアニメーション（オプション）
+document.addEventListener('DOMContentLoaded', function() {
+    // 数値カウントアップアニメーション
+    const counters = document.querySelectorAll('.card h4');
+    counters.forEach(counter => {
+        const target = parseInt(counter.textContent);
+        const increment = target / 50;
+        let current = 0;
+
+        const updateCounter = () => {
+            if (current < target) {
+                current += increment;
+                counter.textContent = Math.ceil(current);
+                setTimeout(updateCounter, 20);
+            } else {
+                counter.textContent = target;
+            }
+        };
+
+        updateCounter();
+    });
+});
@@ -0,0 +1,350 @@
+// グローバル変数
+let currentPage = 1;
+let questionsPerPage = 12;
+let allQuestions = [];
+let filteredQuestions = [];
+let searchResultIds = null;  // サーバー側検索の結果（関連度順の問題ID）。未検索時は null
+
+// ページ読み込み時の初期化
+document.addEventListener('DOMContentLoaded', function() {
+    loadQuestions();
+    setupEventListeners();
+});
+
+// イベントリスナーの設定
+function setupEventListeners() {
+    // 検索入力
+    document.getElementById('searchInput').addEventListener('input', debounce(searchQuestions, 300));
+
+    // フィルター変更
+    document.getElementById('difficultyFilter').addEventListener('change', filterQuestions);
+    document.getElementById('categoryFilter').addEventListener('change', filterQuestions);
+    document.getElementById('sortOrder').addEventListener('change', filterQuestions);
+}
+
+// 問題の読み込み
+async function loadQuestions() {
+    showLoading(true);
+
+    try {
+        const response = await fetch('/api/questions/public');
+        if (response.ok) {
+            allQuestions = await response.json();
+            filterQuestions();
+        } else {
+            throw new Error('問題の読み込みに失敗しました');
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        showError('問題の読み込みに失敗しました。ページを再読み込みしてください。');
+    } finally {
+        showLoading(false);
+    }
+}
+
+// 全文検索（問題文・正解・文字起こし）
+async function searchQuestions() {
+    const searchTerm = document.getElementById('searchInput').value.trim();
+    if (!searchTerm) {
+        searchResultIds = null;
+        filterQuestions();
+        return;
+    }
+    try {
+        const response = await fetch('/api/questions/search?per_page=100&q=' + encodeURIComponent(searchTerm));
+        if (!response.ok) {
+            throw new Error('検索に失敗しました');
+        }
+        const data = await response.json();
+        searchResultIds = data.results.map(result => result.id);
+    } catch (error) {
+        console.error('Error:', error);
+        searchResultIds = null;
+    }
+    filterQuestions();
+}
+
+// 問題のフィルタリング
+function filterQuestions() {
+    const searchTerm = document.getElementById('searchInput').value.toLowerCase();
+    const difficulty = document.getElementById('difficultyFilter').value;
+    const category = document.getElementById('categoryFilter').value;
+    const sortOrder = document.getElementById('sortOrder').value;
+
+    // フィルタリング
+    filteredQuestions = allQuestions.filter(question => {
+        // サーバー側検索が使えない場合は問題文の部分一致で絞り込む
+        const matchesSearch = searchResultIds
+            ? searchResultIds.includes(question.id)
+            : question.question_text.toLowerCase().includes(searchTerm);
+        const matchesDifficulty = !difficulty || question.difficulty === difficulty;
+        const matchesCategory = !category || question.category === category;
+
+        return matchesSearch && matchesDifficulty && matchesCategory;
+    });
+
+    // ソート（検索中は関連度順）
+    if (searchResultIds) {
+        filteredQuestions.sort((a, b) => searchResultIds.indexOf(a.id) - searchResultIds.indexOf(b.id));
+    } else {
+        sortQuestions(sortOrder);
+    }
+
+    // 表示
+    currentPage = 1;
+    displayQuestions();
+    updatePagination();
+}
+
+// 問題のソート
+function sortQuestions(sortOrder) {
+    switch (sortOrder) {
+        case 'newest':
+            filteredQuestions.sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+            break;
+        case 'oldest':
+            filteredQuestions.sort((a, b) => new Date(a.created_at) - new Date(b.created_at));
+            break;
+        case 'popular':
+            filteredQuestions.sort((a, b) => (b.play_count || 0) - (a.play_count || 0));
+            break;
+    }
+}
+
+// 問題の表示
+function displayQuestions() {
+    const container = document.getElementById('questionsContainer');
+    const startIndex = (currentPage - 1) * questionsPerPage;
+    const endIndex = startIndex + questionsPerPage;
+    const pageQuestions = filteredQuestions.slice(startIndex, endIndex);
+
+    if (pageQuestions.length === 0) {
+        showNoQuestions();
+        return;
+    }
+
+    container.innerHTML = pageQuestions.map(question => createQuestionCard(question)).join('');
+}
+
+// 問題カードの作成
+function createQuestionCard(question) {
+    const difficultyBadge = getDifficultyBadge(question.difficulty);
+    const categoryBadge = getCategoryBadge(question.category);
+
+    return `
+        <div class="col-md-6 col-lg-4 mb-4">
+            <div class="card h-100 shadow-sm question-card" data-question-id="${question.id}">
+                <div class="card-body">
+                    <div class="d-flex justify-content-between align-items-start mb-2">
+                        ${difficultyBadge}
+                        ${categoryBadge}
+                    </div>
+
+                    <h6 class="card-title">${question.question_text.substring(0, 60)}${question.question_text.length > 60 ? '...' : ''}</h6>
+
+                    <div class="mb-3">
+                        <small class="text-muted">
+                            <i class="fas fa-user me-1"></i>${question.uploader && question.uploader.username ? question.uploader.username : 'Unknown'}
+                        </small>
+                        <br>
+                        <small class="text-muted">
+                            <i class="fas fa-calendar me-1"></i>${formatDate(question.created_at)}
+                        </small>
+                    </div>
+
+                    <div class="d-flex justify-content-between align-items-center mb-3">
+                        <span class="badge bg-info">
+                            <i class="fas fa-play me-1"></i>${question.play_count || 0}回
+                        </span>
+                        <span class="badge bg-success">
+                            <i class="fas fa-star me-1"></i>${question.avg_score || 0}点
+                        </span>
+                    </div>
+
+                    <div class="d-grid">
+                        <a href="/learn/${question.id}" class="btn btn-primary">
+                            <i class="fas fa-play me-2"></i>学習開始
+                        </a>
+                    </div>
+                </div>
+            </div>
+        </div>
+    `;
+}
+
+// 難易度バッジの取得
+function getDifficultyBadge(difficulty) {
+    const badges = {
+        'easy': '<span class="badge bg-success">初級</span>',
+        'medium': '<span class="badge bg-warning">中級</span>',
+        'hard': '<span class="badge bg-danger">上級</span>'
+    };
+    return badges[difficulty] || '<span class="badge bg-secondary">未設定</span>';
+}
+
+// カテゴリバッジの取得
+function getCategoryBadge(category) {
+    const badges = {
+        'conversation': '<span class="badge bg-primary">会話</span>',
+        'news': '<span class="badge bg-info">ニュース</span>',
+        'story': '<span class="badge bg-warning">物語</span>',
+        'academic': '<span class="badge bg-dark">学術</span>'
+    };
+    return badges[category] || '<span class="badge bg-secondary">未設定</span>';
+}
+
+// ページネーションの更新
+function updatePagination() {
+    const totalPages = Math.ceil(filteredQuestions.length / questionsPerPage);
+    const pagination = document.getElementById('pagination');
+
+    if (!pagination) return;
+
+    if (totalPages <= 1) {
+        pagination.style.display = 'none';
+        return;
+    }
+
+    pagination.style.display = 'flex';
+
+    let paginationHTML = '';
+
+    // 前のページ
+    if (currentPage > 1) {
+        paginationHTML += `
+            <li class="page-item">
+                <a class="page-link" href="#" onclick="changePage(${currentPage - 1})">
+                    <i class="fas fa-chevron-left"></i>
+                </a>
+            </li>
+        `;
+    }
+
+    // ページ番号
+    for (let i = 1; i <= totalPages; i++) {
+        if (i === currentPage) {
+            paginationHTML += `
+                <li class="page-item active">
+                    <span class="page-link">${i}</span>
+                </li>
+            `;
+        } else if (i === 1 || i === totalPages || (i >= currentPage - 2 && i <= currentPage + 2)) {
+            paginationHTML += `
+                <li class="page-item">
+                    <a class="page-link" href="#" onclick="changePage(${i})">${i}</a>
+                </li>
+            `;
+        } else if (i === currentPage - 3 || i === currentPage + 3) {
+            paginationHTML += `
+                <li class="page-item disabled">
+                    <span class="page-link">...</span>
+                </li>
+            `;
+        }
+    }
+
+    // 次のページ
+    if (currentPage < totalPages) {
+        paginationHTML += `
+            <li class="page-item">
+                <a class="page-link" href="#" onclick="changePage(${currentPage + 1})">
+                    <i class="fas fa-chevron-right"></i>
+                </a>
+            </li>
+        `;
+    }
+
+    pagination.innerHTML = paginationHTML;
+}
+
+// ページ変更
+function changePage(page) {
+    currentPage = page;
+    displayQuestions();
+    updatePagination();
+    window.scrollTo({ top: 0, behavior: 'smooth' });
+}
+
+// フィルターリセット
+function resetFilters() {
+    document.getElementById('searchInput').value = '';
+    searchResultIds = null;
+    document.getElementById('difficultyFilter').value = '';
+    document.getElementById('categoryFilter').value = '';
+    document.getElementById('sortOrder').value = 'newest';
+    filterQuestions();
+}
+
+// ローディング表示
+function showLoading(show) {
+    const loadingSpinner = document.getElementById('loadingSpinner');
+    const questionsContainer = document.getElementById('questionsContainer');
+
+    if (loadingSpinner) loadingSpinner.style.display = show ? 'block' : 'none';
+    if (questionsContainer) questionsContainer.style.display = show ? 'none' : 'block';
+}
+
+// 問題が見つからない場合の表示
+function showNoQuestions() {
+    const container = document.getElementById('questionsContainer');
+    const noQuestions = document.getElementById('noQuestions');
+    const pagination = document.getElementById('pagination');
+
+    if (container) container.innerHTML = '';
+    if (noQuestions) noQuestions.style.display = 'block';
+    if (pagination) pagination.style.display = 'none';
+}
+
+// エラー表示
+function showError(message) {
+    // 既存のエラー表示機能を使用
+    if (window.AppUtils && window.AppUtils.showError) {
+        window.AppUtils.showError(message);
+    } else {
+        // シンプルなエラー表示
+        const errorDiv = document.createElement('div');
+        errorDiv.className = 'alert alert-danger alert-dismissible fade show';
+        errorDiv.innerHTML = `
+            ${message}
+            <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+        `;
+
+        const container = document.querySelector('.container');
+        if (container) {
+            container.insertBefore(errorDiv, container.firstChild);
+        } else {
+            alert(message);
+        }
+    }
+}
+
+// 日付フォーマット
+function formatDate(dateString) {
+    if (!dateString) return '日付不明';
+
+    try {
+        const date = new Date(dateString);
+        if (isNaN(date.getTime())) return '日付不明';
+
+        return date.toLocaleDateString('ja-JP', {
+            year: 'numeric',
+            month: 'short',
+            day: 'numeric'
+        });
+    } catch (error) {
+        return '日付不明';
+    }
+}
+
+// デバウンス関数
+function debounce(func, wait) {
+    let timeout;
+    return function executedFunction(...args) {
+        const later = () => {
+            clearTimeout(timeout);
+            func(...args);
+        };
+        clearTimeout(timeout);
+        timeout = setTimeout(later, wait);
+    };
+}
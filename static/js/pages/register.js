@@ -0,0 +1,74 @@
+// パスワード表示切り替え機能
+function togglePasswordVisibility(fieldId) {
+    const field = document.getElementById(fieldId);
+    const button = field.parentElement.querySelector('.password-toggle-btn i');
+
+    if (field.type === 'password') {
+        field.type = 'text';
+        button.className = 'fas fa-eye-slash';
+    } else {
+        field.type = 'password';
+        button.className = 'fas fa-eye';
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('registerForm');
+    const password = document.getElementById('password');
+    const confirmPassword = document.getElementById('confirm_password');
+    const passwordMatch = document.getElementById('passwordMatch');
+    const submitBtn = document.getElementById('submitBtn');
+
+    // パスワード一致チェック
+    function checkPasswordMatch() {
+        if (confirmPassword.value === '') {
+            passwordMatch.textContent = '';
+            passwordMatch.className = 'form-text';
+        } else if (password.value === confirmPassword.value) {
+            passwordMatch.textContent = '✓ パスワードが一致しています';
+            passwordMatch.className = 'form-text text-success';
+            submitBtn.disabled = false;
+        } else {
+            passwordMatch.textContent = '✗ パスワードが一致しません';
+            passwordMatch.className = 'form-text text-danger';
+            submitBtn.disabled = true;
+        }
+    }
+
+    password.addEventListener('input', checkPasswordMatch);
+    confirmPassword.addEventListener('input', checkPasswordMatch);
+
+    // フォーム送信前の最終チェック
+    form.addEventListener('submit', function(e) {
+        if (password.value !== confirmPassword.value) {
+            e.preventDefault();
+            alert('パスワードが一致しません。');
+            return false;
+        }
+
+        if (password.value.length < 8) {
+            e.preventDefault();
+            alert('パスワードは8文字以上で入力してください。');
+            return false;
+        }
+
+        if (!document.getElementById('terms').checked) {
+            e.preventDefault();
+            alert('利用規約に同意してください。');
+            return false;
+        }
+    });
+
+    // ユーザー名の文字数チェック
+    const username = document.getElementById('username');
+    username.addEventListener('input', function() {
+        const length = this.value.length;
+        if (length < 3) {
+            this.setCustomValidity('ユーザー名は3文字以上で入力してください');
+        } else if (length > 20) {
+            this.setCustomValidity('ユーザー名は20文字以下で入力してください');
+        } else {
+            this.setCustomValidity('');
+        }
+    });
+});
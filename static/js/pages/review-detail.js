@@ -0,0 +1,154 @@
+let selectedAnswer = null;
+let isAnswered = false;
+const PAGE = JSON.parse(document.currentScript.dataset.page);
+const optionTexts = PAGE.optionTexts;
+const correctAnswer = PAGE.correctAnswer;
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text == null ? '' : String(text);
+    return div.innerHTML;
+}
+
+function selectAnswer(option) {
+    if (isAnswered) return;
+
+    // 既存の選択をクリア
+    document.querySelectorAll('.answer-option').forEach(opt => {
+        opt.classList.remove('selected');
+    });
+
+    // 新しい選択を設定
+    document.querySelector(`[data-option="${option}"]`).classList.add('selected');
+    selectedAnswer = option;
+
+    // 回答ボタンを有効化
+    document.getElementById('submitAnswer').disabled = false;
+}
+
+function submitAnswer() {
+    if (!selectedAnswer || isAnswered) return;
+
+    isAnswered = true;
+
+    // 回答ボタンを無効化
+    document.getElementById('submitAnswer').disabled = true;
+
+    // 結果を表示
+    showResult();
+}
+
+function showResult() {
+    // 選択肢の文字列と正解を比較（大文字小文字は区別しない）
+    const isCorrect = (optionTexts[selectedAnswer] || '').toLowerCase() === correctAnswer.toLowerCase();
+    const resultArea = document.getElementById('resultArea');
+    const resultContent = document.getElementById('resultContent');
+
+    let resultHtml = '';
+
+    if (isCorrect) {
+        resultHtml = `
+            <div class="text-center">
+                <div class="mb-3">
+                    <i class="fas fa-check-circle text-success fa-3x"></i>
+                </div>
+                <h4 class="text-success mb-3">正解です！</h4>
+                <p class="mb-3">素晴らしい！この問題は理解できています。</p>
+                <div class="alert alert-success">
+                    <strong>正解:</strong> ${selectedAnswer}. ${escapeHtml(correctAnswer)}
+                </div>
+            </div>
+        `;
+    } else {
+        resultHtml = `
+            <div class="text-center">
+                <div class="mb-3">
+                    <i class="fas fa-times-circle text-danger fa-3x"></i>
+                </div>
+                <h4 class="text-danger mb-3">不正解です</h4>
+                <p class="mb-3">間違えた場合は、なぜ間違えたかを考えましょう。</p>
+                <div class="alert alert-danger">
+                    <strong>あなたの回答:</strong> ${selectedAnswer}
+                </div>
+                <div class="alert alert-success">
+                    <strong>正解:</strong> ${escapeHtml(correctAnswer)}
+                </div>
+            </div>
+        `;
+    }
+
+    resultContent.innerHTML = resultHtml;
+    resultArea.style.display = 'block';
+
+    // 結果をサーバーに送信
+    saveReviewResult(isCorrect);
+
+    // 少し待ってから復習完了モーダルを表示
+    setTimeout(() => {
+        showReviewCompleteModal(isCorrect);
+    }, 2000);
+}
+
+async function saveReviewResult(isCorrect) {
+    try {
+        const response = await fetch('/api/review/save-result', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                question_id: PAGE.questionId,
+                user_answer: selectedAnswer,
+                is_correct: isCorrect,
+                time_spent: 0 // 実際の実装では学習時間を計測
+            })
+        });
+
+        if (response.ok) {
+            console.log('復習結果を保存しました');
+        }
+    } catch (error) {
+        console.error('復習結果の保存に失敗しました:', error);
+    }
+}
+
+function showReviewCompleteModal(isCorrect) {
+    const modal = document.getElementById('reviewCompleteModal');
+    const content = document.getElementById('reviewCompleteContent');
+
+    if (isCorrect) {
+        content.innerHTML = `
+            <div class="text-center">
+                <i class="fas fa-trophy text-warning fa-3x mb-3"></i>
+                <h5 class="text-success">復習完了！</h5>
+                <p>この問題は正しく理解できています。継続して学習を続けましょう！</p>
+            </div>
+        `;
+    } else {
+        content.innerHTML = `
+            <div class="text-center">
+                <i class="fas fa-redo text-warning fa-3x mb-3"></i>
+                <h5 class="text-warning">復習完了</h5>
+                <p>間違えた問題は、また後で復習しましょう。繰り返し学習することで理解が深まります。</p>
+            </div>
+        `;
+    }
+
+    const bootstrapModal = new bootstrap.Modal(modal);
+    bootstrapModal.show();
+}
+
+// 音声プレーヤーの制御
+function playAudio() {
+    document.getElementById('audioPlayer').play();
+}
+
+function pauseAudio() {
+    document.getElementById('audioPlayer').pause();
+}
+
+function restartAudio() {
+    const audio = document.getElementById('audioPlayer');
+    audio.currentTime = 0;
+    audio.play();
+}
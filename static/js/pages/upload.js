@@ -0,0 +1,356 @@
+// グローバル変数
+let uploadProgress = 0;
+let uploadModal;
+
+// ページ読み込み時の初期化
+document.addEventListener('DOMContentLoaded', function() {
+    setupEventListeners();
+    setupDragAndDrop();
+});
+
+// イベントリスナーの設定
+function setupEventListeners() {
+    // ファイル選択
+    document.getElementById('audioFile').addEventListener('change', handleFileSelect);
+
+    // フォーム送信
+    document.getElementById('uploadForm').addEventListener('submit', handleFormSubmit);
+
+    // 難易度・カテゴリ変更時のプレビュー更新
+    document.getElementById('difficulty').addEventListener('change', updatePreview);
+    document.getElementById('category').addEventListener('change', updatePreview);
+    document.getElementById('customQuestion').addEventListener('input', updatePreview);
+}
+
+// ドラッグ&ドロップの設定
+function setupDragAndDrop() {
+    const dropArea = document.getElementById('fileUploadArea');
+
+    ['dragenter', 'dragover', 'dragleave', 'drop'].forEach(eventName => {
+        dropArea.addEventListener(eventName, preventDefaults, false);
+    });
+
+    function preventDefaults(e) {
+        e.preventDefault();
+        e.stopPropagation();
+    }
+
+    ['dragenter', 'dragover'].forEach(eventName => {
+        dropArea.addEventListener(eventName, highlight, false);
+    });
+
+    ['dragleave', 'drop'].forEach(eventName => {
+        dropArea.addEventListener(eventName, unhighlight, false);
+    });
+
+    function highlight(e) {
+        dropArea.classList.add('drag-over');
+    }
+
+    function unhighlight(e) {
+        dropArea.classList.remove('drag-over');
+    }
+
+    dropArea.addEventListener('drop', handleDrop, false);
+
+    function handleDrop(e) {
+        const dt = e.dataTransfer;
+        const files = dt.files;
+
+        if (files.length > 0) {
+            document.getElementById('audioFile').files = files;
+            handleFileSelect();
+        }
+    }
+}
+
+// ファイル選択処理
+function handleFileSelect() {
+    const fileInput = document.getElementById('audioFile');
+    const file = fileInput.files[0];
+
+    if (file) {
+        // ファイル情報を表示
+        showFileInfo(file);
+
+        // アップロードボタンを有効化
+        document.getElementById('uploadBtn').disabled = false;
+
+        // プレビューを更新
+        updatePreview();
+    }
+}
+
+// ファイル情報表示
+function showFileInfo(file) {
+    const fileInfo = document.getElementById('fileInfo');
+    const fileName = document.getElementById('fileName');
+    const fileSize = document.getElementById('fileSize');
+    const fileType = document.getElementById('fileType');
+
+    fileName.textContent = file.name;
+    fileSize.textContent = formatFileSize(file.size);
+    fileType.textContent = file.type || '不明';
+
+    fileInfo.style.display = 'block';
+}
+
+// ファイル削除
+function removeFile() {
+    document.getElementById('audioFile').value = '';
+    document.getElementById('fileInfo').style.display = 'none';
+    document.getElementById('uploadBtn').disabled = true;
+    document.getElementById('previewCard').style.display = 'none';
+}
+
+// ファイルサイズのフォーマット
+function formatFileSize(bytes) {
+    if (bytes === 0) return '0 Bytes';
+    const k = 1024;
+    const sizes = ['Bytes', 'KB', 'MB', 'GB'];
+    const i = Math.floor(Math.log(bytes) / Math.log(k));
+    return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+}
+
+// プレビュー更新
+function updatePreview() {
+    const difficulty = document.getElementById('difficulty').value;
+    const category = document.getElementById('category').value;
+    const customQuestion = document.getElementById('customQuestion').value;
+
+    if (difficulty && category) {
+        const previewCard = document.getElementById('previewCard');
+        const previewContent = document.getElementById('previewContent');
+
+        let previewHTML = `
+            <div class="mb-3">
+                <h6>設定情報:</h6>
+                <p class="mb-1">
+                    <strong>難易度:</strong> 
+                    <span class="badge bg-${getDifficultyColor(difficulty)}">${getDifficultyText(difficulty)}</span>
+                </p>
+                <p class="mb-1">
+                    <strong>カテゴリ:</strong> 
+                    <span class="badge bg-${getCategoryColor(category)}">${getCategoryText(category)}</span>
+                </p>
+            </div>
+        `;
+
+        if (customQuestion.trim()) {
+            previewHTML += `
+                <div class="mb-3">
+                    <h6>カスタム問題文:</h6>
+                    <p class="mb-0 text-muted">${customQuestion}</p>
+                </div>
+            `;
+        } else {
+            previewHTML += `
+                <div class="mb-3">
+                    <h6>問題生成:</h6>
+                    <p class="mb-0 text-muted">音声内容を分析して自動的に穴埋め問題を生成します</p>
+                </div>
+            `;
+        }
+
+        previewContent.innerHTML = previewHTML;
+        previewCard.style.display = 'block';
+    }
+}
+
+// 難易度の色を取得
+function getDifficultyColor(difficulty) {
+    const colors = {
+        'easy': 'success',
+        'medium': 'warning',
+        'hard': 'danger'
+    };
+    return colors[difficulty] || 'secondary';
+}
+
+// 難易度のテキストを取得
+function getDifficultyText(difficulty) {
+    const texts = {
+        'easy': '初級',
+        'medium': '中級',
+        'hard': '上級'
+    };
+    return texts[difficulty] || '未設定';
+}
+
+// カテゴリの色を取得
+function getCategoryColor(category) {
+    const colors = {
+        'conversation': 'primary',
+        'news': 'info',
+        'story': 'warning',
+        'academic': 'dark'
+    };
+    return colors[category] || 'secondary';
+}
+
+// カテゴリのテキストを取得
+function getCategoryText(category) {
+    const texts = {
+        'conversation': '会話',
+        'news': 'ニュース',
+        'story': '物語',
+        'academic': '学術'
+    };
+    return texts[category] || '未設定';
+}
+
+// フォーム送信処理
+async function handleFormSubmit(e) {
+    e.preventDefault();
+
+    const formData = new FormData(e.target);
+    const file = document.getElementById('audioFile').files[0];
+
+    if (!file) {
+        showMessage('音声ファイルを選択してください', 'warning');
+        return;
+    }
+
+    // ファイルサイズチェック（10MB）
+    if (file.size > 10 * 1024 * 1024) {
+        showMessage('ファイルサイズは10MB以下にしてください', 'error');
+        return;
+    }
+
+    // アップロード開始
+    startUpload(formData);
+}
+
+// アップロード開始
+function startUpload(formData) {
+    uploadModal = new bootstrap.Modal(document.getElementById('uploadProgressModal'));
+    uploadModal.show();
+
+    // 進行状況を開始
+    uploadProgress = 0;
+    updateProgress();
+
+    // ステータス1を表示
+    document.getElementById('status1').style.display = 'block';
+
+    // アップロード処理
+    uploadFile(formData);
+}
+
+// 進捗イベントごとの表示（ステータス番号・進捗率）
+const PROGRESS_STAGES = {
+    accepted: [1, 10],
+    saved: [2, 25],
+    transcribing: [2, 40],
+    transcribed: [3, 75],
+    generated: [3, 90],
+    stored: [4, 100],
+};
+
+// アップロード ID（同じ ID での再送はサーバー側で重複処理されない）
+function newUploadId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + Math.random().toString(36).slice(2, 12);
+}
+
+function showStage(event, data) {
+    const stage = PROGRESS_STAGES[event];
+    if (!stage) return;
+    for (let i = 1; i <= 4; i++) {
+        document.getElementById('status' + i).style.display = i === stage[0] ? 'block' : 'none';
+    }
+    uploadProgress = Math.max(uploadProgress, stage[1]);
+    updateProgress();
+    if (data && data.elapsed !== undefined) {
+        console.log(`[upload] ${event}: ${data.seconds}s (累計 ${data.elapsed}s)`);
+    }
+}
+
+// 進捗を SSE で購読し、stored / error で終了する Promise を返す
+function watchProgress(uploadId) {
+    return new Promise((resolve, reject) => {
+        if (!window.EventSource) return;
+        const source = new EventSource(`/api/upload_progress/${uploadId}`);
+        Object.keys(PROGRESS_STAGES).forEach(event => {
+            source.addEventListener(event, e => showStage(event, JSON.parse(e.data)));
+        });
+        source.addEventListener('stored', e => {
+            source.close();
+            resolve(JSON.parse(e.data).result);
+        });
+        source.addEventListener('error', e => {
+            // サーバーからの error イベント（接続エラーの場合は EventSource が自動で再接続する）
+            if (e.data) {
+                source.close();
+                reject(new Error(JSON.parse(e.data).message));
+            }
+        });
+    });
+}
+
+// POST を送る（タイムアウト等の通信エラー時は同じアップロード ID で1回だけ再送）
+async function postUpload(formData, retries = 1) {
+    try {
+        return await fetch('/api/upload_audio', {
+            method: 'POST',
+            body: formData
+        });
+    } catch (error) {
+        if (retries <= 0) throw error;
+        return postUpload(formData, retries - 1);
+    }
+}
+
+// ファイルアップロード
+async function uploadFile(formData) {
+    const uploadId = newUploadId();
+    formData.append('upload_id', uploadId);
+    const progress = watchProgress(uploadId);
+    // POST の応答で結果・エラーを扱う場合は購読側の失敗を無視する
+    progress.catch(() => {});
+    try {
+        const response = await postUpload(formData);
+        let result;
+        if (response.status === 202) {
+            // 再送した時点で前回の処理が続いている: 完了を SSE で待つ
+            result = await progress;
+        } else if (response.ok) {
+            result = await response.json();
+        } else {
+            const err = await response.json().catch(() => ({}));
+            throw new Error(err.error || 'アップロードに失敗しました');
+        }
+        showStage('stored');
+        // 既存の問題とほぼ同じ内容なら知らせる（推薦・ランダム出題には重複元だけが出る）
+        if (result.duplicate_of) {
+            showMessage(`既存の問題 #${result.duplicate_of} とほぼ同じ内容のため、推薦には表示されません`, 'warning');
+        }
+
+        setTimeout(() => {
+            uploadModal.hide();
+            window.location.href = `/learn/${result.question_id}`;
+        }, result.duplicate_of ? 2500 : 800);
+    } catch (error) {
+        console.error('Upload error:', error);
+        showMessage('アップロードに失敗しました: ' + error.message, 'error');
+        uploadModal.hide();
+    }
+}
+
+// 進行状況更新
+function updateProgress() {
+    const progressBar = document.getElementById('uploadProgress');
+    progressBar.style.width = uploadProgress + '%';
+    progressBar.setAttribute('aria-valuenow', uploadProgress);
+}
+
+// メッセージ表示
+function showMessage(message, type = 'info') {
+    if (window.AppUtils) {
+        window.AppUtils.showMessage(message, type);
+    } else {
+        alert(message);
+    }
+}
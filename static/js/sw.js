@@ -0,0 +1,208 @@
+// Service Worker（/sw.js で配信し、base.html から登録する）
+// - /audio/<sha256>.* : 内容から決まる URL で変わらないため、キャッシュ優先（Range リクエストはキャッシュから切り出す）
+// - ビルド済み静的ファイル（/static/dist/）: ファイル名に内容のハッシュを含み変わらないため、キャッシュ優先
+// - その他の静的ファイル: キャッシュを返しつつ裏で更新（stale-while-revalidate）
+// - 学習ページ         : ネットワーク優先、オフライン時はキャッシュ
+// - 先読み             : ページから { type: 'prefetch', audio: [...], pages: [...] } を受け取りキャッシュに入れる
+// - オフライン回答     : Background Sync（answer-queue）で OfflineQueue を再送
+// - ログアウト         : { type: 'logout' } で学習ページのキャッシュを破棄
+
+importScripts('/static/js/offline.js');
+
+const AUDIO_CACHE = 'audio-v1';
+const STATIC_CACHE = 'static-v1';
+const PAGE_CACHE = 'pages-v1';
+const ASSET_CACHE = 'assets-v1';
+const MAX_AUDIO_ENTRIES = 60;
+const MAX_PAGE_ENTRIES = 30;
+// 古いビルドのファイルが溜まらないよう上限を設ける（フォントを含む）
+const MAX_ASSET_ENTRIES = 80;
+// ビルドしていない場合に読み込むファイル（ビルド済みの /static/dist/ は初回利用時にキャッシュする）
+const PRECACHE = [
+    '/static/css/style.css',
+    '/static/js/main.js',
+    '/static/js/offline.js',
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css',
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js',
+    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css'
+];
+
+self.addEventListener('install', event => {
+    // 取得に失敗したものは初回利用時にキャッシュされるため、インストールは失敗させない
+    event.waitUntil(
+        caches.open(STATIC_CACHE)
+            .then(cache => Promise.all(PRECACHE.map(url => cache.add(url).catch(() => {}))))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    const current = [AUDIO_CACHE, STATIC_CACHE, PAGE_CACHE, ASSET_CACHE];
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(key => !current.includes(key)).map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+// 古いものから削除して件数を上限以下に保つ（Cache API の keys() は追加順）
+async function trimCache(name, maxEntries) {
+    const cache = await caches.open(name);
+    const keys = await cache.keys();
+    for (let i = 0; i < keys.length - maxEntries; i++) {
+        await cache.delete(keys[i]);
+    }
+}
+
+async function fetchAudio(url) {
+    const cache = await caches.open(AUDIO_CACHE);
+    let cached = await cache.match(url);
+    if (!cached) {
+        // Range を付けずに全体を取得してキャッシュする
+        const response = await fetch(url, { credentials: 'same-origin' });
+        if (!response.ok) {
+            return response;
+        }
+        await cache.put(url, response.clone());
+        trimCache(AUDIO_CACHE, MAX_AUDIO_ENTRIES);
+        cached = response;
+    }
+    return cached;
+}
+
+// Range: bytes=start-end をキャッシュ済みの音声から切り出して 206 で返す
+async function rangeResponse(response, rangeHeader) {
+    const match = /bytes=(\d*)-(\d*)/.exec(rangeHeader || '');
+    if (!match) {
+        return response;
+    }
+    const blob = await response.blob();
+    let start = match[1] === '' ? null : parseInt(match[1], 10);
+    let end = match[2] === '' ? blob.size - 1 : parseInt(match[2], 10);
+    if (start === null) {
+        // bytes=-N は末尾 N バイト
+        start = Math.max(0, blob.size - end);
+        end = blob.size - 1;
+    }
+    end = Math.min(end, blob.size - 1);
+    if (start > end) {
+        return new Response(null, { status: 416, headers: { 'Content-Range': `bytes */${blob.size}` } });
+    }
+    return new Response(blob.slice(start, end + 1), {
+        status: 206,
+        headers: {
+            'Content-Type': response.headers.get('Content-Type') || 'audio/mpeg',
+            'Content-Range': `bytes ${start}-${end}/${blob.size}`,
+            'Content-Length': String(end - start + 1),
+            'Accept-Ranges': 'bytes'
+        }
+    });
+}
+
+async function handleAudio(request) {
+    const url = new URL(request.url).pathname;
+    try {
+        const response = await fetchAudio(url);
+        if (response.type === 'opaque' || !response.ok) {
+            return response;
+        }
+        return request.headers.has('Range') ? rangeResponse(response, request.headers.get('Range')) : response;
+    } catch (error) {
+        // S3 の署名付き URL へのリダイレクトで CORS が許可されていない場合などはそのまま通す
+        return fetch(request);
+    }
+}
+
+async function cacheFirst(request) {
+    const cache = await caches.open(ASSET_CACHE);
+    const cached = await cache.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        await cache.put(request, response.clone());
+        trimCache(ASSET_CACHE, MAX_ASSET_ENTRIES);
+    }
+    return response;
+}
+
+async function staleWhileRevalidate(request) {
+    const cache = await caches.open(STATIC_CACHE);
+    const cached = await cache.match(request);
+    const network = fetch(request).then(response => {
+        if (response.ok || response.type === 'opaque') {
+            cache.put(request, response.clone());
+        }
+        return response;
+    }).catch(() => cached || Response.error());
+    return cached || network;
+}
+
+async function networkFirst(request) {
+    const cache = await caches.open(PAGE_CACHE);
+    try {
+        const response = await fetch(request);
+        if (response.ok && !response.redirected) {
+            await cache.put(request, response.clone());
+            trimCache(PAGE_CACHE, MAX_PAGE_ENTRIES);
+        }
+        return response;
+    } catch (error) {
+        const cached = await cache.match(request);
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    const sameOrigin = url.origin === self.location.origin;
+    if (sameOrigin && url.pathname.startsWith('/audio/')) {
+        event.respondWith(handleAudio(request));
+    } else if (sameOrigin && url.pathname.startsWith('/static/dist/')) {
+        event.respondWith(cacheFirst(request));
+    } else if ((sameOrigin && url.pathname.startsWith('/static/')) || PRECACHE.includes(request.url)) {
+        event.respondWith(staleWhileRevalidate(request));
+    } else if (sameOrigin && request.mode === 'navigate' && url.pathname.startsWith('/learn/')) {
+        event.respondWith(networkFirst(request));
+    }
+});
+
+// 先読み: キャッシュに無い音声と学習ページだけを取得する
+async function prefetch(audioUrls, pageUrls) {
+    const audioCache = await caches.open(AUDIO_CACHE);
+    const pageCache = await caches.open(PAGE_CACHE);
+    for (const url of audioUrls) {
+        if (url.startsWith('/audio/') && !(await audioCache.match(url))) {
+            await fetchAudio(url).catch(() => {});
+        }
+    }
+    for (const url of pageUrls) {
+        if (!(await pageCache.match(url))) {
+            await networkFirst(new Request(url, { credentials: 'same-origin' })).catch(() => {});
+        }
+    }
+}
+
+self.addEventListener('message', event => {
+    const data = event.data || {};
+    if (data.type === 'prefetch') {
+        event.waitUntil(prefetch(data.audio || [], data.pages || []));
+    } else if (data.type === 'logout') {
+        // 学習ページはユーザーごとの内容のため、ログアウト後は破棄する
+        event.waitUntil(caches.delete(PAGE_CACHE));
+    }
+});
+
+self.addEventListener('sync', event => {
+    if (event.tag === OfflineQueue.SYNC_TAG) {
+        event.waitUntil(OfflineQueue.flush());
+    }
+});
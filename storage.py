@@ -0,0 +1,263 @@
+"""
+音声ファイルの保存先（ストレージバックエンド）
+
+- local（既定）: UPLOAD_FOLDER/blobs 以下に保存し、アプリが配信する
+- s3:           S3 互換ストレージ（AWS S3・MinIO・moto_server など）に保存し、署名付き URL へのリダイレクトで配信する。
+                変換・音声認識に使うファイルはローカルのディスクキャッシュ（AUDIO_CACHE_DIR）に読み込む
+
+キーは audio_store のファンアウト構成（ab/cd/<sha256>.*）をそのまま使う。
+どちらのバックエンドも local_root 以下のファイルを作業用に使い、put_file() で保存先に反映する
+（local では local_root が保存先そのものなので反映は不要）。
+boto3 は s3 バックエンドを使う場合のみ必要で、初回アクセス時に読み込む。
+"""
+
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URL_EXPIRES = 3600
+DEFAULT_MULTIPART_CHUNK_MB = 8
+DEFAULT_CACHE_MAX_MB = 2048
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# mtime は UNIX 時刻（GC の猶予期間の判定に使う）
+StoredObject = namedtuple('StoredObject', ['key', 'size', 'mtime'])
+
+
+def _replace_from(src_path, dest_path):
+    """一時ファイル経由でコピーし、途中のファイルを読ませない"""
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest_path), suffix='.tmp')
+    os.close(fd)
+    shutil.copyfile(src_path, tmp)
+    os.replace(tmp, dest_path)
+
+
+class LocalStorage:
+    kind = 'local'
+
+    def __init__(self, root):
+        self.local_root = root
+
+    def path(self, key):
+        return os.path.join(self.local_root, key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def put_file(self, key, path):
+        if os.path.abspath(path) != os.path.abspath(self.path(key)):
+            _replace_from(path, self.path(key))
+
+    def fetch(self, key):
+        """ローカルのファイルパスを返す（無ければ None）"""
+        path = self.path(key)
+        return path if os.path.exists(path) else None
+
+    def touch(self, key):
+        os.utime(self.path(key))
+
+    def url(self, key):
+        """直接配信用の URL（local はアプリが配信するため None）"""
+        return None
+
+    def list(self, prefix=''):
+        base = self.path(prefix)
+        directory = base if os.path.isdir(base) else os.path.dirname(base)
+        for dirpath, _dirs, names in os.walk(directory):
+            if os.path.basename(dirpath) == 'tmp':
+                continue
+            for name in names:
+                path = os.path.join(dirpath, name)
+                key = os.path.relpath(path, self.local_root).replace(os.sep, '/')
+                if key.startswith(prefix) and not name.endswith('.tmp'):
+                    stat = os.stat(path)
+                    yield StoredObject(key, stat.st_size, stat.st_mtime)
+
+    def delete(self, key):
+        if os.path.exists(self.path(key)):
+            os.remove(self.path(key))
+
+
+class S3Storage:
+    kind = 's3'
+
+    def __init__(self, bucket, cache_root, prefix='', endpoint_url=None, region=None,
+                 url_expires=DEFAULT_URL_EXPIRES, public_base_url=None,
+                 multipart_chunk_mb=DEFAULT_MULTIPART_CHUNK_MB, cache_max_mb=DEFAULT_CACHE_MAX_MB):
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.local_root = cache_root
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.url_expires = url_expires
+        self.public_base_url = public_base_url.rstrip('/') if public_base_url else None
+        self.multipart_chunk = multipart_chunk_mb * 1024 * 1024
+        self.cache_max_bytes = cache_max_mb * 1024 * 1024
+        self._client = None
+        self._transfer_config = None
+        self._lock = threading.Lock()
+        self._downloaded = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from boto3.s3.transfer import TransferConfig
+
+                    # 閾値を超えるファイルはチャンク単位のマルチパートアップロードで送る（全体をメモリに載せない）
+                    self._transfer_config = TransferConfig(
+                        multipart_threshold=self.multipart_chunk, multipart_chunksize=self.multipart_chunk,
+                    )
+                    self._client = boto3.client('s3', endpoint_url=self.endpoint_url, region_name=self.region)
+        return self._client
+
+    def _object_key(self, key):
+        return self.prefix + key
+
+    def path(self, key):
+        """ディスクキャッシュ上のパス"""
+        return os.path.join(self.local_root, key)
+
+    def _is_not_found(self, error):
+        code = error.response.get('Error', {}).get('Code')
+        return code in ('404', 'NoSuchKey', 'NotFound')
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except ClientError as e:
+            if self._is_not_found(e):
+                return False
+            raise
+
+    def put_file(self, key, path):
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.client.upload_file(
+            path, self.bucket, self._object_key(key), Config=self._transfer_config,
+            ExtraArgs={'ContentType': content_type, 'CacheControl': IMMUTABLE_CACHE_CONTROL},
+        )
+        # 作業ファイルはそのままキャッシュとして残す
+        if os.path.abspath(path) != os.path.abspath(self.path(key)):
+            _replace_from(path, self.path(key))
+
+    def fetch(self, key):
+        """読み込み時のキャッシュ: キャッシュに無ければダウンロードしてローカルのパスを返す（無ければ None）"""
+        from botocore.exceptions import ClientError
+        path = self.path(key)
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self._object_key(key), tmp, Config=self._transfer_config)
+        except ClientError as e:
+            os.remove(tmp)
+            if self._is_not_found(e):
+                return None
+            raise
+        os.replace(tmp, path)
+        self._downloaded += os.path.getsize(path)
+        if self._downloaded > self.cache_max_bytes // 10:
+            self._downloaded = 0
+            self.trim_cache()
+        return path
+
+    def trim_cache(self):
+        """キャッシュが上限を超えたら最終利用の古いファイルから削除する"""
+        files = []
+        for dirpath, _dirs, names in os.walk(self.local_root):
+            for name in names:
+                p = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(p)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, p))
+        total = sum(size for _, size, _ in files)
+        if total <= self.cache_max_bytes:
+            return
+        for _, size, p in sorted(files):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.cache_max_bytes * 0.9:
+                break
+        logger.info(f'[storage] ディスクキャッシュを {total / 1024 / 1024:.0f} MB に削減しました')
+
+    def touch(self, key):
+        # 自身へのコピーで LastModified を更新する（GC の猶予期間の起点）
+        object_key = self._object_key(key)
+        self.client.copy_object(
+            Bucket=self.bucket, Key=object_key, CopySource={'Bucket': self.bucket, 'Key': object_key},
+            MetadataDirective='REPLACE', CacheControl=IMMUTABLE_CACHE_CONTROL,
+            ContentType=mimetypes.guess_type(key)[0] or 'application/octet-stream',
+        )
+
+    def url(self, key):
+        """配信 URL（公開ベース URL があればそれを、無ければ署名付き URL を返す）"""
+        if self.public_base_url:
+            return f'{self.public_base_url}/{self._object_key(key)}'
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self._object_key(key)}, ExpiresIn=self.url_expires,
+        )
+
+    def list(self, prefix=''):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._object_key(prefix)):
+            for obj in page.get('Contents', []):
+                yield StoredObject(obj['Key'][len(self.prefix):], obj['Size'], obj['LastModified'].timestamp())
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        if os.path.exists(self.path(key)):
+            os.remove(self.path(key))
+
+
+_backend = None
+
+
+def init_app(app):
+    """設定からバックエンドを作る（全ロールで呼ばれる。boto3 はここでは読み込まない）"""
+    global _backend
+    config = app.config
+    config.setdefault('AUDIO_STORAGE', os.getenv('AUDIO_STORAGE', 'local'))
+    if config['AUDIO_STORAGE'] == 's3':
+        bucket = config.setdefault('AUDIO_S3_BUCKET', os.getenv('AUDIO_S3_BUCKET'))
+        if not bucket:
+            raise ValueError('AUDIO_STORAGE=s3 の場合は AUDIO_S3_BUCKET を設定してください')
+        cache_dir = config.setdefault(
+            'AUDIO_CACHE_DIR', os.getenv('AUDIO_CACHE_DIR', os.path.join(app.instance_path, 'audio_cache')))
+        _backend = S3Storage(
+            bucket, cache_dir,
+            prefix=config.setdefault('AUDIO_S3_PREFIX', os.getenv('AUDIO_S3_PREFIX', 'audio')),
+            endpoint_url=config.setdefault('AUDIO_S3_ENDPOINT_URL', os.getenv('AUDIO_S3_ENDPOINT_URL')),
+            region=config.setdefault('AUDIO_S3_REGION', os.getenv('AUDIO_S3_REGION')),
+            url_expires=int(config.setdefault('AUDIO_URL_EXPIRES', os.getenv('AUDIO_URL_EXPIRES', DEFAULT_URL_EXPIRES))),
+            public_base_url=config.setdefault('AUDIO_PUBLIC_BASE_URL', os.getenv('AUDIO_PUBLIC_BASE_URL')),
+            multipart_chunk_mb=int(os.getenv('AUDIO_MULTIPART_CHUNK_MB', DEFAULT_MULTIPART_CHUNK_MB)),
+            cache_max_mb=int(os.getenv('AUDIO_CACHE_MAX_MB', DEFAULT_CACHE_MAX_MB)),
+        )
+    else:
+        _backend = LocalStorage(os.path.join(config['UPLOAD_FOLDER'], 'blobs'))
+    app.extensions['audio_storage'] = _backend
+
+
+def get_storage():
+    if _backend is None:
+        raise RuntimeError('storage.init_app(app) が呼ばれていません')
+    return _backend
@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+@pytest.fixture(scope='session')
+def postgres_url():
+    """
+    使い捨ての PostgreSQL の URL。環境変数 TEST_DATABASE_URL（中身は削除される）か、
+    testing.postgresql（PostgreSQL のバイナリが必要）で起動したもの。どちらも無ければスキップする
+    """
+    url = os.getenv('TEST_DATABASE_URL')
+    if url:
+        yield url
+        return
+    pytest.importorskip('psycopg2')
+    testing_postgresql = pytest.importorskip('testing.postgresql')
+    try:
+        server = testing_postgresql.Postgresql()
+    except RuntimeError as e:
+        pytest.skip(f'PostgreSQL を起動できません: {e}')
+    try:
+        yield server.url()
+    finally:
+        server.stop()
+
+
+@pytest.fixture
+def sqlite_app(tmp_path, monkeypatch):
+    """一時ファイルの SQLite を使う worker 役割のアプリ（テーブル・検索索引の作成済み）"""
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    # 学習ログのコミット後の統計の更新（バックグラウンドのスレッド）はテストでは行わない
+    monkeypatch.setenv('QUESTION_STATS_REFRESH_INTERVAL', '0')
+    from app import create_app
+    from extensions import db
+    import question_search
+
+    app = create_app('worker')
+    with app.app_context():
+        db.create_all()
+        question_search.ensure_schema(db.session.connection())
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,128 @@
+"""学習履歴 API のキーセットページネーション（X-Next-Before-Id）と NDJSON の出力"""
+
+import json
+
+import pytest
+from sqlalchemy import insert
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    # 学習ログのコミット後の統計の更新（バックグラウンドのスレッド）はテストでは行わない
+    monkeypatch.setenv('QUESTION_STATS_REFRESH_INTERVAL', '0')
+    from app import create_app
+    from extensions import db
+
+    app = create_app('web')
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def user_id(client):
+    from extensions import db
+    from models import Question, User
+
+    user = User(username='alice', email='alice@example.com', password='x')
+    db.session.add(user)
+    db.session.add(Question(id=1, audio_url='/static/audio/sample1.mp3', question_text='Where is the ____?',
+                            correct_answer='station', uploaded_by=1))
+    db.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+    return user.id
+
+
+def _add_logs(user_id, count):
+    """学習ログを count 件追加し（ORM 経由。レスポンスキャッシュのバージョンも進む）、ID を返す"""
+    from extensions import db
+    from models import LearningLog
+
+    logs = [LearningLog(user_id=user_id, content_id=1, question_id=1, user_answer='station', score=1)
+            for _ in range(count)]
+    db.session.add_all(logs)
+    db.session.commit()
+    return [log.id for log in logs]
+
+
+def _bulk_logs(user_id, count):
+    from extensions import db
+    from models import LearningLog
+
+    db.session.execute(insert(LearningLog.__table__), [
+        {'user_id': user_id, 'content_id': 1, 'question_id': 1, 'time_spent': 1.0, 'completion_status': True,
+         'score': 1, 'review_count': 0, 'is_review': False} for _ in range(count)])
+    db.session.commit()
+
+
+def _page(client, **params):
+    response = client.get('/api/user/learning-history', query_string=params)
+    assert response.status_code == 200
+    next_before_id = response.headers.get('X-Next-Before-Id')
+    return [row['id'] for row in response.get_json()], next_before_id and int(next_before_id)
+
+
+def test_walk_pages_with_inserts_between(client, user_id):
+    existing = _add_logs(user_id, 25)
+    added = []
+    seen = []
+    ids, before_id = _page(client, limit=10)
+    seen += ids
+    while before_id is not None:
+        # ページの間に追加された学習ログは既に読んだ範囲（before_id より大きい ID）に入る
+        added += _add_logs(user_id, 3)
+        ids, before_id = _page(client, limit=10, before_id=before_id)
+        seen += ids
+
+    assert seen == sorted(existing, reverse=True)
+    # 追加分は最初のページから読み直すと先頭に並ぶ
+    ids, _ = _page(client, limit=10)
+    assert ids == sorted(added + existing, reverse=True)[:10]
+    assert set(added) <= set(ids)
+
+
+def test_next_before_id_only_when_more_rows(client, user_id):
+    _add_logs(user_id, 10)
+    assert _page(client, limit=10) == (list(range(10, 0, -1)), None)
+    assert _page(client, limit=9) == (list(range(10, 1, -1)), 2)
+    assert _page(client, limit=9, before_id=2) == ([1], None)
+
+
+def test_cached_page_keeps_next_before_id(client, user_id):
+    _add_logs(user_id, 5)
+    first = client.get('/api/user/learning-history?limit=2')
+    cached = client.get('/api/user/learning-history?limit=2')
+    assert cached.headers.get('X-Cache') == 'HIT'
+    assert cached.headers['X-Next-Before-Id'] == first.headers['X-Next-Before-Id'] == '4'
+
+
+@pytest.mark.parametrize('limit, expected', [(5000, 1000), (1000, 1000), (0, 1), (-3, 1)])
+def test_limit_clamped(client, user_id, limit, expected):
+    _bulk_logs(user_id, 1005)
+    ids, before_id = _page(client, limit=limit)
+    assert len(ids) == expected
+    assert before_id == ids[-1]
+
+
+def test_ndjson_streams_all_rows(client, user_id):
+    _bulk_logs(user_id, 1200)
+    page = client.get('/api/user/learning-history?limit=1').get_json()
+
+    for kwargs in ({'query_string': {'format': 'ndjson'}}, {'headers': {'Accept': 'application/x-ndjson'}}):
+        response = client.get('/api/user/learning-history', **kwargs)
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        # 1行1件（limit に関係なく全件。レスポンスキャッシュの対象外）
+        lines = response.get_data(as_text=True).splitlines()
+        rows = [json.loads(line) for line in lines]
+        assert [row['id'] for row in rows] == list(range(1200, 0, -1))
+        assert 'X-Cache' not in response.headers
+        assert rows[0] == page[0]
+
+    # before_id より前の分だけ
+    response = client.get('/api/user/learning-history?format=ndjson&before_id=4')
+    assert [json.loads(line)['id'] for line in response.get_data(as_text=True).splitlines()] == [3, 2, 1]
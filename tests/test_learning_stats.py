@@ -0,0 +1,73 @@
+"""連続学習日数（日別ビットマップと SQL の集計）が空白の日と UTC の日付の境界で正しく切れること"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+TODAY = datetime(2026, 10, 19, 12, 0, 0)
+
+
+def _log(user_id, created_at, minutes=1.0):
+    from extensions import db
+    from models import LearningLog
+
+    db.session.add(LearningLog(user_id=user_id, content_id=1, time_spent=minutes, created_at=created_at))
+    db.session.commit()
+
+
+def _metrics(user_id, today=TODAY):
+    """ビットマップ（UserActivity）と SQL の集計の両方で求め、一致を確かめて返す"""
+    import learning_stats
+    from extensions import db
+
+    from_bits = learning_stats.learning_activity(user_id, today)
+    from_sql = learning_stats.activity_metrics_sql(user_id, learning_stats.to_day(today), db.session)
+    assert from_bits == from_sql
+    return from_bits
+
+
+def test_streak_restarts_after_gap(sqlite_app):
+    # 6日前・5日前 → 4日前は空白 → 3日前〜今日
+    for days_ago in (6, 5, 3, 2, 1, 0):
+        _log(1, TODAY - timedelta(days=days_ago))
+    assert _metrics(1) == (4, 6, 6)
+
+
+def test_streak_counts_same_day_once(sqlite_app):
+    for hours in (0, 1, 2):
+        _log(1, TODAY - timedelta(days=1, hours=hours))
+    _log(1, TODAY)
+    assert _metrics(1).streak == 2
+
+
+@pytest.mark.parametrize('first, second, streak', [
+    # 2 秒差でも UTC の日付が変われば別の日
+    (datetime(2026, 10, 18, 23, 59, 59), datetime(2026, 10, 19, 0, 0, 1), 2),
+    # 24 時間近く離れていても同じ日
+    (datetime(2026, 10, 19, 0, 0, 1), datetime(2026, 10, 19, 23, 59, 59), 1),
+    # 24 時間未満の差でも間の日が空いていれば途切れる
+    (datetime(2026, 10, 17, 23, 59, 59), datetime(2026, 10, 19, 0, 0, 1), 1),
+])
+def test_streak_uses_utc_day_boundary(sqlite_app, first, second, streak):
+    _log(1, first)
+    _log(1, second)
+    assert _metrics(1, today=datetime(2026, 10, 19, 23, 59, 59)).streak == streak
+
+
+def test_backfilled_day_joins_runs(sqlite_app):
+    # 3日前と今日・昨日の間の空白（2日前）を後から埋める（オフライン回答）
+    for days_ago in (3, 1, 0):
+        _log(1, TODAY - timedelta(days=days_ago))
+    assert _metrics(1).streak == 2
+
+    _log(1, TODAY - timedelta(days=2))
+    assert _metrics(1).streak == 4
+
+
+def test_streak_is_per_user(sqlite_app):
+    _log(1, TODAY - timedelta(days=1))
+    _log(1, TODAY)
+    _log(2, TODAY)
+    assert _metrics(1).streak == 2
+    assert _metrics(2).streak == 1
+    assert _metrics(3) == (0, 0, 0)
@@ -0,0 +1,26 @@
+"""alembic の autogenerate（flask db migrate）がアプリの作る検索用のテーブルを削除の差分にしないこと"""
+
+import os
+import shutil
+
+from conftest import PROJECT_ROOT
+
+
+def test_autogenerate_ignores_search_tables(sqlite_app, tmp_path):
+    from flask_migrate import Migrate, migrate, stamp
+    from extensions import db
+
+    # 生成されるリビジョンをリポジトリに書かないようコピーで実行する
+    directory = tmp_path / 'migrations'
+    shutil.copytree(os.path.join(PROJECT_ROOT, 'migrations'), directory,
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    Migrate(sqlite_app, db, directory=str(directory))
+    # sqlite_app はモデルどおりのテーブルと FTS5 の question_fts を作成済み
+    stamp(directory=str(directory))
+    before = set(os.listdir(directory / 'versions'))
+    migrate(directory=str(directory), message='check')
+
+    generated = set(os.listdir(directory / 'versions')) - before
+    for name in generated:
+        with open(directory / 'versions' / name, encoding='utf-8') as f:
+            assert 'question_fts' not in f.read()
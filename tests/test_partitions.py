@@ -0,0 +1,202 @@
+"""learning_log の月別パーティション（マイグレーション partition_learning_log と partitions）の PostgreSQL でのテスト"""
+
+import os
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from conftest import PROJECT_ROOT
+
+# マイグレーション前（add_learning_rollup 時点）の learning_log。見直し用の列は NULL 可
+UNPARTITIONED_DDL = """
+    CREATE TABLE learning_log (
+        id serial PRIMARY KEY,
+        user_id integer NOT NULL,
+        content_id integer NOT NULL,
+        time_spent double precision NOT NULL,
+        completion_status boolean NOT NULL,
+        question_id integer REFERENCES question (id),
+        user_answer varchar(255),
+        score integer,
+        created_at timestamp without time zone,
+        updated_at timestamp without time zone,
+        review_count integer,
+        is_review boolean
+    )
+"""
+
+
+@pytest.fixture
+def pg_app(postgres_url, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', postgres_url)
+    monkeypatch.setenv('MIGRATION_BATCH_SIZE', '2')
+    monkeypatch.setenv('MIGRATION_BATCH_PAUSE', '0')
+    from flask_migrate import Migrate, stamp
+    from app import create_app
+    from extensions import db
+
+    app = create_app('cli')
+    Migrate(app, db, directory=os.path.join(PROJECT_ROOT, 'migrations'))
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP SCHEMA IF EXISTS archive CASCADE'))
+            connection.execute(text('DROP SCHEMA public CASCADE'))
+            connection.execute(text('CREATE SCHEMA public'))
+        db.create_all()
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP TABLE learning_log'))
+            connection.execute(text(UNPARTITIONED_DDL))
+        stamp(revision='add_learning_rollup')
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _insert_logs(connection, *created):
+    for i, created_at in enumerate(created):
+        connection.execute(text(
+            'INSERT INTO learning_log (user_id, content_id, time_spent, completion_status, score, created_at, '
+            'updated_at, review_count, is_review) VALUES (1, :i, 1.0, true, 1, :created, :created, 0, false)'
+        ), {'i': i, 'created': created_at})
+
+
+def _scalar(sql, **params):
+    from extensions import db
+    with db.engine.connect() as connection:
+        return connection.execute(text(sql), params).scalar()
+
+
+def _upgrade():
+    from flask_migrate import upgrade
+    upgrade(revision='partition_learning_log')
+
+
+def test_upgrade_copies_rows_in_batches_and_keeps_not_null(pg_app):
+    from extensions import db
+    import partitions
+
+    with db.engine.begin() as connection:
+        _insert_logs(connection, '2026-01-15', '2026-02-03', '2026-02-20')
+        # 見直し用の列が埋まっていない行
+        connection.execute(text(
+            'INSERT INTO learning_log (user_id, content_id, time_spent, completion_status) VALUES (2, 9, 0.5, false)'))
+    _upgrade()
+
+    with db.engine.connect() as connection:
+        assert partitions.is_partitioned(connection)
+        names = {p.name for p in partitions.list_partitions(connection)}
+    assert {'learning_log_p202601', 'learning_log_p202602'} <= names
+    assert _scalar('SELECT count(*) FROM learning_log') == 4
+    assert _scalar('SELECT count(*) FROM learning_log_p202602') == 2
+    assert _scalar('SELECT count(*) FROM learning_log WHERE created_at IS NULL OR updated_at IS NULL '
+                   'OR review_count IS NULL OR is_review IS NULL') == 0
+    for column in ('created_at', 'updated_at', 'review_count', 'is_review'):
+        assert _scalar("SELECT is_nullable FROM information_schema.columns "
+                       "WHERE table_name = 'learning_log' AND column_name = :column", column=column) == 'NO'
+    # 作業用のテーブル・トリガーは残らず、id のシーケンスと既定値はそのまま使える
+    assert _scalar("SELECT to_regclass('learning_log_new')") is None
+    assert _scalar("SELECT to_regclass('learning_log_changes')") is None
+    with db.engine.begin() as connection:
+        row = connection.execute(text(
+            'INSERT INTO learning_log (user_id, content_id, time_spent, completion_status) '
+            'VALUES (3, 1, 1.0, true) RETURNING id, review_count, is_review')).one()
+    assert (row.id, row.review_count, row.is_review) == (5, 0, False)
+    assert _scalar("SELECT indexname FROM pg_indexes WHERE tablename = 'learning_log' "
+                   "AND indexname = 'ix_learning_log_user_created'") == 'ix_learning_log_user_created'
+
+
+def test_upgrade_applies_changes_made_during_copy(pg_app, monkeypatch):
+    from extensions import db
+    import online_migration
+
+    with db.engine.begin() as connection:
+        _insert_logs(connection, '2026-01-15', '2026-01-16', '2026-01-17')
+    copy_rows = online_migration.copy_rows
+
+    def copy_then_write(*args, **kwargs):
+        copied = copy_rows(*args, **kwargs)
+        # コピーが終わってから置き換えるまでの間の書き込み（トリガーで記録される）
+        with db.engine.begin() as connection:
+            connection.execute(text('UPDATE learning_log SET score = 0 WHERE id = 1'))
+            connection.execute(text('DELETE FROM learning_log WHERE id = 2'))
+            _insert_logs(connection, '2026-01-18')
+        return copied
+
+    monkeypatch.setattr(online_migration, 'copy_rows', copy_then_write)
+    _upgrade()
+
+    assert _scalar('SELECT count(*) FROM learning_log') == 3
+    assert _scalar('SELECT score FROM learning_log WHERE id = 1') == 0
+    assert _scalar('SELECT count(*) FROM learning_log WHERE id = 2') == 0
+    assert _scalar('SELECT count(*) FROM learning_log WHERE id = 4') == 1
+
+
+def test_downgrade_restores_single_table(pg_app):
+    from flask_migrate import downgrade
+    from extensions import db
+    import partitions
+
+    with db.engine.begin() as connection:
+        _insert_logs(connection, '2026-01-15', '2026-03-01')
+    _upgrade()
+    downgrade(revision='add_learning_rollup')
+
+    with db.engine.connect() as connection:
+        assert not partitions.is_partitioned(connection)
+    assert _scalar('SELECT count(*) FROM learning_log') == 2
+    assert _scalar("SELECT to_regclass('learning_log_p202601')") is None
+    assert _scalar("SELECT conname FROM pg_constraint WHERE conrelid = 'learning_log'::regclass "
+                   "AND contype = 'p'") == 'learning_log_pkey'
+    with db.engine.begin() as connection:
+        _insert_logs(connection, '2026-04-01')
+    assert _scalar('SELECT max(id) FROM learning_log') == 3
+
+
+def test_ensure_partitions_moves_rows_out_of_default(pg_app):
+    from extensions import db
+    import partitions
+
+    _upgrade()
+    ahead = partitions.add_months(date.today().replace(day=1), 6)
+    with db.engine.begin() as connection:
+        # まだパーティションの無い月の行は既定パーティションに入る
+        _insert_logs(connection, ahead.replace(day=10), ahead.replace(day=20))
+    assert _scalar('SELECT count(*) FROM learning_log_default') == 2
+
+    with db.engine.begin() as connection:
+        created = partitions.ensure_partitions(connection, months_ahead=6)
+    assert partitions.partition_name(ahead) in created
+    assert _scalar('SELECT count(*) FROM learning_log_default') == 0
+    assert _scalar(f'SELECT count(*) FROM {partitions.partition_name(ahead)}') == 2
+    assert _scalar('SELECT count(*) FROM learning_log') == 2
+    with db.engine.begin() as connection:
+        assert partitions.ensure_partitions(connection, months_ahead=6) == []
+
+
+def test_archive_partitions(pg_app):
+    from extensions import db
+    import partitions
+
+    with db.engine.begin() as connection:
+        _insert_logs(connection, '2025-11-05')
+    _upgrade()
+
+    with db.engine.begin() as connection:
+        archived, skipped = partitions.archive_partitions(connection, date(2026, 1, 1))
+    # 行の残っている月は既定では残す
+    assert archived == ['learning_log_p202512']
+    assert skipped == ['learning_log_p202511']
+    assert _scalar("SELECT to_regclass('archive.learning_log_p202512')") is not None
+
+    with db.engine.begin() as connection:
+        archived, skipped = partitions.archive_partitions(connection, date(2026, 1, 1), drop=True)
+    assert (archived, skipped) == ([], ['learning_log_p202511'])
+
+    with db.engine.begin() as connection:
+        archived, _ = partitions.archive_partitions(connection, date(2026, 1, 1), include_nonempty=True)
+        remaining = {p.name for p in partitions.list_partitions(connection)}
+    assert archived == ['learning_log_p202511']
+    assert 'learning_log_p202511' not in remaining
+    assert _scalar('SELECT count(*) FROM archive.learning_log_p202511') == 1
+    assert _scalar('SELECT count(*) FROM learning_log') == 0
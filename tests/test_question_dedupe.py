@@ -0,0 +1,86 @@
+"""question_dedupe の近似重複の関連付け（公開設定・アップローダーによる制限）"""
+
+import pytest
+
+TRANSCRIPT = ('The museum will open an hour later than usual on Friday because the staff are preparing '
+              'a new exhibition about the history of the city harbour')
+
+
+@pytest.fixture
+def users(sqlite_app):
+    from extensions import db
+    from models import User
+
+    alice = User(username='alice', email='alice@example.com', password='x')
+    bob = User(username='bob', email='bob@example.com', password='x')
+    db.session.add_all([alice, bob])
+    db.session.commit()
+    return alice.id, bob.id
+
+
+def _upload(uploaded_by, is_public, transcript=TRANSCRIPT):
+    import question_dedupe
+    from extensions import db
+    from models import Question
+
+    question = Question(audio_url='/static/audio/test.mp3', question_text='The museum will open ____ later',
+                        correct_answer='an hour', uploaded_by=uploaded_by, is_public=is_public)
+    db.session.add(question)
+    db.session.flush()
+    matches = question_dedupe.index_question(db.session, question, transcript)
+    db.session.commit()
+    return question, matches
+
+
+def test_public_question_is_not_linked_to_private_original(users):
+    alice, _ = users
+    private, _ = _upload(alice, is_public=False)
+    public, matches = _upload(alice, is_public=True)
+    # 近似重複としては見つかるが、非公開の問題の重複にはしない（他のユーザーに出題されなくなるため）
+    assert [m.question_id for m in matches] == [private.id]
+    assert public.duplicate_of is None
+
+
+def test_private_question_is_linked_to_own_private_original(users):
+    alice, _ = users
+    first, _ = _upload(alice, is_public=False)
+    second, _ = _upload(alice, is_public=False)
+    assert second.duplicate_of == first.id
+
+
+def test_question_is_linked_to_public_original_of_another_user(users):
+    alice, bob = users
+    original, _ = _upload(alice, is_public=True)
+    duplicate, _ = _upload(bob, is_public=True)
+    assert duplicate.duplicate_of == original.id
+
+
+def test_private_question_of_another_user_is_not_a_candidate(users):
+    alice, bob = users
+    _upload(alice, is_public=False)
+    question, matches = _upload(bob, is_public=False)
+    assert matches == []
+    assert question.duplicate_of is None
+
+
+def test_dedupe_rebuild_applies_the_same_rule(users, monkeypatch):
+    import question_dedupe
+    import question_search
+    from extensions import db
+    from models import Question
+
+    alice, bob = users
+    private, _ = _upload(alice, is_public=False)
+    public, _ = _upload(alice, is_public=True)
+    other, _ = _upload(bob, is_public=False)
+    # 以前の規則で作られた関連付け
+    public.duplicate_of = private.id
+    db.session.commit()
+
+    monkeypatch.setattr(question_search, 'read_transcript', lambda audio_url: TRANSCRIPT)
+    question_dedupe.dedupe(rebuild=True)
+    db.session.expire_all()
+    assert db.session.get(Question, public.id).duplicate_of is None
+    assert db.session.get(Question, private.id).duplicate_of is None
+    # 公開の問題の重複になる（非公開の private の重複にはならない）
+    assert db.session.get(Question, other.id).duplicate_of == public.id
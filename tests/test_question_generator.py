@@ -0,0 +1,124 @@
+"""穴埋め問題の生成（空欄の数・聞き取りにくい語・誤答の選び方）と採点"""
+
+import random
+
+import pytest
+
+from question_generator import (
+    BLANK, MIN_BLANK_DURATION_MS, VocabularyIndex, check_answer, generate_cloze, generate_question, guess_pos,
+)
+
+TRANSCRIPT = ('Researchers discovered ancient pottery beneath the flooded village, '
+              'revealing remarkable craftsmanship and forgotten traditions.')
+SEEDS = range(20)
+
+
+def _word_times(transcript, short_words=(), short_ms=80, normal_ms=400):
+    """空白区切りの語ごとの (開始ms, 終了ms)。short_words を含む語だけ発話を短くする"""
+    times = []
+    start = 0
+    for word in transcript.split():
+        duration = short_ms if any(s in word for s in short_words) else normal_ms
+        times.append((start, start + duration))
+        start += duration + 50
+    return times
+
+
+def _variants(word, count=4):
+    """同じ長さ・同じ接尾辞（同じ品詞）の語"""
+    return [letter + word[1:].lower() for letter in 'bcdfgh'[:count] if letter != word[0].lower()]
+
+
+@pytest.mark.parametrize('max_blanks', [1, 2, 3, 5])
+def test_number_of_blanks(max_blanks):
+    for seed in SEEDS:
+        cloze = generate_cloze(TRANSCRIPT, max_blanks=max_blanks, rng=random.Random(seed))
+        assert cloze.question_text.count(BLANK) == len(cloze.answers) == max_blanks
+        assert cloze.correct_answer == ' '.join(cloze.answers)
+        # 空欄同士は隣接しない
+        assert BLANK + ' ' + BLANK not in cloze.question_text
+
+
+def test_blanks_limited_by_candidates():
+    # 4文字以上・ストップワード以外の語は2つだけ
+    cloze = generate_cloze('The river and the forest are in it.', max_blanks=3, rng=random.Random(0))
+    assert sorted(cloze.answers) == ['forest', 'river']
+
+
+def test_short_spoken_words_never_blanked():
+    short = ('Researchers', 'pottery', 'remarkable', 'forgotten')
+    word_times = _word_times(TRANSCRIPT, short)
+    assert any(end - start < MIN_BLANK_DURATION_MS for start, end in word_times)
+    for seed in SEEDS:
+        cloze = generate_cloze(TRANSCRIPT, max_blanks=3, rng=random.Random(seed), word_times=word_times)
+        assert len(cloze.answers) == 3
+        assert not set(cloze.answers) & set(short)
+
+
+def test_short_words_used_only_when_nothing_else():
+    transcript = 'Hello wonderful world'
+    word_times = _word_times(transcript, ('Hello', 'wonderful', 'world'))
+    cloze = generate_cloze(transcript, max_blanks=1, rng=random.Random(0), word_times=word_times)
+    assert len(cloze.answers) == 1
+
+
+def test_mismatched_word_times_ignored():
+    cloze = generate_cloze(TRANSCRIPT, max_blanks=2, rng=random.Random(0), word_times=[(0, 10)])
+    assert len(cloze.answers) == 2
+
+
+def test_distractors_from_same_bucket():
+    words = [w.strip('.,') for w in TRANSCRIPT.split()]
+    index = VocabularyIndex(v for w in words for v in _variants(w))
+    # 長さの違う同じ品詞の語（同じ長さの語が足りていれば選ばれない）
+    index.add('extraordinarily')
+    for seed in SEEDS:
+        cloze = generate_cloze(TRANSCRIPT, max_blanks=3, index=index, rng=random.Random(seed))
+        assert len(cloze.options) == 4
+        assert cloze.correct_answer in cloze.options
+        for option in cloze.options:
+            if option == cloze.correct_answer:
+                continue
+            for answer, distractor in zip(cloze.answers, option.split()):
+                assert distractor.lower() != answer.lower()
+                assert (guess_pos(distractor), len(distractor)) == (guess_pos(answer), len(answer))
+                # 大文字始まりの語には大文字始まりの誤答
+                assert distractor[0].isupper() == answer[0].isupper()
+        # 同じ語を複数の選択肢に使わない
+        distractors = [option.split() for option in cloze.options if option != cloze.correct_answer]
+        for k in range(len(cloze.answers)):
+            column = [d[k].lower() for d in distractors]
+            assert len(set(column)) == len(column)
+
+
+def test_distractors_fall_back_to_nearby_lengths():
+    index = VocabularyIndex(['walked', 'jumped', 'talked', 'played'])
+    distractors = index.distractors('listened', k=3, rng=random.Random(0))
+    # 同じ長さの VBD が無ければ近い長さ（±2）から
+    assert len(distractors) == 3
+    assert set(distractors) <= {'walked', 'jumped', 'talked', 'played'}
+
+
+@pytest.mark.parametrize('user_answer, correct_answer, expected', [
+    # 以前の1空欄の形式（正解は1語）
+    ('hello', 'Hello', True),
+    ('  HELLO ', 'hello', True),
+    ('hellos', 'hello', False),
+    ('', 'hello', False),
+    # 複数空欄（区切りはスペース・カンマ・スラッシュ・読点）
+    ('ancient pottery', 'ancient pottery', True),
+    ('Ancient, Pottery', 'ancient pottery', True),
+    ('ancient/pottery', 'ancient pottery', True),
+    ('ancient、pottery', 'ancient pottery', True),
+    ('pottery ancient', 'ancient pottery', False),
+    ('ancient', 'ancient pottery', False),
+])
+def test_check_answer(user_answer, correct_answer, expected):
+    assert check_answer(user_answer, correct_answer) is expected
+
+
+def test_generate_question_compat():
+    # (問題文, 正解) の組。空欄の語を正解にスペース区切りで並べる
+    question_text, correct_answer = generate_question('Hello wonderful world')
+    assert question_text == '____ wonderful ____'
+    assert correct_answer == 'Hello world'
@@ -0,0 +1,50 @@
+"""question_search の索引がマッパーイベントで更新されること（アップロード以外の経路で作った問題）"""
+
+import pytest
+
+
+@pytest.fixture
+def user_id(sqlite_app):
+    from extensions import db
+    from models import User
+
+    user = User(username='alice', email='alice@example.com', password='x')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def _search(query, user_id):
+    import question_search
+    return [question_id for question_id, _, _ in question_search.search(query, user_id)[0]]
+
+
+def test_question_added_through_the_orm_is_searchable(user_id):
+    from extensions import db
+    from models import Question
+
+    question = Question(audio_url='/static/audio/sample1.mp3', question_text='Where is the ____ station?',
+                        correct_answer='nearest', uploaded_by=user_id, is_public=True)
+    db.session.add(question)
+    db.session.commit()
+    assert _search('station', user_id) == [question.id]
+
+
+def test_index_follows_updates_and_deletes(user_id):
+    from sqlalchemy import text
+    from extensions import db
+    from models import Question
+
+    question = Question(audio_url='/static/audio/sample1.mp3', question_text='Where is the ____ station?',
+                        correct_answer='nearest', uploaded_by=user_id, is_public=True)
+    db.session.add(question)
+    db.session.commit()
+
+    question.question_text = 'When does the ____ leave?'
+    db.session.commit()
+    assert _search('station', user_id) == []
+    assert _search('leave', user_id) == [question.id]
+
+    db.session.delete(question)
+    db.session.commit()
+    assert db.session.execute(text('SELECT count(*) FROM question_fts')).scalar() == 0
@@ -0,0 +1,40 @@
+"""question_stats の水位が ID の欠番（コミット前の可能性がある INSERT）の手前で止まること"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+NOW = datetime(2026, 10, 19, 12, 0, 0)
+
+
+def _log(log_id, inserted_at, created_at=datetime(2026, 1, 1)):
+    # created_at は過去の日時（取り込み・バックフィルの行など）
+    return {'id': log_id, 'user_id': 1, 'content_id': 1, 'time_spent': 1.0, 'completion_status': True,
+            'score': 1, 'created_at': created_at, 'updated_at': created_at, 'review_count': 0,
+            'is_review': False, 'inserted_at': inserted_at}
+
+
+def _refresh(*logs):
+    import question_stats
+    from extensions import db
+    from models import LearningLog
+
+    db.session.execute(insert(LearningLog.__table__), list(logs))
+    result = question_stats.refresh(db.session.connection(), now=NOW)
+    db.session.commit()
+    return result.watermark
+
+
+def test_stops_before_gap_followed_by_recent_insert(sqlite_app):
+    recent = NOW - timedelta(seconds=5)
+    assert _refresh(_log(1, recent), _log(2, recent), _log(4, recent)) == 2
+
+
+def test_skips_old_gap(sqlite_app):
+    old = NOW - timedelta(minutes=5)
+    assert _refresh(_log(1, old), _log(3, old)) == 3
+
+
+def test_skips_gap_before_rows_without_inserted_at(sqlite_app):
+    # マイグレーション前からある行（inserted_at が NULL）
+    assert _refresh(_log(1, None), _log(3, None)) == 3
@@ -0,0 +1,127 @@
+"""レート制限（トークンバケットの補充・バースト、429 の応答、ストリーミング応答の同時実行数の枠の解放）"""
+
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask, Response, stream_with_context
+from flask_login import LoginManager
+
+import rate_limit
+from rate_limit import MemoryStore, RateLimiter, SQLiteStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, 'time', SimpleNamespace(monotonic=clock, time=clock))
+    return clock
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, clock, tmp_path):
+    if request.param == 'memory':
+        return MemoryStore()
+    return SQLiteStore(str(tmp_path / 'ratelimit.db'))
+
+
+def test_bucket_burst_and_refill(store, clock):
+    # 1 トークン/秒、容量 3
+    assert [store.consume('k', 1.0, 3)[0] for _ in range(4)] == [True, True, True, False]
+    assert store.consume('k', 1.0, 3) == (False, 1)
+
+    # 2 秒で 2 トークン補充
+    clock.now += 2
+    assert [store.consume('k', 1.0, 3)[0] for _ in range(3)] == [True, True, False]
+
+    # 長く空けても容量までしか貯まらない
+    clock.now += 100
+    assert [store.consume('k', 1.0, 3)[0] for _ in range(4)] == [True, True, True, False]
+
+    # キーごとに別のバケット
+    assert store.consume('other', 1.0, 3) == (True, 0)
+
+
+def test_retry_after_reflects_refill_rate(store):
+    # 6 トークン/分（10 秒に1トークン）
+    assert store.consume('k', 0.1, 1) == (True, 0)
+    assert store.consume('k', 0.1, 1) == (False, 10)
+
+
+@pytest.fixture
+def limited_app():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    login_manager.user_loader(lambda user_id: None)
+    limiter = RateLimiter(app)
+
+    @app.route('/limited')
+    @limiter.limit('limited', per_minute=60, burst=2)
+    def limited():
+        return 'ok'
+
+    @app.route('/stream')
+    @limiter.limit('stream', per_minute=600, burst=100, concurrency=1)
+    def stream():
+        def generate():
+            yield from ('a', 'b', 'c')
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    @app.route('/plain')
+    @limiter.limit('plain', per_minute=600, burst=100, concurrency=1)
+    def plain():
+        return 'ok'
+
+    @app.route('/error')
+    @limiter.limit('error', per_minute=600, burst=100, concurrency=1)
+    def error():
+        raise RuntimeError('boom')
+
+    return app
+
+
+def test_limit_returns_429_with_retry_after(limited_app):
+    client = limited_app.test_client()
+    assert [client.get('/limited').status_code for _ in range(2)] == [200, 200]
+
+    response = client.get('/limited')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+    assert response.get_json() == {'error': 'Too many requests', 'retry_after': 1}
+
+
+def test_streamed_response_holds_slot_until_closed(limited_app):
+    client = limited_app.test_client()
+
+    first = client.get('/stream', buffered=False)
+    assert first.status_code == 200
+    # ボディを返し終える（close）まで枠を使っている
+    second = client.get('/stream', buffered=False)
+    assert second.status_code == 429
+    assert second.headers['Retry-After'] == '1'
+
+    assert b''.join(first.response) == b'abc'
+    first.close()
+
+    third = client.get('/stream', buffered=False)
+    assert third.status_code == 200
+    third.close()
+
+
+def test_plain_response_and_error_release_slot(limited_app):
+    client = limited_app.test_client()
+    assert [client.get('/plain').status_code for _ in range(3)] == [200, 200, 200]
+
+    limited_app.testing = True
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            client.get('/error')
@@ -0,0 +1,98 @@
+"""レスポンスキャッシュのキー（ユーザーのバージョンは学習ログのコミット時にだけ進む・推薦は問題カタログのバージョンにも従う）"""
+
+import pytest
+
+
+@pytest.fixture
+def cache(sqlite_app):
+    from response_cache import response_cache
+
+    # 既定のプロセス内バックエンドを作り直す（イベントの登録は1回だけ）
+    response_cache.init_app(sqlite_app)
+    return response_cache
+
+
+def _add_log(user_id):
+    from extensions import db
+    from models import LearningLog
+
+    db.session.add(LearningLog(user_id=user_id, content_id=1, score=1))
+    db.session.flush()
+
+
+def test_version_bumped_after_commit(cache):
+    from extensions import db
+
+    _add_log(1)
+    _add_log(1)
+    # フラッシュしただけでは進まない（他のリクエストはまだ古いデータを読む）
+    assert cache.backend.version(1) == 0
+
+    db.session.commit()
+    # 同じトランザクションの INSERT はまとめて1回
+    assert cache.backend.version(1) == 1
+    assert cache.backend.version(2) == 0
+
+
+def test_rollback_leaves_version_unchanged(cache):
+    from extensions import db
+
+    _add_log(1)
+    db.session.rollback()
+    assert cache.backend.version(1) == 0
+
+    # ロールバックした INSERT は次のコミットに持ち越さない
+    db.session.commit()
+    assert cache.backend.version(1) == 0
+
+    _add_log(2)
+    db.session.commit()
+    assert cache.backend.version(1) == 0
+    assert cache.backend.version(2) == 1
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    # 学習ログのコミット後の統計の更新（バックグラウンドのスレッド）はテストでは行わない
+    monkeypatch.setenv('QUESTION_STATS_REFRESH_INTERVAL', '0')
+    from app import create_app
+    from extensions import db
+    from models import User
+
+    app = create_app('web')
+    with app.app_context():
+        db.create_all()
+        user = User(username='alice', email='alice@example.com', password='x')
+        db.session.add(user)
+        db.session.commit()
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+        yield client
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _add_question():
+    from extensions import db
+    from models import Question
+
+    question = Question(audio_url='/static/audio/sample1.mp3', question_text='Where is the ____?',
+                        correct_answer='station', uploaded_by=1, is_public=True, difficulty_level=1)
+    db.session.add(question)
+    db.session.commit()
+    return question.id
+
+
+def test_recommendations_cache_follows_catalog_version(client):
+    first = _add_question()
+    assert [r['id'] for r in client.get('/api/recommendations').get_json()] == [first]
+    assert client.get('/api/recommendations').headers.get('X-Cache') == 'HIT'
+
+    # 学習ログが無くても、問題の追加で作り直す
+    second = _add_question()
+    response = client.get('/api/recommendations')
+    assert 'X-Cache' not in response.headers
+    assert sorted(r['id'] for r in response.get_json()) == [first, second]
+    assert client.get('/api/recommendations').headers.get('X-Cache') == 'HIT'
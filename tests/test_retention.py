@@ -0,0 +1,98 @@
+"""学習ログの圧縮で件数・スコアの集計が変わらず、繰り返しても二重計上しないこと"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+NOW = datetime(2026, 10, 19, 12, 0, 0)
+OLD = NOW - timedelta(days=200)
+
+
+@pytest.fixture(params=['upsert', 'update'])
+def compact(request, sqlite_app, monkeypatch):
+    """retention.compact（ON CONFLICT を使う場合と UPDATE → INSERT の場合）"""
+    import retention
+
+    if request.param == 'update':
+        monkeypatch.setattr(retention, 'dialect_insert', lambda connection: None)
+    return lambda **kwargs: retention.compact(days=180, now=NOW, **kwargs)
+
+
+def _log(created_at, score, question_id=1, user_id=1, completion_status=True):
+    from extensions import db
+    from models import LearningLog
+
+    db.session.add(LearningLog(user_id=user_id, content_id=1, question_id=question_id, score=score,
+                               time_spent=1.0, completion_status=completion_status, created_at=created_at))
+    db.session.commit()
+
+
+def _rollups():
+    from extensions import db
+    from models import LearningRollup
+
+    return {(r.user_id, r.question_id, r.day): (r.attempts, r.correct, r.failed, r.score_sum, r.wrong,
+                                                r.last_wrong_score)
+            for r in db.session.query(LearningRollup).all()}
+
+
+def _totals(user_id=1):
+    import read_queries
+
+    # 問題の無い学習ログは question_id None
+    totals = sorted(read_queries.question_totals(user_id), key=lambda total: total.question_id or 0)
+    return read_queries.log_summary(user_id), totals
+
+
+def test_summary_unchanged_after_compaction(compact):
+    from extensions import db
+    from models import LearningLog
+
+    for score in (1, 0, None, 100, 40):
+        _log(OLD, score)
+    _log(OLD + timedelta(days=1), 1, question_id=None)
+    _log(OLD, 1, question_id=2)
+    _log(NOW - timedelta(days=1), 1)
+    _log(NOW - timedelta(days=1), 0, user_id=2)
+    before = _totals(1), _totals(2)
+
+    result = compact()
+    assert result.logs == 7
+    # 保持期間内の学習ログだけが残る
+    assert db.session.query(LearningLog).count() == 2
+    assert (_totals(1), _totals(2)) == before
+
+
+def test_compacting_twice_does_not_double_count(compact):
+    for score in (1, 0, 40):
+        _log(OLD, score)
+    assert compact().logs == 3
+    rollups = _rollups()
+    summary = _totals()
+
+    # 2回目は対象が無い
+    assert compact() == (0, 0, 0)
+    assert _rollups() == rollups
+    assert _totals() == summary
+
+    # 同じ (ユーザー, 問題, 日) の学習ログが後から来ても既存の集計に加算する
+    _log(OLD, 1)
+    assert compact().logs == 1
+    (key, (attempts, correct, *_)), = _rollups().items()
+    assert (attempts, correct) == (4, 2)
+    assert _totals()[0] == (4, 2, 42)
+
+
+@pytest.mark.parametrize('batch_size', [1, 2, 10])
+def test_last_wrong_score_merged_across_batches(compact, batch_size):
+    # 間違い（完了済みで 100 点未満）40 → 70 → 正解 100 → 未完了 10（間違いに数えない）
+    _log(OLD, 40)
+    _log(OLD, 70)
+    _log(OLD, 100)
+    _log(OLD, 10, completion_status=False)
+
+    compact(batch_size=batch_size)
+    (_, (attempts, _, _, score_sum, wrong, last_wrong_score)), = _rollups().items()
+    assert (attempts, score_sum, wrong) == (4, 220, 2)
+    # 後のバッチに間違いが無くても、前のバッチの最後の間違いのスコアを残す
+    assert last_wrong_score == 70
@@ -0,0 +1,57 @@
+"""学習セッションの先読み（/api/session/prefetch）がキューと同じ対象から選ぶこと"""
+
+import pytest
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    # 学習ログのコミット後の統計の更新（バックグラウンドのスレッド）はテストでは行わない
+    monkeypatch.setenv('QUESTION_STATS_REFRESH_INTERVAL', '0')
+    from app import create_app
+    from extensions import db
+
+    app = create_app('web')
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _question(uploaded_by, is_public=True, duplicate_of=None):
+    from extensions import db
+    from models import Question
+
+    question = Question(audio_url='/static/audio/sample1.mp3', question_text='Where is the ____?',
+                        correct_answer='station', uploaded_by=uploaded_by, is_public=is_public,
+                        duplicate_of=duplicate_of)
+    db.session.add(question)
+    db.session.commit()
+    return question.id
+
+
+def test_fallback_skips_duplicates_solved_and_private_questions(client):
+    from extensions import db
+    from models import LearningLog, QuestionQueue, User
+
+    alice = User(username='alice', email='alice@example.com', password='x')
+    bob = User(username='bob', email='bob@example.com', password='x')
+    db.session.add_all([alice, bob])
+    db.session.commit()
+    original = _question(bob.id)
+    _question(bob.id, duplicate_of=original)
+    queued = _question(bob.id)
+    _question(bob.id, is_public=False)
+    solved = _question(bob.id)
+    db.session.add(LearningLog(user_id=alice.id, content_id=solved, question_id=solved, time_spent=1.0,
+                               completion_status=True, score=100))
+    # キューに1問だけ（残りは ID 順の補充で選ばれる）
+    db.session.add(QuestionQueue(user_id=alice.id, position=1, question_id=queued))
+    db.session.commit()
+
+    with client.session_transaction() as session:
+        session['_user_id'] = str(alice.id)
+    response = client.get('/api/session/prefetch?n=5')
+    assert response.status_code == 200
+    assert [item['id'] for item in response.get_json()['questions']] == [queued, original]
@@ -0,0 +1,53 @@
+"""起動時間の予算（benchmarks/import_time.py）と、起動時に重いモジュールを読み込まないこと"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import PROJECT_ROOT
+
+# 計測値は 500 ms 前後。CI のばらつきを見込んだ上限
+BUDGET_MS = 1000
+
+# flask コマンドだけが使うモジュール（どのロールでも create_app では読み込まない）
+COMMAND_ONLY_MODULES = ('ingest', 'partitions', 'retention')
+# Blueprint が使うモジュール（Blueprint の無いロールでは読み込まない）
+BLUEPRINT_MODULES = ('assets', 'question_dedupe', 'question_generator', 'transcription', 'word_timing')
+
+
+def _loaded_modules(role, tmp_path):
+    """別プロセスで create_app(role) を実行し、読み込まれたモジュール名の集合を返す"""
+    code = (
+        f'import sys; sys.path.insert(0, {PROJECT_ROOT!r}); import app; app.create_app({role!r}); '
+        'print("\\n".join(sys.modules))'
+    )
+    proc = subprocess.run(
+        [sys.executable, '-c', code], cwd=tmp_path, capture_output=True, text=True,
+        env={**os.environ, 'DATABASE_URL': f'sqlite:///{tmp_path / "startup.db"}'},
+    )
+    assert proc.returncode == 0, proc.stderr
+    return set(proc.stdout.split())
+
+
+def test_app_import_within_budget():
+    proc = subprocess.run(
+        [sys.executable, os.path.join(PROJECT_ROOT, 'benchmarks', 'import_time.py'),
+         '--budget-ms', str(BUDGET_MS), '--runs', '3'],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+    )
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+
+
+@pytest.mark.parametrize('role, absent', [
+    ('web', COMMAND_ONLY_MODULES),
+    ('worker', COMMAND_ONLY_MODULES + BLUEPRINT_MODULES),
+    ('cli', COMMAND_ONLY_MODULES + BLUEPRINT_MODULES),
+])
+def test_create_app_defers_role_modules(role, absent, tmp_path):
+    loaded = _loaded_modules(role, tmp_path)
+    assert not loaded & set(absent)
+    # flask コマンドは登録されたまま、モデルのイベントに追従するモジュールは全ロールで読み込む
+    assert 'commands' in loaded
+    assert {'audio_store', 'question_catalog', 'question_search', 'learning_stats', 'question_stats'} <= loaded
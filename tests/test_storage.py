@@ -0,0 +1,80 @@
+"""storage の S3 バックエンド（moto でモックした S3）と、音声配信の署名付き URL へのリダイレクト"""
+
+import hashlib
+import os
+
+import pytest
+
+pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+
+BUCKET = 'listening-audio'
+DIGEST = hashlib.sha256(b'audio').hexdigest()
+NAME = f'{DIGEST}.play.mp3'
+KEY = f'{DIGEST[:2]}/{DIGEST[2:4]}/{NAME}'
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with moto.mock_aws():
+        import boto3
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+        yield
+
+
+@pytest.fixture
+def backend(s3, tmp_path):
+    from storage import S3Storage
+    return S3Storage(BUCKET, str(tmp_path / 'cache'), prefix='audio', region='us-east-1')
+
+
+def _write(path, data=b'audio'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_put_file_exists_and_fetch(backend, tmp_path):
+    import boto3
+
+    assert not backend.exists(KEY)
+    backend.put_file(KEY, _write(str(tmp_path / 'work' / NAME)))
+    assert backend.exists(KEY)
+    head = boto3.client('s3', region_name='us-east-1').head_object(Bucket=BUCKET, Key=f'audio/{KEY}')
+    assert head['ContentType'] == 'audio/mpeg'
+    assert 'immutable' in head['CacheControl']
+
+    # キャッシュに無ければダウンロードする
+    os.remove(backend.path(KEY))
+    path = backend.fetch(KEY)
+    assert path == backend.path(KEY)
+    with open(path, 'rb') as f:
+        assert f.read() == b'audio'
+    assert backend.fetch('00/00/missing.mp3') is None
+
+
+def test_audio_route_redirects_to_presigned_url(s3, tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('AUDIO_STORAGE', 's3')
+    monkeypatch.setenv('AUDIO_S3_BUCKET', BUCKET)
+    monkeypatch.setenv('AUDIO_S3_REGION', 'us-east-1')
+    monkeypatch.setenv('AUDIO_CACHE_DIR', str(tmp_path / 'cache'))
+    from app import create_app
+    from blueprints.media import REDIRECT_MAX_AGE
+    from storage import get_storage
+
+    app = create_app('web')
+    get_storage().put_file(KEY, _write(str(tmp_path / 'work' / NAME)))
+    response = app.test_client().get(f'/audio/{NAME}')
+
+    assert response.status_code == 302
+    location = response.headers['Location']
+    assert location.startswith(f'https://{BUCKET}.s3.amazonaws.com/audio/{KEY}?')
+    assert 'Signature=' in location
+    assert response.headers['Cache-Control'] == f'private, max-age={REDIRECT_MAX_AGE}'
+    # 文字起こしは配信しない
+    assert app.test_client().get(f'/audio/{DIGEST}.txt').status_code == 404
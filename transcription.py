@@ -0,0 +1,190 @@
+"""
+Google Cloud Speech-to-Text による音声認識
+
+google.cloud.speech は protobuf/gRPC の読み込みに時間がかかるため、モジュール先頭では import せず
+最初の文字起こし時に読み込む。Web ワーカーの起動や flask db upgrade・各種スクリプトは SDK を読み込まない。
+"""
+
+import io
+import logging
+import os
+from collections import namedtuple
+
+import audio_pipeline
+import audio_store
+import word_timing
+
+logger = logging.getLogger(__name__)
+
+_speech = None
+
+# word_times は単語ごとの (開始ms, 終了ms)。transcript.split() の各語に対応する
+Transcript = namedtuple('Transcript', ['text', 'word_times'])
+
+
+def _speech_modules():
+    """Speech SDK（v1 と v1p1beta1）を初回呼び出し時に読み込む"""
+    global _speech
+    if _speech is None:
+        from google.cloud import speech
+        from google.cloud import speech_v1p1beta1 as speech_beta
+        _speech = (speech, speech_beta)
+    return _speech
+
+
+def _ensure_gcp_credentials():
+    """
+    Render 等のクラウドでは ADC が無いため、
+    環境変数 GOOGLE_CREDENTIALS_JSON にサービスアカウント JSON 文字列を設定可能にする。
+    設定されている場合、一時ファイルに書き出して GOOGLE_APPLICATION_CREDENTIALS をセットする。
+    """
+    if os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"):
+        return
+    credentials_json = os.environ.get("GOOGLE_CREDENTIALS_JSON") or os.environ.get("GCP_CREDENTIALS_JSON")
+    if not credentials_json:
+        return
+    try:
+        import tempfile
+        import json
+        # 有効な JSON か確認
+        json.loads(credentials_json)
+        fd, path = tempfile.mkstemp(suffix=".json", prefix="gcp_credentials_")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(credentials_json)
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = path
+            logger.info("GCP credentials set from GOOGLE_CREDENTIALS_JSON environment variable.")
+        except Exception:
+            os.close(fd)
+            if os.path.exists(path):
+                os.unlink(path)
+            raise
+    except json.JSONDecodeError as e:
+        logger.warning(f"GOOGLE_CREDENTIALS_JSON is not valid JSON: {e}")
+
+
+def _offset_ms(offset):
+    """単語の開始・終了時刻（timedelta または protobuf の Duration）をミリ秒に変換"""
+    if hasattr(offset, 'total_seconds'):
+        return int(round(offset.total_seconds() * 1000))
+    return int(offset.seconds) * 1000 + int(offset.nanos) // 1_000_000
+
+
+def _response_words(response):
+    word_times = []
+    for result in response.results:
+        for word in result.alternatives[0].words:
+            word_times.append((_offset_ms(word.start_time), _offset_ms(word.end_time)))
+    return word_times
+
+
+# 音声認識（MP3/WAV対応・フォーマットに応じた最適設定）
+def transcribe_audio(audio_file_path, encoding=None, sample_rate_hertz=None, client=None):
+    """文字起こしのテキストだけを返す（単語タイミングが必要な場合は transcribe_audio_words）"""
+    return transcribe_audio_words(audio_file_path, encoding, sample_rate_hertz, client).text
+
+
+def transcribe_audio_words(audio_file_path, encoding=None, sample_rate_hertz=None, client=None):
+    """
+    単語ごとの時刻（enable_word_time_offsets）付きで認識し、Transcript を返す。
+
+    encoding/sample_rate_hertz が指定された場合（audio_pipeline で変換済みの
+    16kHz モノラル FLAC / LINEAR16）は、拡張子からの推測をせずにその設定で認識する。
+    client を渡すとその Speech クライアント（recognize を持つオブジェクト）を使う。
+    audio_file_path に Question.audio_url（/audio/<sha256>.*）を渡した場合は保存先からローカルに取得して読む。
+    """
+    if audio_file_path.startswith(audio_store.URL_PREFIX):
+        local_path = audio_store.localize(audio_store.resolve_path(audio_file_path))
+        if local_path is None:
+            raise FileNotFoundError(f'音声ファイルが保存先にありません: {audio_file_path}')
+        audio_file_path = local_path
+    _ensure_gcp_credentials()
+    speech, speech_beta = _speech_modules()
+    ext = os.path.splitext(audio_file_path)[1].lower()
+    with io.open(audio_file_path, "rb") as f:
+        content = f.read()
+
+    # 変換済みファイル: 形式が確定しているのでそのまま指定
+    if encoding in ("FLAC", "LINEAR16"):
+        client = client or speech.SpeechClient()
+        config = speech.RecognitionConfig(
+            encoding=getattr(speech.RecognitionConfig.AudioEncoding, encoding),
+            sample_rate_hertz=sample_rate_hertz or audio_pipeline.RECOGNITION_SAMPLE_RATE,
+            audio_channel_count=audio_pipeline.RECOGNITION_CHANNELS,
+            language_code="en-US",
+            enable_word_time_offsets=True,
+        )
+        audio = speech.RecognitionAudio(content=content)
+        response = client.recognize(config=config, audio=audio)
+    # MP3: v1p1beta1 のみ対応。正しいエンコーディング指定で高速・確実に認識
+    elif ext == ".mp3":
+        client = client or speech_beta.SpeechClient()
+        config = speech_beta.types.RecognitionConfig(
+            encoding=speech_beta.types.RecognitionConfig.AudioEncoding.MP3,
+            sample_rate_hertz=44100,
+            language_code="en-US",
+            enable_word_time_offsets=True,
+        )
+        audio = speech_beta.types.RecognitionAudio(content=content)
+        response = client.recognize(config=config, audio=audio)
+    # WAV: ヘッダから自動判定させる（サンプルレート等をAPIに任せる）
+    elif ext == ".wav":
+        client = client or speech_beta.SpeechClient()
+        config = speech_beta.types.RecognitionConfig(
+            encoding=speech_beta.types.RecognitionConfig.AudioEncoding.ENCODING_UNSPECIFIED,
+            language_code="en-US",
+            enable_word_time_offsets=True,
+        )
+        audio = speech_beta.types.RecognitionAudio(content=content)
+        response = client.recognize(config=config, audio=audio)
+    else:
+        # その他（未対応形式は LINEAR16 16kHz として扱う）
+        client = client or speech.SpeechClient()
+        config = speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=16000,
+            language_code="en-US",
+            enable_word_time_offsets=True,
+        )
+        audio = speech.RecognitionAudio(content=content)
+        response = client.recognize(config=config, audio=audio)
+
+    if not response.results:
+        return Transcript("", [])
+    transcript = " ".join(
+        result.alternatives[0].transcript for result in response.results
+    )
+    return Transcript(transcript, _response_words(response))
+
+
+def transcribe_stored(blob_path, converted=None, transcribe=None):
+    """
+    ストア内の音声を文字起こしし、文字起こし（<sha256>.txt）と単語タイミング（<sha256>.words）を書き出す。
+    同じ音声の文字起こしが既にあれば音声認識を省略する。
+
+    transcribe は transcribe_audio_words 互換の関数（テキストだけを返す transcribe_audio 互換でもよい）。
+    Returns: (文字起こし, 単語タイミング [(開始ms, 終了ms), ...] または None, 保存先に反映するファイル)
+    """
+    transcript_path = audio_store.transcript_path(blob_path)
+    words_path = word_timing.timings_path(blob_path)
+    if audio_store.localize(transcript_path):
+        with open(transcript_path, encoding='utf-8') as f:
+            transcript = f.read()
+        word_times = word_timing.decode(word_timing.read_file(words_path))
+        return transcript, word_times, [transcript_path] + ([words_path] if word_times else [])
+
+    transcribe = transcribe or transcribe_audio_words
+    if converted:
+        result = transcribe(converted.recognition_path,
+                            encoding=converted.recognition_encoding,
+                            sample_rate_hertz=converted.sample_rate_hertz)
+    else:
+        result = transcribe(blob_path)
+    transcript, word_times = (result, None) if isinstance(result, str) else result
+    audio_store.write_text(transcript_path, transcript)
+    if not word_timing.aligned(transcript, word_times):
+        if word_times:
+            logger.warning(f'単語タイミングが文字起こしの語数と一致しないため保存しません: {blob_path}')
+        return transcript, None, [transcript_path]
+    audio_store.write_bytes(words_path, word_timing.encode(word_times))
+    return transcript, word_times, [transcript_path, words_path]
@@ -0,0 +1,221 @@
+"""
+アップロード処理の進捗通知（Server-Sent Events 用の pub/sub）
+
+クライアントが発行した upload_id ごとのチャンネル（user_id:upload_id）に、upload_audio が段階ごとのイベント
+（accepted → saved → transcribing → transcribed → generated → stored / error）を経過時間付きで追加し、
+/api/upload_progress/<upload_id> がそれを SSE で配信する。
+
+バックエンド（UPLOAD_PROGRESS_URL）:
+- memory://（既定）: プロセス内。購読者は Condition で待つだけなのでポーリングしない
+- sqlite:///path:    複数ワーカーで共有する SQLite ファイル。他ワーカーのイベントは短い間隔のポーリングで拾い、
+                     同じワーカー内のイベントは Condition で即座に通知する
+
+イベントはチャンネルごとに連番（SSE の id）を持つため、再接続時は Last-Event-ID から続きを配信できる。
+同じ upload_id で再送されたアップロードは claim() で検出し、音声認識を二重に実行しない。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+metrics.describe('upload_progress_listeners', 'Open upload progress streams in this worker')
+
+DEFAULT_TTL = 600
+DEFAULT_MAX_LISTENERS = 64
+POLL_INTERVAL = 0.5
+TERMINAL_EVENTS = ('stored', 'error')
+
+
+class MemoryBroker:
+    """プロセス内のチャンネル"""
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._channels = {}
+        self._cond = threading.Condition()
+
+    def _expire(self, now):
+        for channel in [c for c, (_, updated) in self._channels.items() if updated < now - self.ttl]:
+            del self._channels[channel]
+
+    def claim(self, channel, data):
+        """チャンネルが未使用（または前回が error で終了）なら accepted を追加して True を返す"""
+        with self._cond:
+            self._expire(time.time())
+            events = self._channels.get(channel, ([], 0))[0]
+            if events and events[-1][1] != 'error':
+                return False
+            self._append(channel, 'accepted', data)
+            return True
+
+    def publish(self, channel, event, data):
+        with self._cond:
+            self._append(channel, event, data)
+
+    def _append(self, channel, event, data):
+        events = self._channels.get(channel, ([], 0))[0]
+        events.append((len(events) + 1, event, data))
+        self._channels[channel] = (events, time.time())
+        self._cond.notify_all()
+
+    def events(self, channel, after=0):
+        with self._cond:
+            return [e for e in self._channels.get(channel, ([], 0))[0] if e[0] > after]
+
+    def wait(self, channel, after, timeout):
+        """after より新しいイベントが来るまで最大 timeout 秒待つ"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                events = [e for e in self._channels.get(channel, ([], 0))[0] if e[0] > after]
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events
+                self._cond.wait(remaining)
+
+
+class SQLiteBroker:
+    """複数ワーカーで共有する SQLite ファイル上のチャンネル"""
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS upload_progress ('
+            'channel TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, data TEXT NOT NULL, '
+            'created REAL NOT NULL, PRIMARY KEY (channel, seq))'
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _append(self, conn, channel, event, data, check_claim=False):
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if check_claim:
+                conn.execute('DELETE FROM upload_progress WHERE created < ?', (now - self.ttl,))
+            row = conn.execute(
+                'SELECT seq, event FROM upload_progress WHERE channel = ? ORDER BY seq DESC LIMIT 1', (channel,)
+            ).fetchone()
+            if check_claim and row and row[1] != 'error':
+                conn.execute('COMMIT')
+                return False
+            conn.execute('INSERT INTO upload_progress (channel, seq, event, data, created) VALUES (?, ?, ?, ?, ?)',
+                         (channel, (row[0] if row else 0) + 1, event, json.dumps(data), now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        with self._cond:
+            self._cond.notify_all()
+        return True
+
+    def claim(self, channel, data):
+        return self._append(self._connect(), channel, 'accepted', data, check_claim=True)
+
+    def publish(self, channel, event, data):
+        self._append(self._connect(), channel, event, data)
+
+    def events(self, channel, after=0):
+        rows = self._connect().execute(
+            'SELECT seq, event, data FROM upload_progress WHERE channel = ? AND seq > ? ORDER BY seq',
+            (channel, after),
+        )
+        return [(seq, event, json.loads(data)) for seq, event, data in rows]
+
+    def wait(self, channel, after, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            events = self.events(channel, after)
+            remaining = deadline - time.monotonic()
+            if events or remaining <= 0:
+                return events
+            # 同じワーカーの publish は即座に起こされ、他ワーカーの分は POLL_INTERVAL ごとに読み直す
+            with self._cond:
+                self._cond.wait(min(POLL_INTERVAL, remaining))
+
+
+def _make_broker(url, ttl):
+    if url and url.startswith('sqlite:///'):
+        return SQLiteBroker(url[len('sqlite:///'):], ttl)
+    return MemoryBroker(ttl)
+
+
+class Tracker:
+    """1回のアップロードの進捗を記録する（upload_id が無い場合は何もしない）"""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.started = time.perf_counter()
+        self._stage_started = self.started
+
+    def claim(self):
+        return self.channel is None or self.broker.claim(self.channel, {'elapsed': 0.0})
+
+    def stage(self, event, **data):
+        """イベントを追加する（elapsed はアップロード開始から、seconds は前の段階からの秒数）"""
+        now = time.perf_counter()
+        data.setdefault('seconds', round(now - self._stage_started, 3))
+        data['elapsed'] = round(now - self.started, 3)
+        self._stage_started = now
+        if self.channel is not None:
+            self.broker.publish(self.channel, event, data)
+        return data
+
+    def previous(self):
+        """同じ upload_id の直前までのイベント"""
+        return self.broker.events(self.channel) if self.channel is not None else []
+
+
+class UploadProgress:
+    def __init__(self):
+        self.broker = MemoryBroker()
+        self.max_listeners = DEFAULT_MAX_LISTENERS
+        self._listeners = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('UPLOAD_PROGRESS_URL', os.getenv('UPLOAD_PROGRESS_URL', 'memory://'))
+        app.config.setdefault('UPLOAD_PROGRESS_TTL', int(os.getenv('UPLOAD_PROGRESS_TTL', DEFAULT_TTL)))
+        app.config.setdefault('UPLOAD_PROGRESS_MAX_LISTENERS',
+                              int(os.getenv('UPLOAD_PROGRESS_MAX_LISTENERS', DEFAULT_MAX_LISTENERS)))
+        self.broker = _make_broker(app.config['UPLOAD_PROGRESS_URL'], app.config['UPLOAD_PROGRESS_TTL'])
+        self.max_listeners = app.config['UPLOAD_PROGRESS_MAX_LISTENERS']
+        metrics.gauge('upload_progress_listeners', lambda: {(): self._listeners})
+
+    def tracker(self, user_id, upload_id):
+        return Tracker(self.broker, channel_for(user_id, upload_id) if upload_id else None)
+
+    def acquire_listener(self):
+        """購読数の上限（スレッドを占有する接続数を抑える）。超えていれば False"""
+        with self._lock:
+            if self._listeners >= self.max_listeners:
+                return False
+            self._listeners += 1
+            return True
+
+    def release_listener(self):
+        with self._lock:
+            self._listeners -= 1
+
+
+def channel_for(user_id, upload_id):
+    # 他ユーザーの upload_id を推測しても購読できないよう user_id で区切る
+    return f'{user_id}:{upload_id}'
+
+
+upload_progress = UploadProgress()
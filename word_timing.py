@@ -0,0 +1,155 @@
+"""
+単語タイミング（音声認識の単語ごとの開始・終了時刻）
+
+Question.word_timings と音声ストアの <sha256>.words に、以下のバイト列で保存する。
+    [形式バージョン 1B][単語数 varint]([前の単語の終了からの間隔 varint][単語の長さ varint]) × 単語数
+時刻は 10ms 単位の差分なので、1語あたり 2〜3 バイト程度になる。
+
+単語は文字起こし（および穴埋め後の question_text）を空白で区切った語と順に対応する。
+空欄を含む文の時間範囲（セグメント）を求め、学習ページでその部分だけを繰り返し再生する。
+"""
+
+import os
+import re
+
+import audio_store
+from question_generator import BLANK
+
+FORMAT_VERSION = 1
+UNIT_MS = 10
+# セグメントの前後に付ける余白・文の区切りとみなす無音・セグメントの最大長
+SEGMENT_PADDING_MS = 150
+SENTENCE_PAUSE_MS = 500
+MAX_SEGMENT_MS = 15000
+
+_SENTENCE_END_RE = re.compile(r'[.!?。！？]["\')]*$')
+
+
+def _put_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode(word_times):
+    """[(開始ms, 終了ms), ...] をバイト列にする（時刻が前後していても単調になるよう丸める）"""
+    out = bytearray([FORMAT_VERSION])
+    _put_varint(out, len(word_times))
+    prev_end = 0
+    for start_ms, end_ms in word_times:
+        start = max(int(round(start_ms / UNIT_MS)), prev_end)
+        end = max(int(round(end_ms / UNIT_MS)), start)
+        _put_varint(out, start - prev_end)
+        _put_varint(out, end - start)
+        prev_end = end
+    return bytes(out)
+
+
+def decode(data):
+    """encode() の逆変換。空・未対応の形式は None"""
+    if not data or data[0] != FORMAT_VERSION:
+        return None
+    count, pos = _read_varint(data, 1)
+    word_times = []
+    prev_end = 0
+    for _ in range(count):
+        gap, pos = _read_varint(data, pos)
+        duration, pos = _read_varint(data, pos)
+        start = prev_end + gap
+        prev_end = start + duration
+        word_times.append((start * UNIT_MS, prev_end * UNIT_MS))
+    return word_times
+
+
+def timings_path(blob_path):
+    """blob と同じディレクトリの単語タイミングファイル（<sha256>.words）"""
+    return os.path.splitext(audio_store.transcript_path(blob_path))[0] + '.words'
+
+
+def read_file(path):
+    """ストア内の単語タイミングファイルを読む（無ければ None）"""
+    local_path = audio_store.localize(path)
+    if not local_path:
+        return None
+    with open(local_path, 'rb') as f:
+        return f.read()
+
+
+def load(audio_url):
+    """Question.audio_url に対応する単語タイミング（バイト列）をストアから読む。旧形式のパスは None"""
+    path = audio_store.resolve_path(audio_url)
+    if path == audio_url:
+        return None
+    return read_file(timings_path(path))
+
+
+def aligned(text, word_times):
+    """text の空白区切りの語数と単語タイミングの数が一致するか（一致しなければタイミングは使えない）"""
+    return bool(word_times) and len(text.split()) == len(word_times)
+
+
+def _is_boundary(words, word_times, i):
+    """i 番目の語の後ろが文の区切りか"""
+    if i >= len(words) - 1:
+        return True
+    if _SENTENCE_END_RE.search(words[i]):
+        return True
+    return word_times[i + 1][0] - word_times[i][1] >= SENTENCE_PAUSE_MS
+
+
+def _sentence_span(words, word_times, i):
+    lo = i
+    while lo > 0 and not _is_boundary(words, word_times, lo - 1):
+        lo -= 1
+    hi = i
+    while not _is_boundary(words, word_times, hi):
+        hi += 1
+    # 長すぎる文は空欄から遠い側の語を削る
+    while word_times[hi][1] - word_times[lo][0] > MAX_SEGMENT_MS and lo < hi:
+        if i - lo > hi - i:
+            lo += 1
+        else:
+            hi -= 1
+    return lo, hi
+
+
+def segments(question_text, word_times):
+    """
+    空欄を含む文ごとの再生範囲を返す（同じ文の空欄はまとめる）。
+
+    Returns: [{'start', 'end'（秒）, 'text', 'blanks'（文中の空欄の番号）}, ...]。タイミングが使えなければ []
+    """
+    if not aligned(question_text, word_times):
+        return []
+    words = question_text.split()
+    result = []
+    blank_no = 0
+    covered = -1
+    for i, word in enumerate(words):
+        if BLANK not in word:
+            continue
+        if i <= covered:
+            result[-1]['blanks'].append(blank_no)
+        else:
+            lo, hi = _sentence_span(words, word_times, i)
+            covered = hi
+            result.append({
+                'start': round(max(0, word_times[lo][0] - SEGMENT_PADDING_MS) / 1000, 2),
+                'end': round((word_times[hi][1] + SEGMENT_PADDING_MS) / 1000, 2),
+                'text': ' '.join(words[lo:hi + 1]),
+                'blanks': [blank_no],
+            })
+        blank_no += 1
+    return result